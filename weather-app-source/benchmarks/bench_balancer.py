@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""задержка клиента при деградации одной реплики: round_robin gRPC против p2c из shared/balancer.py
+
+три реплики weather-aggregator-заглушки на localhost отвечают за BASE_MS; в середине замера одна
+начинает отвечать за SLOW_MS (пауза GC, шумный сосед). клиенты в CLIENTS потоков шлют запросы подряд
+"""
+import os
+import sys
+import threading
+import time
+from concurrent import futures
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'generated'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'shared'))
+
+import grpc
+import numpy as np
+
+import weather_service_pb2
+import weather_service_pb2_grpc
+from balancer import BalancedChannel
+from channels import create_channel
+
+BASE_PORT = int(os.getenv('BENCH_BASE_PORT', '6301'))
+REPLICAS = 3
+CLIENTS = int(os.getenv('BENCH_CLIENTS', '8'))
+PHASE_SECONDS = float(os.getenv('BENCH_PHASE_SECONDS', '5'))
+BASE_MS = 2.0
+SLOW_MS = 100.0
+
+
+class Replica(weather_service_pb2_grpc.WeatherServiceServicer):
+    def __init__(self):
+        self.delay = BASE_MS / 1000
+        self.calls = 0
+
+    def GetWeather(self, request, context):
+        self.calls += 1
+        time.sleep(self.delay)
+        return weather_service_pb2.WeatherResponse(city=request.city)
+
+
+def start_replicas():
+    replicas, servers = [], []
+    for i in range(REPLICAS):
+        replica = Replica()
+        server = grpc.server(futures.ThreadPoolExecutor(max_workers=CLIENTS * 2))
+        weather_service_pb2_grpc.add_WeatherServiceServicer_to_server(replica, server)
+        server.add_insecure_port(f'127.0.0.1:{BASE_PORT + i}')
+        server.start()
+        replicas.append(replica)
+        servers.append(server)
+    return replicas, servers
+
+
+def load(stub, seconds):
+    latencies = []
+    lock = threading.Lock()
+    stop = time.monotonic() + seconds
+
+    def client():
+        own = []
+        request = weather_service_pb2.WeatherRequest(city='moscow')
+        while time.monotonic() < stop:
+            started = time.perf_counter()
+            stub.GetWeather(request, timeout=5)
+            own.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(own)
+
+    threads = [threading.Thread(target=client) for _ in range(CLIENTS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return np.array(latencies) * 1000
+
+
+def report(name, phase, latencies, replicas):
+    p50, p99, p999 = np.percentile(latencies, [50, 99, 99.9])
+    share = replicas[0].calls / max(sum(replica.calls for replica in replicas), 1)
+    print(f"{name:11s} {phase:9s} {len(latencies) / PHASE_SECONDS:7.0f} req/s  "
+          f"p50 {p50:6.1f} ms  p99 {p99:6.1f} ms  p99.9 {p999:6.1f} ms  slow replica share {share:.0%}")
+
+
+def run(name, channel, replicas):
+    stub = weather_service_pb2_grpc.WeatherServiceStub(channel)
+    load(stub, 1.0)
+    for phase, delay in (('healthy', BASE_MS), ('degraded', SLOW_MS)):
+        replicas[0].delay = delay / 1000
+        for replica in replicas:
+            replica.calls = 0
+        report(name, phase, load(stub, PHASE_SECONDS), replicas)
+    replicas[0].delay = BASE_MS / 1000
+    channel.close()
+
+
+def main():
+    replicas, servers = start_replicas()
+    addresses = ','.join(f'127.0.0.1:{BASE_PORT + i}' for i in range(REPLICAS))
+    try:
+        run('round_robin', create_channel(addresses, balanced=True), replicas)
+        run('p2c', BalancedChannel(addresses, create_channel), replicas)
+    finally:
+        for server in servers:
+            server.stop(None)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""перегрузка CPU-нагруженного сервиса: прежний пул на 10 потоков с неограниченной очередью против
+адаптивного лимита из shared/concurrency.py
+
+клиент шлет вызовы с постоянной частотой (открытая модель, как пользователи gateway) примерно вдвое
+выше возможностей сервера, с дедлайном DEADLINE; параллельно раз в 100 мс идет HealthCheck.
+сервер - отдельный процесс, обработчик - BUSY_MS чистого Python
+"""
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from concurrent import futures
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'shared'))
+
+import grpc
+import numpy as np
+
+from channels import create_channel, server_options
+from concurrency import SERVER_THREADS, ConcurrencyInterceptor
+from deadline import DeadlineInterceptor
+
+PORT = int(os.getenv('BENCH_PORT', '6601'))
+BUSY_MS = 10.0
+RATE = float(os.getenv('BENCH_RATE', '200'))
+SECONDS = float(os.getenv('BENCH_SECONDS', '10'))
+DEADLINE = 2.0
+
+
+def work(request, context):
+    deadline = time.perf_counter() + BUSY_MS / 1000
+    value = 0
+    while time.perf_counter() < deadline:
+        value += sum(range(100))
+    return b''
+
+
+def health(request, context):
+    return b'ok'
+
+
+def serve(limited, ready):
+    if limited:
+        server = grpc.server(
+            futures.ThreadPoolExecutor(max_workers=SERVER_THREADS),
+            interceptors=[DeadlineInterceptor(), ConcurrencyInterceptor()],
+            maximum_concurrent_rpcs=SERVER_THREADS,
+            options=server_options()
+        )
+    else:
+        server = grpc.server(
+            futures.ThreadPoolExecutor(max_workers=10),
+            interceptors=[DeadlineInterceptor()],
+            options=server_options()
+        )
+    handlers = {
+        'Work': grpc.unary_unary_rpc_method_handler(work),
+        'HealthCheck': grpc.unary_unary_rpc_method_handler(health),
+    }
+    server.add_generic_rpc_handlers((grpc.method_handlers_generic_handler('bench.Busy', handlers),))
+    server.add_insecure_port(f'127.0.0.1:{PORT}')
+    server.start()
+    ready.set()
+    server.wait_for_termination()
+
+
+def load(channel):
+    work_call = channel.unary_unary('/bench.Busy/Work')
+    health_call = channel.unary_unary('/bench.Busy/HealthCheck')
+    results = []
+    lock = threading.Lock()
+    pending = []
+
+    def done(started, future):
+        elapsed = time.perf_counter() - started
+        with lock:
+            results.append((future.code(), elapsed))
+
+    health_latencies = []
+    stop = time.perf_counter() + SECONDS
+
+    def check_health():
+        while time.perf_counter() < stop:
+            started = time.perf_counter()
+            try:
+                health_call(b'', timeout=DEADLINE)
+                health_latencies.append(time.perf_counter() - started)
+            except grpc.RpcError:
+                health_latencies.append(DEADLINE)
+            time.sleep(0.1)
+
+    checker = threading.Thread(target=check_health)
+    checker.start()
+    interval = 1 / RATE
+    next_call = time.perf_counter()
+    while next_call < stop:
+        started = time.perf_counter()
+        future = work_call.future(b'', timeout=DEADLINE)
+        future.add_done_callback(lambda f, started=started: done(started, f))
+        pending.append(future)
+        next_call += interval
+        time.sleep(max(next_call - time.perf_counter(), 0))
+    for future in pending:
+        try:
+            future.result()
+        except grpc.RpcError:
+            pass
+    checker.join()
+    return results, health_latencies
+
+
+def report(name, results, health_latencies):
+    total = len(results)
+    ok = np.array([elapsed for code, elapsed in results if code == grpc.StatusCode.OK]) * 1000
+    shed = np.array([elapsed for code, elapsed in results if code == grpc.StatusCode.RESOURCE_EXHAUSTED]) * 1000
+    expired = sum(1 for code, _ in results if code == grpc.StatusCode.DEADLINE_EXCEEDED)
+    print(f"{name}: {total} calls, ok {len(ok) / total:.0%}, shed {len(shed) / total:.0%}, "
+          f"deadline exceeded {expired / total:.0%}, goodput {len(ok) / SECONDS:.0f} req/s")
+    if len(ok):
+        print(f"  ok latency p50 {np.percentile(ok, 50):7.1f} ms  p99 {np.percentile(ok, 99):7.1f} ms")
+    if len(shed):
+        print(f"  shed latency p50 {np.percentile(shed, 50):5.1f} ms  p99 {np.percentile(shed, 99):5.1f} ms")
+    health = np.array(health_latencies) * 1000
+    print(f"  health check p50 {np.percentile(health, 50):7.1f} ms  p99 {np.percentile(health, 99):7.1f} ms")
+
+
+def main():
+    print(f"{RATE:.0f} req/s for {SECONDS:.0f} s, {BUSY_MS} ms of CPU per call, deadline {DEADLINE} s")
+    context = multiprocessing.get_context('spawn')
+    for name, limited in (('fixed pool', False), ('adaptive limit', True)):
+        ready = context.Event()
+        server = context.Process(target=serve, args=(limited, ready), daemon=True)
+        server.start()
+        ready.wait(30)
+        channel = create_channel(f'127.0.0.1:{PORT}')
+        grpc.channel_ready_future(channel).result(timeout=30)
+        report(name, *load(channel))
+        channel.close()
+        server.terminate()
+        server.join()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""сборка ответа data-processor: пересборка данных провайдеров (как до common.proto) против пересылки
+
+старый путь: каждое поле WeatherData копируется в новый SourceData, тот через CopyFrom в WeatherSummary,
+а готовые подсообщения еще раз копируются конструктором ProcessResponse; новый путь - один CopyFrom
+общего common.WeatherData прямо в ответ. оба пути заканчиваются сериализацией, как в gRPC
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'generated'))
+
+import common_pb2
+import data_processor_pb2
+import weather_service_pb2
+
+REQUESTS = int(os.getenv('BENCH_REQUESTS', '100000'))
+ALLOCATION_SAMPLES = 2000
+
+
+def weather_response():
+    return weather_service_pb2.WeatherResponse(
+        city='moscow',
+        openweather=common_pb2.WeatherData(
+            temperature=12.3, humidity=71, pressure=1012.0, description='light rain', wind_speed=4.2, available=True
+        ),
+        weatherapi=common_pb2.WeatherData(
+            temperature=11.8, humidity=75, pressure=1011.0, description='Patchy rain nearby', wind_speed=15.1, available=True
+        ),
+        timestamp_us=time.time_ns() // 1000,
+        status=common_pb2.SourceStatus(openweather='success', weatherapi='success')
+    )
+
+
+def _convert(weather_data):
+    # так выглядел DataProcessorService._convert_weather_data (SourceData имел те же поля)
+    return common_pb2.WeatherData(
+        temperature=weather_data.temperature,
+        humidity=weather_data.humidity,
+        pressure=weather_data.pressure,
+        description=weather_data.description,
+        wind_speed=weather_data.wind_speed
+    )
+
+
+def rebuild(source, processed_at_us):
+    weather_summary = data_processor_pb2.WeatherSummary()
+    weather_summary.openweather.CopyFrom(_convert(source.openweather))
+    weather_summary.weatherapi.CopyFrom(_convert(source.weatherapi))
+    averages = data_processor_pb2.Averages(
+        temperature=(source.openweather.temperature + source.weatherapi.temperature) / 2,
+        humidity=(source.openweather.humidity + source.weatherapi.humidity) / 2
+    )
+    data_sources = common_pb2.SourceStatus(
+        openweather=source.status.openweather,
+        weatherapi=source.status.weatherapi
+    )
+    return data_processor_pb2.ProcessResponse(
+        city=source.city,
+        processed_at_us=processed_at_us,
+        weather_summary=weather_summary,
+        averages=averages,
+        data_sources=data_sources
+    ).SerializeToString()
+
+
+def forward(source, processed_at_us):
+    response = data_processor_pb2.ProcessResponse(city=source.city, processed_at_us=processed_at_us)
+    response.averages.temperature = (source.openweather.temperature + source.weatherapi.temperature) / 2
+    response.averages.humidity = (source.openweather.humidity + source.weatherapi.humidity) / 2
+    response.weather_summary.openweather.CopyFrom(source.openweather)
+    response.weather_summary.weatherapi.CopyFrom(source.weatherapi)
+    response.data_sources.CopyFrom(source.status)
+    return response.SerializeToString()
+
+
+def cpu_per_request(build, source, processed_at_us):
+    started = time.process_time()
+    for _ in range(REQUESTS):
+        build(source, processed_at_us)
+    return (time.process_time() - started) / REQUESTS * 1e6
+
+
+def peak_bytes_per_request(build, source, processed_at_us):
+    # пик кучи Python на запрос; память арен upb (C) tracemalloc не видит
+    tracemalloc.start()
+    total = 0
+    for _ in range(ALLOCATION_SAMPLES):
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        build(source, processed_at_us)
+        total += tracemalloc.get_traced_memory()[1] - current
+    tracemalloc.stop()
+    return total / ALLOCATION_SAMPLES
+
+
+def main():
+    source = weather_response()
+    processed_at_us = time.time_ns() // 1000
+    assert rebuild(source, processed_at_us) != b''
+
+    results = {}
+    for name, build in (('rebuild', rebuild), ('forward', forward)):
+        results[name] = (cpu_per_request(build, source, processed_at_us), peak_bytes_per_request(build, source, processed_at_us))
+        print(f"{name:8s} {results[name][0]:6.2f} us CPU/request, {results[name][1]:6.0f} B peak Python heap/request")
+
+    saved_cpu = results['rebuild'][0] - results['forward'][0]
+    saved_bytes = results['rebuild'][1] - results['forward'][1]
+    print(f"saved    {saved_cpu:6.2f} us CPU/request ({saved_cpu / results['rebuild'][0]:.0%}), "
+          f"{saved_bytes:6.0f} B/request")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""замер записи и загрузки снапшота analytics на синтетической истории (по умолчанию 1M точек)"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'services', 'analytics'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'shared'))
+
+from fleet import FleetMatrix
+from snapshot import load_snapshot, write_snapshot
+from store import MICROS, HistoryStore
+
+CITIES = int(os.getenv('BENCH_CITIES', '1000'))
+POINTS_PER_CITY = int(os.getenv('BENCH_POINTS_PER_CITY', '1000'))
+
+
+def fill(store, fleet):
+    start = time.time() - POINTS_PER_CITY * 300
+    for c in range(CITIES):
+        city = f"city-{c}"
+        for i in range(POINTS_PER_CITY):
+            ts = start + i * 300
+            temperature = 10 + (c + i) % 20
+            store.append(city, round(ts * MICROS), temperature, 60.0)
+            fleet.update(city, ts, temperature, 60.0)
+
+
+def main():
+    store = HistoryStore(max_points_per_city=POINTS_PER_CITY)
+    fleet = FleetMatrix()
+    fill(store, fleet)
+
+    path = os.path.join(tempfile.mkdtemp(), 'analytics.snapshot')
+    started = time.perf_counter()
+    points = write_snapshot(path, store, fleet)
+    write_ms = (time.perf_counter() - started) * 1000
+
+    restored_store = HistoryStore(max_points_per_city=POINTS_PER_CITY)
+    restored_fleet = FleetMatrix()
+    started = time.perf_counter()
+    cities, loaded = load_snapshot(path, restored_store, restored_fleet)
+    load_ms = (time.perf_counter() - started) * 1000
+
+    size_mb = os.path.getsize(path) / 1024 / 1024
+    print(f"points: {points}, cities: {cities}, file: {size_mb:.1f} MB")
+    print(f"write: {write_ms:.0f} ms, load (mmap): {load_ms:.0f} ms, {loaded / load_ms * 1000:,.0f} points/s")
+    os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""время строкой ISO 8601 (как было) против int64 микросекунд эпохи
+
+сравнивается размер и скорость (де)сериализации HistoryRecord и колоночного ExportChunk, а также
+память точки истории в analytics. старые сообщения со строковым временем собираются из дескриптора
+на лету - те же номера полей, что были в analytics.proto до перехода
+"""
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'generated'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'services', 'analytics'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'shared'))
+
+from google.protobuf import descriptor_pb2, descriptor_pool, message_factory
+
+import analytics_pb2
+from store import MICROS, HistoryPoint
+
+POINTS = int(os.getenv('BENCH_POINTS', '100000'))
+CHUNK_POINTS = 1000
+STEP_US = 300 * MICROS
+
+F = descriptor_pb2.FieldDescriptorProto
+
+
+def legacy_messages():
+    """HistoryRecord и ExportChunk со строковым временем в поле 2 / 3"""
+    proto = descriptor_pb2.FileDescriptorProto(name='legacy_timestamps.proto', package='legacy', syntax='proto3')
+    record = proto.message_type.add(name='HistoryRecord')
+    for number, name, kind in ((1, 'seq', F.TYPE_INT64), (2, 'timestamp', F.TYPE_STRING),
+                               (3, 'temperature', F.TYPE_DOUBLE), (4, 'humidity', F.TYPE_DOUBLE),
+                               (5, 'repeats', F.TYPE_INT32)):
+        record.field.add(name=name, number=number, type=kind, label=F.LABEL_OPTIONAL)
+    chunk = proto.message_type.add(name='ExportChunk')
+    for number, name, kind in ((1, 'city', F.TYPE_STRING), (2, 'seq', F.TYPE_INT64), (3, 'timestamps', F.TYPE_STRING),
+                               (4, 'temperature', F.TYPE_DOUBLE), (5, 'humidity', F.TYPE_DOUBLE),
+                               (6, 'repeats', F.TYPE_INT32)):
+        chunk.field.add(name=name, number=number, type=kind,
+                        label=F.LABEL_OPTIONAL if number == 1 else F.LABEL_REPEATED)
+    pool = descriptor_pool.DescriptorPool()
+    pool.Add(proto)
+    return (
+        message_factory.GetMessageClass(pool.FindMessageTypeByName('legacy.HistoryRecord')),
+        message_factory.GetMessageClass(pool.FindMessageTypeByName('legacy.ExportChunk'))
+    )
+
+
+def iso(us):
+    return datetime.fromtimestamp(us // MICROS).replace(microsecond=us % MICROS).isoformat()
+
+
+def timed(fn, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat * 1e6
+
+
+def compare_records(legacy_record, now_us):
+    # время с микросекундами, как у datetime.now().isoformat()
+    observed_us = now_us + 123456
+    legacy = legacy_record(seq=12345, timestamp=iso(observed_us), temperature=12.3, humidity=71.0, repeats=1)
+    binary = analytics_pb2.HistoryRecord(seq=12345, timestamp_us=observed_us, temperature=12.3, humidity=71.0, repeats=1)
+    print("HistoryRecord (one point):")
+    for name, message in (('string', legacy), ('int64', binary)):
+        data = message.SerializeToString()
+        encode = timed(message.SerializeToString, POINTS)
+        decode = timed(lambda: type(message).FromString(data), POINTS)
+        print(f"  {name:6s} {len(data):3d} B, serialize {encode:.2f} us, parse {decode:.2f} us")
+
+
+def compare_chunks(legacy_chunk, now_us):
+    stamps = [now_us - (CHUNK_POINTS - i) * STEP_US + i * 1013 for i in range(CHUNK_POINTS)]
+    columns = dict(
+        city='moscow',
+        seq=list(range(1, CHUNK_POINTS + 1)),
+        temperature=[10 + i % 20 * 0.5 for i in range(CHUNK_POINTS)],
+        humidity=[60.0] * CHUNK_POINTS,
+        repeats=[1] * CHUNK_POINTS
+    )
+    legacy = legacy_chunk(timestamps=[iso(us) for us in stamps], **columns)
+    binary = analytics_pb2.ExportChunk(timestamps_us=stamps, **columns)
+    repeat = max(1, POINTS // CHUNK_POINTS)
+    print(f"ExportChunk ({CHUNK_POINTS} points):")
+    for name, message in (('string', legacy), ('int64', binary)):
+        data = message.SerializeToString()
+        encode = timed(message.SerializeToString, repeat)
+        decode = timed(lambda: type(message).FromString(data), repeat)
+        print(f"  {name:6s} {len(data) / 1024:5.1f} KB, serialize {encode:.0f} us, parse {decode:.0f} us")
+    # строка теперь собирается только на gateway, для текстовых форматов экспорта
+    formatting = timed(lambda: [iso(us) for us in binary.timestamps_us], repeat)
+    print(f"  gateway formatting of timestamps: {formatting / CHUNK_POINTS:.2f} us/point")
+
+
+def point_bytes(make, now_us):
+    tracemalloc.start()
+    points = [make(i, now_us - i * STEP_US) for i in range(POINTS)]
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del points
+    return size / POINTS
+
+
+def compare_memory(now_us):
+    # значения - отдельные объекты, как после разбора сообщения, а не общие константы
+    legacy = point_bytes(lambda i, us: HistoryPoint(i, iso(us), 10.0 + i % 20, 60.0 + i % 7), now_us)
+    binary = point_bytes(lambda i, us: HistoryPoint(i, us, 10.0 + i % 20, 60.0 + i % 7), now_us)
+    print(f"history point in memory: string {legacy:.0f} B, int64 {binary:.0f} B "
+          f"(saved {legacy - binary:.0f} B, {(legacy - binary) / legacy:.0%})")
+
+
+def main():
+    legacy_record, legacy_chunk = legacy_messages()
+    now_us = time.time_ns() // 1000 // MICROS * MICROS
+    compare_records(legacy_record, now_us)
+    compare_chunks(legacy_chunk, now_us)
+    compare_memory(now_us)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""накладные расходы трассировки из shared/tracing.py под полной нагрузкой
+
+сервер - отдельный процесс с теми же перехватчиками, что у сервисов (метрики или TracingInterceptor,
+дедлайн, лимит); обработчик - BUSY_MS чистого Python. клиент, как gateway, открывает
+корневой спан на каждый запрос и вызывает сервер через канал с ClientMetricsInterceptor
+(ClientTracingInterceptor).
+CLIENTS потоков шлют вызовы без пауз; режимы чередуются по кругам, чтобы дрейф машины не лег на один
+из них. спаны пишутся в файл во временном каталоге
+"""
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent import futures
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'shared'))
+
+# до импорта tracing: TRACE_EXPORT читается при импорте, процесс сервера наследует окружение
+os.environ.setdefault('TRACE_EXPORT', os.path.join(tempfile.mkdtemp(), 'traces.jsonl'))
+
+import grpc
+
+import tracing
+from channels import create_channel, server_options
+from concurrency import SERVER_THREADS, ConcurrencyInterceptor
+from deadline import DeadlineInterceptor
+from metrics import ClientMetricsInterceptor, MetricsInterceptor
+
+PORT = int(os.getenv('BENCH_PORT', '6701'))
+CLIENTS = int(os.getenv('BENCH_CLIENTS', '8'))
+SECONDS = float(os.getenv('BENCH_SECONDS', '3'))
+ROUNDS = int(os.getenv('BENCH_ROUNDS', '5'))
+BUSY_MS = 2.0
+
+
+def work(request, context):
+    deadline = time.perf_counter() + BUSY_MS / 1000
+    value = 0
+    while time.perf_counter() < deadline:
+        value += sum(range(100))
+    return b''
+
+
+def serve(port, traced, ready):
+    tracing.configure_tracing('bench-server')
+    first = tracing.TracingInterceptor() if traced else MetricsInterceptor()
+    interceptors = [first, DeadlineInterceptor(), ConcurrencyInterceptor()]
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=SERVER_THREADS), interceptors=interceptors,
+                         maximum_concurrent_rpcs=SERVER_THREADS, options=server_options())
+    handler = grpc.unary_unary_rpc_method_handler(work)
+    server.add_generic_rpc_handlers((grpc.method_handlers_generic_handler('bench.Busy', {'Work': handler}),))
+    server.add_insecure_port(f'127.0.0.1:{port}')
+    server.start()
+    ready.set()
+    server.wait_for_termination()
+
+
+def load(channel, traced):
+    call = channel.unary_unary('/bench.Busy/Work')
+    counts = []
+    stop = time.monotonic() + SECONDS
+
+    def client():
+        calls = 0
+        while time.monotonic() < stop:
+            if traced:
+                span = tracing.start_span('GET /bench')
+                token = tracing.activate(span)
+                try:
+                    call(b'', timeout=5)
+                except grpc.RpcError:
+                    pass
+                tracing.deactivate(token)
+                span.end()
+            else:
+                try:
+                    call(b'', timeout=5)
+                except grpc.RpcError:
+                    pass
+            calls += 1
+        counts.append(calls)
+
+    threads = [threading.Thread(target=client) for _ in range(CLIENTS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(counts) / SECONDS
+
+
+def main():
+    tracing.configure_tracing('bench-client')
+    context = multiprocessing.get_context('spawn')
+    servers = []
+    for port, traced in ((PORT, False), (PORT + 1, True)):
+        ready = context.Event()
+        process = context.Process(target=serve, args=(port, traced, ready), daemon=True)
+        process.start()
+        ready.wait(30)
+        servers.append(process)
+    plain = grpc.intercept_channel(create_channel(f'127.0.0.1:{PORT}'), ClientMetricsInterceptor('bench'))
+    traced = grpc.intercept_channel(create_channel(f'127.0.0.1:{PORT + 1}'), tracing.ClientTracingInterceptor('bench'))
+    for channel in (plain, traced):
+        grpc.channel_ready_future(channel).result(timeout=30)
+
+    modes = (('no tracing', plain, False, None), ('sampled 1%', traced, True, 0.01),
+             ('sampled 100%', traced, True, 1.0))
+    results = {name: [] for name, *_ in modes}
+    for _ in range(ROUNDS):
+        for name, channel, traced_calls, rate in modes:
+            if rate is not None:
+                tracing.SAMPLE_RATE = rate
+            results[name].append(load(channel, traced_calls))
+            # спаны круга выгружаются в фоне - ждем выгрузки, чтобы она не легла на следующий режим
+            time.sleep(tracing.EXPORT_INTERVAL + 0.5)
+    print(f"{os.cpu_count()} CPUs, {CLIENTS} client threads, {BUSY_MS} ms of CPU per call, "
+          f"{ROUNDS} rounds of {SECONDS:.0f} s")
+    baseline = statistics.median(results['no tracing'])
+    for name, *_ in modes:
+        throughput = statistics.median(results[name])
+        print(f"{name:>13}: {throughput:6.0f} req/s  {100 * (throughput / baseline - 1):+5.1f}%")
+    for process in servers:
+        process.terminate()
+        process.join()
+
+
+if __name__ == '__main__':
+    main()
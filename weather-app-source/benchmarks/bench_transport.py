@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""один хоп gRPC через TCP loopback против unix-сокета
+
+сервер и клиент в одном процессе, каналы и параметры сервера - из shared/channels.py. на каждый
+размер сообщения - задержка вызова (p50/p99) и процессорное время обеих сторон на вызов
+(user + sys: у TCP заметная часть уходит в сетевой стек ядра)
+"""
+import os
+import resource
+import sys
+import tempfile
+import time
+from concurrent import futures
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'shared'))
+
+import grpc
+import numpy as np
+
+from channels import add_ports, create_channel, server_options
+
+PORT = int(os.getenv('BENCH_PORT', '6401'))
+CALLS = int(os.getenv('BENCH_CALLS', '5000'))
+# запрос погоды, ответ с историей, чанк экспорта
+SIZES = (100, 16 * 1024, 256 * 1024)
+METHOD = '/bench.Echo/Echo'
+
+
+def start_server(unix_socket):
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=4), options=server_options())
+    # без сериализаторов обработчик получает и отдает bytes как есть
+    handler = grpc.unary_unary_rpc_method_handler(lambda request, context: request)
+    server.add_generic_rpc_handlers((grpc.method_handlers_generic_handler('bench.Echo', {'Echo': handler}),))
+    add_ports(server, PORT, unix_socket=unix_socket, listen_tcp=True)
+    server.start()
+    return server
+
+
+def cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def measure(target, payload):
+    channel = create_channel(target)
+    echo = channel.unary_unary(METHOD)
+    for _ in range(200):
+        echo(payload, timeout=5)
+    latencies = np.empty(CALLS)
+    cpu_started = cpu_seconds()
+    for i in range(CALLS):
+        started = time.perf_counter()
+        echo(payload, timeout=5)
+        latencies[i] = time.perf_counter() - started
+    cpu = (cpu_seconds() - cpu_started) / CALLS
+    channel.close()
+    p50, p99 = np.percentile(latencies * 1e6, [50, 99])
+    return p50, p99, cpu * 1e6
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        unix_socket = os.path.join(directory, 'bench.sock')
+        server = start_server(unix_socket)
+        try:
+            for size in SIZES:
+                payload = os.urandom(size)
+                print(f"{size / 1024:6.1f} KB:")
+                results = {}
+                for name, target in (('tcp', f'127.0.0.1:{PORT}'), ('unix', f'unix:{unix_socket}')):
+                    results[name] = measure(target, payload)
+                    p50, p99, cpu = results[name]
+                    print(f"  {name:4s} p50 {p50:7.1f} us  p99 {p99:7.1f} us  cpu {cpu:7.1f} us/call")
+                print(f"  unix vs tcp: p50 {1 - results['unix'][0] / results['tcp'][0]:.0%} lower, "
+                      f"cpu {1 - results['unix'][2] / results['tcp'][2]:.0%} lower")
+        finally:
+            server.stop(None)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""пропускная способность CPU-нагруженного gRPC-сервиса: один процесс против GRPC_WORKERS процессов на
+одном порту (SO_REUSEPORT)
+
+сервер запускается через WorkerPool из shared/workers.py - этот же файл в роли grpc_server.py.
+обработчик - BUSY_MS чистого Python, как разбор и расчеты в data-processor. клиенты - отдельные
+процессы с p2c-каналом из нескольких соединений, чтобы ядро разнесло соединения по процессам сервера
+"""
+import multiprocessing
+import os
+import sys
+import time
+from collections import Counter
+from concurrent import futures
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'shared'))
+
+import grpc
+
+from balancer import BalancedChannel
+from channels import add_ports, create_channel, server_options
+from workers import WorkerPool
+
+PORT = int(os.getenv('BENCH_PORT', '6501'))
+WORKER_COUNTS = tuple(int(count) for count in os.getenv('BENCH_WORKERS', '1,2,4').split(','))
+CLIENTS = int(os.getenv('BENCH_CLIENTS', str(max(os.cpu_count() or 1, 4))))
+CONNECTIONS = 4
+SECONDS = float(os.getenv('BENCH_SECONDS', '5'))
+BUSY_MS = 2.0
+METHOD = '/bench.Busy/Work'
+
+
+def work(request, context):
+    deadline = time.perf_counter() + BUSY_MS / 1000
+    value = 0
+    while time.perf_counter() < deadline:
+        value += sum(range(100))
+    return str(os.getpid()).encode()
+
+
+def serve():
+    workers = int(os.getenv('GRPC_WORKERS', '1'))
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=8), options=server_options(reuse_port=workers > 1))
+    handler = grpc.unary_unary_rpc_method_handler(work)
+    server.add_generic_rpc_handlers((grpc.method_handlers_generic_handler('bench.Busy', {'Work': handler}),))
+    add_ports(server, PORT, unix_socket='')
+    server.start()
+    server.wait_for_termination()
+
+
+def client(seconds, results):
+    channel = BalancedChannel(f'127.0.0.1:{PORT}', lambda address: create_channel(address, dedicated=True),
+                              resolve_interval=0, connections=CONNECTIONS)
+    call = channel.unary_unary(METHOD)
+    pids = Counter()
+    stop = time.monotonic() + seconds
+    while time.monotonic() < stop:
+        pids[call(b'', timeout=5).decode()] += 1
+    channel.close()
+    results.put(pids)
+
+
+def wait_ready(count):
+    channel = create_channel(f'127.0.0.1:{PORT}')
+    grpc.channel_ready_future(channel).result(timeout=30)
+    channel.close()
+    # остальные процессы поднимаются параллельно первому
+    time.sleep(0.5 * count)
+
+
+def run(count):
+    pool = WorkerPool(os.path.abspath(__file__), count)
+    pool.start()
+    try:
+        wait_ready(count)
+        context = multiprocessing.get_context('spawn')
+        results = context.Queue()
+        clients = [context.Process(target=client, args=(SECONDS, results)) for _ in range(CLIENTS)]
+        for process in clients:
+            process.start()
+        pids = Counter()
+        for _ in clients:
+            pids.update(results.get())
+        for process in clients:
+            process.join()
+    finally:
+        pool.stop()
+    total = sum(pids.values())
+    spread = ' '.join(f'{calls / total:.0%}' for calls in sorted(pids.values(), reverse=True))
+    print(f"workers {count}: {total / SECONDS:6.0f} req/s  calls per process: {spread}")
+    return total / SECONDS
+
+
+def main():
+    print(f"{os.cpu_count()} CPUs, {CLIENTS} client processes, {BUSY_MS} ms of CPU per call")
+    baseline = None
+    for count in WORKER_COUNTS:
+        throughput = run(count)
+        baseline = baseline or throughput
+        print(f"  x{throughput / baseline:.2f} of one process")
+
+
+if __name__ == '__main__':
+    if 'GRPC_WORKER_INDEX' in os.environ:
+        serve()
+    else:
+        main()
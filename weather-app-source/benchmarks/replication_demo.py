@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""две площадки analytics на localhost: схождение агрегатов и докачка после разрыва связи
+
+площадка a реплицирует на b через TCP-прокси, который умеет "ронять" связь; прокси считает байты,
+поэтому видно, что после восстановления связи передается только пропущенное, а не все состояние
+"""
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+ANALYTICS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'services', 'analytics')
+sys.path.append(os.path.join(ANALYTICS_DIR, 'generated'))
+
+import grpc
+
+import analytics_pb2
+import analytics_pb2_grpc
+
+PORT_A = int(os.getenv('DEMO_PORT_A', '6101'))
+PORT_B = int(os.getenv('DEMO_PORT_B', '6102'))
+PROXY_PORT = int(os.getenv('DEMO_PROXY_PORT', '6201'))
+CITIES = int(os.getenv('DEMO_CITIES', '200'))
+POINTS_PER_CITY = int(os.getenv('DEMO_POINTS_PER_CITY', '50'))
+CONVERGE_TIMEOUT = 30
+FIVE_MINUTES_US = 5 * 60 * 1_000_000
+
+
+class FlakyProxy:
+    """TCP-прокси a -> b: считает переданные байты, в режиме down рвет и не принимает соединения"""
+
+    def __init__(self, listen_port, target_port):
+        self.target_port = target_port
+        self.bytes = 0
+        self.up = True
+        self._lock = threading.Lock()
+        self._connections = []
+        self._server = socket.create_server(('localhost', listen_port))
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            client, _ = self._server.accept()
+            if not self.up:
+                client.close()
+                continue
+            upstream = socket.create_connection(('localhost', self.target_port))
+            with self._lock:
+                self._connections += [client, upstream]
+            threading.Thread(target=self._pipe, args=(client, upstream, True), daemon=True).start()
+            threading.Thread(target=self._pipe, args=(upstream, client, False), daemon=True).start()
+
+    def _pipe(self, source, target, count):
+        try:
+            while True:
+                data = source.recv(65536)
+                if not data:
+                    break
+                if count:
+                    with self._lock:
+                        self.bytes += len(data)
+                target.sendall(data)
+        except OSError:
+            pass
+        finally:
+            for sock in (source, target):
+                try:
+                    sock.close()
+                except OSError:
+                    pass
+
+    def down(self):
+        self.up = False
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for sock in connections:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def restore(self):
+        self.up = True
+
+
+def start_site(site, port, peer):
+    env = dict(
+        os.environ,
+        ANALYTICS_SITE=site,
+        ANALYTICS_GRPC_PORT=str(port),
+        ANALYTICS_REPLICAS=f'localhost:{port}',
+        ANALYTICS_SELF=f'localhost:{port}',
+        ANALYTICS_PEERS=peer,
+        ANALYTICS_REPLICATION_INTERVAL='0.2',
+        ANALYTICS_SNAPSHOT_PATH='',
+        ANALYTICS_SPILL_DIR='',
+    )
+    return subprocess.Popen(
+        [sys.executable, 'grpc_server.py'], cwd=ANALYTICS_DIR, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+
+def ingest(client, offset, cities, points):
+    now_us = time.time_ns() // 1000
+    batch = analytics_pb2.ObservationBatch()
+    for c in cities:
+        for i in range(points):
+            batch.observations.add(
+                city=f'city-{c}',
+                observed_at_us=now_us - i * FIVE_MINUTES_US,
+                temperature=offset + c % 30 + i * 0.1,
+                humidity=50 + i % 40
+            )
+    client.IngestObservations(batch)
+    return len(batch.observations)
+
+
+def counts(client, cities):
+    return [
+        client.GetPercentiles(analytics_pb2.PercentileRequest(city=f'city-{c}', window_seconds=86400)).count
+        for c in cities
+    ]
+
+
+def wait_converged(clients, cities, expected):
+    deadline = time.time() + CONVERGE_TIMEOUT
+    while time.time() < deadline:
+        if all(counts(client, cities) == expected for client in clients):
+            return True
+        time.sleep(0.2)
+    return False
+
+
+def main():
+    proxy = FlakyProxy(PROXY_PORT, PORT_B)
+    processes = [
+        start_site('b', PORT_B, f'localhost:{PORT_A}'),
+        start_site('a', PORT_A, f'localhost:{PROXY_PORT}'),
+    ]
+    try:
+        channels = [grpc.insecure_channel(f'localhost:{port}') for port in (PORT_A, PORT_B)]
+        for channel in channels:
+            grpc.channel_ready_future(channel).result(timeout=10)
+        a, b = (analytics_pb2_grpc.AnalyticsServiceStub(channel) for channel in channels)
+
+        all_cities = list(range(CITIES))
+        ingest(a, 0, all_cities, POINTS_PER_CITY)
+        ingest(b, 100, all_cities, POINTS_PER_CITY)
+        started = time.time()
+        converged = wait_converged((a, b), all_cities, [2 * POINTS_PER_CITY] * CITIES)
+        initial_bytes = proxy.bytes
+        print(f"initial sync: converged={converged} in {time.time() - started:.1f} s, a -> b {initial_bytes / 1024:.0f} KB")
+
+        proxy.down()
+        changed = all_cities[:5]
+        ingest(a, 200, changed, 10)
+        time.sleep(2)
+        print(f"partition: b sees {counts(b, changed)} for changed cities on a: {counts(a, changed)}")
+
+        proxy.restore()
+        started = time.time()
+        converged = wait_converged((b,), changed, counts(a, changed))
+        catch_up = proxy.bytes - initial_bytes
+        print(f"after partition: converged={converged} in {time.time() - started:.1f} s, "
+              f"a -> b {catch_up / 1024:.1f} KB ({catch_up / max(initial_bytes, 1):.1%} of initial sync)")
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -24,7 +24,7 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0f\x61nalytics.proto\x12\tanalytics\"\x07\n\x05\x45mpty\"\x1e\n\x0e\x41nalyzeRequest\x12\x0c\n\x04\x63ity\x18\x01 \x01(\t\"\xcc\x01\n\x0f\x41nalyzeResponse\x12\x0c\n\x04\x63ity\x18\x01 \x01(\t\x12\x15\n\ranalysis_time\x18\x02 \x01(\t\x12\x16\n\x0etotal_requests\x18\x03 \x01(\x05\x12\x32\n\x0f\x63urrent_weather\x18\x04 \x01(\x0b\x32\x19.analytics.CurrentWeather\x12\x10\n\x08insights\x18\x05 \x03(\t\x12\x36\n\x11temperature_trend\x18\x06 \x01(\x0b\x32\x1b.analytics.TemperatureTrend\"7\n\x0e\x43urrentWeather\x12\x13\n\x0btemperature\x18\x01 \x01(\x01\x12\x10\n\x08humidity\x18\x02 \x01(\x01\"P\n\x10TemperatureTrend\x12\x0f\n\x07\x63urrent\x18\x01 \x01(\x01\x12\x16\n\x0erecent_average\x18\x02 \x01(\x01\x12\x13\n\x0b\x64\x61ta_points\x18\x03 \x01(\x05\"\x1e\n\x0eHistoryRequest\x12\x0c\n\x04\x63ity\x18\x01 \x01(\t\"G\n\x0fHistoryResponse\x12\x0c\n\x04\x63ity\x18\x01 \x01(\t\x12\x15\n\rtotal_records\x18\x02 \x01(\x05\x12\x0f\n\x07history\x18\x03 \x03(\t\"1\n\x0eHealthResponse\x12\x0e\n\x06status\x18\x01 \x01(\t\x12\x0f\n\x07service\x18\x02 \x01(\t2\xdc\x01\n\x10\x41nalyticsService\x12G\n\x0e\x41nalyzeWeather\x12\x19.analytics.AnalyzeRequest\x1a\x1a.analytics.AnalyzeResponse\x12\x43\n\nGetHistory\x12\x19.analytics.HistoryRequest\x1a\x1a.analytics.HistoryResponse\x12:\n\x0bHealthCheck\x12\x10.analytics.Empty\x1a\x19.analytics.HealthResponseb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x0f\x61nalytics.proto\x12\tanalytics\"\x07\n\x05\x45mpty\"/\n\x0e\x41nalyzeRequest\x12\x0c\n\x04\x63ity\x18\x01 \x01(\t\x12\x0f\n\x07refresh\x18\x02 \x01(\x08\"\xe4\x01\n\x0f\x41nalyzeResponse\x12\x0c\n\x04\x63ity\x18\x01 \x01(\t\x12\x16\n\x0etotal_requests\x18\x03 \x01(\x05\x12\x32\n\x0f\x63urrent_weather\x18\x04 \x01(\x0b\x32\x19.analytics.CurrentWeather\x12\x10\n\x08insights\x18\x05 \x03(\t\x12\x36\n\x11temperature_trend\x18\x06 \x01(\x0b\x32\x1b.analytics.TemperatureTrend\x12\x18\n\x10\x61nalysis_time_us\x18\x07 \x01(\x03J\x04\x08\x02\x10\x03R\ranalysis_time\"7\n\x0e\x43urrentWeather\x12\x13\n\x0btemperature\x18\x01 \x01(\x01\x12\x10\n\x08humidity\x18\x02 \x01(\x01\"P\n\x10TemperatureTrend\x12\x0f\n\x07\x63urrent\x18\x01 \x01(\x01\x12\x16\n\x0erecent_average\x18\x02 \x01(\x01\x12\x13\n\x0b\x64\x61ta_points\x18\x03 \x01(\x05\"A\n\x0eHistoryRequest\x12\x0c\n\x04\x63ity\x18\x01 \x01(\t\x12\x11\n\tpage_size\x18\x02 \x01(\x05\x12\x0e\n\x06\x63ursor\x18\x03 \x01(\t\"{\n\rHistoryRecord\x12\x0b\n\x03seq\x18\x01 \x01(\x03\x12\x13\n\x0btemperature\x18\x03 \x01(\x01\x12\x10\n\x08humidity\x18\x04 \x01(\x01\x12\x0f\n\x07repeats\x18\x05 \x01(\x05\x12\x14\n\x0ctimestamp_us\x18\x06 \x01(\x03J\x04\x08\x02\x10\x03R\ttimestamp\"\x85\x01\n\x0fHistoryResponse\x12\x0c\n\x04\x63ity\x18\x01 \x01(\t\x12\x15\n\rtotal_records\x18\x02 \x01(\x05\x12)\n\x07records\x18\x04 \x03(\x0b\x32\x18.analytics.HistoryRecord\x12\x13\n\x0bnext_cursor\x18\x05 \x01(\tJ\x04\x08\x03\x10\x04R\x07history\"\x86\x01\n\x0c\x43hartRequest\x12\x0c\n\x04\x63ity\x18\x01 \x01(\t\x12\x0e\n\x06points\x18\x04 \x01(\x05\x12\x0e\n\x06method\x18\x05 \x01(\t\x12\x0e\n\x06metric\x18\x06 \x01(\t\x12\x10\n\x08start_us\x18\x07 \x01(\x03\x12\x0e\n\x06\x65nd_us\x18\x08 \x01(\x03J\x04\x08\x02\x10\x03J\x04\x08\x03\x10\x04R\x05startR\x03\x65nd\"|\n\x0b\x43hartSeries\x12\x0c\n\x04\x63ity\x18\x01 \x01(\t\x12\x0e\n\x06method\x18\x02 \x01(\t\x12\x0e\n\x06metric\x18\x03 \x01(\t\x12\x15\n\rsource_points\x18\x04 \x01(\x05\x12(\n\x06points\x18\x05 \x03(\x0b\x32\x18.analytics.HistoryRecord\"o\n\rExportRequest\x12\x0e\n\x06\x63ities\x18\x01 \x03(\t\x12\x14\n\x0c\x63hunk_points\x18\x04 \x01(\x05\x12\x10\n\x08start_us\x18\x05 \x01(\x03\x12\x0e\n\x06\x65nd_us\x18\x06 \x01(\x03J\x04\x08\x02\x10\x03J\x04\x08\x03\x10\x04R\x05startR\x03\x65nd\"\x89\x01\n\x0b\x45xportChunk\x12\x0c\n\x04\x63ity\x18\x01 \x01(\t\x12\x0b\n\x03seq\x18\x02 \x03(\x03\x12\x13\n\x0btemperature\x18\x04 \x03(\x01\x12\x10\n\x08humidity\x18\x05 \x03(\x01\x12\x0f\n\x07repeats\x18\x06 \x03(\x05\x12\x15\n\rtimestamps_us\x18\x07 \x03(\x03J\x04\x08\x03\x10\x04R\ntimestamps\"\xef\x01\n\x0bObservation\x12\x0c\n\x04\x63ity\x18\x01 \x01(\t\x12\x13\n\x0btemperature\x18\x03 \x01(\x01\x12\x10\n\x08humidity\x18\x04 \x01(\x01\x12$\n\x17openweather_temperature\x18\x05 \x01(\x01H\x00\x88\x01\x01\x12#\n\x16weatherapi_temperature\x18\x06 \x01(\x01H\x01\x88\x01\x01\x12\x16\n\x0eobserved_at_us\x18\x07 \x01(\x03\x42\x1a\n\x18_openweather_temperatureB\x19\n\x17_weatherapi_temperatureJ\x04\x08\x02\x10\x03R\x0bobserved_at\"@\n\x10ObservationBatch\x12,\n\x0cobservations\x18\x01 \x03(\x0b\x32\x16.analytics.Observation\"!\n\rIngestSummary\x12\x10\n\x08\x61\x63\x63\x65pted\x18\x01 \x01(\x05\"t\n\x0f\x42\x61\x63kfillSummary\x12\x10\n\x08\x61\x63\x63\x65pted\x18\x01 \x01(\x03\x12\x10\n\x08rejected\x18\x02 \x01(\x03\x12\x0e\n\x06\x63ities\x18\x03 \x01(\x05\x12\x12\n\nelapsed_ms\x18\x04 \x01(\x01\x12\x19\n\x11points_per_second\x18\x05 \x01(\x01\"?\n\x0bRankRequest\x12\x0e\n\x06metric\x18\x01 \x01(\t\x12\r\n\x05limit\x18\x02 \x01(\x05\x12\x11\n\tascending\x18\x03 \x01(\x08\"(\n\tCityValue\x12\x0c\n\x04\x63ity\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\x01\"Z\n\x0cRankResponse\x12\x0e\n\x06metric\x18\x01 \x01(\t\x12\x14\n\x0ctotal_cities\x18\x02 \x01(\x05\x12$\n\x06\x63ities\x18\x03 \x03(\x0b\x32\x14.analytics.CityValue\"8\n\x11\x46leetStatsRequest\x12\x0e\n\x06metric\x18\x01 \x01(\t\x12\x13\n\x0bpercentiles\x18\x02 \x03(\x01\"4\n\x0fPercentileValue\x12\x12\n\npercentile\x18\x01 \x01(\x01\x12\r\n\x05value\x18\x02 \x01(\x01\"\x8c\x01\n\x12\x46leetStatsResponse\x12\x0e\n\x06metric\x18\x01 \x01(\t\x12\r\n\x05\x63ount\x18\x02 \x01(\x05\x12\x0c\n\x04mean\x18\x03 \x01(\x01\x12\x0b\n\x03min\x18\x04 \x01(\x01\x12\x0b\n\x03max\x18\x05 \x01(\x01\x12/\n\x0bpercentiles\x18\x06 \x03(\x0b\x32\x1a.analytics.PercentileValue\"h\n\x11PercentileRequest\x12\x0c\n\x04\x63ity\x18\x01 \x01(\t\x12\x16\n\x0ewindow_seconds\x18\x02 \x01(\x03\x12\x13\n\x0bpercentiles\x18\x03 \x03(\x01\x12\x18\n\x10include_sketches\x18\x04 \x01(\x08\"\xeb\x01\n\x12PercentileResponse\x12\x0c\n\x04\x63ity\x18\x01 \x01(\t\x12\x16\n\x0ewindow_seconds\x18\x02 \x01(\x03\x12\x0c\n\x04tier\x18\x03 \x01(\t\x12\r\n\x05\x63ount\x18\x04 \x01(\x03\x12/\n\x0btemperature\x18\x05 \x03(\x0b\x32\x1a.analytics.PercentileValue\x12,\n\x08humidity\x18\x06 \x03(\x0b\x32\x1a.analytics.PercentileValue\x12\x1a\n\x12temperature_sketch\x18\x07 \x01(\x0c\x12\x17\n\x0fhumidity_sketch\x18\x08 \x01(\x0c\">\n\x0c\x41nomalyQuery\x12\x0c\n\x04kind\x18\x01 \x01(\t\x12\x11\n\tmin_score\x18\x02 \x01(\x01\x12\r\n\x05limit\x18\x03 \x01(\x05\"U\n\x07\x41nomaly\x12\x0c\n\x04\x63ity\x18\x01 \x01(\t\x12\x0c\n\x04kind\x18\x02 \x01(\t\x12\r\n\x05score\x18\x03 \x01(\x01\x12\r\n\x05value\x18\x04 \x01(\x01\x12\x10\n\x08\x62\x61seline\x18\x05 \x01(\x01\"\xaf\x01\n\x0b\x41nomalyList\x12\r\n\x05total\x18\x01 \x01(\x05\x12%\n\tanomalies\x18\x02 \x03(\x0b\x32\x12.analytics.Anomaly\x12\x16\n\x0e\x63ities_scanned\x18\x04 \x01(\x05\x12\x13\n\x0bscan_cpu_ms\x18\x05 \x01(\x01\x12\x14\n\x0cscan_wall_ms\x18\x06 \x01(\x01\x12\x15\n\rscanned_at_us\x18\x07 \x01(\x03J\x04\x08\x03\x10\x04R\nscanned_at\"\x1e\n\nMembership\x12\x10\n\x08replicas\x18\x01 \x03(\t\"[\n\x11MembershipSummary\x12\x14\n\x0cowned_cities\x18\x01 \x01(\x05\x12\x19\n\x11handed_off_cities\x18\x02 \x01(\x05\x12\x15\n\rfailed_cities\x18\x03 \x01(\x05\"\x9e\x01\n\x11RollupBucketState\x12\x0c\n\x04tier\x18\x01 \x01(\t\x12\r\n\x05start\x18\x02 \x01(\x03\x12\r\n\x05\x63ount\x18\x03 \x01(\x03\x12\x17\n\x0ftemperature_sum\x18\x04 \x01(\x01\x12\x1a\n\x12temperature_sketch\x18\x05 \x01(\x0c\x12\x17\n\x0fhumidity_sketch\x18\x06 \x01(\x0c\x12\x0f\n\x07version\x18\x07 \x01(\x03\"\x84\x01\n\tCityShard\x12\x0c\n\x04\x63ity\x18\x01 \x01(\t\x12\x10\n\x08next_seq\x18\x02 \x01(\x03\x12(\n\x06points\x18\x03 \x03(\x0b\x32\x18.analytics.HistoryRecord\x12-\n\x07rollups\x18\x04 \x03(\x0b\x32\x1c.analytics.RollupBucketState\"2\n\nShardBatch\x12$\n\x06\x63ities\x18\x01 \x03(\x0b\x32\x14.analytics.CityShard\"*\n\x0fTransferSummary\x12\x17\n\x0f\x61\x63\x63\x65pted_cities\x18\x01 \x01(\x05\"o\n\tCityDelta\x12\x0c\n\x04\x63ity\x18\x01 \x01(\t\x12\x14\n\x0cobservations\x18\x02 \x01(\x03\x12\x0f\n\x07version\x18\x03 \x01(\x03\x12-\n\x07rollups\x18\x04 \x03(\x0b\x32\x1c.analytics.RollupBucketState\"i\n\x10ReplicationBatch\x12\x0e\n\x06origin\x18\x01 \x01(\t\x12\x0e\n\x06sender\x18\x02 \x01(\t\x12\x0f\n\x07version\x18\x03 \x01(\x03\x12$\n\x06\x63ities\x18\x04 \x03(\x0b\x32\x14.analytics.CityDelta\")\n\x0eReplicationAck\x12\x17\n\x0f\x61pplied_version\x18\x01 \x01(\x03\":\n\x18ReplicationCursorRequest\x12\x0e\n\x06origin\x18\x01 \x01(\t\x12\x0e\n\x06sender\x18\x02 \x01(\t\"$\n\x11ReplicationCursor\x12\x0f\n\x07version\x18\x01 \x01(\x03\"\xba\x01\n\nStoreStats\x12\x17\n\x0fresident_cities\x18\x01 \x01(\x05\x12\x17\n\x0fresident_points\x18\x02 \x01(\x03\x12\x17\n\x0f\x65stimated_bytes\x18\x03 \x01(\x03\x12\x14\n\x0c\x62udget_bytes\x18\x04 \x01(\x03\x12\x11\n\tevictions\x18\x05 \x01(\x03\x12\x0f\n\x07spilled\x18\x06 \x01(\x03\x12\x0f\n\x07reloads\x18\x07 \x01(\x03\x12\x16\n\x0espilled_cities\x18\x08 \x01(\x05\"1\n\x0eHealthResponse\x12\x0e\n\x06status\x18\x01 \x01(\t\x12\x0f\n\x07service\x18\x02 \x01(\t2\xd5\t\n\x10\x41nalyticsService\x12G\n\x0e\x41nalyzeWeather\x12\x19.analytics.AnalyzeRequest\x1a\x1a.analytics.AnalyzeResponse\x12\x43\n\nGetHistory\x12\x19.analytics.HistoryRequest\x1a\x1a.analytics.HistoryResponse\x12\x46\n\rStreamHistory\x12\x19.analytics.HistoryRequest\x1a\x18.analytics.HistoryRecord0\x01\x12\x41\n\x0eGetChartSeries\x12\x17.analytics.ChartRequest\x1a\x16.analytics.ChartSeries\x12\x43\n\rExportHistory\x12\x18.analytics.ExportRequest\x1a\x16.analytics.ExportChunk0\x01\x12K\n\x12IngestObservations\x12\x1b.analytics.ObservationBatch\x1a\x18.analytics.IngestSummary\x12Q\n\x14\x42\x61\x63kfillObservations\x12\x1b.analytics.ObservationBatch\x1a\x1a.analytics.BackfillSummary(\x01\x12=\n\nRankCities\x12\x16.analytics.RankRequest\x1a\x17.analytics.RankResponse\x12L\n\rGetFleetStats\x12\x1c.analytics.FleetStatsRequest\x1a\x1d.analytics.FleetStatsResponse\x12M\n\x0eGetPercentiles\x12\x1c.analytics.PercentileRequest\x1a\x1d.analytics.PercentileResponse\x12@\n\rListAnomalies\x12\x17.analytics.AnomalyQuery\x1a\x16.analytics.AnomalyList\x12G\n\x10UpdateMembership\x12\x15.analytics.Membership\x1a\x1c.analytics.MembershipSummary\x12\x42\n\rTransferShard\x12\x15.analytics.ShardBatch\x1a\x1a.analytics.TransferSummary\x12G\n\tReplicate\x12\x1b.analytics.ReplicationBatch\x1a\x19.analytics.ReplicationAck(\x01\x30\x01\x12Y\n\x14GetReplicationCursor\x12#.analytics.ReplicationCursorRequest\x1a\x1c.analytics.ReplicationCursor\x12\x38\n\rGetStoreStats\x12\x10.analytics.Empty\x1a\x15.analytics.StoreStats\x12:\n\x0bHealthCheck\x12\x10.analytics.Empty\x1a\x19.analytics.HealthResponseb\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -34,19 +34,83 @@ if not _descriptor._USE_C_DESCRIPTORS:
   _globals['_EMPTY']._serialized_start=30
   _globals['_EMPTY']._serialized_end=37
   _globals['_ANALYZEREQUEST']._serialized_start=39
-  _globals['_ANALYZEREQUEST']._serialized_end=69
-  _globals['_ANALYZERESPONSE']._serialized_start=72
-  _globals['_ANALYZERESPONSE']._serialized_end=276
-  _globals['_CURRENTWEATHER']._serialized_start=278
-  _globals['_CURRENTWEATHER']._serialized_end=333
-  _globals['_TEMPERATURETREND']._serialized_start=335
-  _globals['_TEMPERATURETREND']._serialized_end=415
-  _globals['_HISTORYREQUEST']._serialized_start=417
-  _globals['_HISTORYREQUEST']._serialized_end=447
-  _globals['_HISTORYRESPONSE']._serialized_start=449
-  _globals['_HISTORYRESPONSE']._serialized_end=520
-  _globals['_HEALTHRESPONSE']._serialized_start=522
-  _globals['_HEALTHRESPONSE']._serialized_end=571
-  _globals['_ANALYTICSSERVICE']._serialized_start=574
-  _globals['_ANALYTICSSERVICE']._serialized_end=794
+  _globals['_ANALYZEREQUEST']._serialized_end=86
+  _globals['_ANALYZERESPONSE']._serialized_start=89
+  _globals['_ANALYZERESPONSE']._serialized_end=317
+  _globals['_CURRENTWEATHER']._serialized_start=319
+  _globals['_CURRENTWEATHER']._serialized_end=374
+  _globals['_TEMPERATURETREND']._serialized_start=376
+  _globals['_TEMPERATURETREND']._serialized_end=456
+  _globals['_HISTORYREQUEST']._serialized_start=458
+  _globals['_HISTORYREQUEST']._serialized_end=523
+  _globals['_HISTORYRECORD']._serialized_start=525
+  _globals['_HISTORYRECORD']._serialized_end=648
+  _globals['_HISTORYRESPONSE']._serialized_start=651
+  _globals['_HISTORYRESPONSE']._serialized_end=784
+  _globals['_CHARTREQUEST']._serialized_start=787
+  _globals['_CHARTREQUEST']._serialized_end=921
+  _globals['_CHARTSERIES']._serialized_start=923
+  _globals['_CHARTSERIES']._serialized_end=1047
+  _globals['_EXPORTREQUEST']._serialized_start=1049
+  _globals['_EXPORTREQUEST']._serialized_end=1160
+  _globals['_EXPORTCHUNK']._serialized_start=1163
+  _globals['_EXPORTCHUNK']._serialized_end=1300
+  _globals['_OBSERVATION']._serialized_start=1303
+  _globals['_OBSERVATION']._serialized_end=1542
+  _globals['_OBSERVATIONBATCH']._serialized_start=1544
+  _globals['_OBSERVATIONBATCH']._serialized_end=1608
+  _globals['_INGESTSUMMARY']._serialized_start=1610
+  _globals['_INGESTSUMMARY']._serialized_end=1643
+  _globals['_BACKFILLSUMMARY']._serialized_start=1645
+  _globals['_BACKFILLSUMMARY']._serialized_end=1761
+  _globals['_RANKREQUEST']._serialized_start=1763
+  _globals['_RANKREQUEST']._serialized_end=1826
+  _globals['_CITYVALUE']._serialized_start=1828
+  _globals['_CITYVALUE']._serialized_end=1868
+  _globals['_RANKRESPONSE']._serialized_start=1870
+  _globals['_RANKRESPONSE']._serialized_end=1960
+  _globals['_FLEETSTATSREQUEST']._serialized_start=1962
+  _globals['_FLEETSTATSREQUEST']._serialized_end=2018
+  _globals['_PERCENTILEVALUE']._serialized_start=2020
+  _globals['_PERCENTILEVALUE']._serialized_end=2072
+  _globals['_FLEETSTATSRESPONSE']._serialized_start=2075
+  _globals['_FLEETSTATSRESPONSE']._serialized_end=2215
+  _globals['_PERCENTILEREQUEST']._serialized_start=2217
+  _globals['_PERCENTILEREQUEST']._serialized_end=2321
+  _globals['_PERCENTILERESPONSE']._serialized_start=2324
+  _globals['_PERCENTILERESPONSE']._serialized_end=2559
+  _globals['_ANOMALYQUERY']._serialized_start=2561
+  _globals['_ANOMALYQUERY']._serialized_end=2623
+  _globals['_ANOMALY']._serialized_start=2625
+  _globals['_ANOMALY']._serialized_end=2710
+  _globals['_ANOMALYLIST']._serialized_start=2713
+  _globals['_ANOMALYLIST']._serialized_end=2888
+  _globals['_MEMBERSHIP']._serialized_start=2890
+  _globals['_MEMBERSHIP']._serialized_end=2920
+  _globals['_MEMBERSHIPSUMMARY']._serialized_start=2922
+  _globals['_MEMBERSHIPSUMMARY']._serialized_end=3013
+  _globals['_ROLLUPBUCKETSTATE']._serialized_start=3016
+  _globals['_ROLLUPBUCKETSTATE']._serialized_end=3174
+  _globals['_CITYSHARD']._serialized_start=3177
+  _globals['_CITYSHARD']._serialized_end=3309
+  _globals['_SHARDBATCH']._serialized_start=3311
+  _globals['_SHARDBATCH']._serialized_end=3361
+  _globals['_TRANSFERSUMMARY']._serialized_start=3363
+  _globals['_TRANSFERSUMMARY']._serialized_end=3405
+  _globals['_CITYDELTA']._serialized_start=3407
+  _globals['_CITYDELTA']._serialized_end=3518
+  _globals['_REPLICATIONBATCH']._serialized_start=3520
+  _globals['_REPLICATIONBATCH']._serialized_end=3625
+  _globals['_REPLICATIONACK']._serialized_start=3627
+  _globals['_REPLICATIONACK']._serialized_end=3668
+  _globals['_REPLICATIONCURSORREQUEST']._serialized_start=3670
+  _globals['_REPLICATIONCURSORREQUEST']._serialized_end=3728
+  _globals['_REPLICATIONCURSOR']._serialized_start=3730
+  _globals['_REPLICATIONCURSOR']._serialized_end=3766
+  _globals['_STORESTATS']._serialized_start=3769
+  _globals['_STORESTATS']._serialized_end=3955
+  _globals['_HEALTHRESPONSE']._serialized_start=3957
+  _globals['_HEALTHRESPONSE']._serialized_end=4006
+  _globals['_ANALYTICSSERVICE']._serialized_start=4009
+  _globals['_ANALYTICSSERVICE']._serialized_end=5246
 # @@protoc_insertion_point(module_scope)
@@ -0,0 +1,165 @@
+import os
+import threading
+import time
+import numpy as np
+
+from metrics import registry
+
+SCAN_INTERVAL = float(os.getenv('ANALYTICS_ANOMALY_SCAN_INTERVAL', '60'))
+Z_THRESHOLD = float(os.getenv('ANALYTICS_ANOMALY_Z_THRESHOLD', '3.5'))
+DISAGREEMENT_THRESHOLD = float(os.getenv('ANALYTICS_ANOMALY_DISAGREEMENT', '3.0'))
+# минимум точек базовой линии, с которым z-оценке можно верить
+MIN_BASELINE_POINTS = 6
+# нижняя граница разброса, чтобы плоская история не давала бесконечных z
+MIN_SCALE = 0.5
+# MAD -> стандартное отклонение для нормального распределения
+MAD_SCALE = 1.4826
+
+KIND_ZSCORE = 'temperature_zscore'
+KIND_DISAGREEMENT = 'provider_disagreement'
+KINDS = (KIND_ZSCORE, KIND_DISAGREEMENT)
+
+# проходы идут раз в SCAN_INTERVAL: их время - в /metrics, в лог попадают только аномалии и ошибки
+scan_seconds = registry.histogram('analytics_anomaly_scan_seconds', 'Wall time of an anomaly scan pass')
+scan_cpu_seconds = registry.counter(
+    'analytics_anomaly_scan_cpu_seconds_total', 'CPU time of the scanning thread spent in anomaly scan passes')
+scan_errors = registry.counter('analytics_anomaly_scan_errors_total', 'Anomaly scan passes that failed')
+
+
+def _row_median(sorted_values, counts):
+    # NaN после сортировки уходят в конец строки, медиана берется по первым counts значениям
+    rows = np.arange(len(counts))
+    safe = np.maximum(counts, 1)
+    low = sorted_values[rows, (safe - 1) // 2]
+    high = sorted_values[rows, safe // 2]
+    return (low + high) / 2
+
+
+def score(latest, baseline, openweather, weatherapi):
+    """робастные z-оценки последнего значения против базовой линии и расхождение провайдеров"""
+    counts = np.count_nonzero(~np.isnan(baseline), axis=1)
+    median = _row_median(np.sort(baseline, axis=1), counts)
+    mad = _row_median(np.sort(np.abs(baseline - median[:, None]), axis=1), counts)
+
+    scale = np.maximum(MAD_SCALE * mad, MIN_SCALE)
+    zscores = (latest - median) / scale
+    zscores[counts < MIN_BASELINE_POINTS] = np.nan
+
+    disagreement = np.abs(openweather - weatherapi)
+    return zscores, median, disagreement
+
+
+class Anomaly:
+    __slots__ = ('city', 'kind', 'score', 'value', 'baseline')
+
+    def __init__(self, city, kind, score, value, baseline):
+        self.city = city
+        self.kind = kind
+        self.score = score
+        self.value = value
+        self.baseline = baseline
+
+
+class AnomalyScanner:
+    """фоновый проход по всем городам за один векторный расчет; результат - индекс последних аномалий"""
+
+    def __init__(self, fleet, interval=SCAN_INTERVAL):
+        self.fleet = fleet
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._anomalies = []
+        self._by_city = {}
+        self.scanned_at_us = 0
+        self.cities_scanned = 0
+        self.scan_cpu_ms = 0.0
+        self.scan_wall_ms = 0.0
+        self._thread = None
+
+        registry.callback('analytics_anomalies', 'Anomalies found by the last scan pass', self._counts, ('kind',))
+        registry.callback('analytics_anomaly_cities_scanned', 'Cities checked by the last anomaly scan pass',
+                          lambda: self.last_pass()["cities_scanned"])
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.scan()
+            except Exception as e:
+                scan_errors.inc()
+                print(f"Anomaly scan error: {e}")
+
+    def scan(self):
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+
+        cities, latest, baseline, openweather, weatherapi = self.fleet.scan_snapshot()
+        zscores, median, disagreement = score(latest, baseline, openweather, weatherapi)
+
+        anomalies = []
+        with np.errstate(invalid='ignore'):
+            flagged_z = np.flatnonzero(np.abs(zscores) >= Z_THRESHOLD)
+            flagged_d = np.flatnonzero(disagreement >= DISAGREEMENT_THRESHOLD)
+        for row in flagged_z:
+            anomalies.append(Anomaly(cities[row], KIND_ZSCORE, abs(float(zscores[row])), float(latest[row]), float(median[row])))
+        for row in flagged_d:
+            anomalies.append(Anomaly(
+                cities[row], KIND_DISAGREEMENT, float(disagreement[row]),
+                float(openweather[row]), float(weatherapi[row])
+            ))
+        anomalies.sort(key=lambda anomaly: anomaly.score, reverse=True)
+
+        by_city = {}
+        for anomaly in anomalies:
+            by_city.setdefault(anomaly.city, []).append(anomaly)
+
+        cpu_ms = (time.thread_time() - cpu_start) * 1000
+        wall_ms = (time.perf_counter() - wall_start) * 1000
+
+        with self._lock:
+            self._anomalies = anomalies
+            self._by_city = by_city
+            self.scanned_at_us = time.time_ns() // 1000
+            self.cities_scanned = len(cities)
+            self.scan_cpu_ms = cpu_ms
+            self.scan_wall_ms = wall_ms
+        scan_seconds.observe(wall_ms / 1000)
+        scan_cpu_seconds.inc(value=cpu_ms / 1000)
+
+        if anomalies:
+            top = anomalies[0]
+            print(f"Anomaly scan: {len(anomalies)} anomalies in {len(by_city)} of {len(cities)} cities, "
+                  f"top {top.city} {top.kind} {top.score:.1f}")
+
+    def query(self, kind, min_score, limit):
+        """аномалии последнего прохода по убыванию оценки, возвращает (срез, всего подходящих)"""
+        with self._lock:
+            matched = [
+                anomaly for anomaly in self._anomalies
+                if (not kind or anomaly.kind == kind) and anomaly.score >= min_score
+            ]
+        return matched[:limit], len(matched)
+
+    def last_pass(self):
+        with self._lock:
+            return {
+                "scanned_at_us": self.scanned_at_us,
+                "cities_scanned": self.cities_scanned,
+                "scan_cpu_ms": self.scan_cpu_ms,
+                "scan_wall_ms": self.scan_wall_ms
+            }
+
+    def _counts(self):
+        with self._lock:
+            counts = {(kind,): 0 for kind in KINDS}
+            for anomaly in self._anomalies:
+                counts[(anomaly.kind,)] += 1
+            return counts
+
+    def for_city(self, city):
+        with self._lock:
+            return list(self._by_city.get(city, ()))
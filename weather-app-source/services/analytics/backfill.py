@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""загрузка исторических наблюдений из CSV/NDJSON в analytics
+
+файл режется на диапазоны байт, которые разбирают и проверяют процессы пула; каждый процесс
+сортирует свои строки по городу и времени и сразу собирает сериализованные пачки ObservationBatch
+для реплики-владельца. основной процесс только передает готовые байты в клиентские стримы
+BackfillObservations (по одному на реплику)
+
+    python backfill.py history.csv
+    python backfill.py history.ndjson --replicas analytics-0:50053,analytics-1:50053 --workers 8
+
+CSV: заголовок обязателен, колонки city, observed_at, temperature, humidity и необязательные
+openweather_temperature, weatherapi_temperature; запись - одна строка файла (диапазоны режутся по
+переводам строк), файл с переводом строки внутри поля в кавычках отклоняется. NDJSON - объекты с
+теми же полями
+
+загрузка не идемпотентна: реплика применяет каждую пачку сразу, повторный запуск по тому же файлу
+(в том числе после ошибки на середине) еще раз добавляет наблюдения в агрегаты
+"""
+import argparse
+import csv
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import queue
+import re
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+sys.path.append(os.path.join(os.path.dirname(__file__), 'generated'))
+# общие модули: в образе - /app/shared (Dockerfile копирует корневой shared/), в репозитории - ../../shared
+sys.path.append(os.path.join(os.path.dirname(__file__), 'shared'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'shared'))
+
+import grpc
+
+import analytics_pb2
+from channels import create_channel
+from hash_ring import HashRing, parse_replicas
+
+DEFAULT_REPLICAS = os.getenv('ANALYTICS_REPLICAS', 'analytics:50053')
+BATCH_SIZE = 5000
+# размер диапазона файла на одну задачу пула
+RANGE_BYTES = 8 * 1024 * 1024
+# пачек в очереди на реплику, дальше разбор ждет отправку
+QUEUE_BATCHES = 64
+# как часто ожидающая места в очереди отправка проверяет, жив ли стрим
+SEND_POLL = 0.5
+BACKFILL_METHOD = '/analytics.AnalyticsService/BackfillObservations'
+
+REQUIRED_FIELDS = ('city', 'observed_at', 'temperature', 'humidity')
+PROVIDER_FIELDS = ('openweather_temperature', 'weatherapi_temperature')
+MIN_TEMPERATURE = -100.0
+MAX_TEMPERATURE = 70.0
+# сколько ошибок разбора показывать
+MAX_REPORTED_ERRORS = 5
+MICROS = 1_000_000
+# строка с нечетным числом кавычек
+_SPLIT_RECORD = re.compile(rb'^[^"\n]*(?:"[^"\n]*"[^"\n]*)*"[^"\n]*$', re.M)
+
+
+def _temperature(value):
+    temperature = float(value)
+    if not math.isfinite(temperature) or not MIN_TEMPERATURE <= temperature <= MAX_TEMPERATURE:
+        raise ValueError(f"temperature out of range: {value}")
+    return temperature
+
+
+def validate(record):
+    """проверенная строка (city, observed_us, temperature, humidity, openweather, weatherapi)"""
+    city = str(record['city']).strip()
+    if not city:
+        raise ValueError("empty city")
+    # в файле время в ISO 8601, по сети - микросекунды эпохи
+    observed_us = round(datetime.fromisoformat(str(record['observed_at']).strip()).timestamp() * MICROS)
+    humidity = float(record['humidity'])
+    if not math.isfinite(humidity) or not 0 <= humidity <= 100:
+        raise ValueError(f"humidity out of range: {record['humidity']}")
+    providers = [
+        _temperature(record[field]) if record.get(field) not in (None, '') else None
+        for field in PROVIDER_FIELDS
+    ]
+    return (city, observed_us, _temperature(record['temperature']), humidity, *providers)
+
+
+def _read_range(path, start, end):
+    # диапазону принадлежат строки, которые начинаются в [start, end)
+    with open(path, 'rb') as f:
+        if start > 0:
+            f.seek(start - 1)
+            f.readline()
+        data = f.read(max(0, end - f.tell()))
+        if data and not data.endswith(b'\n'):
+            data += f.readline()
+    return data
+
+
+def _read_lines(path, start, end):
+    return _read_range(path, start, end).decode('utf-8').splitlines()
+
+
+def split_record(path, start, end):
+    """задача пула: первая строка диапазона, на которой запись CSV не заканчивается, None - таких нет
+
+    в целой записи кавычки парные; нечетное их число - начало или конец поля в кавычках с переводом
+    строки внутри. такую запись построчные диапазоны разрезали бы на части
+    """
+    match = _SPLIT_RECORD.search(_read_range(path, start, end))
+    return match.group().decode('utf-8', errors='replace')[:80] if match else None
+
+
+def _records(lines, fmt, header):
+    # строка и функция разбора: ошибка разбора отклоняет строку, а не всю задачу
+    if fmt == 'ndjson':
+        for line in lines:
+            if line.strip():
+                yield line, lambda line=line: json.loads(line)
+    else:
+        for line, row in zip(lines, csv.reader(lines)):
+            if row:
+                yield line, lambda row=row: dict(zip(header, row))
+
+
+def parse_range(path, fmt, header, start, end, replicas, batch_size):
+    """задача пула: разбор и проверка диапазона, возвращает ({реплика: [пачки в байтах]}, точек, ошибок, примеры)"""
+    rows = []
+    rejected = 0
+    errors = []
+    for line, record in _records(_read_lines(path, start, end), fmt, header):
+        try:
+            rows.append(validate(record()))
+        except (KeyError, TypeError, ValueError) as e:
+            rejected += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append(f"{line[:80]!r}: {e}")
+
+    # отсортированные по городу и времени пачки сервер вставляет целыми кусками
+    rows.sort(key=lambda row: (row[0].lower(), row[1]))
+    ring = HashRing(replicas)
+    batches = {}
+    pending = {}
+    for city, observed_us, temperature, humidity, openweather, weatherapi in rows:
+        owner = ring.node_for(city)
+        batch = pending.get(owner)
+        if batch is None:
+            batch = pending[owner] = analytics_pb2.ObservationBatch()
+        observation = batch.observations.add(
+            city=city,
+            observed_at_us=observed_us,
+            temperature=temperature,
+            humidity=humidity
+        )
+        if openweather is not None:
+            observation.openweather_temperature = openweather
+        if weatherapi is not None:
+            observation.weatherapi_temperature = weatherapi
+        if len(batch.observations) >= batch_size:
+            batches.setdefault(owner, []).append(batch.SerializeToString())
+            del pending[owner]
+    for owner, batch in pending.items():
+        batches.setdefault(owner, []).append(batch.SerializeToString())
+    return batches, len(rows), rejected, errors
+
+
+class ReplicaStream:
+    """клиентский стрим BackfillObservations к одной реплике, пачки передаются уже сериализованными"""
+
+    def __init__(self, address):
+        self.address = address
+        self._queue = queue.Queue(maxsize=QUEUE_BATCHES)
+        self._channel = create_channel(address)
+        # без сериализатора gRPC отправляет байты как есть
+        backfill = self._channel.stream_unary(
+            BACKFILL_METHOD,
+            request_serializer=None,
+            response_deserializer=analytics_pb2.BackfillSummary.FromString
+        )
+        self._future = backfill.future(self._requests())
+
+    def _requests(self):
+        while True:
+            batch = self._queue.get()
+            if batch is None:
+                return
+            yield batch
+
+    def send(self, batch):
+        # стрим оборвался - очередь больше никто не читает, и ожидание места в ней длилось бы вечно
+        while True:
+            if self._future.done():
+                self._future.result()
+                raise RuntimeError(f"Backfill stream to {self.address} ended before the input")
+            try:
+                self._queue.put(batch, timeout=SEND_POLL)
+                return
+            except queue.Full:
+                pass
+
+    def finish(self):
+        self.send(None)
+        try:
+            return self._future.result()
+        finally:
+            self._channel.close()
+
+    def cancel(self):
+        self._future.cancel()
+        self._channel.close()
+
+
+def _ranges(path, data_start):
+    size = os.path.getsize(path)
+    start = data_start
+    while start < size:
+        end = min(start + RANGE_BYTES, size)
+        yield start, end
+        start = end
+
+
+def _header(path, fmt):
+    # для CSV разбирается заголовок, данные начинаются со следующей строки
+    if fmt == 'ndjson':
+        return None, 0
+    with open(path, 'rb') as f:
+        first = f.readline()
+    header = [name.strip() for name in next(csv.reader([first.decode('utf-8-sig')]))]
+    missing = [name for name in REQUIRED_FIELDS if name not in header]
+    if missing:
+        raise ValueError(f"CSV header is missing columns: {', '.join(missing)}")
+    return header, len(first)
+
+
+def _check_csv(pool, path, data_start):
+    # до отправки первой пачки: реплики применяют пачки сразу, отказ на середине оставил бы часть файла
+    ranges = list(_ranges(path, data_start))
+    starts = [start for start, _ in ranges]
+    ends = [end for _, end in ranges]
+    for line in pool.map(split_record, itertools.repeat(path), starts, ends):
+        if line is not None:
+            raise ValueError(f"CSV record spans several lines (line break inside a quoted field): {line!r}; "
+                             "convert the file to NDJSON")
+
+
+def backfill(path, fmt, replicas, workers, batch_size=BATCH_SIZE):
+    header, data_start = _header(path, fmt)
+    parsed = rejected = 0
+    errors = []
+    started = time.perf_counter()
+
+    # forkserver: к моменту запуска процессов у gRPC уже есть свои потоки, fork от них небезопасен
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('forkserver')) as pool:
+        if fmt == 'csv':
+            _check_csv(pool, path, data_start)
+        streams = {address: ReplicaStream(address) for address in replicas}
+        ranges = _ranges(path, data_start)
+        in_flight = set()
+        try:
+            while True:
+                # в работе не больше двух диапазонов на процесс, чтобы результаты не копились в памяти
+                for start, end in ranges:
+                    in_flight.add(pool.submit(parse_range, path, fmt, header, start, end, replicas, batch_size))
+                    if len(in_flight) >= workers * 2:
+                        break
+                if not in_flight:
+                    break
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    batches, count, bad, samples = future.result()
+                    parsed += count
+                    rejected += bad
+                    errors.extend(samples[:MAX_REPORTED_ERRORS - len(errors)])
+                    for owner, owner_batches in batches.items():
+                        for batch in owner_batches:
+                            streams[owner].send(batch)
+            parse_elapsed = time.perf_counter() - started
+            summaries = {address: stream.finish() for address, stream in streams.items()}
+        except BaseException:
+            # ошибка реплики или разбора: остальные стримы обрываются, а не ждут конца файла
+            for future in in_flight:
+                future.cancel()
+            for stream in streams.values():
+                stream.cancel()
+            raise
+
+    elapsed = time.perf_counter() - started
+    return {
+        "parsed": parsed,
+        "rejected": rejected,
+        "errors": errors,
+        "parse_points_per_second": parsed / parse_elapsed if parse_elapsed > 0 else 0.0,
+        "points_per_second": parsed / elapsed if elapsed > 0 else 0.0,
+        "elapsed_seconds": elapsed,
+        "replicas": summaries
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill historical observations into analytics")
+    parser.add_argument('path')
+    parser.add_argument('--format', choices=('csv', 'ndjson'), help="by default taken from the file extension")
+    parser.add_argument('--replicas', default=DEFAULT_REPLICAS)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    fmt = args.format or ('ndjson' if args.path.endswith(('.ndjson', '.jsonl')) else 'csv')
+    try:
+        result = backfill(args.path, fmt, parse_replicas(args.replicas), args.workers, args.batch_size)
+    except grpc.RpcError as e:
+        sys.exit(f"backfill failed: {e.code().name}: {e.details()}")
+    except (RuntimeError, ValueError) as e:
+        sys.exit(f"backfill failed: {e}")
+
+    print(f"parsed {result['parsed']} points, rejected {result['rejected']}, "
+          f"{result['elapsed_seconds']:.1f} s")
+    print(f"parse: {result['parse_points_per_second']:.0f} points/s, "
+          f"end-to-end: {result['points_per_second']:.0f} points/s")
+    for error in result['errors']:
+        print(f"  rejected {error}")
+    for address, summary in result['replicas'].items():
+        print(f"{address}: accepted {summary.accepted}, rejected {summary.rejected}, "
+              f"{summary.cities} cities, {summary.points_per_second:.0f} points/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+import numpy as np
+
+METHOD_LTTB = 'lttb'
+METHOD_MINMAX = 'minmax'
+METHODS = (METHOD_LTTB, METHOD_MINMAX)
+
+
+def lttb(x, y, target):
+    """индексы точек по Largest-Triangle-Three-Buckets; x должен быть отсортирован
+
+    первая и последняя точки сохраняются, из каждой корзины между ними берется точка,
+    образующая наибольший треугольник с выбранной в предыдущей корзине и средним следующей
+    """
+    n = len(x)
+    if target >= n or target < 3:
+        return np.arange(n)
+
+    # target - 2 корзины на отрезке [1, n - 1), шаг не меньше 1 при target < n
+    edges = np.linspace(1, n - 1, target - 1).astype(np.int64)
+    ends = np.append(edges[2:], n)
+    # средние следующих корзин считаются сразу для всех корзин через накопленные суммы
+    x_sums = np.concatenate(([0.0], np.cumsum(x)))
+    y_sums = np.concatenate(([0.0], np.cumsum(y)))
+    next_sizes = ends - edges[1:]
+    next_x = (x_sums[ends] - x_sums[edges[1:]]) / next_sizes
+    next_y = (y_sums[ends] - y_sums[edges[1:]]) / next_sizes
+
+    selected = np.empty(target, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    # выбор в корзине зависит от выбора в предыдущей, поэтому цикл по корзинам, внутри - векторно
+    for i in range(target - 2):
+        start, end = edges[i], edges[i + 1]
+        areas = np.abs(
+            (x[a] - next_x[i]) * (y[start:end] - y[a]) -
+            (x[a] - x[start:end]) * (next_y[i] - y[a])
+        )
+        a = start + int(np.argmax(areas))
+        selected[i + 1] = a
+    return selected
+
+
+def min_max(x, y, target):
+    """индексы минимума и максимума y в каждой из target // 2 корзин равного размера"""
+    n = len(x)
+    buckets = target // 2
+    if target >= n or buckets < 1:
+        return np.arange(n)
+
+    # дополняем хвост последним значением, чтобы разложить ряд в матрицу корзин;
+    # индексы дополнения схлопываются в последнюю точку
+    size = -(-n // buckets)
+    grid = np.pad(y, (0, buckets * size - n), mode='edge').reshape(buckets, size)
+    offsets = np.arange(buckets) * size
+    lows = offsets + np.argmin(grid, axis=1)
+    highs = offsets + np.argmax(grid, axis=1)
+    return np.unique(np.minimum(np.concatenate((lows, highs)), n - 1))
+
+
+def downsample(method, x, y, target):
+    if method == METHOD_LTTB:
+        return lttb(x, y, target)
+    if method == METHOD_MINMAX:
+        return min_max(x, y, target)
+    raise ValueError(f"Unknown downsampling method: {method}")
@@ -0,0 +1,184 @@
+import threading
+import numpy as np
+
+# окно для суточного размаха температуры, по часовым корзинам
+SWING_HOURS = 24
+# сколько предыдущих наблюдений города хранится как базовая линия для поиска аномалий
+BASELINE_POINTS = 24
+
+METRICS = ('temperature', 'humidity', 'temperature_swing_24h')
+
+# колонки матрицы: имя, ширина (None - вектор), тип, значение пустой ячейки
+COLUMNS = (
+    ('observed_ts', None, np.float64, -np.inf),
+    ('temperature', None, np.float64, np.nan),
+    ('humidity', None, np.float64, np.nan),
+    ('hour_ids', SWING_HOURS, np.int64, -1),
+    ('hour_min', SWING_HOURS, np.float64, np.nan),
+    ('hour_max', SWING_HOURS, np.float64, np.nan),
+    ('baseline', BASELINE_POINTS, np.float64, np.nan),
+    ('baseline_pos', None, np.int64, 0),
+    ('openweather', None, np.float64, np.nan),
+    ('weatherapi', None, np.float64, np.nan),
+)
+
+
+class FleetMatrix:
+    """упакованная матрица последних значений по всем городам для запросов сразу по всему парку
+
+    строка на город, обновляется на каждом наблюдении; запросы - векторные операции numpy
+    """
+
+    def __init__(self, capacity=1024):
+        self._lock = threading.Lock()
+        self._rows = {}
+        self._cities = []
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        for name, width, dtype, empty in COLUMNS:
+            shape = capacity if width is None else (capacity, width)
+            setattr(self, name, np.full(shape, empty, dtype=dtype))
+
+    def _grow(self):
+        size = len(self._cities)
+        old = self._columns()
+        self._allocate(max(2 * len(self.temperature), 1024))
+        for new, prev in zip(self._columns(), old):
+            new[:size] = prev[:size]
+
+    def _columns(self):
+        return tuple(getattr(self, name) for name, _, _, _ in COLUMNS)
+
+    def __len__(self):
+        return len(self._cities)
+
+    def update(self, city, observed_ts, temperature, humidity, openweather=None, weatherapi=None):
+        hour = int(observed_ts // 3600)
+        slot = hour % SWING_HOURS
+
+        with self._lock:
+            row = self._rows.get(city)
+            if row is None:
+                if len(self._cities) == len(self.temperature):
+                    self._grow()
+                row = self._rows[city] = len(self._cities)
+                self._cities.append(city)
+
+            # запоздавшее наблюдение не перетирает более свежее, а сразу уходит в базовую линию
+            if observed_ts >= self.observed_ts[row]:
+                if not np.isnan(self.temperature[row]):
+                    self._push_baseline(row, self.temperature[row])
+                self.observed_ts[row] = observed_ts
+                self.temperature[row] = temperature
+                self.humidity[row] = humidity
+                self.openweather[row] = np.nan if openweather is None else openweather
+                self.weatherapi[row] = np.nan if weatherapi is None else weatherapi
+            else:
+                self._push_baseline(row, temperature)
+
+            # корзина часа переиспользуется по кругу, устаревшую перезаписываем
+            if self.hour_ids[row, slot] != hour:
+                if self.hour_ids[row, slot] > hour:
+                    return
+                self.hour_ids[row, slot] = hour
+                self.hour_min[row, slot] = temperature
+                self.hour_max[row, slot] = temperature
+            else:
+                self.hour_min[row, slot] = min(self.hour_min[row, slot], temperature)
+                self.hour_max[row, slot] = max(self.hour_max[row, slot], temperature)
+
+    def remove(self, city):
+        # последняя строка переезжает на место удаленной, матрица остается плотной
+        with self._lock:
+            row = self._rows.pop(city, None)
+            if row is None:
+                return
+            last = len(self._cities) - 1
+            if row != last:
+                moved = self._cities[last]
+                for column in self._columns():
+                    column[row] = column[last]
+                self._cities[row] = moved
+                self._rows[moved] = row
+            self._cities.pop()
+            for (_, _, _, empty), column in zip(COLUMNS, self._columns()):
+                column[last] = empty
+
+    def export_columns(self):
+        with self._lock:
+            size = len(self._cities)
+            return list(self._cities), [column[:size].copy() for column in self._columns()]
+
+    def restore(self, cities, columns):
+        """заменяет содержимое матрицы колонками из снапшота"""
+        with self._lock:
+            self._cities = list(cities)
+            self._rows = {city: row for row, city in enumerate(self._cities)}
+            self._allocate(max(len(self._cities), 1024))
+            for target, source in zip(self._columns(), columns):
+                target[:len(self._cities)] = source
+
+    def _push_baseline(self, row, value):
+        self.baseline[row, self.baseline_pos[row] % BASELINE_POINTS] = value
+        self.baseline_pos[row] += 1
+
+    def scan_snapshot(self):
+        """копия данных для фонового сканирования, чтобы не держать блокировку на время расчета"""
+        with self._lock:
+            size = len(self._cities)
+            return (
+                list(self._cities),
+                self.temperature[:size].copy(),
+                self.baseline[:size].copy(),
+                self.openweather[:size].copy(),
+                self.weatherapi[:size].copy()
+            )
+
+    def _values(self, metric, now_ts):
+        size = len(self._cities)
+        if metric == 'temperature':
+            return self.temperature[:size]
+        if metric == 'humidity':
+            return self.humidity[:size]
+        if metric == 'temperature_swing_24h':
+            fresh = self.hour_ids[:size] > int(now_ts // 3600) - SWING_HOURS
+            highs = np.max(self.hour_max[:size], axis=1, where=fresh, initial=-np.inf)
+            lows = np.min(self.hour_min[:size], axis=1, where=fresh, initial=np.inf)
+            swing = highs - lows
+            swing[~np.isfinite(swing)] = np.nan
+            return swing
+        raise ValueError(f"Unknown metric: {metric}")
+
+    def rank(self, metric, limit, ascending, now_ts):
+        """top-N городов по метрике, возвращает (список (город, значение), всего городов с данными)"""
+        with self._lock:
+            values = self._values(metric, now_ts)
+            rows = np.flatnonzero(~np.isnan(values))
+            keys = values[rows] if ascending else -values[rows]
+
+            if limit < len(rows):
+                top = np.argpartition(keys, limit)[:limit]
+            else:
+                top = np.arange(len(rows))
+            top = top[np.argsort(keys[top], kind='stable')]
+
+            return [(self._cities[rows[i]], float(values[rows[i]])) for i in top], len(rows)
+
+    def stats(self, metric, percentiles, now_ts):
+        """агрегаты по всему парку: count, mean, min, max и перцентили (0-100)"""
+        with self._lock:
+            values = self._values(metric, now_ts)
+            values = values[~np.isnan(values)]
+
+        if len(values) == 0:
+            return {"count": 0, "mean": 0.0, "min": 0.0, "max": 0.0, "percentiles": [(p, 0.0) for p in percentiles]}
+
+        quantiles = np.percentile(values, percentiles) if percentiles else []
+        return {
+            "count": len(values),
+            "mean": float(values.mean()),
+            "min": float(values.min()),
+            "max": float(values.max()),
+            "percentiles": [(p, float(q)) for p, q in zip(percentiles, quantiles)]
+        }
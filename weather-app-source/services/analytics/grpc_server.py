@@ -1,131 +1,620 @@
 import grpc
-from concurrent import futures
 import sys
 import os
 sys.path.append(os.path.join(os.path.dirname(__file__), 'generated'))
+# общие модули: в образе - /app/shared (Dockerfile копирует корневой shared/), в репозитории - ../../shared
+sys.path.append(os.path.join(os.path.dirname(__file__), 'shared'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'shared'))
 
 import analytics_pb2
 import analytics_pb2_grpc
 import data_processor_pb2
 import data_processor_pb2_grpc
-from datetime import datetime
-import json
+import struct
+import time
+import numpy as np
+from store import MEMORY_BUDGET_BYTES, MICROS, HistoryStore, MAX_POINTS_PER_CITY, normalize_city
+from fleet import BASELINE_POINTS, FleetMatrix
+from rollup import MAX_WINDOW
+from anomaly import AnomalyScanner, KIND_ZSCORE
+from sharding import ANALYTICS_REPLICAS, ANALYTICS_SELF, ShardManager, shard_to_city
+from snapshot import SNAPSHOT_PATH, SnapshotWriter, load_snapshot
+from spill import SPILL_DIR, SpillStore
+from downsample import METHOD_LTTB, METHODS, downsample
+from replication import ANALYTICS_PEERS, ANALYTICS_SITE, ChangeLog, PeerAggregates, Replicator
+from channels import DATA_PROCESSOR_TARGET, add_ports, server_options, shared_channel
+from hash_ring import MEMBERSHIP_KEY
+from workers import GRPC_WORKERS, watch_parent
+from concurrency import PRIORITY_METHODS, SERVER_THREADS, ConcurrencyInterceptor
+from executor import EXECUTOR_AUTOSIZE, InstrumentedExecutor, PoolController
+from metrics import MetricsInterceptor, register_server_stats, registry
+from tracing import TRACING_ENABLED, TracingInterceptor, configure_tracing
+from deadline import ABANDONED, DOWNSTREAM, DeadlineExceeded, DeadlineInterceptor, deadline_stats, downstream_timeout
 
-# хранилище для истории запросов
-weather_history = []
+# хранилище для истории запросов; холодные города при нехватке бюджета уходят на диск (если задан SPILL_DIR)
+weather_history = HistoryStore(spill=SpillStore(SPILL_DIR, MAX_POINTS_PER_CITY) if SPILL_DIR else None)
+# последние значения по всем городам для запросов по всему парку
+fleet = FleetMatrix()
+# периодический поиск аномалий сразу по всем городам
+anomaly_scanner = AnomalyScanner(fleet)
+# города распределены между репликами по консистентному хешу
+shard_manager = ShardManager(weather_history, fleet)
+# active-active между площадками: локальные изменения агрегатов уходят на ANALYTICS_PEERS,
+# агрегаты других площадок хранятся отдельно и добавляются при ответе
+change_log = ChangeLog()
+weather_history.on_change = change_log.touch
+peer_aggregates = PeerAggregates()
+replicator = Replicator(weather_history, change_log, ANALYTICS_SITE, ANALYTICS_SELF, ANALYTICS_PEERS) if ANALYTICS_PEERS else None
+
+GRPC_PORT = int(os.getenv('ANALYTICS_GRPC_PORT', '50053'))
+# адаптивный лимит одновременных вызовов; управление кластером и репликация идут мимо него
+concurrency_limiter = ConcurrencyInterceptor(priority=PRIORITY_METHODS + (
+    'UpdateMembership', 'TransferShard', 'Replicate', 'GetReplicationCursor'
+))
+# пул обработчиков с замерами очереди; с EXECUTOR_AUTOSIZE размер подбирает контроллер
+executor = InstrumentedExecutor(SERVER_THREADS)
+pool_controller = PoolController(executor)
+# лимит, пул и дедлайны - еще и в /metrics
+register_server_stats(concurrency_limiter, executor, deadline_stats)
+# память истории и вытеснения (то же, что /stats); доля попаданий - analytics_history_lookups_total
+registry.callback('analytics_history_estimated_bytes', 'Estimated memory held by resident city history',
+                  lambda: weather_history.stats()["estimated_bytes"])
+registry.callback('analytics_history_resident_cities', 'Cities whose history is in memory',
+                  lambda: weather_history.stats()["resident_cities"])
+registry.callback('analytics_history_evictions_total', 'Cities evicted over the memory budget',
+                  lambda: weather_history.stats()["evictions"], kind='counter')
+
+DEFAULT_PAGE_SIZE = 10
+MAX_PAGE_SIZE = 1000
+DEFAULT_RANK_LIMIT = 20
+MAX_RANK_LIMIT = 1000
+DEFAULT_PERCENTILE_WINDOW = 86400
+DEFAULT_PERCENTILES = (5, 50, 95)
+DEFAULT_ANOMALY_LIMIT = 100
+MAX_ANOMALY_LIMIT = 1000
+DEFAULT_CHART_POINTS = 500
+MAX_CHART_POINTS = 5000
+CHART_METRICS = ('temperature', 'humidity')
+DEFAULT_EXPORT_CHUNK = 1000
+MAX_EXPORT_CHUNK = 10000
+# таймаут вызова data-processor, если у входящего вызова нет дедлайна
+PROCESS_TIMEOUT = float(os.getenv('PROCESS_TIMEOUT_SECONDS', '30'))
+
+def shard_worker_env(index):
+    """окружение процесса index при GRPC_WORKERS > 1: отдельная реплика кольца на порту GRPC_PORT + index
+
+    общий порт через SO_REUSEPORT здесь не подходит - ядро отдало бы вызов по городу случайному
+    процессу, а не владельцу. город принадлежит одному процессу, клиенты находят его по
+    ANALYTICS_REPLICAS, где перечислены адреса всех процессов; снапшот, каталог выгрузки и бюджет
+    памяти у каждого процесса свои
+    """
+    host = ANALYTICS_SELF.rpartition(':')[0]
+    address = f'{host}:{GRPC_PORT + index}'
+    if address not in ANALYTICS_REPLICAS:
+        print(f"Analytics worker {index}: {address} is missing from ANALYTICS_REPLICAS, it will own no cities")
+    env = {
+        'ANALYTICS_GRPC_PORT': str(GRPC_PORT + index),
+        'ANALYTICS_SELF': address,
+        'ANALYTICS_MEMORY_BUDGET_BYTES': str(MEMORY_BUDGET_BYTES // GRPC_WORKERS),
+    }
+    if SNAPSHOT_PATH:
+        env['ANALYTICS_SNAPSHOT_PATH'] = f'{SNAPSHOT_PATH}.{index}'
+    if SPILL_DIR:
+        env['ANALYTICS_SPILL_DIR'] = os.path.join(SPILL_DIR, str(index))
+    return env
+
+def now_us():
+    return time.time_ns() // 1000
+
+def time_range(start_us, end_us):
+    # границы в микросекундах эпохи, 0 - без ограничения
+    return (start_us if start_us else -np.inf, end_us if end_us else np.inf)
+
+def replay_into_fleet(state):
+    # строка в матрице парка восстанавливается из истории города
+    for point in state.points:
+        fleet.update(state.city, point.observed_us / MICROS, point.temperature, point.humidity)
+
+weather_history.on_evict = fleet.remove
+weather_history.on_reload = replay_into_fleet
+
+def record_observation(city, observed_us, temperature, humidity, openweather=None, weatherapi=None):
+    # время без отметки (0) - момент приема
+    observed_us = observed_us or now_us()
+    point = weather_history.append(city, observed_us, temperature, humidity)
+    # повтор предыдущего наблюдения не должен попадать в базовую линию парка
+    if point.repeats == 1:
+        fleet.update(normalize_city(city), observed_us / MICROS, temperature, humidity, openweather, weatherapi)
+
+def backfill_city(city, rows):
+    """пакетная загрузка истории: rows - (observed_us, temperature, humidity, openweather, weatherapi)"""
+    observed_us, temperatures, humidities, _, _ = zip(*rows)
+    weather_history.backfill(
+        city,
+        np.array(observed_us, dtype=np.int64),
+        np.array(temperatures, dtype=np.float64),
+        np.array(humidities, dtype=np.float64)
+    )
+    # матрице парка нужны только последние значения и базовая линия
+    for us, temperature, humidity, openweather, weatherapi in sorted(rows, key=lambda row: row[0])[-(BASELINE_POINTS + 1):]:
+        fleet.update(normalize_city(city), us / MICROS, temperature, humidity, openweather, weatherapi)
+
+def owns(cities, context):
+    """True - все города принадлежат этой реплике
+
+    иначе вызов получает FAILED_PRECONDITION с владельцем в тексте и составом кольца в trailing-метаданных:
+    после UpdateMembership клиенты со старым кольцом перестраивают его и повторяют вызов у владельца, а
+    бывший владелец не создает заново переданные города
+    """
+    foreign = shard_manager.foreign(cities)
+    if foreign is None:
+        return True
+    city, owner = foreign
+    context.set_trailing_metadata(((MEMBERSHIP_KEY, ','.join(shard_manager.ring.nodes)),))
+    context.set_code(grpc.StatusCode.FAILED_PRECONDITION)
+    context.set_details(f"City {city} is owned by {owner}")
+    return False
 
 class AnalyticsService(analytics_pb2_grpc.AnalyticsServiceServicer):
     def __init__(self):
         # клиент для data-processor
-        self.data_processor_channel = grpc.insecure_channel('data-processor:50052')
+        self.data_processor_channel = shared_channel(DATA_PROCESSOR_TARGET, balanced=True)
         self.data_processor_client = data_processor_pb2_grpc.DataProcessorServiceStub(self.data_processor_channel)
     
     def AnalyzeWeather(self, request, context):
         city = request.city
+        if not owns((city,), context):
+            return analytics_pb2.AnalyzeResponse()
         
-        try:
-            # получаем текущие обработанные данные через gRPC
-            process_request = data_processor_pb2.ProcessRequest(city=city)
-            current_data = self.data_processor_client.ProcessWeatherData(process_request)
-
-            history_record = {
-                "city": city,
-                "timestamp": datetime.now().isoformat(),
-                "data": {
-                    "averages": {
-                        "temperature": current_data.averages.temperature,
-                        "humidity": current_data.averages.humidity
-                    }
-                }
-            }
-            
-            weather_history.append(history_record)
+        # обычно отвечаем из локальной истории, которую наполняет data-processor;
+        # синхронно идем за данными только по refresh или для еще неизвестного города
+        if request.refresh or weather_history.count(city) == 0:
+            try:
+                self._fetch_current(city, downstream_timeout(context, PROCESS_TIMEOUT))
+            except DeadlineExceeded:
+                deadline_stats.count(ABANDONED, 'AnalyzeWeather')
+                context.set_code(grpc.StatusCode.DEADLINE_EXCEEDED)
+                context.set_details("Deadline exceeded before calling data-processor")
+                return analytics_pb2.AnalyzeResponse()
+            except grpc.RpcError as e:
+                if e.code() == grpc.StatusCode.DEADLINE_EXCEEDED:
+                    deadline_stats.count(DOWNSTREAM, 'AnalyzeWeather')
+                    context.set_code(grpc.StatusCode.DEADLINE_EXCEEDED)
+                    context.set_details("data-processor did not answer within the deadline")
+                    return analytics_pb2.AnalyzeResponse()
+                if e.code() == grpc.StatusCode.RESOURCE_EXHAUSTED:
+                    context.set_code(grpc.StatusCode.RESOURCE_EXHAUSTED)
+                    context.set_details("data-processor is overloaded")
+                    return analytics_pb2.AnalyzeResponse()
+                context.set_code(grpc.StatusCode.INTERNAL)
+                context.set_details(f"Failed to get processed data: {str(e)}")
+                return analytics_pb2.AnalyzeResponse()
+        
+        # последние 5 различных наблюдений, последнее из них - текущее;
+        # total_requests считает и свернутые повторы
+        recent = weather_history.recent(city, 5)
+        if not recent:
+            # загрузка не дала наблюдения (город передан другой реплике или обрезан хранением)
+            context.set_code(grpc.StatusCode.NOT_FOUND)
+            context.set_details(f"No observations for {city}")
+            return analytics_pb2.AnalyzeResponse()
+        total_requests = weather_history.observations(city) + peer_aggregates.observations(city)
+        latest = recent[-1]
+        
+        current_weather = analytics_pb2.CurrentWeather(
+            temperature=latest.temperature,
+            humidity=latest.humidity
+        )
+        
+        insights = []
+        temperature_trend = None
+        
+        if len(recent) > 1:
+            recent_temps = [point.temperature for point in recent]
+            avg_temp = sum(recent_temps) / len(recent_temps)
+            current_temp = latest.temperature
             
-            # ограничиваем размер истории
-            if len(weather_history) > 100:
-                weather_history.pop(0)
+            if current_temp > avg_temp + 2:
+                insights.append("температура выше среднего значения")
+            elif current_temp < avg_temp - 2:
+                insights.append("температура ниже среднего значения")
+            else:
+                insights.append("температура в пределах нормы")
             
-            city_history = [item for item in weather_history if item['city'].lower() == city.lower()]
+            # результат последнего фонового прохода по всем городам
+            for anomaly in anomaly_scanner.for_city(normalize_city(city)):
+                if anomaly.kind == KIND_ZSCORE:
+                    insights.append(f"аномальная температура относительно истории города (z={anomaly.score:.1f})")
+                else:
+                    insights.append(f"провайдеры расходятся на {anomaly.score:.1f} °C")
             
-            current_weather = analytics_pb2.CurrentWeather(
-                temperature=current_data.averages.temperature,
-                humidity=current_data.averages.humidity
+            temperature_trend = analytics_pb2.TemperatureTrend(
+                current=current_temp,
+                recent_average=round(avg_temp, 2),
+                data_points=len(recent_temps)
             )
-            
-            insights = []
-            temperature_trend = None
-            
-            if len(city_history) > 1:
-                recent_temps = []
-                for record in city_history[-5:]:  # последние 5 записей
-                    temp = record.get('data', {}).get('averages', {}).get('temperature')
-                    if temp is not None:
-                        recent_temps.append(temp)
-                
-                if recent_temps:
-                    avg_temp = sum(recent_temps) / len(recent_temps)
-                    current_temp = current_data.averages.temperature
-                    
-                    if current_temp > avg_temp + 2:
-                        insights.append("температура выше среднего значения")
-                    elif current_temp < avg_temp - 2:
-                        insights.append("температура ниже среднего значения")
-                    else:
-                        insights.append("температура в пределах нормы")
-                    
-                    temperature_trend = analytics_pb2.TemperatureTrend(
-                        current=current_temp,
-                        recent_average=round(avg_temp, 2),
-                        data_points=len(recent_temps)
-                    )
-            
-            response = analytics_pb2.AnalyzeResponse(
-                city=city,
-                analysis_time=datetime.now().isoformat(),
-                total_requests=len(city_history),
-                current_weather=current_weather,
-                insights=insights
+        
+        response = analytics_pb2.AnalyzeResponse(
+            city=city,
+            analysis_time_us=now_us(),
+            total_requests=total_requests,
+            current_weather=current_weather,
+            insights=insights
+        )
+        
+        if temperature_trend:
+            response.temperature_trend.CopyFrom(temperature_trend)
+        
+        return response
+    
+    def IngestObservations(self, request, context):
+        if not owns((observation.city for observation in request.observations), context):
+            return analytics_pb2.IngestSummary()
+        for observation in request.observations:
+            record_observation(
+                observation.city,
+                observation.observed_at_us,
+                observation.temperature,
+                observation.humidity,
+                observation.openweather_temperature if observation.HasField('openweather_temperature') else None,
+                observation.weatherapi_temperature if observation.HasField('weatherapi_temperature') else None
             )
+        return analytics_pb2.IngestSummary(accepted=len(request.observations))
+    
+    def BackfillObservations(self, request_iterator, context):
+        started = time.perf_counter()
+        accepted = rejected = 0
+        cities = set()
+        
+        for batch in request_iterator:
+            if not owns((observation.city for observation in batch.observations), context):
+                return analytics_pb2.BackfillSummary(accepted=accepted, rejected=rejected, cities=len(cities))
+            by_city = {}
+            for observation in batch.observations:
+                # в отличие от живого потока время наблюдения обязано быть корректным
+                if observation.observed_at_us <= 0:
+                    rejected += 1
+                    continue
+                by_city.setdefault(normalize_city(observation.city), []).append((
+                    observation.observed_at_us,
+                    observation.temperature,
+                    observation.humidity,
+                    observation.openweather_temperature if observation.HasField('openweather_temperature') else None,
+                    observation.weatherapi_temperature if observation.HasField('weatherapi_temperature') else None
+                ))
             
-            if temperature_trend:
-                response.temperature_trend.CopyFrom(temperature_trend)
-            
-            return response
-            
-        except grpc.RpcError as e:
-            context.set_code(grpc.StatusCode.INTERNAL)
-            context.set_details(f"Failed to get processed data: {str(e)}")
-            return analytics_pb2.AnalyzeResponse()
+            for city, rows in by_city.items():
+                backfill_city(city, rows)
+                cities.add(city)
+                accepted += len(rows)
+        
+        elapsed = time.perf_counter() - started
+        points_per_second = accepted / elapsed if elapsed > 0 else 0.0
+        print(f"Analytics backfill: {accepted} points, {len(cities)} cities, {points_per_second:.0f} points/s")
+        return analytics_pb2.BackfillSummary(
+            accepted=accepted,
+            rejected=rejected,
+            cities=len(cities),
+            elapsed_ms=elapsed * 1000,
+            points_per_second=points_per_second
+        )
     
     def GetHistory(self, request, context):
         city = request.city
-        city_history = [item for item in weather_history if item['city'].lower() == city.lower()]
+        if not owns((city,), context):
+            return analytics_pb2.HistoryResponse()
+        page_size = min(request.page_size if request.page_size > 0 else DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
         
-        # конвертируем последние 10 записей в JSON
-        history_json = []
-        for record in city_history[-10:]:
-            history_json.append(json.dumps(record))
+        try:
+            points, next_cursor, total = weather_history.page(city, request.cursor, page_size)
+        except ValueError:
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details(f"Invalid cursor: {request.cursor}")
+            return analytics_pb2.HistoryResponse()
         
         return analytics_pb2.HistoryResponse(
             city=city,
-            total_records=len(city_history),
-            history=history_json
+            total_records=total,
+            records=[self._history_record(point) for point in points],
+            next_cursor=next_cursor
         )
     
+    def StreamHistory(self, request, context):
+        # вся история города по порядку, без сборки ответа в памяти
+        if not owns((request.city,), context):
+            return
+        for point in weather_history.iter_points(request.city):
+            if not context.is_active():
+                return
+            yield self._history_record(point)
+    
+    def GetChartSeries(self, request, context):
+        city = request.city
+        if not owns((city,), context):
+            return analytics_pb2.ChartSeries()
+        target = min(request.points if request.points > 0 else DEFAULT_CHART_POINTS, MAX_CHART_POINTS)
+        method = request.method or METHOD_LTTB
+        metric = request.metric or 'temperature'
+        
+        start, end = time_range(request.start_us, request.end_us)
+        if method not in METHODS or metric not in CHART_METRICS:
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details(f"method must be one of {', '.join(METHODS)}, metric one of {', '.join(CHART_METRICS)}")
+            return analytics_pb2.ChartSeries()
+        
+        points = weather_history.points(city)
+        # микросекунды во float64 точны до 2**53, а накопленные суммы LTTB не переполняются, как в int64
+        timestamps = np.fromiter((point.observed_us for point in points), dtype=np.float64, count=len(points))
+        values = np.fromiter((getattr(point, metric) for point in points), dtype=np.float64, count=len(points))
+        
+        # окно по времени и сортировка (поздние наблюдения могли лечь в историю не по порядку)
+        selected = np.flatnonzero((timestamps >= start) & (timestamps <= end))
+        selected = selected[np.argsort(timestamps[selected], kind='stable')]
+        chosen = selected[downsample(method, timestamps[selected], values[selected], target)]
+        
+        return analytics_pb2.ChartSeries(
+            city=city,
+            method=method,
+            metric=metric,
+            source_points=len(selected),
+            points=[self._history_record(points[i]) for i in chosen.tolist()]
+        )
+    
+    def ExportHistory(self, request, context):
+        if not owns(request.cities, context):
+            return
+        start, end = time_range(request.start_us, request.end_us)
+        chunk_points = min(request.chunk_points if request.chunk_points > 0 else DEFAULT_EXPORT_CHUNK, MAX_EXPORT_CHUNK)
+        
+        # колоночные куски по chunk_points точек: в памяти всегда не больше одного куска
+        for city in request.cities:
+            columns = ([], [], [], [], [])
+            for point in weather_history.iter_points(city, chunk_points):
+                if not start <= point.observed_us <= end:
+                    continue
+                for column, value in zip(columns, point):
+                    column.append(value)
+                if len(columns[0]) >= chunk_points:
+                    if not context.is_active():
+                        return
+                    yield self._export_chunk(city, columns)
+                    columns = ([], [], [], [], [])
+            if columns[0]:
+                yield self._export_chunk(city, columns)
+    
+    def RankCities(self, request, context):
+        limit = min(request.limit if request.limit > 0 else DEFAULT_RANK_LIMIT, MAX_RANK_LIMIT)
+        
+        try:
+            ranked, total = fleet.rank(request.metric, limit, request.ascending, time.time())
+        except ValueError as e:
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details(str(e))
+            return analytics_pb2.RankResponse()
+        
+        return analytics_pb2.RankResponse(
+            metric=request.metric,
+            total_cities=total,
+            cities=[analytics_pb2.CityValue(city=city, value=value) for city, value in ranked]
+        )
+    
+    def GetFleetStats(self, request, context):
+        percentiles = list(request.percentiles)
+        
+        if any(p < 0 or p > 100 for p in percentiles):
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details("Percentiles must be within [0, 100]")
+            return analytics_pb2.FleetStatsResponse()
+        
+        try:
+            stats = fleet.stats(request.metric, percentiles, time.time())
+        except ValueError as e:
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details(str(e))
+            return analytics_pb2.FleetStatsResponse()
+        
+        return analytics_pb2.FleetStatsResponse(
+            metric=request.metric,
+            count=stats["count"],
+            mean=stats["mean"],
+            min=stats["min"],
+            max=stats["max"],
+            percentiles=[
+                analytics_pb2.PercentileValue(percentile=p, value=value)
+                for p, value in stats["percentiles"]
+            ]
+        )
+    
+    def GetPercentiles(self, request, context):
+        city = request.city
+        if not owns((city,), context):
+            return analytics_pb2.PercentileResponse()
+        window = request.window_seconds if request.window_seconds > 0 else DEFAULT_PERCENTILE_WINDOW
+        percentiles = list(request.percentiles) or list(DEFAULT_PERCENTILES)
+        
+        if window > MAX_WINDOW or any(p < 0 or p > 100 for p in percentiles):
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details(f"window_seconds must be <= {MAX_WINDOW}, percentiles within [0, 100]")
+            return analytics_pb2.PercentileResponse()
+        
+        now = time.time()
+        tier, bucket = weather_history.rollup_window(city, window, now)
+        # вклад других площадок
+        remote_tier, remote_bucket = peer_aggregates.window(city, window, now)
+        if remote_bucket is not None:
+            tier = remote_tier
+            bucket = remote_bucket if bucket is None else bucket.merge(remote_bucket)
+        if bucket is None:
+            return analytics_pb2.PercentileResponse(city=city, window_seconds=window)
+        
+        qs = [p / 100 for p in percentiles]
+        response = analytics_pb2.PercentileResponse(
+            city=city,
+            window_seconds=window,
+            tier=tier,
+            count=bucket.count,
+            temperature=[
+                analytics_pb2.PercentileValue(percentile=p, value=value)
+                for p, value in zip(percentiles, bucket.temperature.quantiles(qs))
+            ],
+            humidity=[
+                analytics_pb2.PercentileValue(percentile=p, value=value)
+                for p, value in zip(percentiles, bucket.humidity.quantiles(qs))
+            ]
+        )
+        
+        # сериализованные скетчи можно объединить с ответами других реплик через KLLSketch.merge
+        if request.include_sketches:
+            response.temperature_sketch = bucket.temperature.to_bytes()
+            response.humidity_sketch = bucket.humidity.to_bytes()
+        
+        return response
+    
+    def ListAnomalies(self, request, context):
+        limit = min(request.limit if request.limit > 0 else DEFAULT_ANOMALY_LIMIT, MAX_ANOMALY_LIMIT)
+        anomalies, total = anomaly_scanner.query(request.kind, request.min_score, limit)
+        last_pass = anomaly_scanner.last_pass()
+        
+        return analytics_pb2.AnomalyList(
+            total=total,
+            anomalies=[
+                analytics_pb2.Anomaly(
+                    city=anomaly.city,
+                    kind=anomaly.kind,
+                    score=anomaly.score,
+                    value=anomaly.value,
+                    baseline=anomaly.baseline
+                )
+                for anomaly in anomalies
+            ],
+            scanned_at_us=last_pass["scanned_at_us"],
+            cities_scanned=last_pass["cities_scanned"],
+            scan_cpu_ms=last_pass["scan_cpu_ms"],
+            scan_wall_ms=last_pass["scan_wall_ms"]
+        )
+    
+    def UpdateMembership(self, request, context):
+        if not request.replicas:
+            context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+            context.set_details("Membership must contain at least one replica")
+            return analytics_pb2.MembershipSummary()
+        
+        owned, handed_off, failed = shard_manager.update_membership(list(request.replicas))
+        return analytics_pb2.MembershipSummary(
+            owned_cities=owned,
+            handed_off_cities=handed_off,
+            failed_cities=failed
+        )
+    
+    def TransferShard(self, request, context):
+        for shard in request.cities:
+            state = shard_to_city(shard, weather_history.max_points_per_city)
+            weather_history.import_city(state)
+            replay_into_fleet(state)
+            # город теперь реплицирует эта реплика, другим площадкам уходит его объединенное состояние
+            change_log.touch(state.city)
+        return analytics_pb2.TransferSummary(accepted_cities=len(request.cities))
+    
+    def Replicate(self, request_iterator, context):
+        for batch in request_iterator:
+            if batch.origin == ANALYTICS_SITE:
+                context.set_code(grpc.StatusCode.INVALID_ARGUMENT)
+                context.set_details(f"Replication batch from own site {batch.origin}")
+                return
+            yield analytics_pb2.ReplicationAck(applied_version=peer_aggregates.apply(batch))
+    
+    def GetReplicationCursor(self, request, context):
+        return analytics_pb2.ReplicationCursor(version=peer_aggregates.cursor(request.origin, request.sender))
+    
+    def GetStoreStats(self, request, context):
+        return analytics_pb2.StoreStats(**weather_history.stats())
+    
     def HealthCheck(self, request, context):
         return analytics_pb2.HealthResponse(
             status="healthy",
             service="analytics"
         )
 
+    def _fetch_current(self, city, timeout):
+        # получаем текущие обработанные данные через gRPC;
+        # skip_analytics - запись делаем сами, data-processor не должен присылать ее повторно
+        process_request = data_processor_pb2.ProcessRequest(city=city, skip_analytics=True)
+        current_data = self.data_processor_client.ProcessWeatherData(process_request, timeout=timeout)
+        
+        summary = current_data.weather_summary
+        # время наблюдения провайдеров, как у data-processor для живого потока
+        observed = [
+            data.observed_at_us for data in (summary.openweather, summary.weatherapi) if data.observed_at_us
+        ]
+        record_observation(
+            city,
+            max(observed, default=current_data.processed_at_us),
+            current_data.averages.temperature,
+            current_data.averages.humidity,
+            summary.openweather.temperature if summary.HasField('openweather') else None,
+            summary.weatherapi.temperature if summary.HasField('weatherapi') else None
+        )
+
+    def _history_record(self, point):
+        return analytics_pb2.HistoryRecord(
+            seq=point.seq,
+            timestamp_us=point.observed_us,
+            temperature=point.temperature,
+            humidity=point.humidity,
+            repeats=point.repeats
+        )
+
+    def _export_chunk(self, city, columns):
+        seq, timestamps, temperature, humidity, repeats = columns
+        return analytics_pb2.ExportChunk(
+            city=city,
+            seq=seq,
+            timestamps_us=timestamps,
+            temperature=temperature,
+            humidity=humidity,
+            repeats=repeats
+        )
+
+def restore_state():
+    # история и агрегаты переживают передеплой через снапшот на диске
+    if not SNAPSHOT_PATH or not os.path.exists(SNAPSHOT_PATH):
+        return
+    started = time.perf_counter()
+    try:
+        cities, points = load_snapshot(SNAPSHOT_PATH, weather_history, fleet)
+        print(f"Analytics snapshot loaded: {cities} cities, {points} points in {(time.perf_counter() - started) * 1000:.0f} ms")
+    except (OSError, ValueError, struct.error) as e:
+        print(f"Analytics snapshot load error: {e}")
+
 def serve():
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
+    if GRPC_WORKERS > 1:
+        watch_parent()
+    if EXECUTOR_AUTOSIZE:
+        pool_controller.start()
+    # спаны вызовов уходят в TRACE_EXPORT, если он задан
+    configure_tracing('analytics')
+    restore_state()
+    if SNAPSHOT_PATH:
+        SnapshotWriter(SNAPSHOT_PATH, weather_history, fleet).start()
+    
+    # очереди перед обработчиками нет: вызовы сверх адаптивного лимита сразу получают RESOURCE_EXHAUSTED
+    server = grpc.server(
+        executor,
+        # с трассировкой TracingInterceptor заменяет MetricsInterceptor: замеры те же, слоем меньше
+        interceptors=[TracingInterceptor() if TRACING_ENABLED else MetricsInterceptor(),
+                      DeadlineInterceptor(), concurrency_limiter],
+        maximum_concurrent_rpcs=SERVER_THREADS,
+        options=server_options()
+    )
     analytics_pb2_grpc.add_AnalyticsServiceServicer_to_server(
         AnalyticsService(), server
     )
-    server.add_insecure_port('[::]:50053')
+    addresses = add_ports(server, GRPC_PORT)
+    anomaly_scanner.start()
+    if replicator is not None:
+        replicator.start()
     
-    print("gRPC Analytics Service запущен на порту 50053...")
+    print(f"gRPC Analytics Service запущен: {', '.join(addresses)}...")
     server.start()
     server.wait_for_termination()
 
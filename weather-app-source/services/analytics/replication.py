@@ -0,0 +1,307 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+import grpc
+
+import analytics_pb2
+import analytics_pb2_grpc
+from channels import shared_channel
+from hash_ring import HashRing, parse_replicas
+from rollup import TIERS, RollupBucket, CityRollups
+from sketch import KLLSketch
+from store import normalize_city
+
+# реплики analytics на другой площадке; пусто - репликация выключена
+ANALYTICS_PEERS = parse_replicas(os.getenv('ANALYTICS_PEERS', ''))
+# площадка - источник изменений; все реплики одной площадки пишут от одного имени
+ANALYTICS_SITE = os.getenv('ANALYTICS_SITE', 'default')
+REPLICATION_INTERVAL = float(os.getenv('ANALYTICS_REPLICATION_INTERVAL', '1.0'))
+REPLICATION_BATCH_BYTES = 1024 * 1024
+REPLICATION_RETRY = 5.0
+
+# ключ изменения всего города (после backfill или приема шарда)
+ALL_BUCKETS = '*'
+TIER_WIDTHS = {name: (width, keep) for name, width, keep in TIERS}
+
+
+class ChangeLog:
+    """версии локальных изменений агрегатов: (город, уровень, начало корзины) -> версия
+
+    версии монотонны и переживают рестарт (наносекунды времени), ключ хранит только последнюю
+    версию, поэтому изменения после курсора - это хвост упорядоченного по версиям словаря
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._version = 0
+
+    def _next_version(self):
+        self._version = max(self._version + 1, time.time_ns())
+        return self._version
+
+    def touch(self, city, observed_ts=None):
+        if observed_ts is None:
+            keys = [(city, ALL_BUCKETS, 0)]
+        else:
+            keys = [(city, name, int(observed_ts // width) * width) for name, width, _ in TIERS]
+        with self._lock:
+            version = self._next_version()
+            for key in keys:
+                self._entries[key] = version
+                self._entries.move_to_end(key)
+
+    def version(self):
+        with self._lock:
+            return self._version
+
+    def since(self, version, now_ts):
+        """изменения с версией больше version по возрастанию версий; корзины вне хранения забываются"""
+        changes = []
+        expired = []
+        with self._lock:
+            for key in reversed(self._entries):
+                entry_version = self._entries[key]
+                if entry_version <= version:
+                    break
+                _, tier, start = key
+                if tier in TIER_WIDTHS:
+                    width, keep = TIER_WIDTHS[tier]
+                    if start + width * keep < now_ts:
+                        expired.append(key)
+                        continue
+                changes.append((key, entry_version))
+            for key in expired:
+                del self._entries[key]
+        changes.reverse()
+        return changes
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+def _bucket_state(tier, bucket, version):
+    return analytics_pb2.RollupBucketState(
+        tier=tier,
+        start=bucket.start,
+        count=bucket.count,
+        temperature_sum=bucket.temperature_sum,
+        temperature_sketch=bucket.temperature.to_bytes(),
+        humidity_sketch=bucket.humidity.to_bytes(),
+        version=version
+    )
+
+
+def city_delta(state, changes):
+    """дельта города под блокировкой хранилища: счетчик наблюдений и измененные корзины"""
+    delta = analytics_pb2.CityDelta(
+        city=state.city,
+        observations=state.observations,
+        version=max(version for _, version in changes)
+    )
+    for (tier, start), version in changes:
+        if tier == ALL_BUCKETS:
+            for name, buckets in state.rollups.tiers.items():
+                for bucket in buckets.values():
+                    delta.rollups.append(_bucket_state(name, bucket, version))
+        elif tier in TIER_WIDTHS:
+            bucket = state.rollups.tiers[tier].get(start)
+            if bucket is not None:
+                delta.rollups.append(_bucket_state(tier, bucket, version))
+    return delta
+
+
+class _RemoteCity:
+    __slots__ = ('observations', 'observations_version', 'rollups', 'versions')
+
+    def __init__(self):
+        self.observations = 0
+        self.observations_version = 0
+        self.rollups = CityRollups()
+        self.versions = {}
+
+
+class PeerAggregates:
+    """агрегаты, полученные с других площадок: по площадке-источнику и городу
+
+    состояние источника по каждому ключу только растет, поэтому слияние - замена на более
+    новую версию (LWW по ключу внутри источника): повтор, перестановка и дубли пачек
+    не меняют результат, а сумма по источникам не считает одно наблюдение дважды
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # город -> {источник: _RemoteCity}
+        self._cities = {}
+        # примененная версия по (источник, отправитель) - курсор для докачки после разрыва
+        self._applied = {}
+
+    def cursor(self, origin, sender):
+        with self._lock:
+            return self._applied.get((origin, sender), 0)
+
+    def apply(self, batch):
+        with self._lock:
+            for delta in batch.cities:
+                self._apply_city(batch.origin, delta)
+            key = (batch.origin, batch.sender)
+            self._applied[key] = max(self._applied.get(key, 0), batch.version)
+            return self._applied[key]
+
+    def _apply_city(self, origin, delta):
+        origins = self._cities.setdefault(normalize_city(delta.city), {})
+        remote = origins.get(origin)
+        if remote is None:
+            remote = origins[origin] = _RemoteCity()
+        if delta.version > remote.observations_version:
+            remote.observations = delta.observations
+            remote.observations_version = delta.version
+
+        for item in delta.rollups:
+            if item.tier not in TIER_WIDTHS:
+                continue
+            bucket_key = (item.tier, item.start)
+            if item.version <= remote.versions.get(bucket_key, 0):
+                continue
+            remote.versions[bucket_key] = item.version
+            buckets = remote.rollups.tiers[item.tier]
+            buckets[item.start] = RollupBucket(
+                item.start, item.count, item.temperature_sum,
+                KLLSketch.from_bytes(item.temperature_sketch),
+                KLLSketch.from_bytes(item.humidity_sketch)
+            )
+            _, keep = TIER_WIDTHS[item.tier]
+            for start in sorted(buckets)[:-keep]:
+                del buckets[start]
+                remote.versions.pop((item.tier, start), None)
+
+    def _remote(self, city):
+        return self._cities.get(normalize_city(city), {}).values()
+
+    def observations(self, city):
+        with self._lock:
+            return sum(remote.observations for remote in self._remote(city))
+
+    def window(self, city, window_seconds, now_ts):
+        """объединенная корзина других площадок за окно, (None, None) если данных нет"""
+        with self._lock:
+            windows = [remote.rollups.window(window_seconds, now_ts) for remote in self._remote(city)]
+        windows = [(tier, bucket) for tier, bucket in windows if bucket.count]
+        if not windows:
+            return None, None
+        tier, merged = windows[0]
+        for _, bucket in windows[1:]:
+            merged.merge(bucket)
+        return tier, merged
+
+    def stats(self):
+        with self._lock:
+            return {
+                "origins": len({origin for origins in self._cities.values() for origin in origins}),
+                "cities": len(self._cities),
+                "applied": {f"{origin}/{sender}": version for (origin, sender), version in self._applied.items()}
+            }
+
+
+class Replicator:
+    """отправка локальных изменений на реплики другой площадки
+
+    на каждую реплику - долгоживущий двунаправленный стрим Replicate со сжатием gzip;
+    после разрыва стрим открывается заново с версии, которую реплика успела применить,
+    поэтому догоняется только пропущенное, без полной передачи состояния
+    """
+
+    def __init__(self, store, change_log, site, sender, peers,
+                 interval=REPLICATION_INTERVAL, batch_bytes=REPLICATION_BATCH_BYTES):
+        self.store = store
+        self.change_log = change_log
+        self.site = site
+        self.sender = sender
+        self.ring = HashRing(peers)
+        self.peers = list(peers)
+        self.interval = interval
+        self.batch_bytes = batch_bytes
+        self._lock = threading.Lock()
+        self.sent_batches = 0
+        self.sent_bytes = 0
+        self.acked = {}
+        self._threads = []
+
+    def start(self):
+        if self._threads:
+            return
+        for peer in self.peers:
+            thread = threading.Thread(target=self._run, args=(peer,), daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "site": self.site,
+                "peers": self.peers,
+                "sent_batches": self.sent_batches,
+                "sent_bytes": self.sent_bytes,
+                "acked": dict(self.acked),
+                "local_version": self.change_log.version()
+            }
+
+    def _run(self, peer):
+        client = analytics_pb2_grpc.AnalyticsServiceStub(shared_channel(peer))
+        while True:
+            try:
+                cursor = client.GetReplicationCursor(
+                    analytics_pb2.ReplicationCursorRequest(origin=self.site, sender=self.sender),
+                    timeout=REPLICATION_RETRY
+                ).version
+                acks = client.Replicate(self._batches(peer, cursor), compression=grpc.Compression.Gzip)
+                for ack in acks:
+                    with self._lock:
+                        self.acked[peer] = ack.applied_version
+            except grpc.RpcError as e:
+                print(f"Replication to {peer} failed: {e.code()}")
+            time.sleep(REPLICATION_RETRY)
+
+    def _batches(self, peer, cursor):
+        while True:
+            for batch in self.collect(peer, cursor):
+                cursor = batch.version
+                with self._lock:
+                    self.sent_batches += 1
+                    self.sent_bytes += batch.ByteSize()
+                yield batch
+            time.sleep(self.interval)
+
+    def collect(self, peer, cursor):
+        """пачки дельт для реплики peer по изменениям после cursor, не больше batch_bytes каждая"""
+        by_city = OrderedDict()
+        for (city, tier, start), version in self.change_log.since(cursor, time.time()):
+            if self.ring.node_for(city) == peer:
+                by_city.setdefault(city, []).append(((tier, start), version))
+
+        # города идут по возрастанию их самой ранней версии; версия пачки - граница, до которой
+        # включительно доставлено все: перед самой ранней версией следующего города;
+        # города, которых нет ни в памяти, ни на диске (переданы другой реплике), пропускаются
+        cities = list(by_city.items())
+        last_version = max((changes[-1][1] for _, changes in cities), default=cursor)
+        batch = analytics_pb2.ReplicationBatch(origin=self.site, sender=self.sender)
+        for index, (city, changes) in enumerate(cities):
+            # вытесненный на диск город поднимается: иначе версия пачки прошла бы мимо его изменений
+            delta = self.store.with_city(city, lambda state: city_delta(state, changes), load=True)
+            if delta is None and self.store.is_spilled(city):
+                # вытеснен снова между подъемом и чтением: пачка заканчивается перед ним, следующий проход повторит
+                batch.version = changes[0][1] - 1
+                if batch.cities or batch.version > cursor:
+                    yield batch
+                return
+            if delta is not None:
+                batch.cities.append(delta)
+            if batch.ByteSize() >= self.batch_bytes and index + 1 < len(cities):
+                batch.version = cities[index + 1][1][0][1] - 1
+                yield batch
+                batch = analytics_pb2.ReplicationBatch(origin=self.site, sender=self.sender)
+        batch.version = last_version
+        if batch.cities or last_version > cursor:
+            yield batch
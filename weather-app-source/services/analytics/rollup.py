@@ -0,0 +1,114 @@
+import numpy as np
+
+from sketch import KLLSketch
+
+# уровни агрегации: имя, ширина корзины в секундах, сколько корзин храним
+TIERS = (
+    ('hour', 3600, 24),
+    ('day', 86400, 30),
+)
+
+MAX_WINDOW = max(width * keep for _, width, keep in TIERS)
+
+
+class RollupBucket:
+    """агрегат за интервал: счетчики и скетчи распределений температуры и влажности"""
+
+    __slots__ = ('start', 'count', 'temperature_sum', 'temperature', 'humidity')
+
+    def __init__(self, start, count=0, temperature_sum=0.0, temperature=None, humidity=None):
+        self.start = start
+        self.count = count
+        self.temperature_sum = temperature_sum
+        self.temperature = temperature if temperature is not None else KLLSketch()
+        self.humidity = humidity if humidity is not None else KLLSketch()
+
+    def add(self, temperature, humidity):
+        self.count += 1
+        self.temperature_sum += temperature
+        self.temperature.update(temperature)
+        self.humidity.update(humidity)
+
+    def add_many(self, temperatures, humidities):
+        self.count += len(temperatures)
+        self.temperature_sum += float(np.sum(temperatures))
+        self.temperature.update_many(temperatures.tolist())
+        self.humidity.update_many(humidities.tolist())
+
+    def merge(self, other):
+        self.count += other.count
+        self.temperature_sum += other.temperature_sum
+        self.temperature.merge(other.temperature)
+        self.humidity.merge(other.humidity)
+        return self
+
+
+class CityRollups:
+    """кольцо корзин на каждый уровень, память на город ограничена числом корзин и размером скетча"""
+
+    __slots__ = ('tiers',)
+
+    def __init__(self):
+        self.tiers = {name: {} for name, _, _ in TIERS}
+
+    def add(self, observed_ts, temperature, humidity):
+        for name, width, keep in TIERS:
+            buckets = self.tiers[name]
+            start = int(observed_ts // width) * width
+            bucket = buckets.get(start)
+            if bucket is None:
+                # точка старше всего окна уровня не заводит новую корзину
+                if len(buckets) >= keep and start < min(buckets):
+                    continue
+                bucket = buckets[start] = RollupBucket(start)
+                if len(buckets) > keep:
+                    del buckets[min(buckets)]
+            bucket.add(temperature, humidity)
+
+    def add_many(self, observed_ts, temperatures, humidities):
+        """пакетное добавление (массивы numpy): точки раскладываются по корзинам одной сортировкой,
+        каждая корзина пополняет скетчи одним update_many"""
+        order = np.argsort(observed_ts, kind='stable')
+        observed_ts, temperatures, humidities = observed_ts[order], temperatures[order], humidities[order]
+        for name, width, keep in TIERS:
+            buckets = self.tiers[name]
+            starts = (observed_ts // width).astype(np.int64) * width
+            unique_starts, offsets = np.unique(starts, return_index=True)
+            # остаются только keep самых новых корзин из старых и новых вместе
+            kept = set(sorted(set(buckets) | set(unique_starts.tolist()))[-keep:])
+            ends = np.append(offsets[1:], len(starts))
+            for start, begin, end in zip(unique_starts.tolist(), offsets.tolist(), ends.tolist()):
+                if start not in kept:
+                    continue
+                bucket = buckets.get(start)
+                if bucket is None:
+                    bucket = buckets[start] = RollupBucket(start)
+                bucket.add_many(temperatures[begin:end], humidities[begin:end])
+            for start in [start for start in buckets if start not in kept]:
+                del buckets[start]
+
+    def merge(self, other):
+        """объединение с агрегатами того же города с другой реплики, лишние старые корзины отбрасываются"""
+        for name, _, keep in TIERS:
+            buckets = self.tiers[name]
+            for start, bucket in other.tiers[name].items():
+                if start in buckets:
+                    buckets[start].merge(bucket)
+                else:
+                    buckets[start] = bucket
+            for start in sorted(buckets)[:-keep]:
+                del buckets[start]
+        return self
+
+    def window(self, window_seconds, now_ts):
+        """объединенная корзина за последние window_seconds из самого мелкого подходящего уровня"""
+        # если окно больше всех уровней, остается последний (самый крупный)
+        for name, width, keep in TIERS:
+            if width * keep >= window_seconds:
+                break
+
+        merged = RollupBucket(now_ts - window_seconds)
+        for start, bucket in self.tiers[name].items():
+            if start + width > now_ts - window_seconds:
+                merged.merge(bucket)
+        return name, merged
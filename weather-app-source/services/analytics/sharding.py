@@ -0,0 +1,147 @@
+import os
+import threading
+import grpc
+
+import analytics_pb2
+import analytics_pb2_grpc
+from channels import shared_channel
+from hash_ring import HashRing, parse_replicas
+from rollup import TIERS, RollupBucket
+from sketch import KLLSketch
+from store import CityState, HistoryPoint
+
+ANALYTICS_REPLICAS = parse_replicas(os.getenv('ANALYTICS_REPLICAS', 'analytics:50053'))
+# адрес этой реплики в том виде, в каком он указан в ANALYTICS_REPLICAS
+ANALYTICS_SELF = os.getenv('ANALYTICS_SELF', ANALYTICS_REPLICAS[0])
+# пачка передачи ограничена по размеру, чтобы не упереться в лимит сообщения gRPC (GRPC_MAX_MESSAGE_BYTES)
+HANDOFF_BATCH_BYTES = 2 * 1024 * 1024
+HANDOFF_TIMEOUT = 30
+
+
+def city_to_shard(state):
+    shard = analytics_pb2.CityShard(city=state.city, next_seq=state.next_seq)
+    for point in state.points:
+        shard.points.add(
+            seq=point.seq,
+            timestamp_us=point.observed_us,
+            temperature=point.temperature,
+            humidity=point.humidity,
+            repeats=point.repeats
+        )
+    for tier, buckets in state.rollups.tiers.items():
+        for bucket in buckets.values():
+            shard.rollups.add(
+                tier=tier,
+                start=bucket.start,
+                count=bucket.count,
+                temperature_sum=bucket.temperature_sum,
+                temperature_sketch=bucket.temperature.to_bytes(),
+                humidity_sketch=bucket.humidity.to_bytes()
+            )
+    return shard
+
+
+def shard_to_city(shard, max_points):
+    state = CityState(shard.city, max_points)
+    state.set_points([
+        HistoryPoint(point.seq, point.timestamp_us, point.temperature, point.humidity, point.repeats or 1)
+        for point in shard.points
+    ], shard.next_seq)
+    tiers = {name for name, _, _ in TIERS}
+    for item in shard.rollups:
+        if item.tier not in tiers:
+            continue
+        state.rollups.tiers[item.tier][item.start] = RollupBucket(
+            item.start, item.count, item.temperature_sum,
+            KLLSketch.from_bytes(item.temperature_sketch),
+            KLLSketch.from_bytes(item.humidity_sketch)
+        )
+    return state
+
+
+class ShardManager:
+    """принадлежность городов репликам и передача состояния при смене состава кластера"""
+
+    def __init__(self, store, fleet, self_address=ANALYTICS_SELF, replicas=ANALYTICS_REPLICAS):
+        self.store = store
+        self.fleet = fleet
+        self.self_address = self_address
+        self.ring = HashRing(replicas)
+        self._lock = threading.Lock()
+        self._handoff_lock = threading.Lock()
+        self._clients = {}
+
+    def owner(self, city):
+        return self.ring.node_for(city)
+
+    def foreign(self, cities):
+        """(город, владелец) первого города, который не принадлежит этой реплике, None - все свои"""
+        ring = self.ring
+        for city in cities:
+            owner = ring.node_for(city)
+            if owner != self.self_address:
+                return city, owner
+        return None
+
+    def _client(self, address):
+        with self._lock:
+            client = self._clients.get(address)
+            if client is None:
+                client = self._clients[address] = analytics_pb2_grpc.AnalyticsServiceStub(shared_channel(address))
+            return client
+
+    def update_membership(self, replicas):
+        """перестраивает кольцо и отдает новым владельцам города, которые больше не принадлежат этой реплике"""
+        with self._handoff_lock:
+            self.ring = HashRing(replicas)
+            return self._hand_off()
+
+    def _hand_off(self):
+        moved = {}
+        owned = 0
+        # вытесненные на диск города тоже переезжают, иначе их история останется на старой реплике
+        for city in dict.fromkeys(self.store.cities() + self.store.spilled_cities()):
+            owner = self.ring.node_for(city)
+            if owner == self.self_address:
+                owned += 1
+            else:
+                moved.setdefault(owner, []).append(city)
+
+        handed_off = failed = 0
+        for owner, cities in moved.items():
+            batch = []
+            batch_bytes = 0
+            for city in cities:
+                shard = self.store.with_city(city, city_to_shard, load=True)
+                if shard is None:
+                    continue
+                batch.append(shard)
+                batch_bytes += shard.ByteSize()
+                if batch_bytes >= HANDOFF_BATCH_BYTES:
+                    sent, lost = self._transfer(owner, batch)
+                    handed_off += sent
+                    failed += lost
+                    batch = []
+                    batch_bytes = 0
+            if batch:
+                sent, lost = self._transfer(owner, batch)
+                handed_off += sent
+                failed += lost
+
+        return owned, handed_off, failed
+
+    def _transfer(self, owner, shards):
+        try:
+            self._client(owner).TransferShard(
+                analytics_pb2.ShardBatch(cities=shards),
+                timeout=HANDOFF_TIMEOUT
+            )
+        except grpc.RpcError as e:
+            # города остаются здесь, повторный UpdateMembership попробует снова
+            print(f"Shard handoff to {owner} failed: {e}")
+            return 0, len(shards)
+
+        for shard in shards:
+            self.store.drop_city(shard.city)
+            self.fleet.remove(shard.city)
+        return len(shards), 0
@@ -0,0 +1,150 @@
+import functools
+import math
+import random
+import struct
+
+DEFAULT_K = 128
+# коэффициент уменьшения емкости уровней KLL
+CAPACITY_DECAY = 2.0 / 3.0
+
+_HEADER = struct.Struct('<HHq')
+
+
+@functools.lru_cache(maxsize=None)
+def _level_capacity(k, depth):
+    return max(2, int(math.ceil(k * CAPACITY_DECAY ** depth)))
+
+
+@functools.lru_cache(maxsize=None)
+def _total_capacity(k, level_count):
+    return sum(_level_capacity(k, depth) for depth in range(level_count))
+
+
+class KLLSketch:
+    """квантильный скетч KLL: фиксированная память O(k), ошибка ранга ~1.7/k, объединяется merge()"""
+
+    __slots__ = ('k', 'n', 'levels', 'min', 'max', '_size', '_max_size')
+
+    def __init__(self, k=DEFAULT_K):
+        self.k = k
+        self.n = 0
+        self.levels = [[]]
+        self.min = math.inf
+        self.max = -math.inf
+        self._size = 0
+        self._max_size = _total_capacity(k, 1)
+
+    def _capacity(self, level):
+        return _level_capacity(self.k, len(self.levels) - level - 1)
+
+    def _add_level(self):
+        self.levels.append([])
+        self._max_size = _total_capacity(self.k, len(self.levels))
+
+    def update(self, value):
+        self.n += 1
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        self.levels[0].append(value)
+        self._size += 1
+        if self._size >= self._max_size:
+            self._compress()
+
+    def update_many(self, values):
+        # пакетная вставка: один проход сжатия вместо сжатия на каждой точке
+        values = list(values)
+        if not values:
+            return
+        self.n += len(values)
+        self.min = min(self.min, min(values))
+        self.max = max(self.max, max(values))
+        self.levels[0].extend(values)
+        self._size += len(values)
+        self._compress()
+
+    def merge(self, other):
+        if other.n == 0:
+            return self
+        while len(self.levels) < len(other.levels):
+            self._add_level()
+        for level, items in enumerate(other.levels):
+            self.levels[level].extend(items)
+        self._size += other._size
+        self.n += other.n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    def _compress(self):
+        while self._size >= self._max_size:
+            for level in range(len(self.levels)):
+                if len(self.levels[level]) >= self._capacity(level):
+                    if level + 1 == len(self.levels):
+                        self._add_level()
+                    items = sorted(self.levels[level])
+                    # нечетный элемент остается на уровне, остальные прореживаются через один
+                    keep = [items.pop()] if len(items) % 2 else []
+                    promoted = items[random.getrandbits(1)::2]
+                    self.levels[level + 1].extend(promoted)
+                    self.levels[level] = keep
+                    self._size -= len(items) - len(promoted)
+                    break
+
+    def quantiles(self, qs):
+        if self.n == 0:
+            return [0.0 for _ in qs]
+
+        weighted = sorted(
+            (value, 1 << level)
+            for level, items in enumerate(self.levels)
+            for value in items
+        )
+        total = sum(weight for _, weight in weighted)
+
+        result = []
+        for q in qs:
+            if q <= 0:
+                result.append(self.min)
+                continue
+            if q >= 1:
+                result.append(self.max)
+                continue
+            target = q * total
+            cumulative = 0
+            value = weighted[-1][0]
+            for item, weight in weighted:
+                cumulative += weight
+                if cumulative >= target:
+                    value = item
+                    break
+            result.append(value)
+        return result
+
+    def to_bytes(self):
+        # k, число уровней, n, затем на каждый уровень длина и значения double
+        parts = [_HEADER.pack(self.k, len(self.levels), self.n), struct.pack('<dd', self.min, self.max)]
+        for items in self.levels:
+            parts.append(struct.pack(f'<I{len(items)}d', len(items), *items))
+        return b''.join(parts)
+
+    @classmethod
+    def from_bytes(cls, data):
+        k, level_count, n = _HEADER.unpack_from(data, 0)
+        offset = _HEADER.size
+        sketch = cls.__new__(cls)
+        sketch.k = k
+        sketch.n = n
+        sketch.min, sketch.max = struct.unpack_from('<dd', data, offset)
+        offset += 16
+        sketch.levels = []
+        for _ in range(level_count):
+            (size,) = struct.unpack_from('<I', data, offset)
+            offset += 4
+            sketch.levels.append(list(struct.unpack_from(f'<{size}d', data, offset)))
+            offset += 8 * size
+        sketch._size = sum(len(items) for items in sketch.levels)
+        sketch._max_size = _total_capacity(k, level_count)
+        return sketch
@@ -0,0 +1,235 @@
+import gc
+import mmap
+import os
+import struct
+import threading
+import time
+from datetime import datetime
+import numpy as np
+
+from fleet import COLUMNS
+from rollup import TIERS, RollupBucket
+from sketch import KLLSketch
+from store import MICROS, CityState, HistoryPoint
+
+SNAPSHOT_PATH = os.getenv('ANALYTICS_SNAPSHOT_PATH', '')
+SNAPSHOT_INTERVAL = float(os.getenv('ANALYTICS_SNAPSHOT_INTERVAL', '300'))
+
+# формат (little-endian):
+#   заголовок: magic, версия, время создания, число городов
+#   город: имя, next_seq, n, колонки seq/observed_us/temperature/humidity/repeats (выровнены на 8), корзины агрегатов
+#   матрица парка: имена строк, затем колонки FleetMatrix как есть
+MAGIC = b'WASNAP01'
+VERSION = 3
+# версия 1 - без колонки repeats (читается с repeats=1); версии 1 и 2 хранили время строками ISO 8601
+SUPPORTED_VERSIONS = (1, 2, 3)
+_HEADER = struct.Struct('<8sHdI')
+_CITY = struct.Struct('<qI')
+_BUCKET = struct.Struct('<BqqdII')
+
+TIER_NAMES = [name for name, _, _ in TIERS]
+
+
+class _Output:
+    def __init__(self, f):
+        self.f = f
+        self.offset = 0
+
+    def write(self, data):
+        self.f.write(data)
+        self.offset += len(data)
+
+    def pack(self, fmt, *values):
+        self.write(struct.pack(fmt, *values))
+
+    def string(self, value):
+        data = value.encode('utf-8')
+        self.pack('<H', len(data))
+        self.write(data)
+
+    def blob(self, data):
+        self.pack('<I', len(data))
+        self.write(data)
+
+    def array(self, values):
+        # колонки выравниваются на 8 байт, чтобы читать их из mmap без копирования
+        self.write(b'\0' * (-self.offset % 8))
+        self.write(np.ascontiguousarray(values).tobytes())
+
+
+class _Input:
+    def __init__(self, buffer):
+        self.buffer = buffer
+        self.offset = 0
+
+    def unpack(self, fmt):
+        values = struct.unpack_from(fmt, self.buffer, self.offset)
+        self.offset += struct.calcsize(fmt)
+        return values
+
+    def string(self):
+        (size,) = self.unpack('<H')
+        return self.bytes(size).decode('utf-8')
+
+    def blob(self):
+        (size,) = self.unpack('<I')
+        return self.bytes(size)
+
+    def bytes(self, size):
+        data = self.buffer[self.offset:self.offset + size]
+        self.offset += size
+        return data
+
+    def array(self, dtype, count):
+        self.offset += -self.offset % 8
+        values = np.frombuffer(self.buffer, dtype=dtype, count=count, offset=self.offset)
+        self.offset += values.nbytes
+        return values
+
+
+def _copy_city(state):
+    # под блокировкой хранилища только копия ссылок на неизменяемые точки и сериализация скетчей;
+    # запись на диск идет уже без блокировки, писатели не ждут снапшот
+    buckets = [
+        (TIER_NAMES.index(tier), bucket.start, bucket.count, bucket.temperature_sum,
+         bucket.temperature.to_bytes(), bucket.humidity.to_bytes())
+        for tier, tier_buckets in state.rollups.tiers.items()
+        for bucket in tier_buckets.values()
+    ]
+    return state.city, state.next_seq, list(state.points), buckets
+
+
+def write_snapshot(path, store, fleet):
+    """пишет снапшот во временный файл и атомарно подменяет им предыдущий, возвращает число точек"""
+    cities = store.cities()
+    tmp_path = f"{path}.tmp"
+    points_written = 0
+    city_count = 0
+
+    with open(tmp_path, 'wb') as f:
+        out = _Output(f)
+        # число городов дописывается в конце, когда оно известно
+        out.write(_HEADER.pack(MAGIC, VERSION, time.time(), 0))
+
+        for city in cities:
+            copied = store.with_city(city, _copy_city)
+            if copied is None:
+                continue
+            name, next_seq, points, buckets = copied
+            out.string(name)
+            out.pack(_CITY.format, next_seq, len(points))
+            out.array(np.fromiter((point.seq for point in points), dtype='<i8', count=len(points)))
+            out.array(np.fromiter((point.observed_us for point in points), dtype='<i8', count=len(points)))
+            out.array(np.fromiter((point.temperature for point in points), dtype='<f8', count=len(points)))
+            out.array(np.fromiter((point.humidity for point in points), dtype='<f8', count=len(points)))
+            out.array(np.fromiter((point.repeats for point in points), dtype='<i4', count=len(points)))
+            out.pack('<I', len(buckets))
+            for tier, start, count, temperature_sum, temperature, humidity in buckets:
+                out.pack(_BUCKET.format, tier, start, count, temperature_sum, len(temperature), len(humidity))
+                out.write(temperature)
+                out.write(humidity)
+            points_written += len(points)
+            city_count += 1
+
+        fleet_cities, columns = fleet.export_columns()
+        out.pack('<I', len(fleet_cities))
+        for city in fleet_cities:
+            out.string(city)
+        for column in columns:
+            out.array(column)
+
+        f.seek(0)
+        f.write(_HEADER.pack(MAGIC, VERSION, time.time(), city_count))
+
+    os.replace(tmp_path, path)
+    return points_written
+
+
+def load_snapshot(path, store, fleet):
+    """загружает снапшот через mmap, возвращает (городов, точек)"""
+    # миллионы кортежей подряд: сборщик мусора на время загрузки только тратит время
+    gc.disable()
+    try:
+        return _load(path, store, fleet)
+    finally:
+        gc.enable()
+
+
+def _load(path, store, fleet):
+    with open(path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            source = _Input(buffer)
+            magic, version, _, city_count = source.unpack(_HEADER.format)
+            if magic != MAGIC or version not in SUPPORTED_VERSIONS:
+                raise ValueError(f"Unsupported snapshot format: {magic!r} v{version}")
+
+            points_loaded = 0
+            for _ in range(city_count):
+                name = source.string()
+                next_seq, size = source.unpack(_CITY.format)
+                seqs = source.array('<i8', size).tolist()
+                observed_us = source.array('<i8', size).tolist() if version >= 3 else None
+                temperatures = source.array('<f8', size).tolist()
+                humidities = source.array('<f8', size).tolist()
+                repeats = source.array('<i4', size).tolist() if version >= 2 else [1] * size
+                if observed_us is None:
+                    timestamps = source.blob().decode('utf-8').split('\n') if size else []
+                    observed_us = [round(datetime.fromisoformat(value).timestamp() * MICROS) for value in timestamps]
+
+                state = CityState(name, store.max_points_per_city)
+                state.set_points(list(map(HistoryPoint, seqs, observed_us, temperatures, humidities, repeats)), next_seq)
+
+                (bucket_count,) = source.unpack('<I')
+                for _ in range(bucket_count):
+                    tier, start, count, temperature_sum, temperature_size, humidity_size = source.unpack(_BUCKET.format)
+                    state.rollups.tiers[TIER_NAMES[tier]][start] = RollupBucket(
+                        start, count, temperature_sum,
+                        KLLSketch.from_bytes(source.bytes(temperature_size)),
+                        KLLSketch.from_bytes(source.bytes(humidity_size))
+                    )
+
+                store.import_city(state)
+                points_loaded += size
+
+            _restore_fleet(source, fleet)
+
+    return city_count, points_loaded
+
+
+def _restore_fleet(source, fleet):
+    # restore копирует колонки в собственные массивы матрицы; представления mmap живут только
+    # внутри этой функции, иначе mmap нельзя будет закрыть
+    (rows,) = source.unpack('<I')
+    fleet_cities = [source.string() for _ in range(rows)]
+    columns = []
+    for _, width, dtype, _ in COLUMNS:
+        count = rows if width is None else rows * width
+        column = source.array(np.dtype(dtype).newbyteorder('<'), count)
+        columns.append(column if width is None else column.reshape(rows, width))
+    fleet.restore(fleet_cities, columns)
+
+
+class SnapshotWriter:
+    """периодический снапшот в фоновом потоке"""
+
+    def __init__(self, path, store, fleet, interval=SNAPSHOT_INTERVAL):
+        self.path = path
+        self.store = store
+        self.fleet = fleet
+        self.interval = interval
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                started = time.perf_counter()
+                points = write_snapshot(self.path, self.store, self.fleet)
+                print(f"Analytics snapshot: {points} points in {(time.perf_counter() - started) * 1000:.0f} ms")
+            except Exception as e:
+                print(f"Analytics snapshot error: {e}")
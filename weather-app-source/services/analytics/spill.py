@@ -0,0 +1,101 @@
+import hashlib
+import os
+import threading
+
+from google.protobuf.message import DecodeError
+
+import analytics_pb2
+from sharding import city_to_shard, shard_to_city
+
+SPILL_DIR = os.getenv('ANALYTICS_SPILL_DIR', '')
+
+
+class SpillStore:
+    """вытесненные из памяти города на диске, по файлу на город в формате CityShard"""
+
+    def __init__(self, directory, max_points_per_city):
+        self.directory = directory
+        self.max_points_per_city = max_points_per_city
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        # имя файла -> город: по sha1 город не восстановить, а передаче шардов нужен список городов на диске
+        self._spilled = {}
+        for file_name in os.listdir(directory):
+            if file_name.endswith('.shard'):
+                name = file_name[:-len('.shard')]
+                self._spilled[name] = self._read_city(self._path(name))
+
+    def _name(self, city):
+        return hashlib.sha1(city.encode('utf-8')).hexdigest()
+
+    def _path(self, name):
+        return os.path.join(self.directory, f"{name}.shard")
+
+    def contains(self, city):
+        return self._name(city) in self._spilled
+
+    def count(self):
+        with self._lock:
+            return len(self._spilled)
+
+    def cities(self):
+        """города на диске; файлы, из которых город не прочитался, не попадают"""
+        with self._lock:
+            return [city for city in self._spilled.values() if city is not None]
+
+    def save(self, state):
+        name = self._name(state.city)
+        data = city_to_shard(state).SerializeToString()
+        with self._lock:
+            path = self._path(name)
+            # город мог уже лежать на диске: объединяем, чтобы не потерять старую часть истории
+            if name in self._spilled:
+                previous = self._read(path)
+                if previous is not None:
+                    previous.merge(state)
+                    data = city_to_shard(previous).SerializeToString()
+            with open(f"{path}.tmp", 'wb') as f:
+                f.write(data)
+            os.replace(f"{path}.tmp", path)
+            self._spilled[name] = state.city
+
+    def take(self, city):
+        """забирает город с диска (файл удаляется), None если его там нет"""
+        name = self._name(city)
+        with self._lock:
+            if name not in self._spilled:
+                return None
+            del self._spilled[name]
+            path = self._path(name)
+            state = self._read(path)
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return state
+
+    def discard(self, city):
+        name = self._name(city)
+        with self._lock:
+            if name in self._spilled:
+                del self._spilled[name]
+                try:
+                    os.remove(self._path(name))
+                except OSError:
+                    pass
+
+    def _read_shard(self, path):
+        try:
+            with open(path, 'rb') as f:
+                return analytics_pb2.CityShard.FromString(f.read())
+        except (OSError, DecodeError) as e:
+            print(f"Spill read error {path}: {e}")
+            return None
+
+    def _read(self, path):
+        shard = self._read_shard(path)
+        return shard_to_city(shard, self.max_points_per_city) if shard is not None else None
+
+    def _read_city(self, path):
+        shard = self._read_shard(path)
+        return shard.city if shard is not None else None
@@ -0,0 +1,370 @@
+import os
+import threading
+from collections import OrderedDict, namedtuple
+import numpy as np
+from rollup import CityRollups
+from metrics import registry
+from tracing import child_span
+
+# одна точка истории города; observed_us - время наблюдения в микросекундах эпохи,
+# repeats - сколько раз подряд пришло то же наблюдение провайдеров (run-length)
+HistoryPoint = namedtuple('HistoryPoint', ['seq', 'observed_us', 'temperature', 'humidity', 'repeats'], defaults=(1,))
+
+MICROS = 1_000_000
+
+MAX_POINTS_PER_CITY = int(os.getenv('ANALYTICS_MAX_POINTS_PER_CITY', '10000'))
+
+# оценка памяти: точка истории (кортеж, float, int времени) и постоянная часть города (агрегаты, скетчи)
+POINT_BYTES = 170
+CITY_BYTES = 32 * 1024
+# глобальный бюджет: ANALYTICS_MEMORY_BUDGET_POINTS и/или ANALYTICS_MEMORY_BUDGET_BYTES, действует меньший
+MEMORY_BUDGET_BYTES = min(
+    int(os.getenv('ANALYTICS_MEMORY_BUDGET_POINTS', '5000000')) * POINT_BYTES,
+    int(os.getenv('ANALYTICS_MEMORY_BUDGET_BYTES', str(2 * 1024 ** 3)))
+)
+# обращения к истории города: hit - город в памяти, miss - поднят с диска (spill), absent - его нет нигде
+cache_lookups = registry.counter(
+    'analytics_history_lookups_total', 'City history lookups: resident (hit), reloaded from spill (miss) or absent',
+    ('result',))
+
+
+def normalize_city(city):
+    return city.strip().lower()
+
+
+class CityState:
+    """состояние одного города: история (seq растет монотонно и служит курсором) и агрегаты"""
+
+    def __init__(self, city, max_points):
+        self.city = city
+        self.max_points = max_points
+        self.points = []
+        self.next_seq = 1
+        # число наблюдений с учетом повторов
+        self.observations = 0
+        self.rollups = CityRollups()
+
+    def set_points(self, points, next_seq):
+        self.points = points
+        self.next_seq = next_seq
+        self.observations = sum(point.repeats for point in points)
+
+    def append(self, observed_us, temperature, humidity):
+        self.observations += 1
+        # агрегаты получают каждое наблюдение, в том числе повторы: иначе перцентили и число
+        # наблюдений в корзине смещались бы к различающимся значениям
+        self.rollups.add(observed_us / MICROS, temperature, humidity)
+        last = self.points[-1] if self.points else None
+        # провайдеры еще не обновились: то же время наблюдения провайдера и те же значения -
+        # увеличиваем счетчик повторов у предыдущей точки вместо новой записи. та же величина с
+        # новым временем - новое наблюдение, иначе устойчивая погода свернулась бы в одну давнюю точку
+        if last is not None and last.observed_us == observed_us and (
+            last.temperature == temperature and last.humidity == humidity
+        ):
+            point = self.points[-1] = last._replace(repeats=last.repeats + 1)
+            return point
+
+        point = HistoryPoint(self.next_seq, observed_us, temperature, humidity)
+        self.next_seq += 1
+        self.points.append(point)
+
+        # обрезаем пачками, чтобы не сдвигать список на каждой записи
+        if len(self.points) > self.max_points + self.max_points // 10:
+            trimmed = len(self.points) - self.max_points
+            self.observations -= sum(point.repeats for point in self.points[:trimmed])
+            del self.points[:trimmed]
+        return point
+
+    def backfill(self, observed_us, temperatures, humidities):
+        """пакетная загрузка исторических наблюдений (массивы numpy)"""
+        if not len(observed_us):
+            return 0
+        order = np.argsort(observed_us, kind='stable')
+        observed_us, temperatures, humidities = observed_us[order], temperatures[order], humidities[order]
+        # повторы подряд сворачиваются так же, как в append: то же время и те же значения
+        changed = np.ones(len(order), dtype=bool)
+        changed[1:] = (
+            (observed_us[1:] != observed_us[:-1]) |
+            (temperatures[1:] != temperatures[:-1]) | (humidities[1:] != humidities[:-1])
+        )
+        starts = np.flatnonzero(changed)
+        repeats = np.diff(np.append(starts, len(order)))
+        self.rollups.add_many(observed_us / MICROS, temperatures, humidities)
+
+        columns = (
+            observed_us[starts].tolist(),
+            temperatures[starts].tolist(),
+            humidities[starts].tolist(),
+            repeats.tolist()
+        )
+        if not self.points or columns[0][0] >= self.points[-1].observed_us:
+            # пачка целиком новее истории (обычный случай для хронологического файла) - просто дописываем
+            points = self.points + list(map(HistoryPoint, range(self.next_seq, self.next_seq + len(starts)), *columns))
+            self.set_points(points[-self.max_points:], self.next_seq + len(starts))
+        else:
+            # пачка ложится внутрь истории: слияние по времени и перенумерация, курсоры сбрасываются, как и при merge
+            points = self.points + list(map(HistoryPoint, range(len(starts)), *columns))
+            points = sorted(points, key=lambda point: point.observed_us)[-self.max_points:]
+            self.set_points(list(map(HistoryPoint, range(1, len(points) + 1), *list(zip(*points))[1:])), len(points) + 1)
+        return len(starts)
+
+    def merge(self, other):
+        # история сливается по времени и перенумеровывается, курсоры по этому городу сбрасываются
+        merged = sorted(self.points + other.points, key=lambda point: point.observed_us)[-self.max_points:]
+        self.set_points([point._replace(seq=seq) for seq, point in enumerate(merged, 1)], len(merged) + 1)
+        self.rollups.merge(other.rollups)
+
+    def _index(self, seq):
+        if not self.points:
+            return 0
+        return min(max(seq - self.points[0].seq, 0), len(self.points))
+
+    def before(self, seq, limit):
+        """до limit точек строго перед seq (None - с конца), в хронологическом порядке"""
+        end = len(self.points) if seq is None else self._index(seq)
+        start = max(0, end - limit)
+        return self.points[start:end], start > 0
+
+    def after(self, seq, limit):
+        start = self._index(seq + 1)
+        return self.points[start:start + limit]
+
+
+class HistoryStore:
+    """история по городам с глобальным бюджетом памяти
+
+    города упорядочены по последнему обращению; при превышении бюджета самые давние
+    вытесняются (и, если задан spill, сохраняются на диск и поднимаются при следующем обращении)
+    """
+
+    def __init__(self, max_points_per_city=MAX_POINTS_PER_CITY, budget_bytes=MEMORY_BUDGET_BYTES, spill=None):
+        self.max_points_per_city = max_points_per_city
+        self.budget_bytes = budget_bytes
+        self.spill = spill
+        # вызываются вне блокировки: on_evict(city) после вытеснения, on_reload(state) после подъема с диска,
+        # on_change(city, observed_ts) после локального изменения (observed_ts None - изменен весь город)
+        self.on_evict = None
+        self.on_reload = None
+        self.on_change = None
+        self._lock = threading.Lock()
+        self._cities = OrderedDict()
+        self._points = 0
+        self.evictions = 0
+        self.spilled = 0
+        self.reloads = 0
+
+    def _get(self, key):
+        # под блокировкой: обращение делает город самым свежим в LRU
+        state = self._cities.get(key)
+        if state is not None:
+            self._cities.move_to_end(key)
+        return state
+
+    def _estimated_bytes(self):
+        return self._points * POINT_BYTES + len(self._cities) * CITY_BYTES
+
+    def _ensure_resident(self, key):
+        with child_span('history lookup', city=key) as span:
+            result = self._load(key)
+            cache_lookups.inc(result)
+            span.set_attribute('result', result)
+
+    def _load(self, key):
+        """hit - город в памяти, miss - поднят с диска (spill), absent - его нет нигде"""
+        if key in self._cities:
+            return 'hit'
+        if self.spill is None or not self.spill.contains(key):
+            return 'absent'
+        state = self.spill.take(key)
+        if state is None:
+            return 'absent'
+        self.import_city(state)
+        with self._lock:
+            self.reloads += 1
+        if self.on_reload:
+            self.on_reload(state)
+        return 'miss'
+
+    def _evict_over_budget(self):
+        # под блокировкой выбираем жертв, диск и колбэки - уже снаружи
+        victims = []
+        with self._lock:
+            while self._estimated_bytes() > self.budget_bytes and len(self._cities) > 1:
+                key, state = self._cities.popitem(last=False)
+                self._points -= len(state.points)
+                self.evictions += 1
+                victims.append(state)
+
+        for state in victims:
+            if self.spill is not None:
+                self.spill.save(state)
+                with self._lock:
+                    self.spilled += 1
+            if self.on_evict:
+                self.on_evict(state.city)
+
+    def append(self, city, observed_us, temperature, humidity):
+        """возвращает записанную точку; repeats > 1 - наблюдение свернуто в предыдущую"""
+        key = normalize_city(city)
+        self._ensure_resident(key)
+        with self._lock:
+            history = self._get(key)
+            if history is None:
+                history = self._cities[key] = CityState(key, self.max_points_per_city)
+            before = len(history.points)
+            point = history.append(observed_us, temperature, humidity)
+            self._points += len(history.points) - before
+            over_budget = self._estimated_bytes() > self.budget_bytes
+        if self.on_change:
+            self.on_change(key, observed_us / MICROS)
+        if over_budget:
+            self._evict_over_budget()
+        return point
+
+    def backfill(self, city, observed_us, temperatures, humidities):
+        """пакетная вставка истории города, возвращает число новых (несвернутых) точек"""
+        key = normalize_city(city)
+        self._ensure_resident(key)
+        with self._lock:
+            history = self._get(key)
+            if history is None:
+                history = self._cities[key] = CityState(key, self.max_points_per_city)
+            before = len(history.points)
+            added = history.backfill(observed_us, temperatures, humidities)
+            self._points += len(history.points) - before
+            over_budget = self._estimated_bytes() > self.budget_bytes
+        if self.on_change:
+            self.on_change(key, None)
+        if over_budget:
+            self._evict_over_budget()
+        return added
+
+    def count(self, city):
+        key = normalize_city(city)
+        self._ensure_resident(key)
+        with self._lock:
+            history = self._get(key)
+            return len(history.points) if history else 0
+
+    def observations(self, city):
+        key = normalize_city(city)
+        self._ensure_resident(key)
+        with self._lock:
+            history = self._get(key)
+            return history.observations if history else 0
+
+    def recent(self, city, limit):
+        key = normalize_city(city)
+        self._ensure_resident(key)
+        with self._lock:
+            history = self._get(key)
+            if history is None:
+                return []
+            return history.before(None, limit)[0]
+
+    def points(self, city):
+        """копия всей истории города (ссылки на неизменяемые точки)"""
+        key = normalize_city(city)
+        self._ensure_resident(key)
+        with self._lock:
+            history = self._get(key)
+            return list(history.points) if history else []
+
+    def page(self, city, cursor, limit):
+        """страница истории назад от курсора, возвращает (точки, следующий курсор, всего)"""
+        before_seq = int(cursor) if cursor else None
+        key = normalize_city(city)
+        self._ensure_resident(key)
+        with self._lock:
+            history = self._get(key)
+            if history is None:
+                return [], '', 0
+            points, has_more = history.before(before_seq, limit)
+            next_cursor = str(points[0].seq) if has_more and points else ''
+            return points, next_cursor, len(history.points)
+
+    def rollup_window(self, city, window_seconds, now_ts):
+        key = normalize_city(city)
+        self._ensure_resident(key)
+        with self._lock:
+            history = self._get(key)
+            if history is None:
+                return None, None
+            return history.rollups.window(window_seconds, now_ts)
+
+    def cities(self):
+        with self._lock:
+            return list(self._cities)
+
+    def with_city(self, city, fn, load=False):
+        """выполняет fn(state) под блокировкой хранилища, None если города нет в памяти
+
+        load - сначала поднять город с диска (spill)
+        """
+        key = normalize_city(city)
+        if load:
+            self._ensure_resident(key)
+        with self._lock:
+            state = self._cities.get(key)
+            return fn(state) if state is not None else None
+
+    def is_spilled(self, city):
+        """город вытеснен на диск"""
+        return self.spill is not None and self.spill.contains(normalize_city(city))
+
+    def spilled_cities(self):
+        """города, вытесненные на диск"""
+        return self.spill.cities() if self.spill is not None else []
+
+    def import_city(self, state):
+        state.max_points = self.max_points_per_city
+        with self._lock:
+            existing = self._get(state.city)
+            if existing is None:
+                self._cities[state.city] = state
+                self._points += len(state.points)
+            else:
+                before = len(existing.points)
+                existing.merge(state)
+                self._points += len(existing.points) - before
+            over_budget = self._estimated_bytes() > self.budget_bytes
+        if over_budget:
+            self._evict_over_budget()
+
+    def drop_city(self, city):
+        key = normalize_city(city)
+        with self._lock:
+            state = self._cities.pop(key, None)
+            if state is not None:
+                self._points -= len(state.points)
+        if self.spill is not None:
+            self.spill.discard(key)
+        return state
+
+    def stats(self):
+        with self._lock:
+            return {
+                "resident_cities": len(self._cities),
+                "resident_points": self._points,
+                "estimated_bytes": self._estimated_bytes(),
+                "budget_bytes": self.budget_bytes,
+                "evictions": self.evictions,
+                "spilled": self.spilled,
+                "reloads": self.reloads,
+                "spilled_cities": self.spill.count() if self.spill is not None else 0
+            }
+
+    def iter_points(self, city, chunk_size=500):
+        """обход всей истории кусками, блокировка берется только на время среза"""
+        key = normalize_city(city)
+        self._ensure_resident(key)
+        last_seq = 0
+        while True:
+            with self._lock:
+                history = self._cities.get(key)
+                chunk = history.after(last_seq, chunk_size) if history else []
+            if not chunk:
+                return
+            for point in chunk:
+                yield point
+            last_seq = chunk[-1].seq
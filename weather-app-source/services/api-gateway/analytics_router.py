@@ -0,0 +1,139 @@
+import bisect
+import time
+import grpc
+
+import analytics_pb2
+import analytics_pb2_grpc
+from channels import shared_channel
+from hash_ring import ReplicaRing
+
+# сетка перцентилей, которую запрашиваем у каждой реплики для слияния распределений
+PERCENTILE_GRID = [float(p) for p in range(101)]
+
+
+class AnalyticsRouter:
+    """маршрутизация запросов к analytics: по городу - на реплику-владельца, по парку - на все реплики
+
+    состав реплик обновляется по отказам реплик, которым город больше не принадлежит (после UpdateMembership)
+    """
+
+    def __init__(self, replicas):
+        self.replicas = ReplicaRing(
+            replicas, lambda address: analytics_pb2_grpc.AnalyticsServiceStub(shared_channel(address)))
+
+    def for_city(self, city):
+        return self.replicas.client_for(city)
+
+    def call(self, city, method, request, timeout=None):
+        """unary-вызов у владельца города; после смены состава - один повтор у нового владельца"""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        try:
+            return getattr(self.for_city(city), method)(request, timeout=timeout)
+        except grpc.RpcError as e:
+            if not self.replicas.reload(e):
+                raise
+        remaining = max(deadline - time.monotonic(), 0) if deadline is not None else None
+        return getattr(self.for_city(city), method)(request, timeout=remaining)
+
+    def reload(self, error):
+        # потоковый ответ повторить нельзя, но следующий запрос уже пойдет к новому владельцу
+        return self.replicas.reload(error)
+
+    def owners(self, cities):
+        grouped = {}
+        for city in cities:
+            grouped.setdefault(self.replicas.node_for(city), []).append(city)
+        return grouped
+
+    def export_history(self, export_request, timeout=None):
+        """куски экспорта от реплик-владельцев по очереди, в памяти не больше одного куска
+
+        timeout - бюджет всего экспорта: каждая следующая реплика получает его остаток
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        for owner, cities in self.owners(export_request.cities).items():
+            owner_request = analytics_pb2.ExportRequest()
+            owner_request.CopyFrom(export_request)
+            owner_request.cities[:] = cities
+            owner_timeout = max(deadline - time.monotonic(), 0) if deadline is not None else None
+            chunks = self.replicas.clients[owner].ExportHistory(owner_request, timeout=owner_timeout)
+            try:
+                yield from chunks
+            except grpc.RpcError as e:
+                self.reload(e)
+                raise
+            finally:
+                chunks.cancel()
+
+    def scatter(self, method, request, timeout=None):
+        # запросы уходят параллельно с общим таймаутом, ошибка любой реплики пробрасывается как grpc.RpcError
+        clients = self.replicas.clients
+        calls = [getattr(clients[address], method).future(request, timeout=timeout) for address in self.replicas.nodes()]
+        return [call.result() for call in calls]
+
+    def rank_cities(self, rank_request, timeout=None):
+        responses = self.scatter('RankCities', rank_request, timeout)
+        cities = [item for response in responses for item in response.cities]
+        cities.sort(key=lambda item: item.value, reverse=not rank_request.ascending)
+        return analytics_pb2.RankResponse(
+            metric=rank_request.metric,
+            total_cities=sum(response.total_cities for response in responses),
+            cities=cities[:rank_request.limit] if rank_request.limit > 0 else cities
+        )
+
+    def fleet_stats(self, stats_request, timeout=None):
+        nodes = self.replicas.nodes()
+        if len(nodes) == 1:
+            return self.replicas.clients[nodes[0]].GetFleetStats(stats_request, timeout=timeout)
+
+        grid_request = analytics_pb2.FleetStatsRequest(metric=stats_request.metric, percentiles=PERCENTILE_GRID)
+        responses = [response for response in self.scatter('GetFleetStats', grid_request, timeout) if response.count]
+        merged = analytics_pb2.FleetStatsResponse(metric=stats_request.metric)
+        if not responses:
+            return merged
+
+        merged.count = sum(response.count for response in responses)
+        merged.mean = sum(response.mean * response.count for response in responses) / merged.count
+        merged.min = min(response.min for response in responses)
+        merged.max = max(response.max for response in responses)
+        for p in stats_request.percentiles:
+            merged.percentiles.add(percentile=p, value=_mixture_percentile(responses, p))
+        return merged
+
+    def list_anomalies(self, anomaly_query, timeout=None):
+        responses = self.scatter('ListAnomalies', anomaly_query, timeout)
+        anomalies = [anomaly for response in responses for anomaly in response.anomalies]
+        anomalies.sort(key=lambda anomaly: anomaly.score, reverse=True)
+        return analytics_pb2.AnomalyList(
+            total=sum(response.total for response in responses),
+            anomalies=anomalies[:anomaly_query.limit] if anomaly_query.limit > 0 else anomalies,
+            scanned_at_us=min((response.scanned_at_us for response in responses), default=0),
+            cities_scanned=sum(response.cities_scanned for response in responses),
+            scan_cpu_ms=max((response.scan_cpu_ms for response in responses), default=0.0),
+            scan_wall_ms=max((response.scan_wall_ms for response in responses), default=0.0)
+        )
+
+
+def _interpolate(x, xs, ys):
+    if x <= xs[0]:
+        return ys[0]
+    if x >= xs[-1]:
+        return ys[-1]
+    i = bisect.bisect_right(xs, x)
+    x0, x1, y0, y1 = xs[i - 1], xs[i], ys[i - 1], ys[i]
+    return y0 if x1 == x0 else y0 + (y1 - y0) * (x - x0) / (x1 - x0)
+
+
+def _mixture_percentile(responses, p):
+    """перцентиль объединения реплик: CDF смеси, взвешенной по числу городов, по сетке перцентилей каждой"""
+    total = sum(response.count for response in responses)
+    curves = [
+        ([item.value for item in response.percentiles], [item.percentile for item in response.percentiles], response.count)
+        for response in responses
+    ]
+    candidates = sorted({value for values, _, _ in curves for value in values})
+    cdf = [
+        sum(_interpolate(x, values, ranks) * count for values, ranks, count in curves) / total
+        for x in candidates
+    ]
+    return _interpolate(p, cdf, candidates)
@@ -1,13 +1,26 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, g, jsonify, make_response, request, stream_with_context
 import grpc
 import sys
 import os
 sys.path.append(os.path.join(os.path.dirname(__file__), 'generated'))
+# общие модули: в образе - /app/shared (Dockerfile копирует корневой shared/), в репозитории - ../../shared
+sys.path.append(os.path.join(os.path.dirname(__file__), 'shared'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'shared'))
 
 import data_processor_pb2
 import data_processor_pb2_grpc
 import analytics_pb2
-import analytics_pb2_grpc
+from analytics_router import AnalyticsRouter
+from bulkhead import Bulkhead, parse_bulkheads
+from export_formats import ENCODERS, FORMATS, gzip_stream
+from hash_ring import parse_replicas
+from channels import DATA_PROCESSOR_TARGET, balancer_stats, shared_channel
+from deadline import EXCEEDED, deadline_stats, parse_budgets
+from metrics import CONTENT_TYPE, register_deadline_stats, registry
+from tracing import TRACEPARENT, TRACING_ENABLED, activate, configure_tracing, deactivate, start_span, trusted_source
+from timestamps import format_timestamp, parse_timestamp
+import functools
+import json
 import time
 from collections import defaultdict, deque
 
@@ -18,6 +31,54 @@ rate_limit_storage = defaultdict(lambda: deque())
 RATE_LIMIT = 10
 WINDOW_SIZE = 60
 
+# реплики analytics, город принадлежит одной из них по консистентному хешу
+ANALYTICS_REPLICAS = parse_replicas(os.getenv('ANALYTICS_REPLICAS', 'analytics:50053'))
+
+# бюджет времени маршрута в секундах: уходит дедлайном в gRPC и делится сервисами ниже по цепочке;
+# переопределяется через GATEWAY_DEADLINES="weather=8,export=300"
+ROUTE_DEADLINES = parse_budgets(os.getenv('GATEWAY_DEADLINES', ''), {
+    'weather': 8.0,
+    'analytics': 10.0,
+    'history': 2.0,
+    'history_stream': 60.0,
+    'export': 300.0,
+    'chart': 3.0,
+    'percentiles': 2.0,
+    'fleet': 3.0,
+    'anomalies': 2.0,
+    'status': 1.0,
+})
+
+# через сколько секунд повторить запрос, отклоненный перегруженным сервисом
+RETRY_AFTER_SECONDS = int(os.getenv('GATEWAY_RETRY_AFTER_SECONDS', '1'))
+
+# отсеки по backend-ам (в работе, в очереди): зависший analytics занимает только свои потоки, и
+# /api/weather продолжает работать; долгие потоковые выгрузки - в своем отсеке, чтобы не вытеснять
+# короткие запросы к analytics. переопределяется через GATEWAY_BULKHEADS="analytics=40:20"
+BULKHEADS = {
+    name: Bulkhead(name, concurrent, queued)
+    for name, (concurrent, queued) in parse_bulkheads(os.getenv('GATEWAY_BULKHEADS', ''), {
+        'data-processor': (20, 20),
+        'analytics': (20, 20),
+        'analytics-stream': (4, 0),
+    }).items()
+}
+
+# запросы по маршруту и коду ответа; у потоковых ответов задержка - до начала ответа, а не до конца выгрузки
+http_requests = registry.counter(
+    'http_requests_total', 'Gateway requests by route, method and status', ('route', 'method', 'status'))
+http_latency = registry.histogram(
+    'http_request_seconds', 'Gateway request latency (streamed responses: until the body starts)', ('route',))
+rate_limited = registry.counter('gateway_rate_limited_total', 'Requests rejected by the per-client rate limiter')
+register_deadline_stats(deadline_stats)
+# трасса начинается здесь: выбранная (доля - TRACE_SAMPLE_RATE) передается в gRPC-вызовы; без TRACE_EXPORT выключено
+configure_tracing('api-gateway')
+# то же, что /bulkheads
+for key, kind in (("in_flight", 'gauge'), ("waiting", 'gauge'), ("rejected", 'counter'), ("timed_out", 'counter')):
+    registry.callback(
+        f'gateway_bulkhead_{key}' + ('_total' if kind == 'counter' else ''), f'Bulkhead {key.replace("_", " ")} requests',
+        lambda key=key: {(name,): bulkhead.stats()[key] for name, bulkhead in BULKHEADS.items()}, ('bulkhead',), kind)
+
 def is_rate_limited(client_ip):
     now = time.time()
     client_requests = rate_limit_storage[client_ip]
@@ -26,6 +87,7 @@ def is_rate_limited(client_ip):
         client_requests.popleft()
     
     if len(client_requests) >= RATE_LIMIT:
+        rate_limited.inc()
         return True
     
     client_requests.append(now)
@@ -33,23 +95,126 @@ def is_rate_limited(client_ip):
 
 class GrpcClients:
     def __init__(self):
-        self.data_processor_channel = grpc.insecure_channel('data-processor:50052')
+        self.data_processor_channel = shared_channel(DATA_PROCESSOR_TARGET, balanced=True)
         self.data_processor_client = data_processor_pb2_grpc.DataProcessorServiceStub(
             self.data_processor_channel
         )
         
-        self.analytics_channel = grpc.insecure_channel('analytics:50053')
-        self.analytics_client = analytics_pb2_grpc.AnalyticsServiceStub(
-            self.analytics_channel
-        )
+        self.analytics = AnalyticsRouter(ANALYTICS_REPLICAS)
 
 grpc_clients = GrpcClients()
 
+@app.before_request
+def start_timer():
+    g.started = time.monotonic()
+
+@app.before_request
+def start_trace():
+    # трасса продолжает traceparent клиента, если он его прислал; выбрать ее за нас может только
+    # клиент из TRACE_TRUSTED_NETWORKS, остальным - общая доля TRACE_SAMPLE_RATE
+    if not TRACING_ENABLED:
+        return
+    route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    g.span = start_span(f'{request.method} {route}', request.headers.get(TRACEPARENT), attributes={"http.route": route},
+                        trust_parent=trusted_source(request.remote_addr))
+    g.span_token = activate(g.span)
+
+@app.after_request
+def trace_status(response):
+    span = g.get('span')
+    if span is not None:
+        span.set_attribute('http.status_code', response.status_code)
+        if response.status_code >= 500:
+            span.set_error(f'HTTP {response.status_code}')
+    return response
+
+@app.teardown_request
+def end_trace(exc):
+    # потоковый ответ доходит сюда после конца выгрузки - спан охватывает ее целиком
+    span = g.pop('span', None)
+    if span is None:
+        return
+    deactivate(g.pop('span_token'))
+    if exc is not None:
+        span.set_error(f'{type(exc).__name__}: {exc}')
+    span.end()
+
+@app.after_request
+def record_request(response):
+    # шаблон маршрута, а не путь: город в пути размножил бы серии
+    route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    http_latency.observe(time.monotonic() - g.started, route)
+    http_requests.inc(route, request.method, str(response.status_code))
+    return response
+
 @app.route('/health', methods=['GET'])
 def health():
     return jsonify({"status": "healthy", "service": "api-gateway"})
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    # счетчики и гистограммы в текстовом формате Prometheus, включая клиентские вызовы gRPC
+    return Response(registry.render(), content_type=CONTENT_TYPE)
+
+@app.route('/deadlines', methods=['GET'])
+def deadlines():
+    # запросы, не уложившиеся в бюджет маршрута
+    return jsonify(deadline_stats.stats())
+
+@app.route('/channels', methods=['GET'])
+def channels():
+    # реплики сервисов без состояния глазами балансировщика
+    return jsonify(balancer_stats())
+
+@app.route('/bulkheads', methods=['GET'])
+def bulkheads():
+    # заполненность отсеков и отказы по ним
+    return jsonify({name: bulkhead.stats() for name, bulkhead in BULKHEADS.items()})
+
+def deadline_exceeded(route):
+    deadline_stats.count(EXCEEDED, route)
+    return jsonify({"error": f"Request did not complete within {ROUTE_DEADLINES[route]:g} s"}), 504
+
+def overloaded(message="Service is overloaded. Try again later."):
+    # сервис ниже сбросил вызов сверх своего лимита (или заполнен отсек): быстрый 503, клиент повторит позже
+    response = jsonify({"error": message})
+    response.headers['Retry-After'] = str(RETRY_AFTER_SECONDS)
+    return response, 503
+
+def compartment(name):
+    """маршрут работает в отсеке name; потоковый ответ держит место, пока не будет закрыт"""
+    bulkhead = BULKHEADS[name]
+    
+    def decorate(view):
+        @functools.wraps(view)
+        def guarded(*args, **kwargs):
+            if not bulkhead.acquire():
+                return overloaded(f"Too many requests to {name}. Try again later.")
+            try:
+                response = make_response(view(*args, **kwargs))
+            except BaseException:
+                bulkhead.release()
+                raise
+            if response.is_streamed:
+                response.call_on_close(bulkhead.release)
+            else:
+                bulkhead.release()
+            return response
+        return guarded
+    return decorate
+
+def weather_data_to_dict(data):
+    # common.WeatherData - один тип для всех сервисов
+    return {
+        "temperature": data.temperature,
+        "humidity": data.humidity,
+        "pressure": data.pressure,
+        "description": data.description,
+        "wind_speed": data.wind_speed
+    }
+
 @app.route('/api/weather/<city>', methods=['GET'])
+@compartment('data-processor')
 def get_weather(city):
     client_ip = request.remote_addr
     
@@ -59,27 +224,19 @@ def get_weather(city):
     try:
         # Вызываем data-processor через gRPC
         process_request = data_processor_pb2.ProcessRequest(city=city)
-        response = grpc_clients.data_processor_client.ProcessWeatherData(process_request)
+        response = grpc_clients.data_processor_client.ProcessWeatherData(
+            process_request, timeout=ROUTE_DEADLINES['weather']
+        )
         
         # Конвертируем gRPC ответ в JSON
         result = {
             "city": response.city,
-            "processed_at": response.processed_at,
+            "processed_at": format_timestamp(response.processed_at_us),
             "weather_summary": {
-                "openweather": {
-                    "temperature": response.weather_summary.openweather.temperature,
-                    "humidity": response.weather_summary.openweather.humidity,
-                    "pressure": response.weather_summary.openweather.pressure,
-                    "description": response.weather_summary.openweather.description,
-                    "wind_speed": response.weather_summary.openweather.wind_speed
-                } if response.weather_summary.HasField('openweather') else None,
-                "weatherapi": {
-                    "temperature": response.weather_summary.weatherapi.temperature,
-                    "humidity": response.weather_summary.weatherapi.humidity,
-                    "pressure": response.weather_summary.weatherapi.pressure,
-                    "description": response.weather_summary.weatherapi.description,
-                    "wind_speed": response.weather_summary.weatherapi.wind_speed
-                } if response.weather_summary.HasField('weatherapi') else None
+                "openweather": weather_data_to_dict(response.weather_summary.openweather)
+                if response.weather_summary.HasField('openweather') else None,
+                "weatherapi": weather_data_to_dict(response.weather_summary.weatherapi)
+                if response.weather_summary.HasField('weatherapi') else None
             },
             "averages": {
                 "temperature": response.averages.temperature,
@@ -94,11 +251,16 @@ def get_weather(city):
         return jsonify(result)
         
     except grpc.RpcError as e:
+        if e.code() == grpc.StatusCode.DEADLINE_EXCEEDED:
+            return deadline_exceeded('weather')
+        if e.code() == grpc.StatusCode.RESOURCE_EXHAUSTED:
+            return overloaded()
         return jsonify({"error": f"gRPC error: {str(e)}"}), 500
     except Exception as e:
         return jsonify({"error": f"Weather service error: {str(e)}"}), 500
 
 @app.route('/api/analytics/<city>', methods=['GET'])
+@compartment('analytics')
 def get_analytics(city):
     client_ip = request.remote_addr
     
@@ -106,13 +268,18 @@ def get_analytics(city):
         return jsonify({"error": "Rate limit exceeded. Try again later."}), 429
     
     try:
-        # Вызываем analytics через gRPC
-        analyze_request = analytics_pb2.AnalyzeRequest(city=city)
-        response = grpc_clients.analytics_client.AnalyzeWeather(analyze_request)
+        # Вызываем analytics через gRPC; refresh=1 - принудительно свежие данные от провайдеров
+        analyze_request = analytics_pb2.AnalyzeRequest(
+            city=city,
+            refresh=request.args.get('refresh', '').lower() in ('1', 'true', 'yes')
+        )
+        response = grpc_clients.analytics.call(
+            city, 'AnalyzeWeather', analyze_request, timeout=ROUTE_DEADLINES['analytics']
+        )
         
         result = {
             "city": response.city,
-            "analysis_time": response.analysis_time,
+            "analysis_time": format_timestamp(response.analysis_time_us),
             "total_requests": response.total_requests,
             "current_weather": {
                 "temperature": response.current_weather.temperature,
@@ -129,9 +296,25 @@ def get_analytics(city):
         return jsonify(result)
         
     except grpc.RpcError as e:
+        if e.code() == grpc.StatusCode.DEADLINE_EXCEEDED:
+            return deadline_exceeded('analytics')
+        if e.code() == grpc.StatusCode.RESOURCE_EXHAUSTED:
+            return overloaded()
+        if e.code() == grpc.StatusCode.NOT_FOUND:
+            return jsonify({"error": e.details()}), 404
         return jsonify({"error": f"gRPC Analytics error: {str(e)}"}), 500
 
+def history_record_to_dict(record):
+    return {
+        "seq": record.seq,
+        "timestamp": format_timestamp(record.timestamp_us),
+        "temperature": record.temperature,
+        "humidity": record.humidity,
+        "repeats": record.repeats
+    }
+
 @app.route('/api/history/<city>', methods=['GET'])
+@compartment('analytics')
 def get_history(city):
     client_ip = request.remote_addr
     
@@ -139,18 +322,313 @@ def get_history(city):
         return jsonify({"error": "Rate limit exceeded. Try again later."}), 429
     
     try:
-        history_request = analytics_pb2.HistoryRequest(city=city)
-        response = grpc_clients.analytics_client.GetHistory(history_request)
+        history_request = analytics_pb2.HistoryRequest(
+            city=city,
+            page_size=request.args.get('limit', 10, type=int),
+            cursor=request.args.get('cursor', '')
+        )
+        response = grpc_clients.analytics.call(
+            city, 'GetHistory', history_request, timeout=ROUTE_DEADLINES['history']
+        )
         
         return jsonify({
             "city": response.city,
             "total_records": response.total_records,
-            "history": list(response.history)
+            "history": [history_record_to_dict(record) for record in response.records],
+            "next_cursor": response.next_cursor or None
         })
         
     except grpc.RpcError as e:
+        if e.code() == grpc.StatusCode.DEADLINE_EXCEEDED:
+            return deadline_exceeded('history')
+        if e.code() == grpc.StatusCode.RESOURCE_EXHAUSTED:
+            return overloaded()
+        if e.code() == grpc.StatusCode.INVALID_ARGUMENT:
+            return jsonify({"error": e.details()}), 400
         return jsonify({"error": f"gRPC History error: {str(e)}"}), 500
 
+@app.route('/api/history/<city>/stream', methods=['GET'])
+@compartment('analytics-stream')
+def stream_history(city):
+    client_ip = request.remote_addr
+    
+    if is_rate_limited(client_ip):
+        return jsonify({"error": "Rate limit exceeded. Try again later."}), 429
+    
+    history_request = analytics_pb2.HistoryRequest(city=city)
+    records = grpc_clients.analytics.for_city(city).StreamHistory(
+        history_request, timeout=ROUTE_DEADLINES['history_stream']
+    )
+    
+    # NDJSON: одна запись на строку, отдаем по мере получения из gRPC стрима
+    def generate():
+        try:
+            for record in records:
+                yield json.dumps(history_record_to_dict(record)) + "\n"
+        except grpc.RpcError as e:
+            # статус ответа уже отправлен, бюджет маршрута только учитывается
+            if e.code() == grpc.StatusCode.DEADLINE_EXCEEDED:
+                deadline_stats.count(EXCEEDED, 'history_stream')
+            grpc_clients.analytics.reload(e)
+            yield json.dumps({"error": f"gRPC History error: {str(e)}"}) + "\n"
+        finally:
+            records.cancel()
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route('/api/export', methods=['GET'])
+@compartment('analytics-stream')
+def export_history():
+    client_ip = request.remote_addr
+    
+    if is_rate_limited(client_ip):
+        return jsonify({"error": "Rate limit exceeded. Try again later."}), 429
+    
+    # ?cities=a,b&from=&to= (ISO 8601)&format=ndjson|csv|columnar; gzip по Accept-Encoding, ?compression=gzip - файл .gz
+    cities = [city.strip() for city in request.args.get('cities', '').split(',') if city.strip()]
+    export_format = request.args.get('format', 'ndjson')
+    if not cities:
+        return jsonify({"error": "cities must be a non-empty comma-separated list"}), 400
+    if export_format not in FORMATS:
+        return jsonify({"error": f"format must be one of {', '.join(FORMATS)}"}), 400
+    try:
+        start_us = parse_timestamp(request.args.get('from', ''))
+        end_us = parse_timestamp(request.args.get('to', ''))
+    except ValueError:
+        return jsonify({"error": "from and to must be ISO 8601 timestamps"}), 400
+    
+    export_request = analytics_pb2.ExportRequest(cities=cities, start_us=start_us, end_us=end_us)
+    chunks = grpc_clients.analytics.export_history(export_request, ROUTE_DEADLINES['export'])
+    
+    def generate():
+        try:
+            yield from ENCODERS[export_format](chunks)
+        except grpc.RpcError as e:
+            if e.code() == grpc.StatusCode.DEADLINE_EXCEEDED:
+                deadline_stats.count(EXCEEDED, 'export')
+            # ответ уже начат: в NDJSON ошибка уходит последней строкой, в остальных форматах поток обрывается
+            if export_format != 'ndjson':
+                raise
+            yield (json.dumps({"error": f"gRPC Export error: {str(e)}"}) + "\n").encode('utf-8')
+        finally:
+            chunks.close()
+    
+    filename = f"history.{export_format}"
+    mimetype = FORMATS[export_format]
+    # ответ зависит от Accept-Encoding - кэши должны хранить варианты раздельно
+    headers = {"Vary": "Accept-Encoding"}
+    body = generate()
+    if request.accept_encodings['gzip'] > 0:
+        # клиент распакует сам: gzip - кодирование передачи, файл тот же
+        body = gzip_stream(body)
+        headers["Content-Encoding"] = "gzip"
+    elif request.args.get('compression') == 'gzip':
+        # клиент gzip не принимает: сжатый файл отдается как есть, без Content-Encoding
+        body = gzip_stream(body)
+        filename += '.gz'
+        mimetype = 'application/gzip'
+    headers["Content-Disposition"] = f"attachment; filename={filename}"
+    
+    return Response(stream_with_context(body), mimetype=mimetype, headers=headers)
+
+@app.route('/api/chart/<city>', methods=['GET'])
+@compartment('analytics')
+def get_chart(city):
+    client_ip = request.remote_addr
+    
+    if is_rate_limited(client_ip):
+        return jsonify({"error": "Rate limit exceeded. Try again later."}), 429
+    
+    try:
+        start_us = parse_timestamp(request.args.get('from', ''))
+        end_us = parse_timestamp(request.args.get('to', ''))
+    except ValueError:
+        return jsonify({"error": "from and to must be ISO 8601 timestamps"}), 400
+    
+    try:
+        # прореженный ряд для графика: ?from=&to= (ISO 8601), points, method=lttb|minmax, metric
+        chart_request = analytics_pb2.ChartRequest(
+            city=city,
+            start_us=start_us,
+            end_us=end_us,
+            points=request.args.get('points', 500, type=int),
+            method=request.args.get('method', 'lttb'),
+            metric=request.args.get('metric', 'temperature')
+        )
+        response = grpc_clients.analytics.call(
+            city, 'GetChartSeries', chart_request, timeout=ROUTE_DEADLINES['chart']
+        )
+        
+        return jsonify({
+            "city": response.city,
+            "method": response.method,
+            "metric": response.metric,
+            "source_points": response.source_points,
+            "points": [history_record_to_dict(record) for record in response.points]
+        })
+        
+    except grpc.RpcError as e:
+        if e.code() == grpc.StatusCode.DEADLINE_EXCEEDED:
+            return deadline_exceeded('chart')
+        if e.code() == grpc.StatusCode.RESOURCE_EXHAUSTED:
+            return overloaded()
+        if e.code() == grpc.StatusCode.INVALID_ARGUMENT:
+            return jsonify({"error": e.details()}), 400
+        return jsonify({"error": f"gRPC Chart error: {str(e)}"}), 500
+
+@app.route('/api/percentiles/<city>', methods=['GET'])
+@compartment('analytics')
+def get_percentiles(city):
+    client_ip = request.remote_addr
+    
+    if is_rate_limited(client_ip):
+        return jsonify({"error": "Rate limit exceeded. Try again later."}), 429
+    
+    try:
+        percentiles = [float(p) for p in request.args.get('percentiles', '5,50,95').split(',') if p]
+    except ValueError:
+        return jsonify({"error": "percentiles must be a comma-separated list of numbers"}), 400
+    
+    try:
+        percentile_request = analytics_pb2.PercentileRequest(
+            city=city,
+            window_seconds=request.args.get('window', 86400, type=int),
+            percentiles=percentiles
+        )
+        response = grpc_clients.analytics.call(
+            city, 'GetPercentiles', percentile_request, timeout=ROUTE_DEADLINES['percentiles']
+        )
+        
+        return jsonify({
+            "city": response.city,
+            "window_seconds": response.window_seconds,
+            "tier": response.tier or None,
+            "count": response.count,
+            "temperature": {f"p{item.percentile:g}": item.value for item in response.temperature},
+            "humidity": {f"p{item.percentile:g}": item.value for item in response.humidity}
+        })
+        
+    except grpc.RpcError as e:
+        if e.code() == grpc.StatusCode.DEADLINE_EXCEEDED:
+            return deadline_exceeded('percentiles')
+        if e.code() == grpc.StatusCode.RESOURCE_EXHAUSTED:
+            return overloaded()
+        if e.code() == grpc.StatusCode.INVALID_ARGUMENT:
+            return jsonify({"error": e.details()}), 400
+        return jsonify({"error": f"gRPC Percentiles error: {str(e)}"}), 500
+
+@app.route('/api/fleet/top', methods=['GET'])
+@compartment('analytics')
+def fleet_top():
+    client_ip = request.remote_addr
+    
+    if is_rate_limited(client_ip):
+        return jsonify({"error": "Rate limit exceeded. Try again later."}), 429
+    
+    try:
+        rank_request = analytics_pb2.RankRequest(
+            metric=request.args.get('metric', 'temperature'),
+            limit=request.args.get('limit', 20, type=int),
+            ascending=request.args.get('order', 'desc').lower() == 'asc'
+        )
+        response = grpc_clients.analytics.rank_cities(rank_request, ROUTE_DEADLINES['fleet'])
+        
+        return jsonify({
+            "metric": response.metric,
+            "total_cities": response.total_cities,
+            "cities": [{"city": item.city, "value": item.value} for item in response.cities]
+        })
+        
+    except grpc.RpcError as e:
+        if e.code() == grpc.StatusCode.DEADLINE_EXCEEDED:
+            return deadline_exceeded('fleet')
+        if e.code() == grpc.StatusCode.RESOURCE_EXHAUSTED:
+            return overloaded()
+        if e.code() == grpc.StatusCode.INVALID_ARGUMENT:
+            return jsonify({"error": e.details()}), 400
+        return jsonify({"error": f"gRPC Fleet error: {str(e)}"}), 500
+
+@app.route('/api/fleet/stats', methods=['GET'])
+@compartment('analytics')
+def fleet_stats():
+    client_ip = request.remote_addr
+    
+    if is_rate_limited(client_ip):
+        return jsonify({"error": "Rate limit exceeded. Try again later."}), 429
+    
+    try:
+        percentiles = [float(p) for p in request.args.get('percentiles', '5,50,95').split(',') if p]
+    except ValueError:
+        return jsonify({"error": "percentiles must be a comma-separated list of numbers"}), 400
+    
+    try:
+        stats_request = analytics_pb2.FleetStatsRequest(
+            metric=request.args.get('metric', 'temperature'),
+            percentiles=percentiles
+        )
+        response = grpc_clients.analytics.fleet_stats(stats_request, ROUTE_DEADLINES['fleet'])
+        
+        return jsonify({
+            "metric": response.metric,
+            "count": response.count,
+            "mean": response.mean,
+            "min": response.min,
+            "max": response.max,
+            "percentiles": {f"p{item.percentile:g}": item.value for item in response.percentiles}
+        })
+        
+    except grpc.RpcError as e:
+        if e.code() == grpc.StatusCode.DEADLINE_EXCEEDED:
+            return deadline_exceeded('fleet')
+        if e.code() == grpc.StatusCode.RESOURCE_EXHAUSTED:
+            return overloaded()
+        if e.code() == grpc.StatusCode.INVALID_ARGUMENT:
+            return jsonify({"error": e.details()}), 400
+        return jsonify({"error": f"gRPC Fleet error: {str(e)}"}), 500
+
+@app.route('/api/anomalies', methods=['GET'])
+@compartment('analytics')
+def list_anomalies():
+    client_ip = request.remote_addr
+    
+    if is_rate_limited(client_ip):
+        return jsonify({"error": "Rate limit exceeded. Try again later."}), 429
+    
+    try:
+        anomaly_query = analytics_pb2.AnomalyQuery(
+            kind=request.args.get('kind', ''),
+            min_score=request.args.get('min_score', 0.0, type=float),
+            limit=request.args.get('limit', 100, type=int)
+        )
+        response = grpc_clients.analytics.list_anomalies(anomaly_query, ROUTE_DEADLINES['anomalies'])
+        
+        return jsonify({
+            "total": response.total,
+            "anomalies": [
+                {
+                    "city": anomaly.city,
+                    "kind": anomaly.kind,
+                    "score": anomaly.score,
+                    "value": anomaly.value,
+                    "baseline": anomaly.baseline
+                }
+                for anomaly in response.anomalies
+            ],
+            "last_scan": {
+                "scanned_at": format_timestamp(response.scanned_at_us),
+                "cities_scanned": response.cities_scanned,
+                "cpu_ms": response.scan_cpu_ms,
+                "wall_ms": response.scan_wall_ms
+            }
+        })
+        
+    except grpc.RpcError as e:
+        if e.code() == grpc.StatusCode.DEADLINE_EXCEEDED:
+            return deadline_exceeded('anomalies')
+        if e.code() == grpc.StatusCode.RESOURCE_EXHAUSTED:
+            return overloaded()
+        return jsonify({"error": f"gRPC Anomalies error: {str(e)}"}), 500
+
 @app.route('/api/status', methods=['GET'])
 def system_status():
     status = {}
@@ -158,18 +636,30 @@ def system_status():
     # Проверяем data-processor
     try:
         health_request = data_processor_pb2.Empty()
-        response = grpc_clients.data_processor_client.HealthCheck(health_request)
+        response = grpc_clients.data_processor_client.HealthCheck(
+            health_request, timeout=ROUTE_DEADLINES['status']
+        )
         status['data-processor'] = response.status
     except:
         status['data-processor'] = "unavailable"
     
-    # Проверяем analytics
-    try:
-        health_request = analytics_pb2.Empty()
-        response = grpc_clients.analytics_client.HealthCheck(health_request)
-        status['analytics'] = response.status
-    except:
+    # Проверяем все реплики analytics
+    replicas = {}
+    for address in grpc_clients.analytics.replicas.nodes():
+        try:
+            response = grpc_clients.analytics.replicas.clients[address].HealthCheck(analytics_pb2.Empty(), timeout=ROUTE_DEADLINES['status'])
+            replicas[address] = response.status
+        except:
+            replicas[address] = "unavailable"
+    
+    healthy = sum(1 for value in replicas.values() if value == "healthy")
+    if healthy == len(replicas):
+        status['analytics'] = "healthy"
+    elif healthy:
+        status['analytics'] = "degraded"
+    else:
         status['analytics'] = "unavailable"
+    status['analytics_replicas'] = replicas
     
     return jsonify(status)
 
@@ -0,0 +1,74 @@
+import threading
+import time
+
+# сколько запрос может ждать места в заполненном отсеке; ожидание входит в его ответ, а не в бюджет backend-а
+DEFAULT_MAX_WAIT = 0.5
+
+
+class Bulkhead:
+    """отсек gateway: не больше max_concurrent запросов в работе и max_queue ожидающих
+
+    запрос сверх очереди отклоняется сразу, ожидающий - по истечении max_wait. так зависший
+    backend занимает только потоки своего отсека, а не все потоки gateway
+    """
+
+    def __init__(self, name, max_concurrent, max_queue, max_wait=DEFAULT_MAX_WAIT):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.in_flight = 0
+        self.waiting = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        """True - место получено, False - отсек заполнен (или место не освободилось за max_wait)"""
+        with self._condition:
+            if self.in_flight < self.max_concurrent and not self.waiting:
+                self.in_flight += 1
+                return True
+            if self.waiting >= self.max_queue:
+                self.rejected += 1
+                return False
+            self.waiting += 1
+            deadline = time.monotonic() + self.max_wait
+            try:
+                while self.in_flight >= self.max_concurrent:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.timed_out += 1
+                        return False
+                    self._condition.wait(remaining)
+                self.in_flight += 1
+                return True
+            finally:
+                self.waiting -= 1
+
+    def release(self):
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify()
+
+    def stats(self):
+        with self._condition:
+            return {
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "in_flight": self.in_flight,
+                "waiting": self.waiting,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out
+            }
+
+
+def parse_bulkheads(value, defaults):
+    """размеры отсеков "analytics=20:10,export=2:0" (в работе:в очереди) поверх значений по умолчанию"""
+    sizes = dict(defaults)
+    for item in value.split(','):
+        if item.strip():
+            name, size = item.split('=', 1)
+            concurrent, _, queued = size.partition(':')
+            sizes[name.strip()] = (int(concurrent), int(queued or 0))
+    return sizes
@@ -0,0 +1,72 @@
+import csv
+import io
+import json
+import struct
+import zlib
+
+from timestamps import format_timestamp
+
+# формат -> MIME-тип ответа
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+    'columnar': 'application/octet-stream',
+}
+CSV_HEADER = ('city', 'seq', 'timestamp', 'temperature', 'humidity', 'repeats')
+GZIP_LEVEL = 6
+
+
+def _rows(chunk):
+    # в текстовых форматах время - ISO 8601, columnar отдает микросекунды эпохи как есть
+    return zip(chunk.seq, map(format_timestamp, chunk.timestamps_us), chunk.temperature, chunk.humidity, chunk.repeats)
+
+
+def ndjson(chunks):
+    for chunk in chunks:
+        yield ''.join(
+            json.dumps({
+                "city": chunk.city,
+                "seq": seq,
+                "timestamp": timestamp,
+                "temperature": temperature,
+                "humidity": humidity,
+                "repeats": repeats
+            }) + "\n"
+            for seq, timestamp, temperature, humidity, repeats in _rows(chunk)
+        ).encode('utf-8')
+
+
+def csv_rows(chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_HEADER)
+    for chunk in chunks:
+        writer.writerows((chunk.city, *row) for row in _rows(chunk))
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def columnar(chunks):
+    # поток сообщений ExportChunk из analytics.proto: 4 байта длины (little-endian) + сообщение
+    for chunk in chunks:
+        data = chunk.SerializeToString()
+        yield struct.pack('<I', len(data)) + data
+
+
+ENCODERS = {
+    'ndjson': ndjson,
+    'csv': csv_rows,
+    'columnar': columnar,
+}
+
+
+def gzip_stream(pieces):
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    for piece in pieces:
+        data = compressor.compress(piece)
+        if data:
+            yield data
+    yield compressor.flush()
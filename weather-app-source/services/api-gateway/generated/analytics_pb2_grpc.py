@@ -44,6 +44,76 @@ class AnalyticsServiceStub(object):
                 request_serializer=analytics__pb2.HistoryRequest.SerializeToString,
                 response_deserializer=analytics__pb2.HistoryResponse.FromString,
                 _registered_method=True)
+        self.StreamHistory = channel.unary_stream(
+                '/analytics.AnalyticsService/StreamHistory',
+                request_serializer=analytics__pb2.HistoryRequest.SerializeToString,
+                response_deserializer=analytics__pb2.HistoryRecord.FromString,
+                _registered_method=True)
+        self.GetChartSeries = channel.unary_unary(
+                '/analytics.AnalyticsService/GetChartSeries',
+                request_serializer=analytics__pb2.ChartRequest.SerializeToString,
+                response_deserializer=analytics__pb2.ChartSeries.FromString,
+                _registered_method=True)
+        self.ExportHistory = channel.unary_stream(
+                '/analytics.AnalyticsService/ExportHistory',
+                request_serializer=analytics__pb2.ExportRequest.SerializeToString,
+                response_deserializer=analytics__pb2.ExportChunk.FromString,
+                _registered_method=True)
+        self.IngestObservations = channel.unary_unary(
+                '/analytics.AnalyticsService/IngestObservations',
+                request_serializer=analytics__pb2.ObservationBatch.SerializeToString,
+                response_deserializer=analytics__pb2.IngestSummary.FromString,
+                _registered_method=True)
+        self.BackfillObservations = channel.stream_unary(
+                '/analytics.AnalyticsService/BackfillObservations',
+                request_serializer=analytics__pb2.ObservationBatch.SerializeToString,
+                response_deserializer=analytics__pb2.BackfillSummary.FromString,
+                _registered_method=True)
+        self.RankCities = channel.unary_unary(
+                '/analytics.AnalyticsService/RankCities',
+                request_serializer=analytics__pb2.RankRequest.SerializeToString,
+                response_deserializer=analytics__pb2.RankResponse.FromString,
+                _registered_method=True)
+        self.GetFleetStats = channel.unary_unary(
+                '/analytics.AnalyticsService/GetFleetStats',
+                request_serializer=analytics__pb2.FleetStatsRequest.SerializeToString,
+                response_deserializer=analytics__pb2.FleetStatsResponse.FromString,
+                _registered_method=True)
+        self.GetPercentiles = channel.unary_unary(
+                '/analytics.AnalyticsService/GetPercentiles',
+                request_serializer=analytics__pb2.PercentileRequest.SerializeToString,
+                response_deserializer=analytics__pb2.PercentileResponse.FromString,
+                _registered_method=True)
+        self.ListAnomalies = channel.unary_unary(
+                '/analytics.AnalyticsService/ListAnomalies',
+                request_serializer=analytics__pb2.AnomalyQuery.SerializeToString,
+                response_deserializer=analytics__pb2.AnomalyList.FromString,
+                _registered_method=True)
+        self.UpdateMembership = channel.unary_unary(
+                '/analytics.AnalyticsService/UpdateMembership',
+                request_serializer=analytics__pb2.Membership.SerializeToString,
+                response_deserializer=analytics__pb2.MembershipSummary.FromString,
+                _registered_method=True)
+        self.TransferShard = channel.unary_unary(
+                '/analytics.AnalyticsService/TransferShard',
+                request_serializer=analytics__pb2.ShardBatch.SerializeToString,
+                response_deserializer=analytics__pb2.TransferSummary.FromString,
+                _registered_method=True)
+        self.Replicate = channel.stream_stream(
+                '/analytics.AnalyticsService/Replicate',
+                request_serializer=analytics__pb2.ReplicationBatch.SerializeToString,
+                response_deserializer=analytics__pb2.ReplicationAck.FromString,
+                _registered_method=True)
+        self.GetReplicationCursor = channel.unary_unary(
+                '/analytics.AnalyticsService/GetReplicationCursor',
+                request_serializer=analytics__pb2.ReplicationCursorRequest.SerializeToString,
+                response_deserializer=analytics__pb2.ReplicationCursor.FromString,
+                _registered_method=True)
+        self.GetStoreStats = channel.unary_unary(
+                '/analytics.AnalyticsService/GetStoreStats',
+                request_serializer=analytics__pb2.Empty.SerializeToString,
+                response_deserializer=analytics__pb2.StoreStats.FromString,
+                _registered_method=True)
         self.HealthCheck = channel.unary_unary(
                 '/analytics.AnalyticsService/HealthCheck',
                 request_serializer=analytics__pb2.Empty.SerializeToString,
@@ -66,6 +136,90 @@ class AnalyticsServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def StreamHistory(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def GetChartSeries(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def ExportHistory(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def IngestObservations(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def BackfillObservations(self, request_iterator, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def RankCities(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def GetFleetStats(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def GetPercentiles(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def ListAnomalies(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def UpdateMembership(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def TransferShard(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def Replicate(self, request_iterator, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def GetReplicationCursor(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def GetStoreStats(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def HealthCheck(self, request, context):
         """Missing associated documentation comment in .proto file."""
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
@@ -85,6 +239,76 @@ def add_AnalyticsServiceServicer_to_server(servicer, server):
                     request_deserializer=analytics__pb2.HistoryRequest.FromString,
                     response_serializer=analytics__pb2.HistoryResponse.SerializeToString,
             ),
+            'StreamHistory': grpc.unary_stream_rpc_method_handler(
+                    servicer.StreamHistory,
+                    request_deserializer=analytics__pb2.HistoryRequest.FromString,
+                    response_serializer=analytics__pb2.HistoryRecord.SerializeToString,
+            ),
+            'GetChartSeries': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetChartSeries,
+                    request_deserializer=analytics__pb2.ChartRequest.FromString,
+                    response_serializer=analytics__pb2.ChartSeries.SerializeToString,
+            ),
+            'ExportHistory': grpc.unary_stream_rpc_method_handler(
+                    servicer.ExportHistory,
+                    request_deserializer=analytics__pb2.ExportRequest.FromString,
+                    response_serializer=analytics__pb2.ExportChunk.SerializeToString,
+            ),
+            'IngestObservations': grpc.unary_unary_rpc_method_handler(
+                    servicer.IngestObservations,
+                    request_deserializer=analytics__pb2.ObservationBatch.FromString,
+                    response_serializer=analytics__pb2.IngestSummary.SerializeToString,
+            ),
+            'BackfillObservations': grpc.stream_unary_rpc_method_handler(
+                    servicer.BackfillObservations,
+                    request_deserializer=analytics__pb2.ObservationBatch.FromString,
+                    response_serializer=analytics__pb2.BackfillSummary.SerializeToString,
+            ),
+            'RankCities': grpc.unary_unary_rpc_method_handler(
+                    servicer.RankCities,
+                    request_deserializer=analytics__pb2.RankRequest.FromString,
+                    response_serializer=analytics__pb2.RankResponse.SerializeToString,
+            ),
+            'GetFleetStats': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetFleetStats,
+                    request_deserializer=analytics__pb2.FleetStatsRequest.FromString,
+                    response_serializer=analytics__pb2.FleetStatsResponse.SerializeToString,
+            ),
+            'GetPercentiles': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetPercentiles,
+                    request_deserializer=analytics__pb2.PercentileRequest.FromString,
+                    response_serializer=analytics__pb2.PercentileResponse.SerializeToString,
+            ),
+            'ListAnomalies': grpc.unary_unary_rpc_method_handler(
+                    servicer.ListAnomalies,
+                    request_deserializer=analytics__pb2.AnomalyQuery.FromString,
+                    response_serializer=analytics__pb2.AnomalyList.SerializeToString,
+            ),
+            'UpdateMembership': grpc.unary_unary_rpc_method_handler(
+                    servicer.UpdateMembership,
+                    request_deserializer=analytics__pb2.Membership.FromString,
+                    response_serializer=analytics__pb2.MembershipSummary.SerializeToString,
+            ),
+            'TransferShard': grpc.unary_unary_rpc_method_handler(
+                    servicer.TransferShard,
+                    request_deserializer=analytics__pb2.ShardBatch.FromString,
+                    response_serializer=analytics__pb2.TransferSummary.SerializeToString,
+            ),
+            'Replicate': grpc.stream_stream_rpc_method_handler(
+                    servicer.Replicate,
+                    request_deserializer=analytics__pb2.ReplicationBatch.FromString,
+                    response_serializer=analytics__pb2.ReplicationAck.SerializeToString,
+            ),
+            'GetReplicationCursor': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetReplicationCursor,
+                    request_deserializer=analytics__pb2.ReplicationCursorRequest.FromString,
+                    response_serializer=analytics__pb2.ReplicationCursor.SerializeToString,
+            ),
+            'GetStoreStats': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetStoreStats,
+                    request_deserializer=analytics__pb2.Empty.FromString,
+                    response_serializer=analytics__pb2.StoreStats.SerializeToString,
+            ),
             'HealthCheck': grpc.unary_unary_rpc_method_handler(
                     servicer.HealthCheck,
                     request_deserializer=analytics__pb2.Empty.FromString,
@@ -155,6 +379,384 @@ class AnalyticsService(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def StreamHistory(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/analytics.AnalyticsService/StreamHistory',
+            analytics__pb2.HistoryRequest.SerializeToString,
+            analytics__pb2.HistoryRecord.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def GetChartSeries(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/analytics.AnalyticsService/GetChartSeries',
+            analytics__pb2.ChartRequest.SerializeToString,
+            analytics__pb2.ChartSeries.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def ExportHistory(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/analytics.AnalyticsService/ExportHistory',
+            analytics__pb2.ExportRequest.SerializeToString,
+            analytics__pb2.ExportChunk.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def IngestObservations(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/analytics.AnalyticsService/IngestObservations',
+            analytics__pb2.ObservationBatch.SerializeToString,
+            analytics__pb2.IngestSummary.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def BackfillObservations(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_unary(
+            request_iterator,
+            target,
+            '/analytics.AnalyticsService/BackfillObservations',
+            analytics__pb2.ObservationBatch.SerializeToString,
+            analytics__pb2.BackfillSummary.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def RankCities(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/analytics.AnalyticsService/RankCities',
+            analytics__pb2.RankRequest.SerializeToString,
+            analytics__pb2.RankResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def GetFleetStats(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/analytics.AnalyticsService/GetFleetStats',
+            analytics__pb2.FleetStatsRequest.SerializeToString,
+            analytics__pb2.FleetStatsResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def GetPercentiles(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/analytics.AnalyticsService/GetPercentiles',
+            analytics__pb2.PercentileRequest.SerializeToString,
+            analytics__pb2.PercentileResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def ListAnomalies(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/analytics.AnalyticsService/ListAnomalies',
+            analytics__pb2.AnomalyQuery.SerializeToString,
+            analytics__pb2.AnomalyList.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def UpdateMembership(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/analytics.AnalyticsService/UpdateMembership',
+            analytics__pb2.Membership.SerializeToString,
+            analytics__pb2.MembershipSummary.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def TransferShard(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/analytics.AnalyticsService/TransferShard',
+            analytics__pb2.ShardBatch.SerializeToString,
+            analytics__pb2.TransferSummary.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def Replicate(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_stream(
+            request_iterator,
+            target,
+            '/analytics.AnalyticsService/Replicate',
+            analytics__pb2.ReplicationBatch.SerializeToString,
+            analytics__pb2.ReplicationAck.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def GetReplicationCursor(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/analytics.AnalyticsService/GetReplicationCursor',
+            analytics__pb2.ReplicationCursorRequest.SerializeToString,
+            analytics__pb2.ReplicationCursor.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def GetStoreStats(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/analytics.AnalyticsService/GetStoreStats',
+            analytics__pb2.Empty.SerializeToString,
+            analytics__pb2.StoreStats.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
     @staticmethod
     def HealthCheck(request,
             target,
@@ -0,0 +1,18 @@
+from datetime import datetime
+
+# внутри системы время - целые микросекунды эпохи; строки ISO 8601 существуют только на границе HTTP API
+MICROS = 1_000_000
+
+
+def format_timestamp(us):
+    """ISO 8601 (локальное время, как datetime.now().isoformat()), None для 0 - времени нет"""
+    if not us:
+        return None
+    return datetime.fromtimestamp(us // MICROS).replace(microsecond=us % MICROS).isoformat()
+
+
+def parse_timestamp(value):
+    """микросекунды эпохи из ISO 8601, 0 для пустой строки; ValueError для некорректного времени"""
+    if not value:
+        return 0
+    return round(datetime.fromisoformat(value).timestamp() * MICROS)
@@ -22,31 +22,28 @@ _runtime_version.ValidateProtobufRuntimeVersion(
 _sym_db = _symbol_database.Default()
 
 
+import common_pb2 as common__pb2
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x14\x64\x61ta_processor.proto\x12\rdataprocessor\"\x07\n\x05\x45mpty\"\x1e\n\x0eProcessRequest\x12\x0c\n\x04\x63ity\x18\x01 \x01(\t\"\xca\x01\n\x0fProcessResponse\x12\x0c\n\x04\x63ity\x18\x01 \x01(\t\x12\x14\n\x0cprocessed_at\x18\x02 \x01(\t\x12\x36\n\x0fweather_summary\x18\x03 \x01(\x0b\x32\x1d.dataprocessor.WeatherSummary\x12)\n\x08\x61verages\x18\x04 \x01(\x0b\x32\x17.dataprocessor.Averages\x12\x30\n\x0c\x64\x61ta_sources\x18\x05 \x01(\x0b\x32\x1a.dataprocessor.DataSources\"o\n\x0eWeatherSummary\x12.\n\x0bopenweather\x18\x01 \x01(\x0b\x32\x19.dataprocessor.SourceData\x12-\n\nweatherapi\x18\x02 \x01(\x0b\x32\x19.dataprocessor.SourceData\"n\n\nSourceData\x12\x13\n\x0btemperature\x18\x01 \x01(\x01\x12\x10\n\x08humidity\x18\x02 \x01(\x05\x12\x10\n\x08pressure\x18\x03 \x01(\x01\x12\x13\n\x0b\x64\x65scription\x18\x04 \x01(\t\x12\x12\n\nwind_speed\x18\x05 \x01(\x01\"1\n\x08\x41verages\x12\x13\n\x0btemperature\x18\x01 \x01(\x01\x12\x10\n\x08humidity\x18\x02 \x01(\x01\"6\n\x0b\x44\x61taSources\x12\x13\n\x0bopenweather\x18\x01 \x01(\t\x12\x12\n\nweatherapi\x18\x02 \x01(\t\"1\n\x0eHealthResponse\x12\x0e\n\x06status\x18\x01 \x01(\t\x12\x0f\n\x07service\x18\x02 \x01(\t2\xaf\x01\n\x14\x44\x61taProcessorService\x12S\n\x12ProcessWeatherData\x12\x1d.dataprocessor.ProcessRequest\x1a\x1e.dataprocessor.ProcessResponse\x12\x42\n\x0bHealthCheck\x12\x14.dataprocessor.Empty\x1a\x1d.dataprocessor.HealthResponseb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x14\x64\x61ta_processor.proto\x12\rdataprocessor\x1a\x0c\x63ommon.proto\"\x07\n\x05\x45mpty\"6\n\x0eProcessRequest\x12\x0c\n\x04\x63ity\x18\x01 \x01(\t\x12\x16\n\x0eskip_analytics\x18\x02 \x01(\x08\"\xdb\x01\n\x0fProcessResponse\x12\x0c\n\x04\x63ity\x18\x01 \x01(\t\x12\x36\n\x0fweather_summary\x18\x03 \x01(\x0b\x32\x1d.dataprocessor.WeatherSummary\x12)\n\x08\x61verages\x18\x04 \x01(\x0b\x32\x17.dataprocessor.Averages\x12*\n\x0c\x64\x61ta_sources\x18\x05 \x01(\x0b\x32\x14.common.SourceStatus\x12\x17\n\x0fprocessed_at_us\x18\x06 \x01(\x03J\x04\x08\x02\x10\x03R\x0cprocessed_at\"c\n\x0eWeatherSummary\x12(\n\x0bopenweather\x18\x01 \x01(\x0b\x32\x13.common.WeatherData\x12\'\n\nweatherapi\x18\x02 \x01(\x0b\x32\x13.common.WeatherData\"1\n\x08\x41verages\x12\x13\n\x0btemperature\x18\x01 \x01(\x01\x12\x10\n\x08humidity\x18\x02 \x01(\x01\"1\n\x0eHealthResponse\x12\x0e\n\x06status\x18\x01 \x01(\t\x12\x0f\n\x07service\x18\x02 \x01(\t2\xaf\x01\n\x14\x44\x61taProcessorService\x12S\n\x12ProcessWeatherData\x12\x1d.dataprocessor.ProcessRequest\x1a\x1e.dataprocessor.ProcessResponse\x12\x42\n\x0bHealthCheck\x12\x14.dataprocessor.Empty\x1a\x1d.dataprocessor.HealthResponseb\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
 _builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'data_processor_pb2', _globals)
 if not _descriptor._USE_C_DESCRIPTORS:
   DESCRIPTOR._loaded_options = None
-  _globals['_EMPTY']._serialized_start=39
-  _globals['_EMPTY']._serialized_end=46
-  _globals['_PROCESSREQUEST']._serialized_start=48
-  _globals['_PROCESSREQUEST']._serialized_end=78
-  _globals['_PROCESSRESPONSE']._serialized_start=81
-  _globals['_PROCESSRESPONSE']._serialized_end=283
-  _globals['_WEATHERSUMMARY']._serialized_start=285
-  _globals['_WEATHERSUMMARY']._serialized_end=396
-  _globals['_SOURCEDATA']._serialized_start=398
-  _globals['_SOURCEDATA']._serialized_end=508
-  _globals['_AVERAGES']._serialized_start=510
-  _globals['_AVERAGES']._serialized_end=559
-  _globals['_DATASOURCES']._serialized_start=561
-  _globals['_DATASOURCES']._serialized_end=615
-  _globals['_HEALTHRESPONSE']._serialized_start=617
-  _globals['_HEALTHRESPONSE']._serialized_end=666
-  _globals['_DATAPROCESSORSERVICE']._serialized_start=669
-  _globals['_DATAPROCESSORSERVICE']._serialized_end=844
+  _globals['_EMPTY']._serialized_start=53
+  _globals['_EMPTY']._serialized_end=60
+  _globals['_PROCESSREQUEST']._serialized_start=62
+  _globals['_PROCESSREQUEST']._serialized_end=116
+  _globals['_PROCESSRESPONSE']._serialized_start=119
+  _globals['_PROCESSRESPONSE']._serialized_end=338
+  _globals['_WEATHERSUMMARY']._serialized_start=340
+  _globals['_WEATHERSUMMARY']._serialized_end=439
+  _globals['_AVERAGES']._serialized_start=441
+  _globals['_AVERAGES']._serialized_end=490
+  _globals['_HEALTHRESPONSE']._serialized_start=492
+  _globals['_HEALTHRESPONSE']._serialized_end=541
+  _globals['_DATAPROCESSORSERVICE']._serialized_start=544
+  _globals['_DATAPROCESSORSERVICE']._serialized_end=719
 # @@protoc_insertion_point(module_scope)
@@ -1,19 +1,56 @@
 import grpc
-from concurrent import futures
 import sys
 import os
 sys.path.append(os.path.join(os.path.dirname(__file__), 'generated'))
+# общие модули: в образе - /app/shared (Dockerfile копирует корневой shared/), в репозитории - ../../shared
+sys.path.append(os.path.join(os.path.dirname(__file__), 'shared'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'shared'))
 
 import data_processor_pb2
 import data_processor_pb2_grpc
 import weather_service_pb2
 import weather_service_pb2_grpc
-from datetime import datetime
+import analytics_pb2
+import time
+from publisher import AnalyticsPublisher
+from hash_ring import parse_replicas
+from channels import WEATHER_AGGREGATOR_TARGET, add_ports, server_options, shared_channel
+from workers import GRPC_WORKERS, watch_parent
+from concurrency import SERVER_THREADS, ConcurrencyInterceptor
+from executor import EXECUTOR_AUTOSIZE, InstrumentedExecutor, PoolController
+from metrics import MetricsInterceptor, register_server_stats
+from tracing import TRACING_ENABLED, TracingInterceptor, configure_tracing
+from deadline import ABANDONED, DOWNSTREAM, DeadlineExceeded, DeadlineInterceptor, deadline_stats, downstream_timeout
+
+# реплики analytics, город принадлежит одной из них по консистентному хешу
+ANALYTICS_REPLICAS = parse_replicas(os.getenv('ANALYTICS_REPLICAS', 'analytics:50053'))
+# таймаут вызова weather-aggregator, если у входящего вызова нет дедлайна (два провайдера по 10 с)
+WEATHER_TIMEOUT = float(os.getenv('WEATHER_TIMEOUT_SECONDS', '25'))
+# адаптивный лимит одновременных вызовов, сверх него - RESOURCE_EXHAUSTED
+concurrency_limiter = ConcurrencyInterceptor()
+# пул обработчиков с замерами очереди; с EXECUTOR_AUTOSIZE размер подбирает контроллер
+executor = InstrumentedExecutor(SERVER_THREADS)
+pool_controller = PoolController(executor)
+# лимит, пул и дедлайны - еще и в /metrics
+register_server_stats(concurrency_limiter, executor, deadline_stats)
+# наблюдения уходят в analytics асинхронно, не задерживая ответ; поток отправки запускает serve()
+analytics_publisher = AnalyticsPublisher(ANALYTICS_REPLICAS)
+
+def observed_at_us(weather_response, processed_at_us):
+    """время наблюдения провайдеров (самое позднее из доступных), без него - момент обработки
+
+    по нему analytics узнает повторный опрос, когда провайдеры еще не обновили данные
+    """
+    observed = [
+        data.observed_at_us for data in (weather_response.openweather, weather_response.weatherapi)
+        if data.available and data.observed_at_us
+    ]
+    return max(observed) if observed else processed_at_us
 
 class DataProcessorService(data_processor_pb2_grpc.DataProcessorServiceServicer):
     def __init__(self):
         # клиент для weather-aggregator
-        self.weather_channel = grpc.insecure_channel('weather-aggregator:50051')
+        self.weather_channel = shared_channel(WEATHER_AGGREGATOR_TARGET, balanced=True)
         self.weather_client = weather_service_pb2_grpc.WeatherServiceStub(self.weather_channel)
     
     def ProcessWeatherData(self, request, context):
@@ -22,16 +59,9 @@ class DataProcessorService(data_processor_pb2_grpc.DataProcessorServiceServicer)
         try:
             # Получаем данные через gRPC от weather-aggregator
             weather_request = weather_service_pb2.WeatherRequest(city=city)
-            weather_response = self.weather_client.GetWeather(weather_request)
-            
-            # Обрабатываем данные
-            weather_summary = data_processor_pb2.WeatherSummary()
-            
-            if weather_response.openweather.available:
-                weather_summary.openweather.CopyFrom(self._convert_weather_data(weather_response.openweather))
-            
-            if weather_response.weatherapi.available:
-                weather_summary.weatherapi.CopyFrom(self._convert_weather_data(weather_response.weatherapi))
+            weather_response = self.weather_client.GetWeather(
+                weather_request, timeout=downstream_timeout(context, WEATHER_TIMEOUT)
+            )
             
             # Вычисляем средние значения
             temps = []
@@ -45,25 +75,52 @@ class DataProcessorService(data_processor_pb2_grpc.DataProcessorServiceServicer)
                 temps.append(weather_response.weatherapi.temperature)
                 humidities.append(weather_response.weatherapi.humidity)
             
-            averages = data_processor_pb2.Averages(
-                temperature=sum(temps) / len(temps) if temps else 0,
-                humidity=sum(humidities) / len(humidities) if humidities else 0
-            )
+            # время - микросекунды эпохи, в строку его превращает только gateway
+            processed_at_us = time.time_ns() // 1000
+            response = data_processor_pb2.ProcessResponse(city=city, processed_at_us=processed_at_us)
+            averages = response.averages
+            averages.temperature = sum(temps) / len(temps) if temps else 0
+            averages.humidity = sum(humidities) / len(humidities) if humidities else 0
             
-            data_sources = data_processor_pb2.DataSources(
-                openweather=weather_response.status.openweather,
-                weatherapi=weather_response.status.weatherapi
-            )
+            # типы провайдеров общие (common.proto): подсообщения пересылаются одним CopyFrom прямо в ответ
+            if weather_response.openweather.available:
+                response.weather_summary.openweather.CopyFrom(weather_response.openweather)
+            if weather_response.weatherapi.available:
+                response.weather_summary.weatherapi.CopyFrom(weather_response.weatherapi)
+            response.data_sources.CopyFrom(weather_response.status)
             
-            return data_processor_pb2.ProcessResponse(
-                city=city,
-                processed_at=datetime.now().isoformat(),
-                weather_summary=weather_summary,
-                averages=averages,
-                data_sources=data_sources
-            )
+            if temps and not request.skip_analytics:
+                observation = analytics_pb2.Observation(
+                    city=city,
+                    observed_at_us=observed_at_us(weather_response, processed_at_us),
+                    temperature=averages.temperature,
+                    humidity=averages.humidity
+                )
+                # значения провайдеров по отдельности - для поиска расхождений в analytics
+                if weather_response.openweather.available:
+                    observation.openweather_temperature = weather_response.openweather.temperature
+                if weather_response.weatherapi.available:
+                    observation.weatherapi_temperature = weather_response.weatherapi.temperature
+                analytics_publisher.publish(observation)
+            
+            return response
             
+        except DeadlineExceeded:
+            deadline_stats.count(ABANDONED, 'ProcessWeatherData')
+            context.set_code(grpc.StatusCode.DEADLINE_EXCEEDED)
+            context.set_details("Deadline exceeded before calling weather-aggregator")
+            return data_processor_pb2.ProcessResponse()
         except grpc.RpcError as e:
+            if e.code() == grpc.StatusCode.DEADLINE_EXCEEDED:
+                deadline_stats.count(DOWNSTREAM, 'ProcessWeatherData')
+                context.set_code(grpc.StatusCode.DEADLINE_EXCEEDED)
+                context.set_details("weather-aggregator did not answer within the deadline")
+                return data_processor_pb2.ProcessResponse()
+            if e.code() == grpc.StatusCode.RESOURCE_EXHAUSTED:
+                # перегрузку ниже по цепочке клиент должен видеть как перегрузку, а не как сбой
+                context.set_code(grpc.StatusCode.RESOURCE_EXHAUSTED)
+                context.set_details("weather-aggregator is overloaded")
+                return data_processor_pb2.ProcessResponse()
             context.set_code(grpc.StatusCode.INTERNAL)
             context.set_details(f"Failed to get weather data: {str(e)}")
             return data_processor_pb2.ProcessResponse()
@@ -73,24 +130,31 @@ class DataProcessorService(data_processor_pb2_grpc.DataProcessorServiceServicer)
             status="healthy",
             service="data-processor"
         )
-        
-    def _convert_weather_data(self, weather_data):
-        return data_processor_pb2.SourceData(
-            temperature=weather_data.temperature,
-            humidity=weather_data.humidity,
-            pressure=weather_data.pressure,
-            description=weather_data.description,
-            wind_speed=weather_data.wind_speed
-        )
     
 def serve():
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
+    if GRPC_WORKERS > 1:
+        watch_parent()
+    if EXECUTOR_AUTOSIZE:
+        pool_controller.start()
+    analytics_publisher.start()
+    # спаны вызовов уходят в TRACE_EXPORT, если он задан
+    configure_tracing('data-processor')
+    # при GRPC_WORKERS > 1 процессы делят порт через SO_REUSEPORT, ядро раздает им соединения
+    # очереди перед обработчиками нет: вызовы сверх адаптивного лимита сразу получают RESOURCE_EXHAUSTED
+    server = grpc.server(
+        executor,
+        # с трассировкой TracingInterceptor заменяет MetricsInterceptor: замеры те же, слоем меньше
+        interceptors=[TracingInterceptor() if TRACING_ENABLED else MetricsInterceptor(),
+                      DeadlineInterceptor(), concurrency_limiter],
+        maximum_concurrent_rpcs=SERVER_THREADS,
+        options=server_options(reuse_port=GRPC_WORKERS > 1)
+    )
     data_processor_pb2_grpc.add_DataProcessorServiceServicer_to_server(
         DataProcessorService(), server
     )
-    server.add_insecure_port('[::]:50052')
+    addresses = add_ports(server, 50052)
     
-    print("gRPC Data Processor Service запущен на порту 50052...")
+    print(f"gRPC Data Processor Service запущен: {', '.join(addresses)}...")
     server.start()
     server.wait_for_termination()
 
@@ -0,0 +1,116 @@
+import os
+import queue
+import threading
+import time
+import grpc
+
+import analytics_pb2
+import analytics_pb2_grpc
+from channels import shared_channel
+from hash_ring import ReplicaRing
+from metrics import registry
+
+QUEUE_SIZE = int(os.getenv('ANALYTICS_PUBLISH_QUEUE_SIZE', '10000'))
+BATCH_SIZE = int(os.getenv('ANALYTICS_PUBLISH_BATCH_SIZE', '100'))
+FLUSH_INTERVAL = float(os.getenv('ANALYTICS_PUBLISH_FLUSH_INTERVAL', '0.5'))
+PUBLISH_TIMEOUT = 5
+# о потерянных при полной очереди наблюдениях - не чаще одной строки в столько секунд
+DROP_LOG_INTERVAL = 10
+
+
+class AnalyticsPublisher:
+    """отправляет обработанные наблюдения в analytics пачками из фонового потока
+
+    каждое наблюдение уходит на реплику-владельца города по консистентному хешу; после смены состава
+    реплика, которой город больше не принадлежит, отклоняет пачку, и она уходит по новому кольцу
+    """
+
+    def __init__(self, replicas, queue_size=QUEUE_SIZE, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL):
+        self.replicas = ReplicaRing(
+            replicas, lambda address: analytics_pb2_grpc.AnalyticsServiceStub(shared_channel(address)))
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self.sent = 0
+        self.dropped = 0
+        self.failed = 0
+        self._drop_logged_at = None
+        self._thread = None
+
+        registry.callback('analytics_publish_queued', 'Observations waiting to be sent to analytics',
+                          lambda: self.stats()["queued"])
+        for key, help in (("sent", "Observations delivered to analytics"),
+                          ("dropped", "Observations dropped over the publish queue"),
+                          ("failed", "Observations lost to analytics errors")):
+            registry.callback(f'analytics_publish_{key}_total', help, lambda key=key: self.stats()[key], kind='counter')
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def publish(self, observation):
+        # путь запроса никогда не ждет analytics: при переполнении очереди наблюдение теряется
+        try:
+            self._queue.put_nowait(observation)
+        except queue.Full:
+            now = time.monotonic()
+            with self._lock:
+                self.dropped += 1
+                if self._drop_logged_at is not None and now - self._drop_logged_at < DROP_LOG_INTERVAL:
+                    return
+                self._drop_logged_at = now
+                dropped = self.dropped
+            print(f"Analytics publish queue full ({self._queue.maxsize}), {dropped} observations dropped so far")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queued": self._queue.qsize(),
+                "sent": self.sent,
+                "dropped": self.dropped,
+                "failed": self.failed
+            }
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _by_owner(self, observations):
+        by_owner = {}
+        for observation in observations:
+            by_owner.setdefault(self.replicas.node_for(observation.city), []).append(observation)
+        return by_owner
+
+    def _run(self):
+        while True:
+            for owner, batch in self._by_owner(self._next_batch()).items():
+                self._send(owner, batch)
+
+    def _send(self, owner, batch, retry=True):
+        try:
+            self.replicas.clients[owner].IngestObservations(
+                analytics_pb2.ObservationBatch(observations=batch),
+                timeout=PUBLISH_TIMEOUT
+            )
+            with self._lock:
+                self.sent += len(batch)
+        except grpc.RpcError as e:
+            # кольцо устарело - пачка делится между новыми владельцами, повтор один
+            if retry and self.replicas.reload(e):
+                for new_owner, part in self._by_owner(batch).items():
+                    self._send(new_owner, part, retry=False)
+                return
+            with self._lock:
+                self.failed += len(batch)
+            print(f"Analytics publish error ({owner}): {e}")
@@ -1,21 +1,77 @@
-from flask import Flask, jsonify
+from flask import Flask, Response, jsonify
+import os
 import threading
-from grpc_server import serve
+from grpc_server import concurrency_limiter, deadline_stats, executor, pool_controller, serve
+# grpc_server добавляет shared в sys.path
+from metrics import CONTENT_TYPE, merge_rendered, registry
+from workers import GRPC_WORKERS, WORKER_STATS_PORT, WorkerPool
 
 app = Flask(__name__)
+# процессы gRPC-сервера при GRPC_WORKERS > 1
+workers = None
 
 @app.route('/health', methods=['GET'])
 def health():
+    if workers is not None and not workers.healthy():
+        return jsonify({"status": "degraded", "service": "weather-aggregator", "workers": workers.stats()}), 503
     return jsonify({"status": "healthy", "service": "weather-aggregator"})
 
+@app.route('/workers', methods=['GET'])
+def worker_processes():
+    # процессы gRPC-сервера; эндпоинты со счетчиками собирают их с каждого процесса
+    return jsonify(workers.stats() if workers is not None else [])
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    # счетчики и гистограммы в текстовом формате Prometheus: вызовы gRPC, лимит, пул, дедлайны
+    if workers is not None:
+        return Response(merge_rendered(workers.fetch('/metrics')), content_type=CONTENT_TYPE)
+    return Response(registry.render(), content_type=CONTENT_TYPE)
+
+@app.route('/deadlines', methods=['GET'])
+def deadlines():
+    # работа, отброшенная из-за истекшего дедлайна вызова
+    if workers is not None:
+        return jsonify(workers.collect('/deadlines'))
+    return jsonify(deadline_stats.stats())
+
+@app.route('/concurrency', methods=['GET'])
+def concurrency():
+    # адаптивный лимит одновременных вызовов и сброшенные сверх него
+    if workers is not None:
+        return jsonify(workers.collect('/concurrency'))
+    return jsonify(concurrency_limiter.stats())
+
+@app.route('/executor', methods=['GET'])
+def executor_stats():
+    # пул обработчиков gRPC: потоки, очередь, ожидание, решения контроллера размера
+    if workers is not None:
+        return jsonify(workers.collect('/executor'))
+    return jsonify({**executor.stats(), "controller": pool_controller.stats()})
+
 # Запускаем gRPC сервер в отдельном потоке
 def start_grpc_server():
     serve()
 
 if __name__ == '__main__':
-    # Запускаем gRPC сервер в фоне
-    grpc_thread = threading.Thread(target=start_grpc_server, daemon=True)
-    grpc_thread.start()
+    if WORKER_STATS_PORT:
+        # процесс-воркер: gRPC сервер, его счетчики - лаунчеру на внутреннем порту
+        threading.Thread(target=app.run, kwargs={'host': '127.0.0.1', 'port': WORKER_STATS_PORT, 'debug': False},
+                         daemon=True).start()
+        start_grpc_server()
+    else:
+        if GRPC_WORKERS > 1:
+            # gRPC сервер в GRPC_WORKERS отдельных процессах (этот же скрипт), этот процесс - health check и сбор их счетчиков
+            workers = WorkerPool(os.path.abspath(__file__))
+            workers.start()
+        else:
+            # gRPC сервер в фоне
+            grpc_thread = threading.Thread(target=start_grpc_server, daemon=True)
+            grpc_thread.start()
     
-    # Запускаем Flask для health check
-    app.run(host='0.0.0.0', port=5001, debug=False)
\ No newline at end of file
+        try:
+            # Flask для health check
+            app.run(host='0.0.0.0', port=5001, debug=False)
+        finally:
+            if workers is not None:
+                workers.stop()
\ No newline at end of file
@@ -22,27 +22,24 @@ _runtime_version.ValidateProtobufRuntimeVersion(
 _sym_db = _symbol_database.Default()
 
 
+import common_pb2 as common__pb2
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x15weather_service.proto\x12\x07weather\"\x07\n\x05\x45mpty\"\x1e\n\x0eWeatherRequest\x12\x0c\n\x04\x63ity\x18\x01 \x01(\t\"\xae\x01\n\x0fWeatherResponse\x12\x0c\n\x04\x63ity\x18\x01 \x01(\t\x12)\n\x0bopenweather\x18\x02 \x01(\x0b\x32\x14.weather.WeatherData\x12(\n\nweatherapi\x18\x03 \x01(\x0b\x32\x14.weather.WeatherData\x12\x11\n\ttimestamp\x18\x04 \x01(\t\x12%\n\x06status\x18\x05 \x01(\x0b\x32\x15.weather.SourceStatus\"\x82\x01\n\x0bWeatherData\x12\x13\n\x0btemperature\x18\x01 \x01(\x01\x12\x10\n\x08humidity\x18\x02 \x01(\x05\x12\x10\n\x08pressure\x18\x03 \x01(\x01\x12\x13\n\x0b\x64\x65scription\x18\x04 \x01(\t\x12\x12\n\nwind_speed\x18\x05 \x01(\x01\x12\x11\n\tavailable\x18\x06 \x01(\x08\"7\n\x0cSourceStatus\x12\x13\n\x0bopenweather\x18\x01 \x01(\t\x12\x12\n\nweatherapi\x18\x02 \x01(\t\"1\n\x0eHealthResponse\x12\x0e\n\x06status\x18\x01 \x01(\t\x12\x0f\n\x07service\x18\x02 \x01(\t2\x89\x01\n\x0eWeatherService\x12?\n\nGetWeather\x12\x17.weather.WeatherRequest\x1a\x18.weather.WeatherResponse\x12\x36\n\x0bHealthCheck\x12\x0e.weather.Empty\x1a\x17.weather.HealthResponseb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x15weather_service.proto\x12\x07weather\x1a\x0c\x63ommon.proto\"\x07\n\x05\x45mpty\"\x1e\n\x0eWeatherRequest\x12\x0c\n\x04\x63ity\x18\x01 \x01(\t\"\xbf\x01\n\x0fWeatherResponse\x12\x0c\n\x04\x63ity\x18\x01 \x01(\t\x12(\n\x0bopenweather\x18\x02 \x01(\x0b\x32\x13.common.WeatherData\x12\'\n\nweatherapi\x18\x03 \x01(\x0b\x32\x13.common.WeatherData\x12$\n\x06status\x18\x05 \x01(\x0b\x32\x14.common.SourceStatus\x12\x14\n\x0ctimestamp_us\x18\x06 \x01(\x03J\x04\x08\x04\x10\x05R\ttimestamp\"1\n\x0eHealthResponse\x12\x0e\n\x06status\x18\x01 \x01(\t\x12\x0f\n\x07service\x18\x02 \x01(\t2\x89\x01\n\x0eWeatherService\x12?\n\nGetWeather\x12\x17.weather.WeatherRequest\x1a\x18.weather.WeatherResponse\x12\x36\n\x0bHealthCheck\x12\x0e.weather.Empty\x1a\x17.weather.HealthResponseb\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
 _builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'weather_service_pb2', _globals)
 if not _descriptor._USE_C_DESCRIPTORS:
   DESCRIPTOR._loaded_options = None
-  _globals['_EMPTY']._serialized_start=34
-  _globals['_EMPTY']._serialized_end=41
-  _globals['_WEATHERREQUEST']._serialized_start=43
-  _globals['_WEATHERREQUEST']._serialized_end=73
-  _globals['_WEATHERRESPONSE']._serialized_start=76
-  _globals['_WEATHERRESPONSE']._serialized_end=250
-  _globals['_WEATHERDATA']._serialized_start=253
-  _globals['_WEATHERDATA']._serialized_end=383
-  _globals['_SOURCESTATUS']._serialized_start=385
-  _globals['_SOURCESTATUS']._serialized_end=440
-  _globals['_HEALTHRESPONSE']._serialized_start=442
-  _globals['_HEALTHRESPONSE']._serialized_end=491
-  _globals['_WEATHERSERVICE']._serialized_start=494
-  _globals['_WEATHERSERVICE']._serialized_end=631
+  _globals['_EMPTY']._serialized_start=48
+  _globals['_EMPTY']._serialized_end=55
+  _globals['_WEATHERREQUEST']._serialized_start=57
+  _globals['_WEATHERREQUEST']._serialized_end=87
+  _globals['_WEATHERRESPONSE']._serialized_start=90
+  _globals['_WEATHERRESPONSE']._serialized_end=281
+  _globals['_HEALTHRESPONSE']._serialized_start=283
+  _globals['_HEALTHRESPONSE']._serialized_end=332
+  _globals['_WEATHERSERVICE']._serialized_start=335
+  _globals['_WEATHERSERVICE']._serialized_end=472
 # @@protoc_insertion_point(module_scope)
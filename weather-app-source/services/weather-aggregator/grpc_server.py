@@ -1,13 +1,40 @@
 import grpc
-from concurrent import futures
 import sys 
 import os
 sys.path.append(os.path.join(os.path.dirname(__file__), 'generated'))
+# общие модули: в образе - /app/shared (Dockerfile копирует корневой shared/), в репозитории - ../../shared
+sys.path.append(os.path.join(os.path.dirname(__file__), 'shared'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'shared'))
 
+import common_pb2
 import weather_service_pb2
 import weather_service_pb2_grpc
 import requests
-from datetime import datetime
+import time
+from channels import add_ports, server_options
+from workers import GRPC_WORKERS, watch_parent
+from concurrency import SERVER_THREADS, ConcurrencyInterceptor
+from executor import EXECUTOR_AUTOSIZE, InstrumentedExecutor, PoolController
+from metrics import MetricsInterceptor, register_server_stats, registry
+from tracing import CLIENT, TRACEPARENT, TRACING_ENABLED, TracingInterceptor, child_span, configure_tracing
+from deadline import ABANDONED, DeadlineExceeded, DeadlineInterceptor, deadline_stats, downstream_timeout
+
+# время наблюдения провайдеры отдают в секундах эпохи, по сети оно идет в микросекундах
+MICROS = 1_000_000
+# таймаут запроса к провайдеру; с дедлайном у вызова - не больше его остатка
+PROVIDER_TIMEOUT = float(os.getenv('PROVIDER_TIMEOUT_SECONDS', '10'))
+# адаптивный лимит одновременных вызовов, сверх него - RESOURCE_EXHAUSTED
+concurrency_limiter = ConcurrencyInterceptor()
+# пул обработчиков с замерами очереди; с EXECUTOR_AUTOSIZE размер подбирает контроллер
+executor = InstrumentedExecutor(SERVER_THREADS)
+pool_controller = PoolController(executor)
+# лимит, пул и дедлайны - еще и в /metrics
+register_server_stats(concurrency_limiter, executor, deadline_stats)
+# запросы к провайдерам: итог (ok, http_error, timeout, error) и задержка
+provider_requests = registry.counter(
+    'provider_requests_total', 'HTTP requests to weather providers by outcome', ('provider', 'outcome'))
+provider_latency = registry.histogram(
+    'provider_request_seconds', 'Latency of HTTP requests to weather providers', ('provider',))
 
 class WeatherService(weather_service_pb2_grpc.WeatherServiceServicer):
     def __init__(self):
@@ -18,13 +45,13 @@ class WeatherService(weather_service_pb2_grpc.WeatherServiceServicer):
         city = request.city
         
         # OpenWeatherMap
-        openweather_data = self._get_openweather_data(city)
+        openweather_data = self._with_budget(self._get_openweather_data, city, context)
         
         # WeatherAPI
-        weatherapi_data = self._get_weatherapi_data(city)
+        weatherapi_data = self._with_budget(self._get_weatherapi_data, city, context)
         
         # создаем статус
-        status = weather_service_pb2.SourceStatus(
+        status = common_pb2.SourceStatus(
             openweather="success" if openweather_data.available else "failed",
             weatherapi="success" if weatherapi_data.available else "failed"
         )
@@ -33,7 +60,7 @@ class WeatherService(weather_service_pb2_grpc.WeatherServiceServicer):
             city=city,
             openweather=openweather_data,
             weatherapi=weatherapi_data,
-            timestamp=datetime.now().isoformat(),
+            timestamp_us=time.time_ns() // 1000,
             status=status
         )
     
@@ -43,55 +70,105 @@ class WeatherService(weather_service_pb2_grpc.WeatherServiceServicer):
             service="weather-aggregator"
         )
     
-    def _get_openweather_data(self, city):
+    def _with_budget(self, fetch, city, context):
+        # клиент уже не ждет ответа - квоту провайдера не тратим
+        try:
+            timeout = downstream_timeout(context, PROVIDER_TIMEOUT)
+        except DeadlineExceeded:
+            deadline_stats.count(ABANDONED, 'GetWeather')
+            return common_pb2.WeatherData(available=False)
+        return fetch(city, timeout)
+    
+    def _request(self, provider, url, timeout):
+        # GET к провайдеру с замером задержки и итога для /metrics и спаном в трассе вызова
+        started = time.monotonic()
+        outcome = 'error'
+        with child_span(f'GET {provider}', CLIENT, provider=provider) as span:
+            traceparent = span.traceparent
+            try:
+                response = requests.get(url, timeout=timeout, headers={TRACEPARENT: traceparent} if traceparent else None)
+                outcome = 'ok' if response.status_code == 200 else 'http_error'
+                span.set_attribute('http.status_code', response.status_code)
+                return response
+            except requests.Timeout:
+                outcome = 'timeout'
+                span.set_error('Timeout')
+                raise
+            except requests.RequestException as e:
+                # текст ошибки requests содержит URL, а в нем ключ API - в трассу только тип
+                span.set_error(type(e).__name__)
+                raise
+            finally:
+                provider_latency.observe(time.monotonic() - started, provider)
+                provider_requests.inc(provider, outcome)
+                span.set_attribute('outcome', outcome)
+    
+    def _get_openweather_data(self, city, timeout=PROVIDER_TIMEOUT):
         try:
             url = f"http://api.openweathermap.org/data/2.5/weather?q={city}&appid={self.openweather_key}&units=metric"
-            response = requests.get(url, timeout=10)
+            response = self._request('openweather', url, timeout)
             
             if response.status_code == 200:
                 data = response.json()
-                return weather_service_pb2.WeatherData(
+                return common_pb2.WeatherData(
                     temperature=data['main'].get('temp', 0),
                     humidity=data['main'].get('humidity', 0),
                     pressure=data['main'].get('pressure', 0),
                     description=data['weather'][0].get('description', '') if data.get('weather') else '',
                     wind_speed=data.get('wind', {}).get('speed', 0),
+                    observed_at_us=int(data.get('dt', 0)) * MICROS,
                     available=True
                 )
         except Exception as e:
             print(f"OpenWeather API error: {e}")
         
-        return weather_service_pb2.WeatherData(available=False)
+        return common_pb2.WeatherData(available=False)
     
-    def _get_weatherapi_data(self, city):
+    def _get_weatherapi_data(self, city, timeout=PROVIDER_TIMEOUT):
         try:
             url = f"http://api.weatherapi.com/v1/current.json?key={self.weatherapi_key}&q={city}"
-            response = requests.get(url, timeout=10)
+            response = self._request('weatherapi', url, timeout)
             
             if response.status_code == 200:
                 data = response.json()
                 current = data.get('current', {})
-                return weather_service_pb2.WeatherData(
+                return common_pb2.WeatherData(
                     temperature=current.get('temp_c', 0),
                     humidity=current.get('humidity', 0),
                     pressure=current.get('pressure_mb', 0),
                     description=current.get('condition', {}).get('text', ''),
                     wind_speed=current.get('wind_kph', 0),
+                    observed_at_us=int(current.get('last_updated_epoch', 0)) * MICROS,
                     available=True
                 )
         except Exception as e:
             print(f"WeatherAPI error: {e}")
         
-        return weather_service_pb2.WeatherData(available=False)
+        return common_pb2.WeatherData(available=False)
     
 def serve():
-    server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
+    if GRPC_WORKERS > 1:
+        watch_parent()
+    if EXECUTOR_AUTOSIZE:
+        pool_controller.start()
+    # спаны вызовов уходят в TRACE_EXPORT, если он задан
+    configure_tracing('weather-aggregator')
+    # при GRPC_WORKERS > 1 процессы делят порт через SO_REUSEPORT, ядро раздает им соединения
+    # очереди перед обработчиками нет: вызовы сверх адаптивного лимита сразу получают RESOURCE_EXHAUSTED
+    server = grpc.server(
+        executor,
+        # с трассировкой TracingInterceptor заменяет MetricsInterceptor: замеры те же, слоем меньше
+        interceptors=[TracingInterceptor() if TRACING_ENABLED else MetricsInterceptor(),
+                      DeadlineInterceptor(), concurrency_limiter],
+        maximum_concurrent_rpcs=SERVER_THREADS,
+        options=server_options(reuse_port=GRPC_WORKERS > 1)
+    )
     weather_service_pb2_grpc.add_WeatherServiceServicer_to_server(
         WeatherService(), server
     )
-    server.add_insecure_port('[::]:50051')
+    addresses = add_ports(server, 50051)
     
-    print("gRPC Weather Service порт: 50051...")
+    print(f"gRPC Weather Service: {', '.join(addresses)}...")
     server.start()
     server.wait_for_termination()
 
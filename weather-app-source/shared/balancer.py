@@ -0,0 +1,483 @@
+import math
+import os
+import random
+import socket
+import threading
+import time
+import grpc
+
+# время затухания EWMA задержки: старые замеры теряют вес за несколько tau
+EWMA_TAU = float(os.getenv('BALANCER_EWMA_TAU_SECONDS', '10'))
+# как часто заново раскрывать DNS-имя в список реплик
+RESOLVE_INTERVAL = float(os.getenv('BALANCER_RESOLVE_INTERVAL_SECONDS', '30'))
+# соединений на адрес: за одним портом с SO_REUSEPORT несколько процессов, ядро распределяет между
+# ними соединения, а не вызовы - одно соединение нагрузило бы только один процесс
+CONNECTIONS_PER_ADDRESS = int(os.getenv('BALANCER_CONNECTIONS_PER_ADDRESS', '1'))
+# выброс по ошибкам: столько неудач подряд
+EJECT_FAILURES = int(os.getenv('BALANCER_EJECT_FAILURES', '5'))
+# выброс по задержке: EWMA во столько раз выше медианы остальных и не меньше порога
+OUTLIER_FACTOR = float(os.getenv('BALANCER_OUTLIER_FACTOR', '3'))
+OUTLIER_MIN_LATENCY = float(os.getenv('BALANCER_OUTLIER_MIN_LATENCY_SECONDS', '0.05'))
+OUTLIER_MIN_SAMPLES = 20
+# длительность выброса растет с каждым повторным выбросом реплики
+EJECTION_TIME = float(os.getenv('BALANCER_EJECTION_SECONDS', '10'))
+MAX_EJECTION_TIME = 300.0
+# больше этой доли реплик не выбрасывается: при общей деградации лучше медленно, чем никак
+MAX_EJECTED_FRACTION = 0.5
+# оценка задержки реплики после отказа: быстрый отказ не должен делать ее самой дешевой для p2c
+FAILURE_PENALTY = float(os.getenv('BALANCER_FAILURE_PENALTY_SECONDS', '1'))
+
+# ошибки, которые говорят о состоянии реплики, а не о запросе
+BACKEND_FAILURES = frozenset((
+    grpc.StatusCode.UNAVAILABLE,
+    grpc.StatusCode.DEADLINE_EXCEEDED,
+    grpc.StatusCode.RESOURCE_EXHAUSTED,
+    grpc.StatusCode.INTERNAL,
+    grpc.StatusCode.UNKNOWN,
+))
+
+
+def resolve(target):
+    """адреса реплик: "host:port" раскрывается через DNS, "a:1,b:2" - статический список"""
+    if ',' in target:
+        return [address.strip() for address in target.split(',') if address.strip()]
+    host, _, port = target.rpartition(':')
+    infos = socket.getaddrinfo(host.strip('[]'), int(port), type=socket.SOCK_STREAM)
+    addresses = []
+    for family, _, _, _, sockaddr in infos:
+        ip = sockaddr[0]
+        address = f'[{ip}]:{port}' if family == socket.AF_INET6 else f'{ip}:{port}'
+        if address not in addresses:
+            addresses.append(address)
+    return addresses
+
+
+class Backend:
+    """одна реплика: свой канал, оценки задержки, запросы в работе и состояние выброса
+
+    peak - peak EWMA для выбора (рост принимается сразу, спад - постепенно), smoothed - обычная
+    EWMA для выброса, чтобы одна пауза GC не выключала реплику
+    """
+
+    def __init__(self, address, connection, channel):
+        self.address = address
+        self.connection = connection
+        self.channel = channel
+        self.peak = 0.0
+        self.smoothed = 0.0
+        self.stamp = time.monotonic()
+        self.in_flight = 0
+        self.samples = 0
+        self.failures = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+        # потоковые вызовы в работе: в оценку не входят, но держат канал реплики, выпавшей из DNS
+        self.streams = 0
+        # состояние канала, пока на BalancedChannel кто-то подписан (None - не отслеживается)
+        self.state = None
+        self.watcher = None
+        self._callables = {}
+
+    def callable(self, kind, method, args, kwargs):
+        key = (kind, method)
+        multicallable = self._callables.get(key)
+        if multicallable is None:
+            multicallable = self._callables[key] = getattr(self.channel, kind)(method, *args, **kwargs)
+        return multicallable
+
+    def cost(self, now):
+        # без новых замеров оценка затухает к нулю, и простаивающая реплика снова получает пробные запросы
+        return self.peak * math.exp(-max(now - self.stamp, 0.0) / EWMA_TAU) * (self.in_flight + 1)
+
+    def observe(self, rtt, now):
+        weight = math.exp(-max(now - self.stamp, 0.0) / EWMA_TAU)
+        self.peak = rtt if rtt > self.peak else self.peak * weight + rtt * (1 - weight)
+        self.smoothed = self.smoothed * weight + rtt * (1 - weight) if self.samples else rtt
+        self.stamp = now
+        self.samples += 1
+
+    def penalize(self, now):
+        self.peak = max(self.peak, FAILURE_PENALTY)
+        self.stamp = now
+
+    def reset(self, latency, now):
+        self.peak = self.smoothed = latency
+        self.stamp = now
+        self.samples = 0
+        self.failures = 0
+
+
+class NoBackends(grpc.RpcError, grpc.Call, grpc.Future):
+    """UNAVAILABLE без обращения к сети: у канала нет реплик (он закрыт)
+
+    уже завершенный вызов, чтобы перехватчики клиента могли обращаться с ним как с обычным
+    """
+
+    def __init__(self, target):
+        super().__init__(f"No replicas available for {target}")
+        self._details = f"No replicas available for {target}"
+
+    def code(self):
+        return grpc.StatusCode.UNAVAILABLE
+
+    def details(self):
+        return self._details
+
+    def initial_metadata(self):
+        return None
+
+    def trailing_metadata(self):
+        return None
+
+    def is_active(self):
+        return False
+
+    def time_remaining(self):
+        return None
+
+    def cancel(self):
+        return False
+
+    def add_callback(self, callback):
+        return False
+
+    def cancelled(self):
+        return False
+
+    def running(self):
+        return False
+
+    def done(self):
+        return True
+
+    def result(self, timeout=None):
+        raise self
+
+    def exception(self, timeout=None):
+        return self
+
+    def traceback(self, timeout=None):
+        return None
+
+    def add_done_callback(self, fn):
+        fn(self)
+
+
+def _connectivity(states):
+    # канал готов, если готова хотя бы одна реплика
+    for state in (grpc.ChannelConnectivity.READY, grpc.ChannelConnectivity.CONNECTING,
+                  grpc.ChannelConnectivity.TRANSIENT_FAILURE, grpc.ChannelConnectivity.IDLE):
+        if state in states:
+            return state
+    return grpc.ChannelConnectivity.SHUTDOWN
+
+
+class Balancer:
+    """выбор реплики power of two choices: из двух случайных - с меньшей задержкой с учетом очереди"""
+
+    def __init__(self, target, channel_factory, resolve_interval=RESOLVE_INTERVAL, connections=CONNECTIONS_PER_ADDRESS):
+        self.target = target
+        self._channel_factory = channel_factory
+        self.connections = connections
+        self._lock = threading.Lock()
+        self._backends = []
+        # реплики, выпавшие из DNS: канал закрывается, когда на нем не останется вызовов
+        self._retired = []
+        # подписчики на состояние BalancedChannel и последнее отправленное им состояние
+        self._subscribers = []
+        self._try_to_connect = False
+        self._state = None
+        self.refresh()
+        if ',' not in target and resolve_interval > 0:
+            threading.Thread(target=self._resolve_loop, args=(resolve_interval,), daemon=True).start()
+
+    def _resolve_loop(self, interval):
+        while True:
+            time.sleep(interval)
+            self.refresh()
+
+    def refresh(self):
+        try:
+            addresses = resolve(self.target)
+        except (OSError, ValueError) as e:
+            addresses = []
+            print(f"Balancer {self.target}: resolve failed: {e}")
+        with self._lock:
+            if not addresses:
+                # DNS еще не готов - канал на само имя, его раскроет gRPC; реплики подтянет следующий refresh
+                if self._backends:
+                    return
+                addresses = [self.target]
+            current = {(backend.address, backend.connection): backend for backend in self._backends}
+            self._backends = [
+                current.pop((address, connection), None) or Backend(address, connection, self._channel_factory(address))
+                for address in addresses
+                for connection in range(self.connections)
+            ]
+            self._retired.extend(current.values())
+            idle = [backend for backend in self._retired if not backend.in_flight and not backend.streams]
+            self._retired = [backend for backend in self._retired if backend.in_flight or backend.streams]
+            watch = [backend for backend in self._backends if backend.state is None] if self._subscribers else []
+        for backend in idle:
+            self._unwatch(backend)
+            backend.channel.close()
+        for backend in watch:
+            self._watch(backend)
+        if idle:
+            self._notify()
+
+    def pick(self, track=True):
+        now = time.monotonic()
+        with self._lock:
+            backends = self._backends
+            if not backends:
+                raise NoBackends(self.target)
+            active = [backend for backend in backends if backend.ejected_until <= now] or backends
+            if len(active) == 1:
+                backend = active[0]
+            else:
+                first, second = random.sample(active, 2)
+                backend = first if first.cost(now) <= second.cost(now) else second
+            if track:
+                backend.in_flight += 1
+            else:
+                backend.streams += 1
+            return backend
+
+    def stream_done(self, backend):
+        with self._lock:
+            backend.streams -= 1
+
+    def done(self, backend, started, code):
+        now = time.monotonic()
+        with self._lock:
+            backend.in_flight -= 1
+            if backend.ejected_until > now:
+                # вызовы, начатые до выброса, не портят стартовую оценку после возврата
+                return
+            if code in BACKEND_FAILURES:
+                # время отказа - не задержка реплики: оценка только растет до штрафа
+                backend.penalize(now)
+                backend.failures += 1
+            else:
+                backend.observe(now - started, now)
+                backend.failures = 0
+            if backend.ejected_until <= now and self._is_outlier(backend, now):
+                self._eject(backend, now)
+
+    def _median_of_others(self, backend):
+        others = sorted(other.smoothed for other in self._backends if other is not backend and other.samples)
+        return others[len(others) // 2] if others else None
+
+    def _is_outlier(self, backend, now):
+        if backend.failures >= EJECT_FAILURES:
+            return True
+        median = self._median_of_others(backend)
+        if backend.samples < OUTLIER_MIN_SAMPLES or median is None:
+            return False
+        return backend.smoothed >= OUTLIER_MIN_LATENCY and backend.smoothed > OUTLIER_FACTOR * median
+
+    def _eject(self, backend, now):
+        ejected = sum(1 for other in self._backends if other.ejected_until > now)
+        if ejected + 1 > len(self._backends) * MAX_EJECTED_FRACTION:
+            return
+        backend.ejections += 1
+        backend.ejected_until = now + min(EJECTION_TIME * backend.ejections, MAX_EJECTION_TIME)
+        # после возврата реплика начинает с медианы остальных, а не со своего худшего замера
+        backend.reset(self._median_of_others(backend) or 0.0, backend.ejected_until)
+        print(f"Balancer {self.target}: ejected {backend.address} for {backend.ejected_until - now:.0f} s")
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            return [
+                {
+                    "address": backend.address,
+                    "connection": backend.connection,
+                    "latency_ms": round(backend.smoothed * 1000, 2),
+                    "in_flight": backend.in_flight,
+                    "ejected": backend.ejected_until > now,
+                    "ejections": backend.ejections
+                }
+                for backend in self._backends
+            ]
+
+    def _watch(self, backend):
+        def changed(state):
+            with self._lock:
+                if backend.watcher is changed:
+                    backend.state = state
+            self._notify()
+        backend.watcher = changed
+        backend.state = grpc.ChannelConnectivity.IDLE
+        backend.channel.subscribe(changed, try_to_connect=self._try_to_connect)
+
+    def _unwatch(self, backend):
+        watcher = backend.watcher
+        if watcher is not None:
+            backend.channel.unsubscribe(watcher)
+            backend.watcher = None
+        backend.state = None
+
+    def _notify(self):
+        with self._lock:
+            if not self._subscribers:
+                return
+            state = _connectivity({backend.state for backend in self._backends})
+            if state == self._state:
+                return
+            self._state = state
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            callback(state)
+
+    def subscribe(self, callback, try_to_connect=False):
+        """состояние канала - лучшее из состояний каналов реплик; реплики отслеживаются, пока есть подписчики"""
+        with self._lock:
+            # реплики подписываются заново, если новый подписчик первым просит соединения
+            rewatch = not self._subscribers or (try_to_connect and not self._try_to_connect)
+            self._subscribers.append(callback)
+            self._try_to_connect = self._try_to_connect or try_to_connect
+            backends = list(self._backends) if rewatch else []
+            state = self._state
+        for backend in backends:
+            self._unwatch(backend)
+            self._watch(backend)
+        if state is not None:
+            callback(state)
+        else:
+            self._notify()
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+            if self._subscribers:
+                return
+            backends = list(self._backends)
+            self._state = None
+            self._try_to_connect = False
+        for backend in backends:
+            self._unwatch(backend)
+
+    def close(self):
+        with self._lock:
+            backends, self._backends = self._backends + self._retired, []
+            self._retired = []
+        for backend in backends:
+            self._unwatch(backend)
+            backend.channel.close()
+        self._notify()
+
+
+class _UnaryUnary:
+    # замер задержки и итога каждого вызова для балансировщика
+    def __init__(self, balancer, method, args, kwargs):
+        self._balancer = balancer
+        self._method = method
+        self._args = args
+        self._kwargs = kwargs
+
+    def _start(self):
+        backend = self._balancer.pick()
+        return backend, backend.callable('unary_unary', self._method, self._args, self._kwargs), time.monotonic()
+
+    def _call(self, name, request, args, kwargs):
+        backend, multicallable, started = self._start()
+        try:
+            result = getattr(multicallable, name)(request, *args, **kwargs)
+        except grpc.RpcError as e:
+            self._balancer.done(backend, started, e.code())
+            raise
+        except BaseException:
+            self._balancer.done(backend, started, grpc.StatusCode.UNKNOWN)
+            raise
+        self._balancer.done(backend, started, grpc.StatusCode.OK)
+        return result
+
+    def __call__(self, request, *args, **kwargs):
+        return self._call('__call__', request, args, kwargs)
+
+    def with_call(self, request, *args, **kwargs):
+        return self._call('with_call', request, args, kwargs)
+
+    def future(self, request, *args, **kwargs):
+        try:
+            backend, multicallable, started = self._start()
+        except NoBackends as e:
+            return e
+        call = multicallable.future(request, *args, **kwargs)
+        call.add_done_callback(lambda done: self._balancer.done(backend, started, done.code()))
+        return call
+
+
+class _Streaming:
+    # потоковые вызовы только распределяются: их длительность - не задержка реплики
+    def __init__(self, balancer, kind, method, args, kwargs):
+        self._balancer = balancer
+        self._kind = kind
+        self._method = method
+        self._args = args
+        self._kwargs = kwargs
+
+    def _call(self, name, args, kwargs):
+        backend = self._balancer.pick(track=False)
+        multicallable = backend.callable(self._kind, self._method, self._args, self._kwargs)
+        try:
+            result = getattr(multicallable, name)(*args, **kwargs)
+        except BaseException:
+            self._balancer.stream_done(backend)
+            raise
+        if name == 'future' or (name == '__call__' and self._kind != 'stream_unary'):
+            # вызов еще идет: канал реплики занят до его завершения
+            result.add_done_callback(lambda _: self._balancer.stream_done(backend))
+        else:
+            self._balancer.stream_done(backend)
+        return result
+
+    def __call__(self, *args, **kwargs):
+        return self._call('__call__', args, kwargs)
+
+    def with_call(self, *args, **kwargs):
+        return self._call('with_call', args, kwargs)
+
+    def future(self, *args, **kwargs):
+        return self._call('future', args, kwargs)
+
+
+class BalancedChannel(grpc.Channel):
+    """канал поверх отдельных каналов к каждой реплике с выбором реплики на каждый вызов
+
+    подходит сгенерированным stub-ам как обычный канал; только для сервисов без состояния
+    """
+
+    def __init__(self, target, channel_factory, resolve_interval=RESOLVE_INTERVAL, connections=CONNECTIONS_PER_ADDRESS):
+        self.balancer = Balancer(target, channel_factory, resolve_interval, connections)
+
+    def unary_unary(self, method, *args, **kwargs):
+        return _UnaryUnary(self.balancer, method, args, kwargs)
+
+    def unary_stream(self, method, *args, **kwargs):
+        return _Streaming(self.balancer, 'unary_stream', method, args, kwargs)
+
+    def stream_unary(self, method, *args, **kwargs):
+        return _Streaming(self.balancer, 'stream_unary', method, args, kwargs)
+
+    def stream_stream(self, method, *args, **kwargs):
+        return _Streaming(self.balancer, 'stream_stream', method, args, kwargs)
+
+    def subscribe(self, callback, try_to_connect=False):
+        self.balancer.subscribe(callback, try_to_connect)
+
+    def unsubscribe(self, callback):
+        self.balancer.unsubscribe(callback)
+
+    def close(self):
+        self.balancer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
@@ -0,0 +1,216 @@
+import ipaddress
+import json
+import os
+import stat
+import threading
+import grpc
+
+from balancer import BalancedChannel
+from metrics import ClientMetricsInterceptor, registry
+from tracing import TRACING_ENABLED, ClientTracingInterceptor
+
+# адреса сервисов без состояния: имя DNS может раскрываться в несколько реплик
+WEATHER_AGGREGATOR_TARGET = os.getenv('WEATHER_AGGREGATOR_TARGET', 'weather-aggregator:50051')
+DATA_PROCESSOR_TARGET = os.getenv('DATA_PROCESSOR_TARGET', 'data-processor:50052')
+
+# keepalive: мертвое соединение обнаруживается за время + таймаут пинга, а не по таймауту TCP
+KEEPALIVE_TIME_MS = int(os.getenv('GRPC_KEEPALIVE_TIME_MS', '30000'))
+KEEPALIVE_TIMEOUT_MS = int(os.getenv('GRPC_KEEPALIVE_TIMEOUT_MS', '10000'))
+# самый частый пинг, который принимает сервер: заметно ниже интервала клиентов, иначе пинг,
+# пришедший чуть раньше срока из-за джиттера таймеров, засчитывается и кончается GOAWAY too_many_pings
+MIN_PING_INTERVAL_MS = int(os.getenv('GRPC_MIN_PING_INTERVAL_MS', str(KEEPALIVE_TIME_MS // 2)))
+# лимит сообщения в обе стороны (по умолчанию в gRPC прием ограничен 4 МБ)
+MAX_MESSAGE_BYTES = int(os.getenv('GRPC_MAX_MESSAGE_BYTES', str(16 * 1024 * 1024)))
+# балансировка сервисов без состояния: p2c (по задержке, с выбросом медленных реплик) или round_robin
+LOAD_BALANCING = os.getenv('GRPC_LOAD_BALANCING', 'p2c')
+# сжатие сообщений по умолчанию: none, gzip или deflate
+COMPRESSION = os.getenv('GRPC_COMPRESSION', 'none')
+# сервер закрывает соединения этого возраста: клиенты переподключаются и заново раскрывают DNS,
+# так round_robin подхватывает добавленные реплики
+MAX_CONNECTION_AGE_MS = int(os.getenv('GRPC_MAX_CONNECTION_AGE_MS', '300000'))
+MAX_CONNECTION_AGE_GRACE_MS = 30000
+# unix-сокет сервера для соседей на том же хосте (путь в общем томе); пусто - только TCP.
+# клиенты переходят на него по хопам: WEATHER_AGGREGATOR_TARGET / DATA_PROCESSOR_TARGET = unix:/путь
+UNIX_SOCKET = os.getenv('GRPC_UNIX_SOCKET', '')
+# с unix-сокетом TCP можно выключить, если все клиенты сервиса на том же хосте
+LISTEN_TCP = os.getenv('GRPC_LISTEN_TCP', 'true').lower() in ('1', 'true', 'yes')
+
+COMPRESSIONS = {
+    'none': grpc.Compression.NoCompression,
+    'gzip': grpc.Compression.Gzip,
+    'deflate': grpc.Compression.Deflate,
+}
+ROUND_ROBIN_CONFIG = json.dumps({"loadBalancingConfig": [{"round_robin": {}}]})
+
+
+def _message_options():
+    return [
+        ('grpc.max_send_message_length', MAX_MESSAGE_BYTES),
+        ('grpc.max_receive_message_length', MAX_MESSAGE_BYTES),
+    ]
+
+
+def channel_options(balanced):
+    options = _message_options() + [
+        ('grpc.keepalive_time_ms', KEEPALIVE_TIME_MS),
+        ('grpc.keepalive_timeout_ms', KEEPALIVE_TIMEOUT_MS),
+        ('grpc.keepalive_permit_without_calls', 1),
+        ('grpc.http2.max_pings_without_data', 0),
+    ]
+    if balanced:
+        options.append(('grpc.service_config', ROUND_ROBIN_CONFIG))
+    return options
+
+
+def server_options(reuse_port=False):
+    """параметры сервера под клиентов из этого модуля: принимать их keepalive и большие сообщения
+
+    reuse_port - порт делят несколько процессов сервиса (GRPC_WORKERS); без него второй процесс
+    на том же порту - ошибка, а не молчаливое деление трафика
+    """
+    return _message_options() + [
+        ('grpc.keepalive_permit_without_calls', 1),
+        ('grpc.http2.min_recv_ping_interval_without_data_ms', MIN_PING_INTERVAL_MS),
+        ('grpc.max_connection_age_ms', MAX_CONNECTION_AGE_MS),
+        ('grpc.max_connection_age_grace_ms', MAX_CONNECTION_AGE_GRACE_MS),
+        ('grpc.so_reuseport', 1 if reuse_port else 0),
+    ]
+
+
+def _remove_stale_socket(path):
+    # сокет от упавшего процесса мешает bind; обычный файл по этому пути не трогаем
+    try:
+        if stat.S_ISSOCK(os.stat(path).st_mode):
+            os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def add_ports(server, port, unix_socket=UNIX_SOCKET, listen_tcp=LISTEN_TCP):
+    """TCP-порт и (если задан) unix-сокет сервера; возвращает адреса для лога"""
+    addresses = []
+    if listen_tcp or not unix_socket:
+        server.add_insecure_port(f'[::]:{port}')
+        addresses.append(f'[::]:{port}')
+    if unix_socket:
+        path = os.path.abspath(unix_socket)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _remove_stale_socket(path)
+        server.add_insecure_port(f'unix:{path}')
+        addresses.append(f'unix:{path}')
+    return addresses
+
+
+def _is_unix(address):
+    return address.startswith('unix:') or address.startswith('unix-abstract:')
+
+
+def _list_target(address):
+    """список "a:1,b:2" как цель gRPC: ipv4:/ipv6: берут только IP одного семейства, None - если в нем имена"""
+    versions = set()
+    for item in address.split(','):
+        host = item.strip().rpartition(':')[0].strip('[]')
+        try:
+            versions.add(ipaddress.ip_address(host).version)
+        except ValueError:
+            return None
+    if len(versions) != 1:
+        return None
+    return f"ipv{versions.pop()}:{','.join(item.strip() for item in address.split(','))}"
+
+
+def _target(address, balanced):
+    # round_robin нужен список адресов: явный резолвер dns:/// отдает все записи имени
+    if balanced and ',' in address:
+        target = _list_target(address)
+        if target is None:
+            raise ValueError(f"round_robin takes only IP addresses of one family: {address}")
+        return target
+    if balanced and '://' not in address and not _is_unix(address):
+        return f'dns:///{address}'
+    return address
+
+
+def create_channel(address, balanced=False, compression=None, dedicated=False):
+    """новый канал с общими параметрами; balanced - round_robin по всем адресам имени
+
+    balanced только для сервисов без состояния: реплики analytics владеют своими городами,
+    поэтому к ним - pick_first по конкретному адресу. dedicated - свое соединение, а не общее
+    с другими каналами процесса на тот же адрес
+    """
+    options = channel_options(balanced)
+    if dedicated:
+        options.append(('grpc.use_local_subchannel_pool', 1))
+    return grpc.insecure_channel(
+        _target(address, balanced),
+        options=options,
+        compression=COMPRESSIONS[compression or COMPRESSION]
+    )
+
+
+# (адрес, balanced) -> (канал, он же с перехватчиками метрик и трассировки)
+_channels = {}
+_lock = threading.Lock()
+
+
+def _dedicated_channel(address):
+    return create_channel(address, dedicated=True)
+
+
+def _balanced_channel(address):
+    # за одним unix-сокетом один процесс на этом хосте - выбирать не из чего
+    if _is_unix(address) and ',' not in address:
+        return create_channel(address)
+    # p2c выбирает реплику сам, поэтому под ним - отдельные каналы к каждому адресу
+    # (список "unix:/a.0,unix:/a.1" - сокеты процессов GRPC_WORKERS - тоже только через p2c)
+    if LOAD_BALANCING == 'p2c' and '://' not in address:
+        return BalancedChannel(address, _dedicated_channel)
+    # список с именами ("data-processor-1:50052,data-processor-2:50052") round_robin не принимает -
+    # тогда тоже p2c: каждое имя раскрывает свой канал dns
+    if ',' in address and _list_target(address) is None:
+        return BalancedChannel(address, _dedicated_channel)
+    return create_channel(address, balanced=True)
+
+
+def shared_channel(address, balanced=False):
+    """канал процесса на адрес: все клиенты одного сервиса делят его соединения вместо своих
+
+    вызовы через него попадают в /metrics (grpc_client_*) с меткой target=address и несут traceparent
+    """
+    key = (address, balanced)
+    with _lock:
+        entry = _channels.get(key)
+        if entry is None:
+            channel = _balanced_channel(address) if balanced else create_channel(address)
+            # с трассировкой - тот же перехватчик метрик, но еще со спанами и traceparent
+            interceptor = ClientTracingInterceptor(address) if TRACING_ENABLED else ClientMetricsInterceptor(address)
+            entry = _channels[key] = (channel, grpc.intercept_channel(channel, interceptor))
+        return entry[1]
+
+
+def balancer_stats():
+    """состояние реплик по каждому каналу с p2c: задержка, запросы в работе, выбросы"""
+    with _lock:
+        channels = list(_channels.items())
+    return {
+        address: channel.balancer.stats()
+        for (address, _), (channel, _) in channels
+        if isinstance(channel, BalancedChannel)
+    }
+
+
+def _backend_metric(key):
+    return lambda: {
+        (target, backend["address"], str(backend["connection"])): backend[key]
+        for target, backends in balancer_stats().items()
+        for backend in backends
+    }
+
+
+# то же, что /channels: сглаженная задержка и выброс каждой реплики под p2c
+registry.callback('balancer_backend_latency_ms', 'Smoothed latency of a replica as seen by the p2c balancer',
+                  _backend_metric("latency_ms"), ('target', 'address', 'connection'))
+registry.callback('balancer_backend_in_flight', 'Calls in flight to a replica',
+                  _backend_metric("in_flight"), ('target', 'address', 'connection'))
+registry.callback('balancer_backend_ejected', '1 while the replica is ejected as an outlier',
+                  _backend_metric("ejected"), ('target', 'address', 'connection'))
@@ -0,0 +1,168 @@
+import math
+import os
+import threading
+import time
+import grpc
+
+# стартовый лимит - прежний размер пула; дальше он подстраивается по задержке
+INITIAL_LIMIT = int(os.getenv('CONCURRENCY_INITIAL_LIMIT', '10'))
+MIN_LIMIT = int(os.getenv('CONCURRENCY_MIN_LIMIT', '2'))
+MAX_LIMIT = int(os.getenv('CONCURRENCY_MAX_LIMIT', '50'))
+# потоки сверх лимита: приоритетные вызовы и быстрые отказы не ждут освобождения пула
+PRIORITY_THREADS = 4
+SERVER_THREADS = MAX_LIMIT + PRIORITY_THREADS
+# лимит пересчитывается раз в окно, если в нем набралось достаточно замеров
+WINDOW_SECONDS = float(os.getenv('CONCURRENCY_WINDOW_SECONDS', '0.1'))
+WINDOW_MIN_SAMPLES = 5
+# средняя задержка окна может быть во столько раз выше задержки без нагрузки без снижения лимита
+TOLERANCE = float(os.getenv('CONCURRENCY_TOLERANCE', '1.5'))
+# доля нового значения лимита за один пересчет
+SMOOTHING = 0.2
+# задержка без нагрузки - минимум замеров; он дрейфует вверх на эту долю в секунду, чтобы лимит
+# догонял сервис, ставший медленнее (история города выросла), а не держался за давний быстрый вызов
+NO_LOAD_DRIFT = 0.05
+
+# вызовы, которые идут мимо лимита: проверки здоровья не должны падать от перегрузки
+PRIORITY_METHODS = ('HealthCheck',)
+
+
+class AdaptiveLimit:
+    """адаптивный лимит одновременных вызовов по градиенту задержки (как Gradient у Netflix)
+
+    если средняя задержка окна выше задержки без нагрузки больше чем в TOLERANCE раз, лимит
+    уменьшается пропорционально (не больше чем вдвое за пересчет), иначе растет на sqrt(limit) -
+    запас под очередь. у CPU-нагруженного сервиса под GIL задержка растет вместе с числом вызовов
+    в работе, и лимит сходится к нескольким вызовам на процесс
+    """
+
+    def __init__(self, initial=INITIAL_LIMIT, min_limit=MIN_LIMIT, max_limit=MAX_LIMIT):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = float(min(max(initial, min_limit), max_limit))
+        self.in_flight = 0
+        self.no_load_rtt = None
+        self._lock = threading.Lock()
+        self._window_started = time.monotonic()
+        self._window_sum = 0.0
+        self._window_count = 0
+        self._window_peak = 0
+
+    def try_acquire(self):
+        with self._lock:
+            if self.in_flight >= int(self.limit):
+                return False
+            self.in_flight += 1
+            self._window_peak = max(self._window_peak, self.in_flight)
+            return True
+
+    def release(self, rtt=None):
+        """rtt - время обработки вызова; None - вызов не годится для замера (поток, ошибка)"""
+        with self._lock:
+            self.in_flight -= 1
+            if rtt is None:
+                return
+            self._window_sum += rtt
+            self._window_count += 1
+            if self.no_load_rtt is None or rtt < self.no_load_rtt:
+                self.no_load_rtt = rtt
+            now = time.monotonic()
+            elapsed = now - self._window_started
+            if elapsed >= WINDOW_SECONDS and self._window_count >= WINDOW_MIN_SAMPLES:
+                self._update(self._window_sum / self._window_count, elapsed)
+                self._window_started = now
+                self._window_sum = 0.0
+                self._window_count = 0
+                self._window_peak = self.in_flight
+
+    def _update(self, short_rtt, elapsed):
+        gradient = max(0.5, min(1.0, TOLERANCE * self.no_load_rtt / short_rtt))
+        self.no_load_rtt *= 1 + NO_LOAD_DRIFT * elapsed
+        # занята меньше половины лимита - расти незачем, задержка ничего не говорит о запасе
+        if gradient >= 1.0 and self._window_peak < self.limit / 2:
+            return
+        target = self.limit * gradient + math.sqrt(self.limit)
+        limit = self.limit * (1 - SMOOTHING) + target * SMOOTHING
+        self.limit = min(max(limit, self.min_limit), self.max_limit)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "limit": int(self.limit),
+                "in_flight": self.in_flight,
+                "no_load_rtt_ms": round(self.no_load_rtt * 1000, 2) if self.no_load_rtt is not None else None
+            }
+
+
+class ConcurrencyInterceptor(grpc.ServerInterceptor):
+    """сбрасывает вызовы сверх адаптивного лимита сразу с RESOURCE_EXHAUSTED вместо очереди пула
+
+    сервер создается с пулом SERVER_THREADS и maximum_concurrent_rpcs=SERVER_THREADS: вызов не ждет
+    свободного потока в очереди пула, а лимит не выше MAX_LIMIT оставляет потоки приоритетным
+    вызовам и отказам. сверх SERVER_THREADS вызовы отклоняет сам gRPC тем же RESOURCE_EXHAUSTED
+    """
+
+    def __init__(self, limit=None, priority=PRIORITY_METHODS):
+        self.limit = limit or AdaptiveLimit()
+        self.priority = frozenset(priority)
+        self._lock = threading.Lock()
+        self._rejected = {}
+
+    def _acquire(self, context, method):
+        if self.limit.try_acquire():
+            return
+        with self._lock:
+            self._rejected[method] = self._rejected.get(method, 0) + 1
+        context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, "Server is overloaded, retry later")
+
+    def _unary(self, behavior, method, measured):
+        def limited(request_or_iterator, context):
+            self._acquire(context, method)
+            started = time.monotonic()
+            rtt = None
+            try:
+                response = behavior(request_or_iterator, context)
+                # отказ обработчика (set_code) быстрый и ничего не говорит о нагрузке
+                if measured and context.code() in (None, grpc.StatusCode.OK):
+                    rtt = time.monotonic() - started
+                return response
+            finally:
+                self.limit.release(rtt)
+        return limited
+
+    def _streaming(self, behavior, method):
+        # поток держит место до конца, но его длительность - не задержка сервиса
+        def limited(request_or_iterator, context):
+            self._acquire(context, method)
+            try:
+                yield from behavior(request_or_iterator, context)
+            finally:
+                self.limit.release()
+        return limited
+
+    def intercept_service(self, continuation, handler_call_details):
+        handler = continuation(handler_call_details)
+        if handler is None:
+            return None
+        method = handler_call_details.method.rsplit('/', 1)[-1]
+        if method in self.priority:
+            return handler
+        serializers = dict(
+            request_deserializer=handler.request_deserializer,
+            response_serializer=handler.response_serializer
+        )
+        if handler.unary_unary:
+            return grpc.unary_unary_rpc_method_handler(self._unary(handler.unary_unary, method, True), **serializers)
+        if handler.unary_stream:
+            return grpc.unary_stream_rpc_method_handler(self._streaming(handler.unary_stream, method), **serializers)
+        if handler.stream_unary:
+            # клиентский поток (пакетная загрузка) - место держится, задержка не замеряется
+            return grpc.stream_unary_rpc_method_handler(self._unary(handler.stream_unary, method, False), **serializers)
+        return grpc.stream_stream_rpc_method_handler(self._streaming(handler.stream_stream, method), **serializers)
+
+    def stats(self):
+        with self._lock:
+            rejected = dict(self._rejected)
+        result = self.limit.stats()
+        result["rejected"] = rejected
+        result["rejected_total"] = sum(rejected.values())
+        return result
@@ -0,0 +1,124 @@
+import os
+import threading
+import grpc
+
+# запас на собственную работу узла после ответа нижестоящего сервиса
+DEADLINE_RESERVE = float(os.getenv('DEADLINE_RESERVE_SECONDS', '0.05'))
+# меньше этого остатка ответ все равно не успеет вернуться клиенту - вызов отклоняется сразу
+MIN_REMAINING = float(os.getenv('DEADLINE_MIN_REMAINING_SECONDS', '0.005'))
+# time_remaining() вызова без дедлайна - "бесконечность" порядка 1e18 секунд
+NO_DEADLINE = 1e9
+
+# причины отброшенной работы
+REJECTED = 'rejected'      # дедлайн истек (или почти истек) до начала обработки
+ABANDONED = 'abandoned'    # бюджета не хватило на вызов вниз по цепочке
+DOWNSTREAM = 'downstream'  # нижестоящий сервис не уложился в переданный ему таймаут
+EXCEEDED = 'exceeded'      # бюджет маршрута gateway исчерпан
+REASONS = (REJECTED, ABANDONED, DOWNSTREAM, EXCEEDED)
+
+
+class DeadlineExceeded(Exception):
+    """бюджет входящего вызова исчерпан, идти вниз по цепочке бессмысленно"""
+
+
+def remaining(context):
+    """остаток дедлайна входящего вызова в секундах, None - у вызова нет дедлайна"""
+    value = context.time_remaining()
+    if value is None or value > NO_DEADLINE:
+        return None
+    return value
+
+
+def downstream_timeout(context, default=None, reserve=DEADLINE_RESERVE):
+    """таймаут для вызова вниз: остаток дедлайна минус запас, не больше default
+
+    без дедлайна у входящего вызова - default; DeadlineExceeded, если остатка не хватает на запас
+    """
+    value = remaining(context)
+    if value is None:
+        return default
+    timeout = value - reserve
+    if timeout <= 0:
+        raise DeadlineExceeded()
+    return timeout if default is None else min(timeout, default)
+
+
+def parse_budgets(value, defaults):
+    """бюджеты маршрутов "weather=8,export=300" поверх значений по умолчанию"""
+    budgets = dict(defaults)
+    for item in value.split(','):
+        if item.strip():
+            name, seconds = item.split('=', 1)
+            budgets[name.strip()] = float(seconds)
+    return budgets
+
+
+class DeadlineStats:
+    """счетчики работы, отброшенной из-за дедлайна: причина -> метод (или маршрут) -> число"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {reason: {} for reason in REASONS}
+
+    def count(self, reason, method):
+        with self._lock:
+            counts = self._counts[reason]
+            counts[method] = counts.get(method, 0) + 1
+
+    def stats(self):
+        with self._lock:
+            result = {reason: dict(counts) for reason, counts in self._counts.items()}
+        result["total"] = sum(sum(counts.values()) for counts in result.values())
+        return result
+
+
+# общие на процесс: их пополняют перехватчик сервера и сами сервисы
+deadline_stats = DeadlineStats()
+
+
+class DeadlineInterceptor(grpc.ServerInterceptor):
+    """отклоняет вызовы, у которых к началу обработки не осталось бюджета
+
+    проверка идет в потоке пула перед обработчиком: вызов, простоявший в очереди занятого пула почти
+    весь свой бюджет, отклоняется до какой-либо работы. полностью истекшие unary-вызовы grpcio
+    отбрасывает и сам, если успел получить отмену, - перехватчик закрывает остальное
+    """
+
+    def __init__(self, stats=deadline_stats, min_remaining=MIN_REMAINING):
+        self.stats = stats
+        self.min_remaining = min_remaining
+
+    def _expired(self, context, method):
+        value = remaining(context)
+        if value is not None and value < self.min_remaining:
+            self.stats.count(REJECTED, method)
+            context.abort(grpc.StatusCode.DEADLINE_EXCEEDED, "Deadline expired before processing started")
+
+    def _unary(self, behavior, method):
+        def guarded(request_or_iterator, context):
+            self._expired(context, method)
+            return behavior(request_or_iterator, context)
+        return guarded
+
+    def _streaming(self, behavior, method):
+        def guarded(request_or_iterator, context):
+            self._expired(context, method)
+            yield from behavior(request_or_iterator, context)
+        return guarded
+
+    def intercept_service(self, continuation, handler_call_details):
+        handler = continuation(handler_call_details)
+        if handler is None:
+            return None
+        method = handler_call_details.method.rsplit('/', 1)[-1]
+        serializers = dict(
+            request_deserializer=handler.request_deserializer,
+            response_serializer=handler.response_serializer
+        )
+        if handler.unary_unary:
+            return grpc.unary_unary_rpc_method_handler(self._unary(handler.unary_unary, method), **serializers)
+        if handler.unary_stream:
+            return grpc.unary_stream_rpc_method_handler(self._streaming(handler.unary_stream, method), **serializers)
+        if handler.stream_unary:
+            return grpc.stream_unary_rpc_method_handler(self._unary(handler.stream_unary, method), **serializers)
+        return grpc.stream_stream_rpc_method_handler(self._streaming(handler.stream_stream, method), **serializers)
@@ -0,0 +1,210 @@
+import os
+import queue
+import threading
+import time
+from concurrent import futures
+
+# пул gRPC-сервера меняет размер сам (PoolController) между EXECUTOR_MIN_WORKERS и верхней границей
+EXECUTOR_AUTOSIZE = os.getenv('EXECUTOR_AUTOSIZE', 'false').lower() in ('1', 'true', 'yes')
+MIN_WORKERS = int(os.getenv('EXECUTOR_MIN_WORKERS', '4'))
+# контроллер раз в интервал смотрит на ожидание в очереди и пропускную способность
+CONTROL_INTERVAL = float(os.getenv('EXECUTOR_CONTROL_INTERVAL_SECONDS', '1'))
+# среднее ожидание в очереди выше этого - потоков не хватает
+TARGET_WAIT = float(os.getenv('EXECUTOR_TARGET_WAIT_SECONDS', '0.01'))
+# прибавка потоков, после которой пропускная способность выросла меньше чем на эту долю, откатывается
+MIN_GAIN = 0.05
+# после отката пул не растет столько секунд: сервис упирается не в потоки, а в CPU (GIL) или ниже
+GROW_HOLD = 30.0
+# пул занят меньше чем наполовину столько интервалов подряд - уменьшается
+SHRINK_INTERVALS = 10
+# свободный поток раз в столько секунд проверяет, не стал ли пул меньше
+IDLE_POLL = 1.0
+
+
+class InstrumentedExecutor(futures.Executor):
+    """пул потоков gRPC-сервера с замерами и изменяемым размером
+
+    в отличие от ThreadPoolExecutor видно, сколько потоков заняты, сколько задач ждет и как долго
+    они ждали; resize меняет размер на ходу, лишние потоки завершаются, освободившись
+    """
+
+    def __init__(self, max_workers, min_workers=MIN_WORKERS, name='grpc-worker'):
+        self.max_workers = max_workers
+        self.min_workers = min(min_workers, max_workers)
+        self.size = max_workers
+        self.name = name
+        self._queue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._workers = 0
+        # потоки, ждущие задачу: новый поток нужен, только если очередь длиннее их числа
+        self._idle = 0
+        self._active = 0
+        self._shutdown = False
+        self._tasks = 0
+        self._wait_total = 0.0
+        # окно контроллера: сбрасывается в sample()
+        self._window_tasks = 0
+        self._window_wait = 0.0
+        self._window_peak = 0
+
+    def submit(self, fn, *args, **kwargs):
+        future = futures.Future()
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("cannot schedule new futures after shutdown")
+            self._queue.put((future, fn, args, kwargs, time.monotonic()))
+            self._spawn()
+        return future
+
+    def _spawn(self):
+        # вызывается под блокировкой
+        while self._workers < self.size and self._idle < self._queue.qsize():
+            self._workers += 1
+            self._idle += 1
+            threading.Thread(target=self._work, name=f'{self.name}-{self._workers}', daemon=True).start()
+
+    def _retire(self):
+        # вызывается под блокировкой: поток уходит, если пул стал меньше
+        if self._shutdown or self._workers > self.size:
+            self._workers -= 1
+            return True
+        return False
+
+    def _work(self):
+        # поток создается свободным (_idle уже учтен в _spawn)
+        while True:
+            try:
+                item = self._queue.get(timeout=IDLE_POLL)
+            except queue.Empty:
+                with self._lock:
+                    if self._retire():
+                        self._idle -= 1
+                        return
+                continue
+            if item is None:
+                return
+            future, fn, args, kwargs, queued_at = item
+            wait = time.monotonic() - queued_at
+            with self._lock:
+                self._idle -= 1
+                self._active += 1
+                self._tasks += 1
+                self._wait_total += wait
+                self._window_tasks += 1
+                self._window_wait += wait
+                self._window_peak = max(self._window_peak, self._active)
+                # задача, поставленная между get и этой блокировкой, видела поток свободным - нужен еще один
+                self._spawn()
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(fn(*args, **kwargs))
+                except BaseException as e:
+                    future.set_exception(e)
+            with self._lock:
+                self._active -= 1
+                if self._retire():
+                    return
+                self._idle += 1
+
+    def resize(self, size):
+        with self._lock:
+            self.size = min(max(size, self.min_workers), self.max_workers)
+            # накопленной очереди новые потоки нужны сразу, а не к следующей задаче
+            self._spawn()
+            return self.size
+
+    def sample(self):
+        """окно с прошлого вызова: (задач, среднее ожидание, пик занятых потоков, длина очереди)"""
+        with self._lock:
+            tasks, wait, peak = self._window_tasks, self._window_wait, self._window_peak
+            self._window_tasks = 0
+            self._window_wait = 0.0
+            self._window_peak = self._active
+        return tasks, wait / tasks if tasks else 0.0, peak, self._queue.qsize()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": self.size,
+                "min_workers": self.min_workers,
+                "max_workers": self.max_workers,
+                "workers": self._workers,
+                "active": self._active,
+                "queued": self._queue.qsize(),
+                "tasks": self._tasks,
+                "wait_avg_ms": round(self._wait_total / self._tasks * 1000, 3) if self._tasks else 0.0
+            }
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        with self._lock:
+            self._shutdown = True
+            workers = self._workers
+        if cancel_futures:
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not None:
+                    item[0].cancel()
+        for _ in range(workers):
+            self._queue.put(None)
+
+
+class PoolController:
+    """подбор размера пула по ожиданию в очереди и пропускной способности (hill climbing)
+
+    задачи ждут дольше TARGET_WAIT - пул растет на четверть; если за следующий интервал пропускная
+    способность не выросла, прибавка откатывается и рост замирает на GROW_HOLD: CPU-нагруженному
+    сервису под GIL лишние потоки только добавляют переключений. долго занятый меньше чем наполовину
+    пул уменьшается
+    """
+
+    def __init__(self, executor, interval=CONTROL_INTERVAL, target_wait=TARGET_WAIT):
+        self.executor = executor
+        self.interval = interval
+        self.target_wait = target_wait
+        self.grown = 0
+        self.reverted = 0
+        self.shrunk = 0
+        self.running = False
+        self._trial = None
+        self._hold_until = 0.0
+        self._underused = 0
+
+    def start(self):
+        self.running = True
+        threading.Thread(target=self._run, daemon=True).start()
+        return self
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.step(*self.executor.sample())
+
+    def step(self, tasks, wait, peak, queued):
+        now = time.monotonic()
+        throughput = tasks / self.interval
+        size = self.executor.size
+        if self._trial is not None:
+            previous_size, previous_throughput = self._trial
+            self._trial = None
+            if throughput < previous_throughput * (1 + MIN_GAIN):
+                self.executor.resize(previous_size)
+                self._hold_until = now + GROW_HOLD
+                self.reverted += 1
+                return
+        if wait > self.target_wait and queued and now >= self._hold_until and size < self.executor.max_workers:
+            self._trial = (size, throughput)
+            self.executor.resize(size + max(1, size // 4))
+            self.grown += 1
+            self._underused = 0
+            return
+        self._underused = self._underused + 1 if peak < size / 2 and not queued else 0
+        if self._underused >= SHRINK_INTERVALS and size > self.executor.min_workers:
+            self.executor.resize(size - max(1, size // 8))
+            self.shrunk += 1
+            self._underused = 0
+
+    def stats(self):
+        return {"running": self.running, "grown": self.grown, "reverted": self.reverted, "shrunk": self.shrunk}
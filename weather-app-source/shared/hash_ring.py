@@ -0,0 +1,93 @@
+import bisect
+import hashlib
+import threading
+import grpc
+
+DEFAULT_VNODES = 128
+# trailing-метаданные отказа FAILED_PRECONDITION: реплика, которой город больше не принадлежит,
+# возвращает в них свой состав кольца, клиент перестраивает кольцо и повторяет вызов у владельца
+MEMBERSHIP_KEY = 'ring-members'
+
+
+def shard_key(city):
+    # шардируем по нормализованному названию, как его хранит analytics
+    return city.strip().lower()
+
+
+def _hash(value):
+    return int.from_bytes(hashlib.md5(value.encode('utf-8')).digest()[:8], 'big')
+
+
+class HashRing:
+    """консистентное хеширование с виртуальными узлами: при смене состава переезжает ~1/N ключей"""
+
+    def __init__(self, nodes, vnodes=DEFAULT_VNODES):
+        self.vnodes = vnodes
+        self.nodes = sorted(set(nodes))
+        points = sorted(
+            (_hash(f"{node}#{replica}"), node)
+            for node in self.nodes
+            for replica in range(vnodes)
+        )
+        self._hashes = [point for point, _ in points]
+        self._owners = [node for _, node in points]
+
+    def node_for(self, city):
+        if not self._hashes:
+            raise ValueError("Hash ring is empty")
+        index = bisect.bisect(self._hashes, _hash(shard_key(city))) % len(self._hashes)
+        return self._owners[index]
+
+
+def parse_replicas(value):
+    return [address.strip() for address in value.split(',') if address.strip()]
+
+
+def membership_from_error(error):
+    """состав кольца из отказа реплики-не-владельца, None - отказ по другой причине"""
+    if error.code() != grpc.StatusCode.FAILED_PRECONDITION:
+        return None
+    for key, value in error.trailing_metadata() or ():
+        if key == MEMBERSHIP_KEY:
+            return parse_replicas(value) or None
+    return None
+
+
+class ReplicaRing:
+    """кольцо реплик и клиенты к ним у вызывающей стороны (gateway, публикатор data-processor)
+
+    начальный состав - из ANALYTICS_REPLICAS; после UpdateMembership реплики отвечают на вызов по чужому
+    городу отказом с новым составом, и reload перестраивает кольцо. клиенты только добавляются: поток,
+    уже взявший старое кольцо, найдет клиента для любого его узла
+    """
+
+    def __init__(self, replicas, make_client):
+        self._make_client = make_client
+        self._lock = threading.Lock()
+        self.clients = {address: make_client(address) for address in replicas}
+        self.ring = HashRing(replicas)
+
+    def node_for(self, city):
+        return self.ring.node_for(city)
+
+    def client_for(self, city):
+        return self.clients[self.ring.node_for(city)]
+
+    def nodes(self):
+        return list(self.ring.nodes)
+
+    def reload(self, error):
+        """True - кольцо перестроено по составу из отказа и вызов стоит повторить"""
+        replicas = membership_from_error(error)
+        if replicas is None:
+            return False
+        with self._lock:
+            # тот же состав: реплики еще не договорились о кольце, повтор ушел бы туда же
+            if sorted(set(replicas)) == self.ring.nodes:
+                return False
+            for address in replicas:
+                if address not in self.clients:
+                    self.clients[address] = self._make_client(address)
+            self.ring = HashRing(replicas)
+        print(f"Analytics ring reloaded: {', '.join(self.ring.nodes)}")
+        return True
@@ -0,0 +1,365 @@
+import bisect
+import threading
+import time
+import grpc
+
+# текстовый формат Prometheus (exposition format 0.0.4)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# границы гистограмм задержки в секундах: от вызова соседа по хосту до таймаута провайдера
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _add_counts(total, values):
+    for labels, value in values.items():
+        total[labels] = total.get(labels, 0) + value
+
+
+def _add_buckets(total, values):
+    for labels, counts in values.items():
+        merged = total.get(labels)
+        if merged is None:
+            total[labels] = list(counts)
+        else:
+            for i, count in enumerate(counts):
+                merged[i] += count
+
+
+class _Shards:
+    """значения метрики по потокам: поток пишет только в свой словарь, без блокировки и без гонок
+
+    складываются они только при чтении /metrics; словари завершившихся потоков (пул gRPC меняет
+    размер) сливаются в один, чтобы не копиться
+    """
+
+    def __init__(self, merge):
+        self._merge = merge
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards = []
+        self._retired = {}
+
+    def local(self):
+        try:
+            return self._local.values
+        except AttributeError:
+            values = self._local.values = {}
+            with self._lock:
+                self._shards.append((threading.current_thread(), values))
+            return values
+
+    def collect(self):
+        total = {}
+        with self._lock:
+            alive = []
+            for thread, values in self._shards:
+                if thread.is_alive():
+                    alive.append((thread, values))
+                else:
+                    self._merge(self._retired, values)
+            self._shards = alive
+            self._merge(total, self._retired)
+        for _, values in alive:
+            # копия словаря атомарна под GIL, а поток-владелец может в это время дописывать
+            self._merge(total, dict(values))
+        return total
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._shards = _Shards(_add_counts)
+
+    def inc(self, *label_values, value=1):
+        values = self._shards.local()
+        values[label_values] = values.get(label_values, 0) + value
+
+    def samples(self):
+        for label_values, value in sorted(self._shards.collect().items()):
+            yield self.name, dict(zip(self.labels, label_values)), value
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._shards = _Shards(_add_buckets)
+
+    def observe(self, value, *label_values):
+        values = self._shards.local()
+        counts = values.get(label_values)
+        if counts is None:
+            # по корзине на границу, корзина +Inf и сумма последним элементом
+            counts = values[label_values] = [0] * (len(self.buckets) + 2)
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def samples(self):
+        bounds = self.buckets + (float('inf'),)
+        for label_values, counts in sorted(self._shards.collect().items()):
+            labels = dict(zip(self.labels, label_values))
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                yield f'{self.name}_bucket', {**labels, "le": bound}, cumulative
+            yield f'{self.name}_sum', labels, counts[-1]
+            yield f'{self.name}_count', labels, cumulative
+
+
+class Callback:
+    """метрика, которую при чтении считает fn: число или {значения меток: число}
+
+    так в /metrics попадают счетчики, которые уже ведут сами компоненты (лимит, пул, отсеки)
+    """
+
+    def __init__(self, name, help, fn, labels=(), kind='gauge'):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self.labels = labels
+        self.kind = kind
+
+    def samples(self):
+        value = self.fn()
+        if not isinstance(value, dict):
+            yield self.name, {}, value
+            return
+        for label_values, item in sorted(value.items()):
+            yield self.name, dict(zip(self.labels, label_values)), item
+
+
+def _format_value(value):
+    if isinstance(value, bool):
+        return str(int(value))
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _escape(value):
+    if not isinstance(value, str):
+        return _format_value(value)
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+class Registry:
+    """метрики процесса; повторная регистрация имени возвращает уже созданную метрику"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def _register(self, metric, replace=False):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None and not replace:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, help, labels=()):
+        return self._register(Counter(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def callback(self, name, help, fn, labels=(), kind='gauge'):
+        # fn замыкается на конкретный объект - новый заменяет прежний
+        return self._register(Callback(name, help, fn, labels, kind), replace=True)
+
+    def render(self):
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        lines = []
+        for metric in metrics:
+            # семейство без замеров (серверные метрики в gateway) не выводится
+            samples = list(metric.samples())
+            if not samples:
+                continue
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, labels, value in samples:
+                lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+def _labeled(line, label, value):
+    if '{' in line:
+        return line.replace('{', f'{{{label}="{_escape(value)}",', 1)
+    name, _, rest = line.partition(' ')
+    return f'{name}{{{label}="{_escape(value)}"}} {rest}'
+
+
+def merge_rendered(texts, label='worker'):
+    """выводы render() нескольких процессов одним текстом: замеры каждого - с меткой label=ключ"""
+    families = {}
+    for key, text in texts.items():
+        samples = None
+        for line in text.splitlines():
+            if line.startswith('# '):
+                _, kind, name, _ = line.split(' ', 3)
+                headers, samples = families.setdefault(name, ({}, []))
+                headers.setdefault(kind, line)
+            elif line and samples is not None:
+                samples.append(_labeled(line, label, key))
+    lines = []
+    for name in sorted(families):
+        headers, samples = families[name]
+        lines.extend(headers[kind] for kind in ('HELP', 'TYPE') if kind in headers)
+        lines.extend(samples)
+    return '\n'.join(lines) + '\n'
+
+
+# общий на процесс: /metrics health-приложения отдает его целиком
+registry = Registry()
+
+server_handled = registry.counter(
+    'grpc_server_handled_total', 'gRPC calls completed by the server', ('method', 'code'))
+server_latency = registry.histogram(
+    'grpc_server_handling_seconds', 'Handling time of unary gRPC calls on the server', ('method',))
+client_handled = registry.counter(
+    'grpc_client_handled_total', 'gRPC calls completed by clients of this process', ('target', 'method', 'code'))
+client_latency = registry.histogram(
+    'grpc_client_handling_seconds', 'Latency of unary gRPC calls made by this process', ('target', 'method'))
+
+
+def _status(context, failed):
+    code = context.code()
+    if code is None:
+        code = grpc.StatusCode.UNKNOWN if failed else grpc.StatusCode.OK
+    return code.name
+
+
+class MetricsInterceptor(grpc.ServerInterceptor):
+    """число вызовов по методу и коду ответа, задержка unary-вызовов
+
+    стоит первым в списке перехватчиков: отказы по дедлайну и лимиту тоже попадают в счетчики.
+    длительность потока - не задержка сервиса, у потоковых вызовов считается только итог
+    """
+
+    def _unary(self, behavior, method):
+        def measured(request_or_iterator, context):
+            started = time.monotonic()
+            failed = True
+            try:
+                response = behavior(request_or_iterator, context)
+                failed = False
+                return response
+            finally:
+                server_latency.observe(time.monotonic() - started, method)
+                server_handled.inc(method, _status(context, failed))
+        return measured
+
+    def _streaming(self, behavior, method):
+        def measured(request_or_iterator, context):
+            failed = True
+            try:
+                yield from behavior(request_or_iterator, context)
+                failed = False
+            finally:
+                server_handled.inc(method, _status(context, failed))
+        return measured
+
+    def _wrap(self, behavior, streaming, handler_call_details):
+        method = handler_call_details.method.rsplit('/', 1)[-1]
+        return self._streaming(behavior, method) if streaming else self._unary(behavior, method)
+
+    def intercept_service(self, continuation, handler_call_details):
+        handler = continuation(handler_call_details)
+        if handler is None:
+            return None
+        serializers = dict(
+            request_deserializer=handler.request_deserializer,
+            response_serializer=handler.response_serializer
+        )
+        if handler.unary_unary:
+            return grpc.unary_unary_rpc_method_handler(
+                self._wrap(handler.unary_unary, False, handler_call_details), **serializers)
+        if handler.unary_stream:
+            return grpc.unary_stream_rpc_method_handler(
+                self._wrap(handler.unary_stream, True, handler_call_details), **serializers)
+        if handler.stream_unary:
+            return grpc.stream_unary_rpc_method_handler(
+                self._wrap(handler.stream_unary, False, handler_call_details), **serializers)
+        return grpc.stream_stream_rpc_method_handler(
+            self._wrap(handler.stream_stream, True, handler_call_details), **serializers)
+
+
+class ClientMetricsInterceptor(grpc.UnaryUnaryClientInterceptor, grpc.UnaryStreamClientInterceptor,
+                               grpc.StreamUnaryClientInterceptor, grpc.StreamStreamClientInterceptor):
+    """число и задержка исходящих вызовов по адресу (как его передал клиент) и методу"""
+
+    def __init__(self, target):
+        self.target = target
+
+    def _watch(self, call, method, started):
+        method = method.rsplit('/', 1)[-1]
+        if started is None:
+            call.add_done_callback(lambda done: client_handled.inc(self.target, method, done.code().name))
+            return call
+
+        def finished(done):
+            client_latency.observe(time.monotonic() - started, self.target, method)
+            client_handled.inc(self.target, method, done.code().name)
+        call.add_done_callback(finished)
+        return call
+
+    def _intercept(self, continuation, details, request, measured):
+        started = time.monotonic() if measured else None
+        return self._watch(continuation(details, request), details.method, started)
+
+    def intercept_unary_unary(self, continuation, client_call_details, request):
+        return self._intercept(continuation, client_call_details, request, True)
+
+    def intercept_stream_unary(self, continuation, client_call_details, request_iterator):
+        return self._intercept(continuation, client_call_details, request_iterator, True)
+
+    def intercept_unary_stream(self, continuation, client_call_details, request):
+        return self._intercept(continuation, client_call_details, request, False)
+
+    def intercept_stream_stream(self, continuation, client_call_details, request_iterator):
+        return self._intercept(continuation, client_call_details, request_iterator, False)
+
+
+def register_deadline_stats(stats):
+    """отброшенная из-за дедлайна работа (то же, что /deadlines)"""
+    registry.callback(
+        'deadline_dropped_total', 'Work dropped because the call deadline ran out', lambda: {
+            (reason, method): count
+            for reason, counts in stats.stats().items() if reason != "total"
+            for method, count in counts.items()
+        }, ('reason', 'method'), kind='counter')
+
+
+def register_server_stats(limiter, executor, deadlines):
+    """адаптивный лимит, пул обработчиков и дедлайны gRPC-сервера (то же, что /concurrency и /executor)"""
+    registry.callback(
+        'grpc_server_concurrency_limit', 'Current adaptive concurrency limit', lambda: limiter.limit.stats()["limit"])
+    registry.callback(
+        'grpc_server_in_flight', 'Calls currently counted against the concurrency limit',
+        lambda: limiter.limit.stats()["in_flight"])
+    registry.callback(
+        'grpc_server_shed_total', 'Calls rejected over the concurrency limit',
+        lambda: {(method,): count for method, count in limiter.stats()["rejected"].items()}, ('method',), kind='counter')
+    for key, help in (("workers", "Handler threads started"), ("active", "Handler threads running a call"),
+                      ("queued", "Calls waiting for a handler thread"), ("size", "Target handler pool size")):
+        registry.callback(f'grpc_server_executor_{key}', help, lambda key=key: executor.stats()[key])
+    registry.callback(
+        'grpc_server_executor_tasks_total', 'Calls taken by handler threads', lambda: executor.stats()["tasks"],
+        kind='counter')
+    register_deadline_stats(deadlines)
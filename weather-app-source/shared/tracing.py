@@ -0,0 +1,393 @@
+import collections
+import contextvars
+import ipaddress
+import json
+import os
+import queue
+import random
+import re
+import threading
+import time
+import urllib.request
+import grpc
+
+from metrics import ClientMetricsInterceptor, MetricsInterceptor, registry
+
+# куда отправлять спаны: путь к файлу (JSON построчно) или http(s)://... коллектора, принимающего
+# OTLP/HTTP JSON (например http://otel-collector:4318/v1/traces); пусто - трассировка выключена
+TRACE_EXPORT = os.getenv('TRACE_EXPORT', '')
+# доля запросов, которые записываются; решение принимает gateway (или доверенный клиент своим traceparent),
+# дальше передаются только выбранные трассы. 1% держит накладные расходы под полной нагрузкой в пределах процента
+SAMPLE_RATE = float(os.getenv('TRACE_SAMPLE_RATE', '0.01'))
+# сети (CIDR через запятую), чей флаг sampled в traceparent gateway принимает; у остальных клиентов
+# трасса продолжается, но выбирается по SAMPLE_RATE - иначе любой клиент включает запись всех своих запросов
+TRUSTED_NETWORKS = [
+    ipaddress.ip_network(network.strip(), strict=False)
+    for network in os.getenv('TRACE_TRUSTED_NETWORKS', '').split(',') if network.strip()
+]
+# спаны уходят пачками раз в интервал или по заполнении пачки; сверх очереди - отбрасываются
+EXPORT_INTERVAL = float(os.getenv('TRACE_EXPORT_INTERVAL_SECONDS', '2'))
+EXPORT_BATCH = 512
+MAX_QUEUE = 10000
+EXPORT_TIMEOUT = 5
+
+TRACING_ENABLED = bool(TRACE_EXPORT)
+# W3C Trace Context: заголовок HTTP и ключ метаданных gRPC
+TRACEPARENT = 'traceparent'
+_TRACEPARENT_FORMAT = re.compile(r'([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})')
+
+SERVER = 'server'
+CLIENT = 'client'
+INTERNAL = 'internal'
+
+# текущий спан потока (обработчика gRPC или запроса Flask)
+_current = contextvars.ContextVar('span', default=None)
+
+
+def _new_id(size):
+    return random.getrandbits(size * 8).to_bytes(size, 'big').hex()
+
+
+def parse_traceparent(value):
+    """(trace_id, span_id, sampled) из "00-<32 hex>-<16 hex>-<флаги>", None - заголовка нет или он негоден"""
+    match = _TRACEPARENT_FORMAT.fullmatch(value) if value else None
+    if match is None:
+        return None
+    version, trace_id, span_id, flags = match.groups()
+    # версия ff и нулевые идентификаторы по W3C Trace Context недействительны
+    if version == 'ff' or trace_id == '0' * 32 or span_id == '0' * 16:
+        return None
+    return trace_id, span_id, bool(int(flags, 16) & 1)
+
+
+class Span:
+    """участок работы запроса; у невыбранного (sampled=False) только идентификаторы для передачи дальше"""
+
+    def __init__(self, name, trace_id, parent_id, sampled, kind=INTERNAL, attributes=None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = _new_id(8)
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.kind = kind
+        self.attributes = attributes or {}
+        self.error = None
+        self.start_ns = time.time_ns()
+        self._token = None
+
+    @property
+    def traceparent(self):
+        return f'00-{self.trace_id}-{self.span_id}-{"01" if self.sampled else "00"}'
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def set_error(self, message):
+        self.error = message
+
+    def end(self):
+        if self.sampled:
+            _export(self, time.time_ns())
+
+    def __enter__(self):
+        self._token = activate(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        deactivate(self._token)
+        if exc is not None and self.error is None:
+            self.error = f'{exc_type.__name__}: {exc}'
+        self.end()
+        return False
+
+
+class _NoopSpan:
+    # дочерний спан вне выбранной трассы: ничего не пишет, не меняет текущий спан и не передается дальше
+    sampled = False
+    traceparent = None
+
+    def set_attribute(self, key, value):
+        pass
+
+    def set_error(self, message):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def activate(span):
+    """делает span текущим вне with (запрос Flask, обработчик gRPC); токен - для deactivate"""
+    return _current.set(span)
+
+
+def deactivate(token):
+    _current.reset(token)
+
+
+def trusted_source(address):
+    """адрес клиента из TRUSTED_NETWORKS: его решению о выборе трассы можно верить"""
+    try:
+        ip = ipaddress.ip_address(address or '')
+    except ValueError:
+        return False
+    return any(ip in network for network in TRUSTED_NETWORKS)
+
+
+def start_span(name, traceparent=None, kind=SERVER, attributes=None, trust_parent=True):
+    """спан входящего запроса: продолжает трассу из traceparent или начинает новую
+
+    новая трасса выбирается с вероятностью SAMPLE_RATE; невыбранный спан в вызовы вниз не передается,
+    сервисы ниже без traceparent спанов не открывают - обрывков трассы не бывает.
+    trust_parent=False (внешний клиент) - флаг sampled родителя не учитывается, выбор по SAMPLE_RATE
+    """
+    parent = parse_traceparent(traceparent)
+    if parent is None:
+        return Span(name, _new_id(16), None, random.random() < SAMPLE_RATE, kind, attributes)
+    trace_id, parent_id, sampled = parent
+    if not trust_parent:
+        sampled = random.random() < SAMPLE_RATE
+    return Span(name, trace_id, parent_id, sampled, kind, attributes)
+
+
+def child_span(name, kind=INTERNAL, **attributes):
+    """дочерний спан текущего (with child_span(...) as span); вне выбранной трассы - NOOP_SPAN"""
+    parent = _current.get()
+    if parent is None or not parent.sampled:
+        return NOOP_SPAN
+    return Span(name, parent.trace_id, parent.span_id, True, kind, attributes)
+
+
+class _Exporter:
+    """фоновая отправка спанов пачками: в файл построчно или коллектору в формате OTLP/HTTP JSON"""
+
+    def __init__(self, target, service):
+        self.target = target
+        self.service = service
+        self.exported = 0
+        self.dropped = 0
+        self.failed = 0
+        self._queue = queue.Queue(MAX_QUEUE)
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def put(self, record):
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            batch = []
+            deadline = time.monotonic() + EXPORT_INTERVAL
+            while len(batch) < EXPORT_BATCH:
+                try:
+                    batch.append(self._queue.get(timeout=max(deadline - time.monotonic(), 0.001)))
+                except queue.Empty:
+                    break
+            if not batch:
+                continue
+            try:
+                self._write(batch)
+                self.exported += len(batch)
+            except Exception as e:
+                self.failed += len(batch)
+                print(f"Trace export to {self.target} failed: {e}")
+
+    def _write(self, batch):
+        if self.target.startswith(('http://', 'https://')):
+            body = json.dumps(_otlp(self.service, batch)).encode()
+            request = urllib.request.Request(self.target, data=body, headers={'Content-Type': 'application/json'})
+            urllib.request.urlopen(request, timeout=EXPORT_TIMEOUT).close()
+            return
+        with open(self.target, 'a') as f:
+            for record in batch:
+                f.write(json.dumps({"service": self.service, **record}) + '\n')
+
+    def stats(self):
+        return {
+            "target": self.target,
+            "queued": self._queue.qsize(),
+            "exported": self.exported,
+            "dropped": self.dropped,
+            "failed": self.failed
+        }
+
+
+_exporter = None
+_exporter_lock = threading.Lock()
+
+
+def configure_tracing(service):
+    """имя сервиса в спанах и запуск экспорта; без TRACE_EXPORT ничего не делает"""
+    global _exporter
+    if not TRACING_ENABLED:
+        return
+    with _exporter_lock:
+        if _exporter is None:
+            _exporter = _Exporter(TRACE_EXPORT, service)
+    for key, help in (("exported", "Spans written to TRACE_EXPORT"), ("dropped", "Spans dropped over the export queue"),
+                      ("failed", "Spans lost to export errors")):
+        registry.callback(f'trace_spans_{key}_total', help, lambda key=key: _exporter.stats()[key], kind='counter')
+
+
+def _export(span, end_ns):
+    if _exporter is None:
+        return
+    _exporter.put({
+        "trace_id": span.trace_id,
+        "span_id": span.span_id,
+        "parent_id": span.parent_id,
+        "name": span.name,
+        "kind": span.kind,
+        "start_ns": span.start_ns,
+        "end_ns": end_ns,
+        "duration_ms": round((end_ns - span.start_ns) / 1e6, 3),
+        "error": span.error,
+        "attributes": span.attributes
+    })
+
+
+_OTLP_KINDS = {INTERNAL: 1, SERVER: 2, CLIENT: 3}
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp(service, batch):
+    spans = []
+    for record in batch:
+        span = {
+            "traceId": record["trace_id"],
+            "spanId": record["span_id"],
+            "name": record["name"],
+            "kind": _OTLP_KINDS[record["kind"]],
+            "startTimeUnixNano": str(record["start_ns"]),
+            "endTimeUnixNano": str(record["end_ns"]),
+            "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in record["attributes"].items()],
+            # 1 - OK, 2 - ERROR
+            "status": {"code": 2, "message": record["error"]} if record["error"] else {"code": 1}
+        }
+        if record["parent_id"]:
+            span["parentSpanId"] = record["parent_id"]
+        spans.append(span)
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service}}]},
+        "scopeSpans": [{"scope": {"name": "weather-app"}, "spans": spans}]
+    }]}
+
+
+def _code_name(context, failed):
+    code = context.code()
+    if code is None:
+        code = grpc.StatusCode.UNKNOWN if failed else grpc.StatusCode.OK
+    return code.name
+
+
+class TracingInterceptor(MetricsInterceptor):
+    """MetricsInterceptor, который еще открывает спан на каждый входящий вызов (traceparent - из метаданных)
+
+    один перехватчик вместо двух: каждый слой сервера заново строит обработчик на каждый вызов. спан
+    охватывает и замеры, и отказы по дедлайну и лимиту; код ответа - атрибут спана. вызов без
+    выбранного traceparent идет без спана - трассу начинает только gateway
+    """
+
+    def _finish(self, span, context, failed):
+        code = _code_name(context, failed)
+        span.set_attribute('rpc.grpc.status_code', code)
+        if code != 'OK':
+            details = context.details()
+            span.set_error(details.decode(errors='replace') if isinstance(details, bytes) else details or code)
+        span.end()
+
+    def _traced_unary(self, behavior, name, parent):
+        trace_id, parent_id, _ = parent
+
+        def traced(request_or_iterator, context):
+            span = Span(name, trace_id, parent_id, True, SERVER)
+            token = activate(span)
+            failed = True
+            try:
+                response = behavior(request_or_iterator, context)
+                failed = False
+                return response
+            finally:
+                deactivate(token)
+                self._finish(span, context, failed)
+        return traced
+
+    def _traced_streaming(self, behavior, name, parent):
+        trace_id, parent_id, _ = parent
+
+        def traced(request_or_iterator, context):
+            span = Span(name, trace_id, parent_id, True, SERVER)
+            token = activate(span)
+            failed = True
+            try:
+                yield from behavior(request_or_iterator, context)
+                failed = False
+            finally:
+                deactivate(token)
+                self._finish(span, context, failed)
+        return traced
+
+    def _wrap(self, behavior, streaming, handler_call_details):
+        measured = super()._wrap(behavior, streaming, handler_call_details)
+        parent = None
+        for key, value in handler_call_details.invocation_metadata or ():
+            if key == TRACEPARENT:
+                parent = parse_traceparent(value)
+                break
+        if parent is None or not parent[2]:
+            return measured
+        name = handler_call_details.method.lstrip('/')
+        if streaming:
+            return self._traced_streaming(measured, name, parent)
+        return self._traced_unary(measured, name, parent)
+
+
+class _CallDetails(collections.namedtuple(
+        '_CallDetails', ('method', 'timeout', 'metadata', 'credentials', 'wait_for_ready', 'compression')),
+        grpc.ClientCallDetails):
+    pass
+
+
+class ClientTracingInterceptor(ClientMetricsInterceptor):
+    """ClientMetricsInterceptor, который в выбранной трассе еще открывает клиентский спан и передает traceparent
+
+    один перехватчик вместо двух: каждый слой intercept_channel заново строит вызов на каждый запрос
+    """
+
+    def _intercept(self, continuation, details, request, measured):
+        parent = _current.get()
+        if parent is None or not parent.sampled:
+            # невыбранный запрос идет без метаданных: ни спана, ни разбора traceparent ниже
+            return super()._intercept(continuation, details, request, measured)
+        span = Span(details.method.lstrip('/'), parent.trace_id, parent.span_id, True, CLIENT,
+                    {"net.peer.name": self.target})
+        metadata = list(details.metadata or ()) + [(TRACEPARENT, span.traceparent)]
+        call = super()._intercept(continuation, _CallDetails(
+            details.method, details.timeout, metadata, details.credentials, details.wait_for_ready, details.compression
+        ), request, measured)
+
+        def finished(done):
+            code = done.code()
+            span.set_attribute('rpc.grpc.status_code', code.name)
+            if code != grpc.StatusCode.OK:
+                span.set_error(done.details() or code.name)
+            span.end()
+        call.add_done_callback(finished)
+        return call
@@ -0,0 +1,132 @@
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+# число процессов gRPC-сервера сервиса: у каждого свой интерпретатор и свой GIL
+GRPC_WORKERS = int(os.getenv('GRPC_WORKERS', '1'))
+# номер процесса, задается лаунчером; 0 - единственный процесс
+WORKER_INDEX = int(os.getenv('GRPC_WORKER_INDEX', '0'))
+# процесс-воркер отдает свои счетчики лаунчеру по HTTP на 127.0.0.1:(GRPC_WORKER_STATS_BASE_PORT + index)
+WORKER_STATS_BASE_PORT = int(os.getenv('GRPC_WORKER_STATS_BASE_PORT', '15000'))
+# порт счетчиков этого процесса, задается лаунчером; 0 - процесс не воркер
+WORKER_STATS_PORT = int(os.getenv('GRPC_WORKER_STATS_PORT', '0'))
+RESTART_DELAY = 1.0
+STOP_TIMEOUT = 10
+STATS_TIMEOUT = 2.0
+
+
+def worker_env(index):
+    """переменные окружения процесса index: unix-сокет у каждого свой (SO_REUSEPORT на них не работает)"""
+    env = {'GRPC_WORKER_INDEX': str(index)}
+    unix_socket = os.getenv('GRPC_UNIX_SOCKET', '')
+    if unix_socket:
+        env['GRPC_UNIX_SOCKET'] = f'{unix_socket}.{index}'
+    return env
+
+
+def watch_parent():
+    """процесс-воркер завершается вместе с лаунчером, даже если тот убит без остановки воркеров"""
+    parent = os.getppid()
+
+    def watch():
+        while os.getppid() == parent:
+            time.sleep(1)
+        os._exit(0)
+
+    threading.Thread(target=watch, daemon=True).start()
+
+
+class WorkerPool:
+    """процессы gRPC-сервера: запуск script в N интерпретаторах, перезапуск упавших, остановка
+
+    процессы запускаются заново, а не fork-ом: gRPC не переживает fork с уже созданными каналами
+    и потоками, а отдельный интерпретатор заодно не наследует состояние родителя;
+    счетчики (метрики, лимит, пул) у каждого процесса свои - лаунчер собирает их по HTTP
+    """
+
+    def __init__(self, script, count=GRPC_WORKERS, env=None, stats_port=WORKER_STATS_BASE_PORT):
+        self.script = script
+        self.count = count
+        self.env = env
+        self.stats_port = stats_port
+        self._processes = [None] * count
+        self._restarts = [0] * count
+        self._stopping = False
+        self._lock = threading.Lock()
+
+    def _spawn(self, index):
+        env = dict(os.environ, GRPC_WORKERS=str(self.count), GRPC_WORKER_STATS_PORT=str(self.stats_port + index))
+        env.update(worker_env(index))
+        if self.env is not None:
+            env.update(self.env(index))
+        return subprocess.Popen([sys.executable, self.script], env=env)
+
+    def start(self):
+        with self._lock:
+            for index in range(self.count):
+                self._processes[index] = self._spawn(index)
+        threading.Thread(target=self._monitor, daemon=True).start()
+        # docker stop шлет SIGTERM: воркеры останавливаются вместе с лаунчером
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        print(f"Started {self.count} gRPC worker processes: {', '.join(str(p.pid) for p in self._processes)}")
+
+    def _monitor(self):
+        while not self._stopping:
+            time.sleep(RESTART_DELAY)
+            with self._lock:
+                for index, process in enumerate(self._processes):
+                    if self._stopping or process.poll() is None:
+                        continue
+                    print(f"gRPC worker {index} (pid {process.pid}) exited with {process.returncode}, restarting")
+                    self._restarts[index] += 1
+                    self._processes[index] = self._spawn(index)
+
+    def healthy(self):
+        with self._lock:
+            return all(process.poll() is None for process in self._processes)
+
+    def stats(self):
+        with self._lock:
+            return [
+                {
+                    "index": index,
+                    "pid": process.pid,
+                    "alive": process.poll() is None,
+                    "restarts": self._restarts[index]
+                }
+                for index, process in enumerate(self._processes)
+            ]
+
+    def fetch(self, path):
+        """ответы процессов на path их HTTP счетчиков: {index: тело}, не ответившие пропускаются"""
+        responses = {}
+        for index in range(self.count):
+            try:
+                with urllib.request.urlopen(f'http://127.0.0.1:{self.stats_port + index}{path}',
+                                            timeout=STATS_TIMEOUT) as response:
+                    responses[index] = response.read().decode('utf-8')
+            except OSError:
+                continue
+        return responses
+
+    def collect(self, path):
+        """JSON-ответы процессов: [{"worker": index, "stats": ...}]"""
+        return [{"worker": index, "stats": json.loads(body)} for index, body in self.fetch(path).items()]
+
+    def stop(self):
+        self._stopping = True
+        with self._lock:
+            processes = list(self._processes)
+        for process in processes:
+            if process.poll() is None:
+                process.terminate()
+        for process in processes:
+            try:
+                process.wait(STOP_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                process.kill()
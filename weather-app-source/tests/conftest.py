@@ -0,0 +1,47 @@
+import os
+import sys
+
+import grpc
+import pytest
+
+# модули импортируются так же, как в контейнерах сервисов: каталог сервиса, shared и generated в sys.path
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in ('generated', 'shared', 'services/data-processor', 'services/api-gateway', 'services/analytics'):
+    sys.path.insert(0, os.path.join(ROOT, path))
+
+
+class FakeContext:
+    """контекст обработчика gRPC для прямого вызова методов сервиса"""
+
+    def __init__(self, time_remaining=None):
+        self.code = None
+        self.details = None
+        self.trailing_metadata = ()
+        self.active = True
+        self._time_remaining = time_remaining
+
+    def set_code(self, code):
+        self.code = code
+
+    def set_details(self, details):
+        self.details = details
+
+    def set_trailing_metadata(self, metadata):
+        self.trailing_metadata = metadata
+
+    def abort(self, code, details):
+        # grpcio прерывает обработчик исключением
+        self.code = code
+        self.details = details
+        raise grpc.RpcError(details)
+
+    def is_active(self):
+        return self.active
+
+    def time_remaining(self):
+        return self._time_remaining
+
+
+@pytest.fixture
+def context():
+    return FakeContext()
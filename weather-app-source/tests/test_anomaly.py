@@ -0,0 +1,71 @@
+import numpy as np
+
+from anomaly import KIND_DISAGREEMENT, KIND_ZSCORE, MIN_BASELINE_POINTS, AnomalyScanner, score
+from metrics import registry
+
+NAN = float('nan')
+
+
+class _Fleet:
+    def __init__(self, cities, latest, baseline, openweather, weatherapi):
+        self.snapshot = (cities, np.array(latest), np.array(baseline), np.array(openweather), np.array(weatherapi))
+
+    def scan_snapshot(self):
+        return self.snapshot
+
+
+def _baseline(values, width=12):
+    row = [NAN] * width
+    row[:len(values)] = values
+    return row
+
+
+def test_score_needs_enough_baseline():
+    steady = [10.0, 10.5, 9.5, 10.0, 10.2, 9.8, 10.1]
+    zscores, median, disagreement = score(
+        np.array([20.0, 20.0]),
+        np.array([_baseline(steady), _baseline(steady[:MIN_BASELINE_POINTS - 1])]),
+        np.array([1.0, NAN]), np.array([4.5, 2.0]))
+    assert zscores[0] > 3.5 and np.isnan(zscores[1])
+    assert median[0] == 10.0
+    assert disagreement[0] == 3.5 and np.isnan(disagreement[1])
+
+
+def test_flat_history_has_finite_score():
+    zscores, _, _ = score(np.array([11.0]), np.array([_baseline([10.0] * 8)]), np.array([NAN]), np.array([NAN]))
+    assert np.isfinite(zscores[0])
+
+
+def _scanner():
+    steady = _baseline([10.0, 10.5, 9.5, 10.0, 10.2, 9.8, 10.1])
+    fleet = _Fleet(['paris', 'oslo', 'lima'], [30.0, 10.0, 10.0], [steady, steady, steady],
+                   [30.0, 10.0, 5.0], [30.0, 10.0, 12.0])
+    return AnomalyScanner(fleet)
+
+
+def test_scan_finds_and_ranks(capsys):
+    scanner = _scanner()
+    scanner.scan()
+    anomalies, total = scanner.query('', 0.0, 10)
+    assert total == 2
+    assert [(anomaly.city, anomaly.kind) for anomaly in anomalies] == [('paris', KIND_ZSCORE), ('lima', KIND_DISAGREEMENT)]
+    assert scanner.query(KIND_DISAGREEMENT, 0.0, 10)[1] == 1
+    assert scanner.query('', 0.0, 1)[0][0].city == 'paris'
+    assert scanner.query('', 1000.0, 10) == ([], 0)
+    assert [anomaly.kind for anomaly in scanner.for_city('lima')] == [KIND_DISAGREEMENT]
+    assert scanner.for_city('oslo') == []
+    assert scanner.last_pass()["cities_scanned"] == 3
+    assert capsys.readouterr().out.count('Anomaly scan') == 1
+
+    text = registry.render()
+    assert f'analytics_anomalies{{kind="{KIND_ZSCORE}"}} 1' in text
+    assert 'analytics_anomaly_cities_scanned 3' in text
+    assert 'analytics_anomaly_scan_seconds_count' in text
+
+
+def test_quiet_pass_is_not_logged(capsys):
+    scanner = AnomalyScanner(_Fleet([], np.empty(0), np.empty((0, 12)), np.empty(0), np.empty(0)))
+    scanner.scan()
+    assert scanner.query('', 0.0, 10) == ([], 0)
+    assert capsys.readouterr().out == ''
+    assert f'analytics_anomalies{{kind="{KIND_ZSCORE}"}} 0' in registry.render()
@@ -0,0 +1,156 @@
+import time
+
+import grpc
+import pytest
+
+from balancer import EJECT_FAILURES, FAILURE_PENALTY, BalancedChannel, Balancer, NoBackends
+
+
+class _Error(grpc.RpcError):
+    def __init__(self, code):
+        self._code = code
+
+    def code(self):
+        return self._code
+
+
+class _Call:
+    def __init__(self):
+        self.callbacks = []
+
+    def add_done_callback(self, callback):
+        self.callbacks.append(callback)
+
+
+class _Multicallable:
+    def __init__(self, channel, method):
+        self.channel = channel
+        self.method = method
+
+    def __call__(self, request, *args, **kwargs):
+        if self.channel.error is not None:
+            raise _Error(self.channel.error)
+        return (self.channel.address, request)
+
+    def with_call(self, request, *args, **kwargs):
+        return self(request), None
+
+    def future(self, request, *args, **kwargs):
+        return _Call()
+
+
+class _Channel:
+    def __init__(self, address):
+        self.address = address
+        self.error = None
+        self.closed = False
+        self.watchers = []
+
+    def unary_unary(self, method, *args, **kwargs):
+        return _Multicallable(self, method)
+
+    unary_stream = unary_unary
+
+    def subscribe(self, callback, try_to_connect=False):
+        self.watchers.append(callback)
+
+    def unsubscribe(self, callback):
+        self.watchers.remove(callback)
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def channels():
+    created = {}
+
+    def factory(address):
+        channel = created[address] = _Channel(address)
+        return channel
+    factory.created = created
+    return factory
+
+
+def _backend(balancer, address):
+    return next(backend for backend in balancer._backends if backend.address == address)
+
+
+def test_pick_prefers_cheaper_backend(channels):
+    balancer = Balancer('a:1,b:1', channels)
+    _backend(balancer, 'a:1').peak = 1.0
+    _backend(balancer, 'b:1').peak = 0.001
+    picks = {balancer.pick(track=False).address for _ in range(20)}
+    assert picks == {'b:1'}
+
+
+def test_failures_penalize_and_eject(channels):
+    balancer = Balancer('a:1,b:1,c:1', channels)
+    backend = _backend(balancer, 'a:1')
+    for _ in range(EJECT_FAILURES):
+        backend.in_flight += 1
+        balancer.done(backend, 0.0, grpc.StatusCode.UNAVAILABLE)
+    assert backend.ejections == 1
+    assert [item["ejected"] for item in balancer.stats()] == [True, False, False]
+    # выброшенная реплика не выбирается, пока есть другие
+    assert {balancer.pick(track=False).address for _ in range(20)} == {'b:1', 'c:1'}
+
+
+def test_request_errors_do_not_penalize(channels):
+    balancer = Balancer('a:1,b:1', channels)
+    backend = balancer.pick()
+    balancer.done(backend, time.monotonic(), grpc.StatusCode.NOT_FOUND)
+    assert backend.failures == 0 and backend.peak < FAILURE_PENALTY
+    backend.in_flight += 1
+    balancer.done(backend, time.monotonic(), grpc.StatusCode.DEADLINE_EXCEEDED)
+    assert backend.failures == 1 and backend.peak >= FAILURE_PENALTY
+
+
+def test_channel_calls_are_measured(channels):
+    channel = BalancedChannel('a:1,b:1', channels)
+    call = channel.unary_unary('/pkg.Service/Get')
+    address, request = call('req')
+    assert request == 'req'
+    backend = _backend(channel.balancer, address)
+    assert backend.samples == 1 and backend.in_flight == 0
+
+    for created in channels.created.values():
+        created.error = grpc.StatusCode.UNAVAILABLE
+    with pytest.raises(grpc.RpcError):
+        call.with_call('req')
+    assert sum(item.failures for item in channel.balancer._backends) == 1
+    assert all(item.in_flight == 0 for item in channel.balancer._backends)
+
+
+def test_closed_channel_raises_no_backends(channels):
+    channel = BalancedChannel('a:1,b:1', channels)
+    channel.close()
+    assert all(created.closed for created in channels.created.values())
+    with pytest.raises(NoBackends) as error:
+        channel.unary_unary('/pkg.Service/Get')('req')
+    assert error.value.code() == grpc.StatusCode.UNAVAILABLE
+    future = channel.unary_unary('/pkg.Service/Get').future('req')
+    assert isinstance(future, NoBackends) and future.done()
+
+
+def test_retired_backend_closes_after_streams(channels):
+    balancer = Balancer('a:1,b:1', channels)
+    stream = balancer.pick(track=False)
+    balancer.target = 'a:1,c:1' if stream.address == 'b:1' else 'b:1,c:1'
+    balancer.refresh()
+    assert not channels.created[stream.address].closed
+    balancer.stream_done(stream)
+    balancer.refresh()
+    assert channels.created[stream.address].closed
+    assert stream not in balancer._retired
+
+
+def test_subscribe_reports_best_state(channels):
+    channel = BalancedChannel('a:1,b:1', channels)
+    states = []
+    channel.subscribe(states.append)
+    assert states == [grpc.ChannelConnectivity.IDLE]
+    channels.created['b:1'].watchers[0](grpc.ChannelConnectivity.READY)
+    assert states[-1] == grpc.ChannelConnectivity.READY
+    channel.unsubscribe(states.append)
+    assert channels.created['a:1'].watchers == []
@@ -0,0 +1,52 @@
+import threading
+import time
+
+from bulkhead import Bulkhead, parse_bulkheads
+
+
+def test_acquire_up_to_limit_then_reject():
+    bulkhead = Bulkhead('analytics', max_concurrent=2, max_queue=0)
+    assert bulkhead.acquire() and bulkhead.acquire()
+    assert not bulkhead.acquire()
+    assert bulkhead.stats()["rejected"] == 1
+    bulkhead.release()
+    assert bulkhead.acquire()
+
+
+def test_waiter_times_out():
+    bulkhead = Bulkhead('analytics', max_concurrent=1, max_queue=1, max_wait=0.05)
+    assert bulkhead.acquire()
+    started = time.monotonic()
+    assert not bulkhead.acquire()
+    assert time.monotonic() - started >= 0.05
+    stats = bulkhead.stats()
+    assert (stats["timed_out"], stats["waiting"], stats["in_flight"]) == (1, 0, 1)
+
+
+def test_release_wakes_waiter():
+    bulkhead = Bulkhead('analytics', max_concurrent=1, max_queue=1, max_wait=5)
+    assert bulkhead.acquire()
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(bulkhead.acquire()))
+    waiter.start()
+    while bulkhead.stats()["waiting"] == 0:
+        time.sleep(0.001)
+    # очередь занята: следующий отклоняется сразу
+    assert not bulkhead.acquire()
+    bulkhead.release()
+    waiter.join(1)
+    assert results == [True]
+    assert bulkhead.stats()["in_flight"] == 1
+
+
+def test_zero_capacity_rejects_everything():
+    bulkhead = Bulkhead('export', max_concurrent=0, max_queue=0)
+    assert not bulkhead.acquire()
+
+
+def test_parse_bulkheads():
+    defaults = {'analytics': (20, 10), 'export': (2, 0)}
+    assert parse_bulkheads('', defaults) == defaults
+    assert parse_bulkheads('export=4:1, weather=8', defaults) == {
+        'analytics': (20, 10), 'export': (4, 1), 'weather': (8, 0)
+    }
@@ -0,0 +1,74 @@
+import pytest
+
+import channels
+from channels import KEEPALIVE_TIME_MS, _list_target, _target, add_ports, server_options
+
+
+@pytest.mark.parametrize('address, target', [
+    ('10.0.0.1:50052,10.0.0.2:50052', 'ipv4:10.0.0.1:50052,10.0.0.2:50052'),
+    (' 10.0.0.1:1 , 10.0.0.2:2 ', 'ipv4:10.0.0.1:1,10.0.0.2:2'),
+    ('[::1]:50052,[fd00::2]:50052', 'ipv6:[::1]:50052,[fd00::2]:50052'),
+    ('10.0.0.1:50052,[::1]:50052', None),
+    ('data-processor-1:50052,10.0.0.2:50052', None),
+    ('data-processor-1:50052,data-processor-2:50052', None),
+])
+def test_list_target(address, target):
+    assert _list_target(address) == target
+
+
+def test_target():
+    assert _target('data-processor:50052', True) == 'dns:///data-processor:50052'
+    assert _target('data-processor:50052', False) == 'data-processor:50052'
+    assert _target('unix:/run/dp.sock', True) == 'unix:/run/dp.sock'
+    assert _target('10.0.0.1:1,10.0.0.2:1', True) == 'ipv4:10.0.0.1:1,10.0.0.2:1'
+    with pytest.raises(ValueError):
+        _target('a:1,b:1', True)
+
+
+class _Balanced:
+    def __init__(self, address, factory):
+        self.address = address
+
+
+@pytest.fixture
+def balanced(monkeypatch):
+    monkeypatch.setattr(channels, 'BalancedChannel', _Balanced)
+    monkeypatch.setattr(channels, 'create_channel', lambda address, balanced=False: ('grpc', address, balanced))
+
+
+def test_round_robin_routes_name_lists_to_p2c(balanced, monkeypatch):
+    monkeypatch.setattr(channels, 'LOAD_BALANCING', 'round_robin')
+    assert isinstance(channels._balanced_channel('a:1,b:1'), _Balanced)
+    assert channels._balanced_channel('10.0.0.1:1,10.0.0.2:1') == ('grpc', '10.0.0.1:1,10.0.0.2:1', True)
+    assert channels._balanced_channel('data-processor:50052') == ('grpc', 'data-processor:50052', True)
+
+
+def test_p2c_routes(balanced, monkeypatch):
+    monkeypatch.setattr(channels, 'LOAD_BALANCING', 'p2c')
+    assert channels._balanced_channel('unix:/run/dp.sock') == ('grpc', 'unix:/run/dp.sock', False)
+    assert isinstance(channels._balanced_channel('unix:/run/dp.0,unix:/run/dp.1'), _Balanced)
+    assert isinstance(channels._balanced_channel('data-processor:50052'), _Balanced)
+
+
+def test_server_accepts_client_pings():
+    options = dict(server_options())
+    assert options['grpc.http2.min_recv_ping_interval_without_data_ms'] < KEEPALIVE_TIME_MS
+    assert options['grpc.so_reuseport'] == 0
+    assert dict(server_options(reuse_port=True))['grpc.so_reuseport'] == 1
+
+
+class _Server:
+    def __init__(self):
+        self.ports = []
+
+    def add_insecure_port(self, address):
+        self.ports.append(address)
+
+
+def test_add_ports(tmp_path):
+    server = _Server()
+    assert add_ports(server, 50052, unix_socket='', listen_tcp=False) == ['[::]:50052']
+    path = tmp_path / 'run' / 'dp.sock'
+    server = _Server()
+    assert add_ports(server, 50052, unix_socket=str(path), listen_tcp=False) == [f'unix:{path}']
+    assert path.parent.is_dir()
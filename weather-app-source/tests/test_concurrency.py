@@ -0,0 +1,63 @@
+import pytest
+
+import concurrency
+from concurrency import AdaptiveLimit
+
+
+@pytest.fixture
+def every_call(monkeypatch):
+    # пересчет лимита на каждом замере, без ожидания окна
+    monkeypatch.setattr(concurrency, 'WINDOW_SECONDS', 0.0)
+    monkeypatch.setattr(concurrency, 'WINDOW_MIN_SAMPLES', 1)
+
+
+def _load(limit, rtt, calls):
+    for _ in range(calls):
+        acquired = 0
+        while limit.try_acquire():
+            acquired += 1
+        for _ in range(acquired):
+            limit.release(rtt)
+
+
+def test_initial_limit_is_clamped():
+    assert AdaptiveLimit(initial=1, min_limit=2, max_limit=5).limit == 2
+    assert AdaptiveLimit(initial=100, min_limit=2, max_limit=5).limit == 5
+
+
+def test_try_acquire_up_to_limit():
+    limit = AdaptiveLimit(initial=3, min_limit=1, max_limit=10)
+    assert [limit.try_acquire() for _ in range(4)] == [True, True, True, False]
+    limit.release()
+    assert limit.try_acquire()
+    assert limit.stats()["in_flight"] == 3
+
+
+def test_release_without_rtt_is_not_a_sample():
+    limit = AdaptiveLimit()
+    limit.try_acquire()
+    limit.release(None)
+    assert limit.no_load_rtt is None
+    assert limit.stats()["no_load_rtt_ms"] is None
+
+
+def test_limit_shrinks_when_latency_grows(every_call):
+    limit = AdaptiveLimit(initial=20, min_limit=2, max_limit=50)
+    _load(limit, 0.01, 1)
+    _load(limit, 0.1, 30)
+    # при задержке вдесятеро выше градиент упирается в 0.5: лимит сходится к L = L/2 + sqrt(L) = 4
+    assert limit.limit < 5
+
+
+def test_limit_grows_when_saturated_at_flat_latency(every_call):
+    limit = AdaptiveLimit(initial=5, min_limit=2, max_limit=50)
+    _load(limit, 0.01, 30)
+    assert limit.limit > 10
+
+
+def test_idle_limit_does_not_grow(every_call):
+    limit = AdaptiveLimit(initial=20, min_limit=2, max_limit=50)
+    for _ in range(30):
+        limit.try_acquire()
+        limit.release(0.01)
+    assert limit.limit == 20
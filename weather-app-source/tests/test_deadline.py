@@ -0,0 +1,75 @@
+import collections
+
+import grpc
+import pytest
+
+from conftest import FakeContext
+from deadline import (ABANDONED, REJECTED, DeadlineExceeded, DeadlineInterceptor, DeadlineStats,
+                      downstream_timeout, parse_budgets, remaining)
+
+
+def test_remaining_without_deadline():
+    assert remaining(FakeContext()) is None
+    assert remaining(FakeContext(1e18)) is None
+    assert remaining(FakeContext(2.5)) == 2.5
+
+
+def test_downstream_timeout():
+    assert downstream_timeout(FakeContext(), 25) == 25
+    assert downstream_timeout(FakeContext(), None) is None
+    assert downstream_timeout(FakeContext(10.0), 25, reserve=0.5) == 9.5
+    assert downstream_timeout(FakeContext(30.0), 25, reserve=0.5) == 25
+    with pytest.raises(DeadlineExceeded):
+        downstream_timeout(FakeContext(0.01), 25, reserve=0.05)
+
+
+def test_parse_budgets():
+    defaults = {'weather': 8.0, 'export': 300.0}
+    assert parse_budgets('', defaults) == defaults
+    assert parse_budgets(' export = 60 ,chart=5,', defaults) == {'weather': 8.0, 'export': 60.0, 'chart': 5.0}
+    with pytest.raises(ValueError):
+        parse_budgets('weather', defaults)
+
+
+def test_stats_total():
+    stats = DeadlineStats()
+    stats.count(REJECTED, 'GetWeather')
+    stats.count(REJECTED, 'GetWeather')
+    stats.count(ABANDONED, 'Export')
+    result = stats.stats()
+    assert result[REJECTED] == {'GetWeather': 2}
+    assert result["total"] == 3
+
+
+_Details = collections.namedtuple('_Details', ('method', 'invocation_metadata'))
+
+
+def _intercepted(handler, stats):
+    interceptor = DeadlineInterceptor(stats=stats, min_remaining=0.01)
+    return interceptor.intercept_service(lambda details: handler, _Details('/pkg.Service/Method', ()))
+
+
+def test_interceptor_rejects_expired_unary():
+    stats = DeadlineStats()
+    handler = _intercepted(grpc.unary_unary_rpc_method_handler(lambda request, context: 'ok'), stats)
+    assert handler.unary_unary('req', FakeContext(1.0)) == 'ok'
+    assert handler.unary_unary('req', FakeContext()) == 'ok'
+    context = FakeContext(0.001)
+    with pytest.raises(grpc.RpcError):
+        handler.unary_unary('req', context)
+    assert context.code == grpc.StatusCode.DEADLINE_EXCEEDED
+    assert stats.stats()[REJECTED] == {'Method': 1}
+
+
+def test_interceptor_rejects_expired_stream():
+    stats = DeadlineStats()
+    handler = _intercepted(grpc.unary_stream_rpc_method_handler(lambda request, context: iter((1, 2))), stats)
+    assert list(handler.unary_stream('req', FakeContext(1.0))) == [1, 2]
+    with pytest.raises(grpc.RpcError):
+        list(handler.unary_stream('req', FakeContext(0.0)))
+    assert stats.stats()["total"] == 1
+
+
+def test_interceptor_passes_unknown_method():
+    interceptor = DeadlineInterceptor(stats=DeadlineStats())
+    assert interceptor.intercept_service(lambda details: None, _Details('/pkg.Service/Nope', ())) is None
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from downsample import METHOD_LTTB, METHOD_MINMAX, downsample, lttb, min_max
+
+
+def _series(n):
+    x = np.arange(n, dtype=np.float64)
+    return x, np.sin(x / 10.0)
+
+
+def test_lttb_empty():
+    x, y = _series(0)
+    assert len(lttb(x, y, 100)) == 0
+
+
+def test_lttb_single_point():
+    x, y = _series(1)
+    assert lttb(x, y, 100).tolist() == [0]
+
+
+def test_lttb_target_not_below_size_returns_all():
+    x, y = _series(50)
+    assert lttb(x, y, 50).tolist() == list(range(50))
+    assert lttb(x, y, 500).tolist() == list(range(50))
+
+
+def test_lttb_target_below_three_returns_all():
+    x, y = _series(50)
+    assert lttb(x, y, 2).tolist() == list(range(50))
+
+
+def test_lttb_keeps_endpoints_and_order():
+    x, y = _series(1000)
+    selected = lttb(x, y, 100)
+    assert len(selected) == 100
+    assert selected[0] == 0 and selected[-1] == 999
+    assert np.all(np.diff(selected) > 0)
+
+
+def test_lttb_keeps_spike():
+    x = np.arange(1000, dtype=np.float64)
+    y = np.zeros(1000)
+    y[437] = 50.0
+    assert 437 in lttb(x, y, 20)
+
+
+def test_min_max_keeps_extremes():
+    x, y = _series(1000)
+    y[123], y[777] = -5.0, 5.0
+    selected = min_max(x, y, 40)
+    assert 123 in selected and 777 in selected
+    assert len(selected) <= 40
+    assert np.all(np.diff(selected) > 0)
+
+
+def test_min_max_small_inputs():
+    x, y = _series(0)
+    assert len(min_max(x, y, 10)) == 0
+    x, y = _series(1)
+    assert min_max(x, y, 10).tolist() == [0]
+
+
+def test_downsample_dispatch():
+    x, y = _series(300)
+    assert downsample(METHOD_LTTB, x, y, 30).tolist() == lttb(x, y, 30).tolist()
+    assert downsample(METHOD_MINMAX, x, y, 30).tolist() == min_max(x, y, 30).tolist()
+    with pytest.raises(ValueError):
+        downsample('average', x, y, 30)
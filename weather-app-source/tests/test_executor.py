@@ -0,0 +1,106 @@
+import threading
+import time
+
+import pytest
+
+import executor as executor_module
+from executor import SHRINK_INTERVALS, InstrumentedExecutor, PoolController
+
+
+def _wait(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_runs_tasks_and_counts():
+    pool = InstrumentedExecutor(4, min_workers=1)
+    assert pool.submit(lambda x: x * 2, 21).result(timeout=5) == 42
+    with pytest.raises(ZeroDivisionError):
+        pool.submit(lambda: 1 / 0).result(timeout=5)
+    assert _wait(lambda: pool.stats()["active"] == 0)
+    stats = pool.stats()
+    assert stats["tasks"] == 2 and stats["queued"] == 0
+    # потоки создаются по очереди задач, а не сразу до max_workers
+    assert stats["workers"] == 1
+    pool.shutdown()
+    with pytest.raises(RuntimeError):
+        pool.submit(lambda: None)
+
+
+def test_size_limits_concurrency_and_sample():
+    pool = InstrumentedExecutor(2, min_workers=1)
+    release = threading.Event()
+    futures = [pool.submit(release.wait, 5) for _ in range(5)]
+    assert _wait(lambda: pool.stats()["active"] == 2)
+    assert pool.stats()["queued"] == 3
+    release.set()
+    assert all(future.result(timeout=5) for future in futures)
+    tasks, wait, peak, queued = pool.sample()
+    assert (tasks, peak, queued) == (5, 2, 0) and wait >= 0
+    assert pool.sample()[0] == 0
+    pool.shutdown()
+
+
+def test_resize_clamps_and_retires(monkeypatch):
+    monkeypatch.setattr(executor_module, 'IDLE_POLL', 0.02)
+    pool = InstrumentedExecutor(8, min_workers=2)
+    assert pool.resize(100) == 8 and pool.resize(0) == 2
+    release = threading.Event()
+    pool.resize(4)
+    futures = [pool.submit(release.wait, 5) for _ in range(4)]
+    assert _wait(lambda: pool.stats()["active"] == 4)
+    pool.resize(2)
+    release.set()
+    for future in futures:
+        future.result(timeout=5)
+    assert _wait(lambda: pool.stats()["workers"] == 2)
+    pool.shutdown()
+
+
+class _Pool:
+    def __init__(self, size=8, min_workers=2, max_workers=64):
+        self.size = size
+        self.min_workers = min_workers
+        self.max_workers = max_workers
+
+    def resize(self, size):
+        self.size = size
+        return size
+
+
+def test_controller_grows_and_keeps_a_gain():
+    pool = _Pool()
+    controller = PoolController(pool, interval=1.0, target_wait=0.01)
+    controller.step(100, 0.05, 8, 5)
+    assert pool.size == 10 and controller.grown == 1
+    controller.step(150, 0.0, 10, 0)
+    assert pool.size == 10 and controller.reverted == 0
+
+
+def test_controller_reverts_and_holds():
+    pool = _Pool()
+    controller = PoolController(pool, interval=1.0, target_wait=0.01)
+    controller.step(100, 0.05, 8, 5)
+    controller.step(101, 0.05, 10, 5)
+    assert pool.size == 8 and controller.reverted == 1
+    # после отката рост замирает на GROW_HOLD
+    controller.step(100, 0.05, 8, 5)
+    assert pool.size == 8 and controller.grown == 1
+
+
+def test_controller_shrinks_underused_pool():
+    pool = _Pool(size=16)
+    controller = PoolController(pool, interval=1.0)
+    for _ in range(SHRINK_INTERVALS - 1):
+        controller.step(10, 0.0, 2, 0)
+    assert pool.size == 16
+    controller.step(10, 0.0, 2, 0)
+    assert pool.size == 14 and controller.stats()["shrunk"] == 1
+    pool.size = 2
+    for _ in range(SHRINK_INTERVALS):
+        controller.step(0, 0.0, 0, 0)
+    assert pool.size == 2
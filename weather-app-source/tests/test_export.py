@@ -0,0 +1,111 @@
+import gzip
+import importlib.util
+import json
+import os
+import struct
+
+import pytest
+
+import analytics_pb2
+from export_formats import CSV_HEADER, ENCODERS, gzip_stream
+from store import MICROS
+
+T0 = 1_700_000_000 * MICROS
+GATEWAY_APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'services', 'api-gateway', 'app.py')
+
+
+def _chunks():
+    return [
+        analytics_pb2.ExportChunk(city='Paris', seq=[1, 2], timestamps_us=[T0, T0 + MICROS],
+                                  temperature=[1.0, 2.0], humidity=[50.0, 51.0], repeats=[1, 3]),
+        analytics_pb2.ExportChunk(city='Oslo'),
+        analytics_pb2.ExportChunk(city='Oslo', seq=[7], timestamps_us=[T0], temperature=[-3.5],
+                                  humidity=[80.0], repeats=[1]),
+    ]
+
+
+def test_ndjson_rows():
+    lines = b''.join(ENCODERS['ndjson'](_chunks())).decode('utf-8').splitlines()
+    rows = [json.loads(line) for line in lines]
+    assert [(row["city"], row["seq"], row["repeats"]) for row in rows] == [('Paris', 1, 1), ('Paris', 2, 3), ('Oslo', 7, 1)]
+    assert rows[0]["timestamp"].startswith('2023-11-14T22:13:20')
+
+
+def test_csv_header_once_and_empty_export():
+    lines = b''.join(ENCODERS['csv'](_chunks())).decode('utf-8').splitlines()
+    assert lines[0] == ','.join(CSV_HEADER)
+    assert len(lines) == 4 and lines[-1].startswith('Oslo,7,')
+    assert b''.join(ENCODERS['csv']([])).decode('utf-8').splitlines() == [','.join(CSV_HEADER)]
+
+
+def test_columnar_frames_round_trip():
+    data = b''.join(ENCODERS['columnar'](_chunks()))
+    chunks, offset = [], 0
+    while offset < len(data):
+        (size,) = struct.unpack_from('<I', data, offset)
+        chunks.append(analytics_pb2.ExportChunk.FromString(data[offset + 4:offset + 4 + size]))
+        offset += 4 + size
+    assert chunks == _chunks()
+
+
+def test_gzip_stream():
+    pieces = [b'a' * 1000, b'', b'b' * 1000]
+    assert gzip.decompress(b''.join(gzip_stream(pieces))) == b''.join(pieces)
+    assert gzip.decompress(b''.join(gzip_stream([]))) == b''
+
+
+class _Stream:
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self.closed = False
+
+    def __iter__(self):
+        return self._chunks
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def gateway(monkeypatch):
+    # у analytics тоже есть app.py: шлюз грузится по пути под своим именем
+    spec = importlib.util.spec_from_file_location('gateway_app', GATEWAY_APP)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    monkeypatch.setattr(module.grpc_clients.analytics, 'export_history', lambda request, timeout: _Stream(_chunks()))
+    return module.app.test_client()
+
+
+def _export(gateway, query='', accept=None):
+    headers = {"Accept-Encoding": accept} if accept is not None else {}
+    return gateway.get(f'/api/export?cities=Paris,Oslo&format=csv{query}', headers=headers)
+
+
+def test_export_plain(gateway):
+    response = _export(gateway)
+    assert response.status_code == 200
+    assert 'Content-Encoding' not in response.headers
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    assert response.headers['Content-Disposition'] == 'attachment; filename=history.csv'
+    assert response.data.decode('utf-8').startswith(','.join(CSV_HEADER))
+
+
+def test_export_gzip_by_accept_encoding(gateway):
+    response = _export(gateway, accept='br, gzip;q=0.8')
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['Content-Disposition'] == 'attachment; filename=history.csv'
+    assert gzip.decompress(response.data).decode('utf-8').startswith(','.join(CSV_HEADER))
+
+
+def test_export_gzip_refused_with_zero_quality(gateway):
+    response = _export(gateway, accept='gzip;q=0')
+    assert 'Content-Encoding' not in response.headers
+    assert response.data.decode('utf-8').startswith(','.join(CSV_HEADER))
+
+
+def test_export_compression_param_sends_gz_file(gateway):
+    response = _export(gateway, query='&compression=gzip', accept='identity')
+    assert 'Content-Encoding' not in response.headers
+    assert response.headers['Content-Type'] == 'application/gzip'
+    assert response.headers['Content-Disposition'] == 'attachment; filename=history.csv.gz'
+    assert gzip.decompress(response.data).decode('utf-8').startswith(','.join(CSV_HEADER))
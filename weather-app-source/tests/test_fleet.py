@@ -0,0 +1,81 @@
+import math
+
+import pytest
+
+from fleet import BASELINE_POINTS, FleetMatrix
+
+NOW = 1_700_000_000.0
+
+
+def _fleet(values):
+    fleet = FleetMatrix(capacity=2)
+    for city, temperature in values.items():
+        fleet.update(city, NOW, temperature, 50.0)
+    return fleet
+
+
+def test_rank_top_and_bottom():
+    fleet = _fleet({'paris': 12.0, 'oslo': -3.0, 'lima': 20.0, 'cairo': 31.0})
+    assert len(fleet) == 4
+    assert fleet.rank('temperature', 2, False, NOW) == ([('cairo', 31.0), ('lima', 20.0)], 4)
+    assert fleet.rank('temperature', 10, True, NOW)[0][0] == ('oslo', -3.0)
+    assert fleet.rank('temperature', 0, True, NOW) == ([], 4)
+
+
+def test_stats_and_empty_fleet():
+    fleet = _fleet({'paris': 10.0, 'oslo': 20.0})
+    stats = fleet.stats('temperature', [50], NOW)
+    assert (stats["count"], stats["mean"], stats["min"], stats["max"]) == (2, 15.0, 10.0, 20.0)
+    assert stats["percentiles"] == [(50, 15.0)]
+    assert FleetMatrix().stats('humidity', [99], NOW)["percentiles"] == [(99, 0.0)]
+    with pytest.raises(ValueError):
+        fleet.rank('pressure', 1, False, NOW)
+
+
+def test_late_observation_goes_to_baseline():
+    fleet = _fleet({'paris': 10.0})
+    fleet.update('paris', NOW - 60, 99.0, 50.0)
+    assert fleet.rank('temperature', 1, False, NOW)[0] == [('paris', 10.0)]
+    _, _, baseline, _, _ = fleet.scan_snapshot()
+    assert 99.0 in baseline[0]
+
+
+def test_baseline_is_a_ring():
+    fleet = FleetMatrix()
+    for i in range(BASELINE_POINTS + 3):
+        fleet.update('paris', NOW + i, float(i), 50.0)
+    _, latest, baseline, _, _ = fleet.scan_snapshot()
+    assert latest[0] == BASELINE_POINTS + 2
+    assert sorted(baseline[0]) == [float(i) for i in range(2, BASELINE_POINTS + 2)]
+
+
+def test_swing_over_hour_buckets():
+    fleet = FleetMatrix()
+    for hours, temperature in ((0, 10.0), (1, 18.0), (2, 12.0)):
+        fleet.update('paris', NOW + hours * 3600, temperature, 50.0)
+    assert fleet.rank('temperature_swing_24h', 1, False, NOW + 2 * 3600) == ([('paris', 8.0)], 1)
+    # через сутки старые корзины не учитываются
+    assert fleet.rank('temperature_swing_24h', 1, False, NOW + 30 * 3600) == ([], 0)
+
+
+def test_remove_keeps_matrix_dense():
+    fleet = _fleet({'paris': 1.0, 'oslo': 2.0, 'lima': 3.0})
+    fleet.remove('paris')
+    fleet.remove('nowhere')
+    assert len(fleet) == 2
+    cities, latest, _, _, _ = fleet.scan_snapshot()
+    assert dict(zip(cities, latest)) == {'lima': 3.0, 'oslo': 2.0}
+    fleet.update('paris', NOW, 4.0, 50.0)
+    assert fleet.rank('temperature', 1, False, NOW)[0] == [('paris', 4.0)]
+
+
+def test_export_restore_round_trip():
+    fleet = _fleet({'paris': 1.0, 'oslo': 2.0})
+    fleet.update('paris', NOW + 1, 5.0, 60.0, openweather=4.0, weatherapi=6.0)
+    restored = FleetMatrix()
+    restored.restore(*fleet.export_columns())
+    assert restored.rank('temperature', 5, True, NOW) == fleet.rank('temperature', 5, True, NOW)
+    cities, _, _, openweather, weatherapi = restored.scan_snapshot()
+    row = cities.index('paris')
+    assert (openweather[row], weatherapi[row]) == (4.0, 6.0)
+    assert math.isnan(openweather[cities.index('oslo')])
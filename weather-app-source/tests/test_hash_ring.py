@@ -0,0 +1,79 @@
+import grpc
+import pytest
+
+from hash_ring import MEMBERSHIP_KEY, HashRing, ReplicaRing, membership_from_error, parse_replicas
+
+CITIES = [f"city-{i}" for i in range(2000)]
+
+
+class _Error(grpc.RpcError):
+    def __init__(self, code, metadata=None):
+        self._code = code
+        self._metadata = metadata
+
+    def code(self):
+        return self._code
+
+    def trailing_metadata(self):
+        return self._metadata
+
+
+def test_empty_ring():
+    with pytest.raises(ValueError):
+        HashRing([]).node_for('Paris')
+
+
+def test_single_node_owns_everything():
+    ring = HashRing(['a:1'])
+    assert {ring.node_for(city) for city in CITIES} == {'a:1'}
+
+
+def test_key_is_normalized():
+    ring = HashRing(['a:1', 'b:1', 'c:1'])
+    assert ring.node_for('  Paris ') == ring.node_for('paris')
+
+
+def test_order_and_duplicates_do_not_matter():
+    first = HashRing(['a:1', 'b:1', 'c:1'])
+    second = HashRing(['c:1', 'a:1', 'b:1', 'a:1'])
+    assert all(first.node_for(city) == second.node_for(city) for city in CITIES)
+
+
+def test_adding_node_moves_only_its_share():
+    before = HashRing(['a:1', 'b:1', 'c:1'])
+    after = HashRing(['a:1', 'b:1', 'c:1', 'd:1'])
+    moved = [city for city in CITIES if before.node_for(city) != after.node_for(city)]
+    assert all(after.node_for(city) == 'd:1' for city in moved)
+    assert 0.1 < len(moved) / len(CITIES) < 0.4
+
+
+def test_parse_replicas():
+    assert parse_replicas(' a:1, ,b:2,') == ['a:1', 'b:2']
+    assert parse_replicas('') == []
+
+
+def test_membership_from_error():
+    error = _Error(grpc.StatusCode.FAILED_PRECONDITION, ((MEMBERSHIP_KEY, 'a:1,b:1'),))
+    assert membership_from_error(error) == ['a:1', 'b:1']
+    assert membership_from_error(_Error(grpc.StatusCode.UNAVAILABLE, ((MEMBERSHIP_KEY, 'a:1'),))) is None
+    assert membership_from_error(_Error(grpc.StatusCode.FAILED_PRECONDITION)) is None
+    assert membership_from_error(_Error(grpc.StatusCode.FAILED_PRECONDITION, ((MEMBERSHIP_KEY, ''),))) is None
+
+
+def test_replica_ring_reload():
+    created = []
+
+    def make_client(address):
+        created.append(address)
+        return address
+
+    replicas = ReplicaRing(['a:1', 'b:1'], make_client)
+    same = _Error(grpc.StatusCode.FAILED_PRECONDITION, ((MEMBERSHIP_KEY, 'b:1,a:1'),))
+    assert not replicas.reload(same)
+    assert not replicas.reload(_Error(grpc.StatusCode.INTERNAL))
+
+    grown = _Error(grpc.StatusCode.FAILED_PRECONDITION, ((MEMBERSHIP_KEY, 'a:1,b:1,c:1'),))
+    assert replicas.reload(grown)
+    assert replicas.nodes() == ['a:1', 'b:1', 'c:1']
+    assert created == ['a:1', 'b:1', 'c:1']
+    assert all(replicas.client_for(city) == replicas.node_for(city) for city in CITIES[:100])
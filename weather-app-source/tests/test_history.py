@@ -0,0 +1,113 @@
+import grpc
+import pytest
+
+import analytics_pb2
+from store import MICROS, CityState, HistoryStore
+
+T0 = 1_700_000_000 * MICROS
+
+
+def _store(points=25, max_points=1000):
+    store = HistoryStore(max_points_per_city=max_points)
+    for i in range(points):
+        store.append('Paris', T0 + i * MICROS, float(i), 50.0)
+    return store
+
+
+def _walk(store, city, limit):
+    pages, cursor = [], ''
+    while True:
+        points, cursor, total = store.page(city, cursor, limit)
+        pages.append(points)
+        if not cursor:
+            return pages, total
+
+
+def test_before_and_after():
+    state = CityState('paris', 100)
+    for i in range(10):
+        state.append(T0 + i * MICROS, float(i), 50.0)
+    points, has_more = state.before(None, 3)
+    assert [point.seq for point in points] == [8, 9, 10] and has_more
+    points, has_more = state.before(3, 5)
+    assert [point.seq for point in points] == [1, 2] and not has_more
+    assert state.before(1, 5) == ([], False)
+    assert [point.seq for point in state.after(7, 10)] == [8, 9, 10]
+    assert state.after(10, 10) == []
+    assert CityState('empty', 10).before(None, 5) == ([], False)
+
+
+def test_page_walk_covers_history_once():
+    pages, total = _walk(_store(25), 'paris', 10)
+    assert total == 25
+    assert [len(page) for page in pages] == [10, 10, 5]
+    seqs = [point.seq for page in reversed(pages) for point in page]
+    assert seqs == list(range(1, 26))
+
+
+def test_page_size_dividing_history_has_no_empty_tail():
+    pages, _ = _walk(_store(20), 'paris', 10)
+    assert [len(page) for page in pages] == [10, 10]
+
+
+def test_cursor_is_stable_across_appends():
+    store = _store(25)
+    first, cursor, _ = store.page('paris', '', 10)
+    for i in range(25, 40):
+        store.append('paris', T0 + i * MICROS, float(i), 50.0)
+    second, _, total = store.page('paris', cursor, 10)
+    assert total == 40
+    assert [point.seq for point in second] == list(range(6, 16))
+    assert second[-1].seq + 1 == first[0].seq
+
+
+def test_cursor_older_than_retained_history():
+    store = _store(40, max_points=10)
+    assert store.page('paris', '1', 10)[0] == []
+
+
+def test_unknown_city_and_bad_cursor():
+    store = _store(5)
+    assert store.page('oslo', '', 10) == ([], '', 0)
+    with pytest.raises(ValueError):
+        store.page('paris', 'not-a-seq', 10)
+
+
+@pytest.fixture
+def service(monkeypatch):
+    import grpc_server
+    store = _store(25)
+    monkeypatch.setattr(grpc_server, 'weather_history', store)
+    return grpc_server.AnalyticsService()
+
+
+def test_get_history_records(service, context):
+    response = service.GetHistory(analytics_pb2.HistoryRequest(city='Paris', page_size=3), context)
+    assert context.code is None
+    assert response.total_records == 25
+    assert [record.seq for record in response.records] == [23, 24, 25]
+    record = response.records[-1]
+    assert (record.timestamp_us, record.temperature, record.humidity, record.repeats) == (T0 + 24 * MICROS, 24.0, 50.0, 1)
+    follow = service.GetHistory(analytics_pb2.HistoryRequest(city='Paris', page_size=3, cursor=response.next_cursor), context)
+    assert [record.seq for record in follow.records] == [20, 21, 22]
+
+
+def test_get_history_page_size_defaults_and_cap(service, context, monkeypatch):
+    import grpc_server
+    response = service.GetHistory(analytics_pb2.HistoryRequest(city='Paris'), context)
+    assert len(response.records) == grpc_server.DEFAULT_PAGE_SIZE
+    monkeypatch.setattr(grpc_server, 'MAX_PAGE_SIZE', 4)
+    response = service.GetHistory(analytics_pb2.HistoryRequest(city='Paris', page_size=1000), context)
+    assert len(response.records) == 4
+
+
+def test_get_history_invalid_cursor(service, context):
+    service.GetHistory(analytics_pb2.HistoryRequest(city='Paris', cursor='abc'), context)
+    assert context.code == grpc.StatusCode.INVALID_ARGUMENT
+
+
+def test_stream_history(service, context):
+    records = list(service.StreamHistory(analytics_pb2.HistoryRequest(city='Paris'), context))
+    assert [record.seq for record in records] == list(range(1, 26))
+    context.active = False
+    assert list(service.StreamHistory(analytics_pb2.HistoryRequest(city='Paris'), context)) == []
@@ -0,0 +1,69 @@
+import threading
+
+from metrics import Registry, merge_rendered
+
+
+def test_counter_sums_threads_and_keeps_finished_ones():
+    registry = Registry()
+    calls = registry.counter('calls_total', 'Calls', ('method',))
+    assert registry.counter('calls_total', 'Calls', ('method',)) is calls
+
+    def work():
+        for _ in range(100):
+            calls.inc('Get')
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    calls.inc('Put', value=2.5)
+    # словари завершившихся потоков сливаются при чтении, повторное чтение их не теряет
+    for _ in range(2):
+        text = registry.render()
+        assert 'calls_total{method="Get"} 400' in text
+        assert 'calls_total{method="Put"} 2.5' in text
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    latency = registry.histogram('latency_seconds', 'Latency', buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.observe(value)
+    lines = registry.render().splitlines()
+    assert lines[:2] == ['# HELP latency_seconds Latency', '# TYPE latency_seconds histogram']
+    assert lines[2:] == [
+        'latency_seconds_bucket{le="0.1"} 2',
+        'latency_seconds_bucket{le="1"} 3',
+        'latency_seconds_bucket{le="+Inf"} 4',
+        'latency_seconds_sum 3.65',
+        'latency_seconds_count 4',
+    ]
+
+
+def test_callbacks_labels_and_escaping():
+    registry = Registry()
+    registry.callback('ejected', 'Ejected', lambda: {('a"b\\c',): True, ('d\ne',): False}, ('address',))
+    registry.callback('limit', 'Limit', lambda: 1.0)
+    registry.callback('limit', 'Limit', lambda: 7)
+    registry.callback('empty', 'Nothing yet', lambda: {})
+    registry.counter('unused_total', 'Never incremented')
+    text = registry.render()
+    assert 'ejected{address="a\\"b\\\\c"} 1' in text
+    assert 'ejected{address="d\\ne"} 0' in text
+    assert 'limit 7' in text
+    assert 'empty' not in text and 'unused_total' not in text
+
+
+def test_merge_rendered_labels_each_worker():
+    first, second = Registry(), Registry()
+    for registry, value in ((first, 1), (second, 2)):
+        registry.counter('calls_total', 'Calls', ('method',)).inc('Get', value=value)
+        registry.callback('limit', 'Limit', lambda value=value: value * 10)
+    merged = merge_rendered({0: first.render(), 1: second.render()})
+    lines = merged.splitlines()
+    assert lines.count('# HELP calls_total Calls') == 1
+    assert 'calls_total{worker="0",method="Get"} 1' in lines
+    assert 'calls_total{worker="1",method="Get"} 2' in lines
+    assert 'limit{worker="0"} 10' in lines and 'limit{worker="1"} 20' in lines
+    assert lines.index('# TYPE limit gauge') < lines.index('limit{worker="0"} 10')
+    assert merge_rendered({}) == '\n'
@@ -0,0 +1,51 @@
+import grpc
+
+import analytics_pb2
+from metrics import registry
+from publisher import AnalyticsPublisher
+
+
+class _Client:
+    def __init__(self, error=None):
+        self.batches = []
+        self.error = error
+
+    def IngestObservations(self, batch, timeout=None):
+        if self.error is not None:
+            raise self.error
+        self.batches.append(batch)
+
+
+class _Error(grpc.RpcError):
+    def code(self):
+        return grpc.StatusCode.UNAVAILABLE
+
+    def trailing_metadata(self):
+        return None
+
+
+def _observation(city='paris'):
+    return analytics_pb2.Observation(city=city, temperature=1.0, humidity=50.0)
+
+
+def test_full_queue_drops_counts_and_logs_once(capsys):
+    publisher = AnalyticsPublisher(['a:1'], queue_size=1)
+    for _ in range(3):
+        publisher.publish(_observation())
+    assert publisher.stats() == {"queued": 1, "sent": 0, "dropped": 2, "failed": 0}
+    assert capsys.readouterr().out.count('publish queue full') == 1
+    text = registry.render()
+    assert 'analytics_publish_dropped_total 2' in text
+    assert 'analytics_publish_queued 1' in text
+
+
+def test_send_counts_sent_and_failed():
+    publisher = AnalyticsPublisher(['a:1'])
+    client = publisher.replicas.clients['a:1'] = _Client()
+    publisher._send('a:1', [_observation(), _observation('oslo')])
+    assert len(client.batches) == 1 and publisher.stats()["sent"] == 2
+
+    publisher.replicas.clients['a:1'] = _Client(_Error())
+    publisher._send('a:1', [_observation()])
+    assert publisher.stats()["failed"] == 1
+    assert 'analytics_publish_failed_total 1' in registry.render()
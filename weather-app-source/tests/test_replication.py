@@ -0,0 +1,123 @@
+import time
+
+import analytics_pb2
+from replication import ALL_BUCKETS, ChangeLog, PeerAggregates, Replicator, city_delta
+from store import MICROS, HistoryStore
+
+NOW = time.time()
+
+
+def _filled(cities=('paris', 'oslo'), points=10):
+    store, log = HistoryStore(), ChangeLog()
+    store.on_change = log.touch
+    for c, city in enumerate(cities):
+        for i in range(points):
+            store.append(city, round((NOW - 3600 + i * 60) * MICROS), 10.0 + c + i, 50.0)
+    return store, log
+
+
+def _batches(store, log, cursor=0, origin='site-a', sender='a-1', batch_bytes=1024 * 1024):
+    replicator = Replicator(store, log, origin, sender, ['peer:1'], batch_bytes=batch_bytes)
+    return list(replicator.collect('peer:1', cursor))
+
+
+def _window(aggregates, city):
+    _, bucket = aggregates.window(city, 86400, NOW)
+    return (bucket.count, round(bucket.temperature_sum, 6)) if bucket is not None else None
+
+
+def test_change_log_orders_by_version():
+    log = ChangeLog()
+    log.touch('paris', NOW)
+    log.touch('oslo', NOW)
+    log.touch('paris', NOW)
+    changes = log.since(0, NOW)
+    versions = [version for _, version in changes]
+    assert versions == sorted(versions)
+    # повторное изменение того же ключа переносит его в хвост с новой версией
+    assert changes[-1][0][0] == 'paris'
+    assert log.since(log.version(), NOW) == []
+
+
+def test_change_log_forgets_expired_buckets():
+    log = ChangeLog()
+    log.touch('paris', NOW - 400 * 86400)
+    assert log.since(0, NOW) == []
+    assert len(log) == 0
+    log.touch('paris')
+    assert [key for key, _ in log.since(0, NOW)] == [('paris', ALL_BUCKETS, 0)]
+
+
+def test_apply_matches_source():
+    store, log = _filled()
+    aggregates = PeerAggregates()
+    for batch in _batches(store, log):
+        aggregates.apply(batch)
+    for city in ('paris', 'oslo'):
+        assert aggregates.observations(city) == store.observations(city) == 10
+        assert _window(aggregates, city) == (10, round(sum(10.0 + (city == 'oslo') + i for i in range(10)), 6))
+    assert aggregates.cursor('site-a', 'a-1') == log.version()
+
+
+def test_apply_is_idempotent_and_order_independent():
+    store, log = _filled()
+    batches = _batches(store, log, batch_bytes=1)
+    assert len(batches) == 2
+
+    once = PeerAggregates()
+    for batch in batches:
+        once.apply(batch)
+    repeated = PeerAggregates()
+    for batch in list(reversed(batches)) + batches + batches:
+        repeated.apply(batch)
+    for city in ('paris', 'oslo'):
+        assert repeated.observations(city) == once.observations(city)
+        assert _window(repeated, city) == _window(once, city)
+    assert repeated.cursor('site-a', 'a-1') == once.cursor('site-a', 'a-1')
+
+
+def test_older_delta_does_not_override_newer():
+    store, log = _filled(cities=('paris',))
+    (old,) = _batches(store, log)
+    store.append('paris', round(NOW * MICROS), 30.0, 50.0)
+    (new,) = _batches(store, log, cursor=old.version)
+
+    aggregates = PeerAggregates()
+    aggregates.apply(new)
+    aggregates.apply(old)
+    assert aggregates.observations('paris') == 11
+
+
+def test_origins_are_summed_not_merged():
+    store, log = _filled(cities=('paris',))
+    aggregates = PeerAggregates()
+    for batch in _batches(store, log, origin='site-a') + _batches(store, log, origin='site-b'):
+        aggregates.apply(batch)
+    assert aggregates.observations('Paris') == 20
+    assert _window(aggregates, 'paris')[0] == 20
+    assert aggregates.stats()["origins"] == 2
+
+
+def test_empty_batch_and_unknown_city():
+    aggregates = PeerAggregates()
+    assert aggregates.apply(analytics_pb2.ReplicationBatch(origin='site-a', sender='a-1', version=5)) == 5
+    assert aggregates.observations('paris') == 0
+    assert aggregates.window('paris', 3600, NOW) == (None, None)
+    store, log = HistoryStore(), ChangeLog()
+    assert _batches(store, log) == []
+
+
+def test_city_delta_whole_city():
+    store, log = _filled(cities=('paris',))
+    delta = store.with_city('paris', lambda state: city_delta(state, [((ALL_BUCKETS, 0), 7)]))
+    assert delta.version == 7
+    assert {item.tier for item in delta.rollups} == {'hour', 'day'}
+    assert sum(item.count for item in delta.rollups if item.tier == 'day') == 10
+
+
+def test_collect_skips_dropped_city():
+    store, log = _filled()
+    store.drop_city('paris')
+    (batch,) = _batches(store, log)
+    assert [delta.city for delta in batch.cities] == ['oslo']
+    assert batch.version == log.version()
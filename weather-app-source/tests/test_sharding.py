@@ -0,0 +1,55 @@
+from sharding import ShardManager
+from spill import SpillStore
+from store import MICROS, HistoryStore
+
+T0 = 1_700_000_000 * MICROS
+CITIES = [f"city-{i}" for i in range(20)]
+
+
+class _Fleet:
+    def __init__(self):
+        self.removed = []
+
+    def remove(self, city):
+        self.removed.append(city)
+
+
+class _Client:
+    def __init__(self):
+        self.received = []
+
+    def TransferShard(self, batch, timeout=None):
+        self.received.extend(shard.city for shard in batch.cities)
+
+
+def _manager(store, client):
+    manager = ShardManager(store, _Fleet(), self_address='a:1', replicas=['a:1'])
+    manager._client = lambda address: client
+    return manager
+
+
+def test_hand_off_moves_resident_and_spilled_cities(tmp_path):
+    store = HistoryStore(budget_bytes=1, spill=SpillStore(str(tmp_path), 100))
+    for i, city in enumerate(CITIES):
+        store.append(city, T0 + i * MICROS, float(i), 50.0)
+    assert store.spilled_cities()
+    client = _Client()
+    manager = _manager(store, client)
+
+    owned, handed_off, failed = manager.update_membership(['a:1', 'b:1'])
+    moved = [city for city in CITIES if manager.owner(city) == 'b:1']
+    assert moved and failed == 0
+    assert handed_off == len(moved) and sorted(client.received) == sorted(moved)
+    assert owned == len(CITIES) - len(moved)
+    for city in moved:
+        assert store.count(city) == 0 and not store.is_spilled(city)
+    kept = [city for city in CITIES if city not in moved]
+    assert all(store.count(city) == 1 for city in kept)
+
+
+def test_hand_off_keeps_own_cities():
+    store = HistoryStore()
+    store.append('paris', T0, 1.0, 50.0)
+    client = _Client()
+    assert _manager(store, client).update_membership(['a:1']) == (1, 0, 0)
+    assert client.received == []
@@ -0,0 +1,88 @@
+import random
+
+from sketch import KLLSketch
+
+
+def _filled(values):
+    sketch = KLLSketch()
+    for value in values:
+        sketch.update(value)
+    return sketch
+
+
+def test_empty_sketch():
+    sketch = KLLSketch()
+    assert sketch.n == 0
+    assert sketch.quantiles([0.0, 0.5, 1.0]) == [0.0, 0.0, 0.0]
+
+
+def test_empty_round_trip():
+    restored = KLLSketch.from_bytes(KLLSketch().to_bytes())
+    assert restored.n == 0
+    assert restored.quantiles([0.5]) == [0.0]
+    restored.update(3.0)
+    assert restored.quantiles([0.5]) == [3.0]
+
+
+def test_single_point():
+    sketch = _filled([7.5])
+    assert sketch.quantiles([0.0, 0.5, 1.0]) == [7.5, 7.5, 7.5]
+
+
+def test_round_trip_preserves_state():
+    random.seed(1)
+    sketch = _filled(random.gauss(15, 5) for _ in range(10000))
+    restored = KLLSketch.from_bytes(sketch.to_bytes())
+    assert (restored.k, restored.n, restored.min, restored.max) == (sketch.k, sketch.n, sketch.min, sketch.max)
+    assert restored.levels == sketch.levels
+    qs = [0.01, 0.25, 0.5, 0.75, 0.99]
+    assert restored.quantiles(qs) == sketch.quantiles(qs)
+
+
+def test_rank_error_within_bounds():
+    random.seed(2)
+    values = list(range(10000))
+    random.shuffle(values)
+    sketch = _filled(values)
+    for q in (0.05, 0.5, 0.95):
+        (estimate,) = sketch.quantiles([q])
+        assert abs(estimate / len(values) - q) < 0.03
+    assert sketch.quantiles([0.0, 1.0]) == [0, 9999]
+
+
+def test_memory_is_bounded():
+    sketch = _filled(range(100000))
+    assert sum(len(items) for items in sketch.levels) < 3 * sketch.k
+
+
+def test_merge_matches_single_sketch():
+    random.seed(3)
+    values = [random.uniform(-20, 40) for _ in range(20000)]
+    left, right = _filled(values[:5000]), _filled(values[5000:])
+    merged = left.merge(right)
+    assert merged is left
+    assert merged.n == len(values)
+    assert (merged.min, merged.max) == (min(values), max(values))
+    ordered = sorted(values)
+    for q in (0.1, 0.5, 0.9):
+        (estimate,) = merged.quantiles([q])
+        rank = sum(1 for value in ordered if value <= estimate) / len(values)
+        assert abs(rank - q) < 0.03
+
+
+def test_merge_with_empty():
+    sketch = _filled([1.0, 2.0, 3.0])
+    before = sketch.to_bytes()
+    sketch.merge(KLLSketch())
+    assert sketch.to_bytes() == before
+    empty = KLLSketch().merge(sketch)
+    assert empty.n == 3
+    assert empty.quantiles([0.0, 1.0]) == [1.0, 3.0]
+
+
+def test_update_many_empty_is_noop():
+    sketch = KLLSketch()
+    sketch.update_many([])
+    assert sketch.n == 0
+    sketch.update_many([4.0, 2.0])
+    assert (sketch.n, sketch.min, sketch.max) == (2, 2.0, 4.0)
@@ -0,0 +1,137 @@
+import struct
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+
+from fleet import COLUMNS, FleetMatrix
+from snapshot import MAGIC, _CITY, _HEADER, _Output, load_snapshot, write_snapshot
+from store import MICROS, HistoryStore
+
+HOUR = 3600
+
+
+def _filled_store():
+    store = HistoryStore(max_points_per_city=1000)
+    fleet = FleetMatrix()
+    start = int(time.time()) - 10 * HOUR
+    for c, city in enumerate(('paris', 'oslo', 'lima')):
+        for i in range(50):
+            ts = start + i * 600
+            store.append(city, ts * MICROS, 10.0 + c + i % 7, 60.0 + i % 3)
+            fleet.update(city, ts, 10.0 + c + i % 7, 60.0 + i % 3)
+        # повтор того же наблюдения провайдера сворачивается в repeats
+        store.append(city, ts * MICROS, 10.0 + c + 49 % 7, 60.0 + 49 % 3)
+    return store, fleet
+
+
+def _buckets(state):
+    return {
+        (tier, start): (bucket.count, bucket.temperature_sum, bucket.temperature.to_bytes())
+        for tier, buckets in state.rollups.tiers.items()
+        for start, bucket in buckets.items()
+    }
+
+
+def test_round_trip(tmp_path):
+    store, fleet = _filled_store()
+    path = str(tmp_path / 'analytics.snapshot')
+    assert write_snapshot(path, store, fleet) == 150
+
+    restored, restored_fleet = HistoryStore(max_points_per_city=1000), FleetMatrix()
+    assert load_snapshot(path, restored, restored_fleet) == (3, 150)
+    for city in ('paris', 'oslo', 'lima'):
+        assert restored.points(city) == store.points(city)
+        assert restored.observations(city) == store.observations(city) == 51
+        assert restored.with_city(city, _buckets) == store.with_city(city, _buckets)
+
+    cities, columns = fleet.export_columns()
+    restored_cities, restored_columns = restored_fleet.export_columns()
+    assert restored_cities == cities
+    for column, restored_column in zip(columns, restored_columns):
+        np.testing.assert_array_equal(restored_column, column)
+
+
+def test_empty_store(tmp_path):
+    path = str(tmp_path / 'analytics.snapshot')
+    assert write_snapshot(path, HistoryStore(), FleetMatrix()) == 0
+    store, fleet = HistoryStore(), FleetMatrix()
+    assert load_snapshot(path, store, fleet) == (0, 0)
+    assert store.cities() == [] and len(fleet) == 0
+
+
+def _write_old(path, version, city, rows):
+    # версии 1 и 2: без колонки observed_us, время - строками ISO 8601 после колонок; в версии 1 нет repeats
+    with open(path, 'wb') as f:
+        out = _Output(f)
+        out.write(_HEADER.pack(MAGIC, version, time.time(), 1))
+        out.string(city)
+        out.pack(_CITY.format, len(rows) + 1, len(rows))
+        out.array(np.array([row[0] for row in rows], dtype='<i8'))
+        out.array(np.array([row[2] for row in rows], dtype='<f8'))
+        out.array(np.array([row[3] for row in rows], dtype='<f8'))
+        if version >= 2:
+            out.array(np.array([row[4] for row in rows], dtype='<i4'))
+        timestamps = '\n'.join(datetime.fromtimestamp(row[1], timezone.utc).isoformat() for row in rows)
+        out.blob(timestamps.encode('utf-8'))
+        out.pack('<I', 0)
+        out.pack('<I', 0)
+        for _, _, dtype, _ in COLUMNS:
+            out.array(np.empty(0, dtype=dtype))
+
+
+ROWS = [(1, 1700000000, 12.5, 70.0, 3), (2, 1700003600, 13.0, 68.0, 1)]
+
+
+@pytest.mark.parametrize('version', [1, 2])
+def test_old_versions(tmp_path, version):
+    path = str(tmp_path / f'v{version}.snapshot')
+    _write_old(path, version, 'paris', ROWS)
+    store = HistoryStore()
+    assert load_snapshot(path, store, FleetMatrix()) == (1, 2)
+    points = store.points('paris')
+    assert [point.observed_us for point in points] == [row[1] * MICROS for row in ROWS]
+    assert [(point.seq, point.temperature, point.humidity) for point in points] == [(1, 12.5, 70.0), (2, 13.0, 68.0)]
+    assert [point.repeats for point in points] == ([3, 1] if version == 2 else [1, 1])
+    assert store.observations('paris') == (4 if version == 2 else 2)
+
+
+def test_old_version_empty_city(tmp_path):
+    path = str(tmp_path / 'v2.snapshot')
+    _write_old(path, 2, 'paris', [])
+    store = HistoryStore()
+    assert load_snapshot(path, store, FleetMatrix()) == (1, 0)
+    assert store.points('paris') == []
+
+
+def test_bad_magic(tmp_path):
+    path = tmp_path / 'bad.snapshot'
+    path.write_bytes(_HEADER.pack(b'NOTASNAP', 3, 0.0, 0) + b'\0' * 64)
+    with pytest.raises(ValueError):
+        load_snapshot(str(path), HistoryStore(), FleetMatrix())
+
+
+def test_unknown_version(tmp_path):
+    path = tmp_path / 'future.snapshot'
+    path.write_bytes(_HEADER.pack(MAGIC, 99, 0.0, 0) + b'\0' * 64)
+    with pytest.raises(ValueError):
+        load_snapshot(str(path), HistoryStore(), FleetMatrix())
+
+
+def test_empty_file(tmp_path):
+    path = tmp_path / 'empty.snapshot'
+    path.write_bytes(b'')
+    with pytest.raises(ValueError):
+        load_snapshot(str(path), HistoryStore(), FleetMatrix())
+
+
+def test_truncated_file(tmp_path):
+    store, fleet = _filled_store()
+    path = tmp_path / 'analytics.snapshot'
+    write_snapshot(str(path), store, fleet)
+    data = path.read_bytes()
+    path.write_bytes(data[:len(data) // 2])
+    # restore_state ловит именно эти исключения и стартует без снапшота
+    with pytest.raises((ValueError, struct.error)):
+        load_snapshot(str(path), HistoryStore(), FleetMatrix())
@@ -0,0 +1,73 @@
+from spill import SpillStore
+from store import MICROS, CityState, HistoryStore
+
+T0 = 1_700_000_000 * MICROS
+
+
+def test_spill_round_trip(tmp_path):
+    spill = SpillStore(str(tmp_path), 100)
+    state = CityState('paris', 100)
+    for i in range(5):
+        state.append(T0 + i * MICROS, float(i), 50.0)
+    spill.save(state)
+    assert spill.contains('paris') and spill.count() == 1
+
+    restored = spill.take('paris')
+    assert restored.points == state.points
+    assert restored.observations == state.observations
+    assert not spill.contains('paris')
+    assert spill.take('paris') is None
+
+
+def test_spill_save_merges_with_previous(tmp_path):
+    spill = SpillStore(str(tmp_path), 100)
+    first, second = CityState('paris', 100), CityState('paris', 100)
+    first.append(T0, 1.0, 50.0)
+    second.append(T0 + MICROS, 2.0, 50.0)
+    spill.save(first)
+    spill.save(second)
+    assert [point.temperature for point in spill.take('paris').points] == [1.0, 2.0]
+
+
+def test_spill_survives_restart_and_discard(tmp_path):
+    state = CityState('paris', 100)
+    state.append(T0, 1.0, 50.0)
+    SpillStore(str(tmp_path), 100).save(state)
+    reopened = SpillStore(str(tmp_path), 100)
+    assert reopened.contains('paris')
+    reopened.discard('paris')
+    assert not reopened.contains('paris')
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_spill_corrupted_file(tmp_path):
+    spill = SpillStore(str(tmp_path), 100)
+    state = CityState('paris', 100)
+    state.append(T0, 1.0, 50.0)
+    spill.save(state)
+    (path,) = tmp_path.iterdir()
+    path.write_bytes(b'\xff' * 16)
+    assert spill.take('paris') is None
+
+
+def test_store_spills_over_budget_and_reloads(tmp_path):
+    store = HistoryStore(budget_bytes=1, spill=SpillStore(str(tmp_path), 100))
+    for i, city in enumerate(('paris', 'oslo', 'lima')):
+        store.append(city, T0 + i * MICROS, float(i), 50.0)
+    assert store.cities() == ['lima']
+    assert store.spilled == 2
+    assert [point.temperature for point in store.points('paris')] == [0.0]
+    assert store.reloads == 1
+    assert store.count('nowhere') == 0
+
+
+
+def test_spill_lists_cities_after_restart(tmp_path):
+    spill = SpillStore(str(tmp_path), 100)
+    for city in ('paris', 'oslo'):
+        state = CityState(city, 100)
+        state.append(T0, 1.0, 50.0)
+        spill.save(state)
+    spill.take('oslo')
+    assert spill.cities() == ['paris']
+    assert SpillStore(str(tmp_path), 100).cities() == ['paris']
@@ -0,0 +1,91 @@
+import numpy as np
+
+from store import MICROS, CityState
+
+T0 = 1_700_000_000 * MICROS
+
+
+def _counts(state):
+    return {name: sum(bucket.count for bucket in buckets.values()) for name, buckets in state.rollups.tiers.items()}
+
+
+def test_merge_interleaves_and_renumbers():
+    left, right = CityState('paris', 100), CityState('paris', 100)
+    for i in range(0, 10, 2):
+        left.append(T0 + i * MICROS, float(i), 50.0)
+    for i in range(1, 10, 2):
+        right.append(T0 + i * MICROS, float(i), 50.0)
+    left.merge(right)
+    assert [point.temperature for point in left.points] == [float(i) for i in range(10)]
+    assert [point.seq for point in left.points] == list(range(1, 11))
+    assert left.next_seq == 11
+    assert left.observations == 10
+    assert _counts(left) == {'hour': 10, 'day': 10}
+
+
+def test_merge_with_empty():
+    state = CityState('paris', 100)
+    state.append(T0, 1.0, 2.0)
+    state.merge(CityState('paris', 100))
+    assert len(state.points) == 1 and state.observations == 1
+    empty = CityState('paris', 100)
+    empty.merge(state)
+    assert [point.temperature for point in empty.points] == [1.0]
+
+
+def test_merge_respects_max_points():
+    left, right = CityState('paris', 5), CityState('paris', 5)
+    for i in range(5):
+        left.append(T0 + i * MICROS, float(i), 50.0)
+        right.append(T0 + (i + 5) * MICROS, float(i + 5), 50.0)
+    left.merge(right)
+    assert [point.temperature for point in left.points] == [5.0, 6.0, 7.0, 8.0, 9.0]
+
+
+def test_append_folds_same_provider_observation():
+    state = CityState('paris', 100)
+    first = state.append(T0, 12.0, 70.0)
+    folded = state.append(T0, 12.0, 70.0)
+    assert folded.seq == first.seq and folded.repeats == 2
+    assert len(state.points) == 1
+    assert state.observations == 2
+    # агрегаты считают и повторы
+    assert _counts(state) == {'hour': 2, 'day': 2}
+
+
+def test_append_same_values_new_time_is_new_point():
+    state = CityState('paris', 100)
+    state.append(T0, 12.0, 70.0)
+    state.append(T0 + 600 * MICROS, 12.0, 70.0)
+    assert [point.seq for point in state.points] == [1, 2]
+    assert [point.repeats for point in state.points] == [1, 1]
+
+
+def test_append_trims_history():
+    state = CityState('paris', 10)
+    for i in range(30):
+        state.append(T0 + i * MICROS, float(i), 50.0)
+    assert 10 <= len(state.points) <= 11
+    assert state.points[-1].seq == 30
+    assert state.observations == len(state.points)
+
+
+def test_backfill_empty_batch():
+    state = CityState('paris', 100)
+    empty = np.array([], dtype=np.int64), np.array([]), np.array([])
+    assert state.backfill(*empty) == 0
+    state.append(T0, 1.0, 2.0)
+    assert state.backfill(*empty) == 0
+    assert len(state.points) == 1
+
+
+def test_backfill_folds_and_sorts():
+    state = CityState('paris', 100)
+    observed = np.array([T0 + 2 * MICROS, T0, T0, T0 + MICROS], dtype=np.int64)
+    temperatures = np.array([3.0, 1.0, 1.0, 2.0])
+    humidities = np.array([50.0, 50.0, 50.0, 50.0])
+    assert state.backfill(observed, temperatures, humidities) == 3
+    assert [point.observed_us for point in state.points] == [T0, T0 + MICROS, T0 + 2 * MICROS]
+    assert [point.repeats for point in state.points] == [2, 1, 1]
+    assert state.observations == 4
+    assert _counts(state) == {'hour': 4, 'day': 4}
@@ -0,0 +1,53 @@
+import pytest
+
+from tracing import parse_traceparent, start_span
+
+TRACE_ID = '4bf92f3577b34da6a3ce929d0e0e4736'
+SPAN_ID = '00f067aa0ba902b7'
+
+
+def test_parse_valid():
+    assert parse_traceparent(f'00-{TRACE_ID}-{SPAN_ID}-01') == (TRACE_ID, SPAN_ID, True)
+    assert parse_traceparent(f'00-{TRACE_ID}-{SPAN_ID}-00') == (TRACE_ID, SPAN_ID, False)
+    # из флагов важен только младший бит sampled
+    assert parse_traceparent(f'00-{TRACE_ID}-{SPAN_ID}-03') == (TRACE_ID, SPAN_ID, True)
+
+
+@pytest.mark.parametrize('value', [
+    None,
+    '',
+    'garbage',
+    f'00-{TRACE_ID}-{SPAN_ID}',
+    f'00-{TRACE_ID}-{SPAN_ID}-01-extra',
+    f'00_{TRACE_ID}_{SPAN_ID}_01',
+    f'00-{TRACE_ID[:-1]}x-{SPAN_ID}-01',
+    f'00-{TRACE_ID}-{SPAN_ID[:-1]}g-01',
+    f'00-{TRACE_ID}-{SPAN_ID}-zz',
+    f'00-{TRACE_ID.upper()}-{SPAN_ID}-01',
+    f'ff-{TRACE_ID}-{SPAN_ID}-01',
+    f'00-{"0" * 32}-{SPAN_ID}-01',
+    f'00-{TRACE_ID}-{"0" * 16}-01',
+])
+def test_parse_malformed(value):
+    assert parse_traceparent(value) is None
+
+
+def test_span_continues_parent():
+    span = start_span('GET /x', f'00-{TRACE_ID}-{SPAN_ID}-01')
+    assert (span.trace_id, span.parent_id, span.sampled) == (TRACE_ID, SPAN_ID, True)
+    assert parse_traceparent(span.traceparent) == (TRACE_ID, span.span_id, True)
+
+
+def test_untrusted_parent_does_not_force_sampling(monkeypatch):
+    monkeypatch.setattr('tracing.SAMPLE_RATE', 0.0)
+    span = start_span('GET /x', f'00-{TRACE_ID}-{SPAN_ID}-01', trust_parent=False)
+    assert span.trace_id == TRACE_ID
+    assert not span.sampled
+
+
+def test_malformed_parent_starts_new_trace(monkeypatch):
+    monkeypatch.setattr('tracing.SAMPLE_RATE', 0.0)
+    span = start_span('GET /x', 'garbage')
+    assert span.parent_id is None
+    assert len(span.trace_id) == 32
+    assert not span.sampled
@@ -0,0 +1,81 @@
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import workers
+from workers import WorkerPool, worker_env
+
+
+def test_worker_env(monkeypatch):
+    monkeypatch.delenv('GRPC_UNIX_SOCKET', raising=False)
+    assert worker_env(2) == {'GRPC_WORKER_INDEX': '2'}
+    monkeypatch.setenv('GRPC_UNIX_SOCKET', '/run/grpc/dp.sock')
+    assert worker_env(1) == {'GRPC_WORKER_INDEX': '1', 'GRPC_UNIX_SOCKET': '/run/grpc/dp.sock.1'}
+
+
+class _Stats(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = json.dumps({"path": self.path}).encode('utf-8')
+        self.send_response(200)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stats_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Stats)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+
+def test_collect_skips_silent_workers(stats_server):
+    # второй процесс (порт + 1) не слушает - его ответа просто нет
+    pool = WorkerPool('unused.py', count=2, stats_port=stats_server)
+    assert pool.collect('/executor') == [{"worker": 0, "stats": {"path": "/executor"}}]
+    assert list(pool.fetch('/metrics')) == [0]
+
+
+SCRIPT = '''
+import os, time
+with open(os.path.join(os.environ['OUT'], os.environ['GRPC_WORKER_INDEX']), 'a') as f:
+    f.write(os.environ['GRPC_WORKER_STATS_PORT'] + ' ' + os.environ['GRPC_WORKERS'] + '\\n')
+time.sleep(60)
+'''
+
+
+def _wait(predicate, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_pool_spawns_restarts_and_stops(tmp_path, monkeypatch):
+    monkeypatch.setattr(workers, 'RESTART_DELAY', 0.05)
+    monkeypatch.setattr(workers.signal, 'signal', lambda *args: None)
+    script = tmp_path / 'worker.py'
+    script.write_text(SCRIPT)
+    pool = WorkerPool(str(script), count=2, env=lambda index: {'OUT': str(tmp_path)}, stats_port=17000)
+    pool.start()
+    try:
+        assert _wait(lambda: os.path.exists(tmp_path / '0') and os.path.exists(tmp_path / '1'))
+        assert (tmp_path / '1').read_text() == '17001 2\n'
+        assert pool.healthy()
+
+        pool._processes[0].kill()
+        assert _wait(lambda: pool.stats()[0]["restarts"] == 1 and pool.healthy())
+        assert _wait(lambda: len((tmp_path / '0').read_text().splitlines()) == 2)
+    finally:
+        pool.stop()
+    assert not any(item["alive"] for item in pool.stats())